@@ -3,10 +3,11 @@ Main FastAPI server and routes
 """
 
 import os
+from contextlib import asynccontextmanager
 from pathlib import Path
 from fastapi import FastAPI, Request
 from fastapi.middleware.cors import CORSMiddleware
-from fastapi.responses import HTMLResponse, JSONResponse, FileResponse
+from fastapi.responses import HTMLResponse, JSONResponse, FileResponse, PlainTextResponse, Response
 from fastapi.staticfiles import StaticFiles
 from dotenv import load_dotenv
 
@@ -15,11 +16,52 @@ env_path = Path(__file__).parent.parent / ".env"
 load_dotenv(dotenv_path=env_path)
 
 # Import routers and middleware (after loading env vars)
-from routers import trends
+from routers import history, jobs, profiling, trends, usage
 from middleware.rate_limiter import rate_limiter
+from services.analysis_store import analysis_store
+from services.deadline import parse_timeout_header
+from services.health_prober import health_prober
+from services.http_client import close_shared_client
+from services.idempotency import IDEMPOTENT_PATHS, MAX_KEY_LENGTH, idempotency_store
+from services.job_queue import job_queue
+from services.precompute import precomputer
+from services.similarity_cache import similarity_cache
+from observability.llm_usage import set_usage_endpoint
+from observability.metrics import metrics
+from observability.loop_monitor import loop_monitor
+from observability.profiler import profiler
+from observability.timing import start_request_timer, timing_span
+from observability.tracing import setup_tracing
+
+# Install the tracer provider before any spans are created (no-op unless TRACING_ENABLED)
+setup_tracing()
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    """Startup and shutdown hooks for background workers"""
+    # Index recent analyses for near-duplicate lookups and keep popular ones warm
+    similarity_cache.warm()
+    precomputer.start()
+    # Background workers for /api/jobs analyses
+    job_queue.start()
+    # Upstream health for /api/status, checked off the request path
+    health_prober.start()
+    # Sampler thread for per-request and on-demand profiles
+    profiler.start()
+    # Event loop lag, and stacks of whatever blocks the loop
+    loop_monitor.start()
+    yield
+    await loop_monitor.stop()
+    await health_prober.stop()
+    await job_queue.stop()
+    await precomputer.stop()
+    await close_shared_client()
+    # Flush analyses still queued for the history store
+    analysis_store.close()
 
 # Create the FastAPI application with enhanced Swagger UI
 app = FastAPI(
+    lifespan=lifespan,
     title="Trend Compass API",
     description="""
     AI-Powered Trend Forecasting & Audience Analysis
@@ -28,7 +70,11 @@ app = FastAPI(
     This API provides endpoints for:
     - `/api/trends/analyze` - Analyze trending topics and forecast their trajectory
     - `/api/audience/analyze` - Generate detailed audience insights and demographics
+    - `/api/audience/compare` - Compare an audience across regions in one request
     - `/api/status` - Check API service status and integrations
+    - `/api/history/search` - Search previously generated analyses (admin)
+    - `/api/jobs/trends/analyze` - Run a long analysis in the background and poll `/api/jobs/{id}`
+    - `/api/usage/llm` - Gemini tokens, latency and cost by endpoint, client, depth and query (admin)
     
     """,
     version="1.0.0",
@@ -51,6 +97,8 @@ app.add_middleware(
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
+    # Let the frontend read rate limit, latency breakdown and replay headers
+    expose_headers=["X-RateLimit-Limit", "X-RateLimit-Remaining", "Server-Timing", "Idempotent-Replayed"],
 )
 
 # Add rate limiting middleware
@@ -59,13 +107,22 @@ async def rate_limit_middleware(request: Request, call_next):
     """Apply rate limiting to API endpoints"""
     
     # Skip rate limiting for health checks and docs
-    if request.url.path in ["/", "/health", "/docs", "/redoc", "/openapi.json"]:
+    if request.url.path in ["/", "/health", "/metrics", "/docs", "/redoc", "/openapi.json"]:
         response = await call_next(request)
         return response
     
+    # Polling a background job does not count as another analysis
+    if request.method == "GET" and request.url.path.startswith("/api/jobs/"):
+        return await call_next(request)
+    
+    # Admin endpoints are gated by token instead
+    if request.url.path.startswith(("/api/admin/", "/api/usage/", "/api/history/")):
+        return await call_next(request)
+    
     # Check rate limit for API endpoints
     if request.url.path.startswith("/api/"):
-        rate_limit_response = rate_limiter.check_rate_limit(request)
+        with timing_span("rate_limit"):
+            rate_limit_response = rate_limiter.check_rate_limit(request)
         if rate_limit_response:
             return rate_limit_response
     
@@ -80,8 +137,94 @@ async def rate_limit_middleware(request: Request, call_next):
     
     return response
 
+# Replay retried analysis POSTs (registered after rate limiting so replays don't use up the daily limit)
+@app.middleware("http")
+async def idempotency_middleware(request: Request, call_next):
+    """Return the stored response (or wait for the running one) for a repeated Idempotency-Key"""
+    key = request.headers.get("idempotency-key")
+    if (key is None or request.method != "POST" or request.url.path not in IDEMPOTENT_PATHS
+            or not idempotency_store.available):
+        return await call_next(request)
+    if not 0 < len(key) <= MAX_KEY_LENGTH:
+        return JSONResponse(status_code=400, content={"detail": f"Idempotency-Key must be 1-{MAX_KEY_LENGTH} characters"})
+
+    # Keys are per client, and a reused key must come with the same request
+    scoped_key = f"{rate_limiter.get_client_ip(request)}|{key}"
+    fingerprint = idempotency_store.fingerprint(request.method, request.url.path, await request.body())
+    with timing_span("idempotency"):
+        outcome, stored = await idempotency_store.acquire(
+            scoped_key, fingerprint, parse_timeout_header(request.headers.get("x-request-timeout"))
+        )
+    if outcome == "mismatch":
+        return JSONResponse(status_code=422, content={"detail": "Idempotency-Key was already used for a different request"})
+    if outcome == "in_flight":
+        return JSONResponse(status_code=409, headers={"Retry-After": "1"},
+                            content={"detail": "A request with this Idempotency-Key is still being processed"})
+    if outcome == "completed":
+        response = Response(content=stored["body"], status_code=stored["status"], headers=stored["headers"])
+        response.headers["Idempotent-Replayed"] = "true"
+        response.headers["X-RateLimit-Limit"] = str(rate_limiter.max_requests_per_day)
+        response.headers["X-RateLimit-Remaining"] = str(rate_limiter.get_remaining_requests(request))
+        return response
+    if outcome != "claimed":
+        return await call_next(request)
+
+    # First request with this key: run it and keep the response for retries
+    try:
+        response = await call_next(request)
+        body = b"".join([chunk async for chunk in response.body_iterator])
+    except BaseException:
+        await idempotency_store.release(scoped_key)
+        raise
+    await idempotency_store.complete(scoped_key, response.status_code, {
+        name: value for name, value in response.headers.items() if name in ("content-type", "content-length")
+    }, body)
+    buffered = Response(content=body, status_code=response.status_code)
+    # Header list as-is: repeated headers (Set-Cookie, Server-Timing) must all survive
+    buffered.raw_headers = list(response.raw_headers)
+    return buffered
+
+# Add per-request latency breakdown (registered after rate limiting so it wraps it)
+@app.middleware("http")
+async def server_timing_middleware(request: Request, call_next):
+    """Time each API request stage and report it in a Server-Timing header"""
+    if not request.url.path.startswith("/api/"):
+        return await call_next(request)
+    
+    # Clients opt in to a JSON timing block in the body with ?debug=timing or X-Debug-Timing: 1
+    debug = request.query_params.get("debug") == "timing" or request.headers.get("x-debug-timing") == "1"
+    timer = start_request_timer(debug=debug)
+    # Gemini usage is accounted per endpoint
+    set_usage_endpoint(request.url.path)
+    response = await call_next(request)
+    response.headers["Server-Timing"] = timer.server_timing_header()
+    response.headers["Timing-Allow-Origin"] = "*"
+    return response
+
+# Mark a sample of API requests for the profiler (registered last so rate limiting is in the profile too)
+@app.middleware("http")
+async def profiling_middleware(request: Request, call_next):
+    """Profile PROFILE_SAMPLE_RATE of API requests with the sampling profiler"""
+    if (not request.url.path.startswith("/api/") or request.url.path.startswith("/api/admin/")
+            or not profiler.begin_request(request.scope)):
+        return await call_next(request)
+    try:
+        return await call_next(request)
+    finally:
+        profiler.end_request()
+
 # Include routers for different endpoints
 app.include_router(trends.router)
+app.include_router(history.router)
+app.include_router(jobs.router)
+app.include_router(usage.router)
+app.include_router(profiling.router)
+
+# Prometheus metrics (registered before the frontend catch-all route)
+@app.get("/metrics", tags=["Health"], response_class=PlainTextResponse)
+async def prometheus_metrics():
+    """Upstream attempt/retry counters and other metrics in Prometheus text format."""
+    return metrics.render_prometheus()
 
 # Mount static files (Vite build output)
 dist_path = Path(__file__).parent.parent / "dist"
@@ -155,7 +298,8 @@ async def api_info():
         "docs": "/docs",
         "endpoints": {
             "trend_analysis": "/api/trends/analyze",
-            "audience_insights": "/api/audience/analyze"
+            "audience_insights": "/api/audience/analyze",
+            "audience_comparison": "/api/audience/compare"
         }
     }
 
@@ -167,7 +311,7 @@ async def reset_rate_limits():
         rate_limiter.reset_all_limits()
         return {
             "status": "success",
-            "message": "Rate limits have been reset. You now have 15 fresh requests.",
+            "message": f"Rate limits have been reset. You now have {rate_limiter.max_requests_per_day} fresh requests.",
             "max_requests": rate_limiter.max_requests_per_day
         }
     except Exception as e:
@@ -2,6 +2,7 @@
 Rate limiting middleware to prevent API abuse and control costs
 """
 
+import os
 import time
 import json
 from pathlib import Path
@@ -12,9 +13,9 @@ from fastapi.responses import JSONResponse
 class RateLimiter:
     """Simple file-based rate limiter to control API usage per IP"""
     
-    def __init__(self, max_requests_per_day: int = 15):
+    def __init__(self, max_requests_per_day: int = 15, rate_limit_file: Optional[str] = None):
         self.max_requests_per_day = max_requests_per_day
-        self.rate_limit_file = Path(__file__).parent.parent / "rate_limits.json"
+        self.rate_limit_file = Path(rate_limit_file) if rate_limit_file else Path(__file__).parent.parent / "rate_limits.json"
         self.ensure_rate_limit_file()
     
     def ensure_rate_limit_file(self):
@@ -133,4 +134,8 @@ class RateLimiter:
             return False
 
 # Global rate limiter instance
-rate_limiter = RateLimiter(max_requests_per_day=15)  # 15 requests per day per IP - Hackathon friendly!
+# 15 requests per day per IP - Hackathon friendly! Overridable for load tests and local development
+rate_limiter = RateLimiter(
+    max_requests_per_day=int(os.getenv("RATE_LIMIT_PER_DAY", "15")),
+    rate_limit_file=os.getenv("RATE_LIMIT_FILE")
+)
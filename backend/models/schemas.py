@@ -29,7 +29,7 @@ class TrendAnalysisRequest(BaseModel):
     )
     depth: Optional[str] = Field(
         "standard",
-        description="Depth of analysis: 'basic', 'standard', or 'deep'"
+        description="Depth of analysis: 'basic' (rule-based insights from Qloo data, no LLM), 'standard', or 'deep'"
     )
 
 class AudienceInsightRequest(BaseModel):
@@ -71,6 +71,7 @@ class TrendAnalysisResponse(BaseModel):
     insights: List[InsightPoint]
     recommendations: List[str]
     data_sources: Dict[str, Any] = {}  # For raw data points if needed
+    debug: Optional[Dict[str, Any]] = None  # Stage timings when requested with ?debug=timing
 
 class AudienceInsightResponse(BaseModel):
     """
@@ -82,3 +83,50 @@ class AudienceInsightResponse(BaseModel):
     cultural_affinities: List[InsightPoint]
     recommendations: List[str]
     data_sources: Dict[str, Any] = {}
+    debug: Optional[Dict[str, Any]] = None
+
+class AudienceComparisonRequest(BaseModel):
+    """
+    Model for comparing one audience across several regions.
+    """
+    target_audience: str = Field(
+        ...,
+        description="Description of the target audience",
+        min_length=3,
+        max_length=200,
+        example="Gen Z tech enthusiasts"
+    )
+    product_category: Optional[str] = Field(
+        None,
+        description="Product or content category"
+    )
+    regions: List[str] = Field(
+        ["North America", "Europe", "Asia"],
+        description="Regions to compare (2 to 6)",
+        min_length=2,
+        max_length=6
+    )
+
+class RegionComparison(BaseModel):
+    """
+    How one region differs from the others, computed from Qloo data.
+    """
+    region: str
+    audience_size: Optional[str] = None
+    similarity: float  # Mean overlap of its affinities with the other regions (0-1)
+    distinctive: List[str]  # Affinities this region over-indexes on
+    less_prominent: List[str]  # Affinities the other regions rank higher
+
+class AudienceComparisonResponse(BaseModel):
+    """
+    Model for multi-region audience comparison response to the client.
+    """
+    target_audience: str
+    summary: str
+    timestamp: str
+    regions: List[RegionComparison]
+    shared_affinities: List[str]
+    insights: List[InsightPoint]
+    recommendations: List[str]
+    data_sources: Dict[str, Any] = {}
+    debug: Optional[Dict[str, Any]] = None
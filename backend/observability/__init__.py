@@ -0,0 +1,6 @@
+"""
+__init__.py - Package initialization for observability
+
+This empty file marks the 'observability' directory as a Python package,
+allowing its modules to be imported from other parts of the application.
+"""
@@ -0,0 +1,207 @@
+"""
+LLM usage - Gemini tokens, latency and cost per endpoint, client, depth and query
+
+Every Gemini call reports its real token counts (response.usage_metadata,
+the estimate when a response has none) and model latency here. They are
+priced with per-model rates (USD per million prompt and response tokens,
+LLM_PRICES overrides them) and aggregated in-process by endpoint, client,
+depth, model and query, so GET /api/usage/llm can answer which traffic
+drives Gemini spend and latency; totals also go to /metrics. Client and
+query tables are bounded to LLM_USAGE_MAX_KEYS entries each, dropping the
+cheapest first. Like the other metrics the numbers are per worker.
+
+With LLM_COST_ADMISSION enabled, calls are also admitted by cost before
+they wait for an LLM slot: a client that has spent LLM_CLIENT_HOURLY_BUDGET
+dollars this hour falls back to rule-based answers, and while calls are
+queueing for Gemini capacity the most expensive prompts (above the
+LLM_ADMISSION_PERCENTILE of recent call costs) are turned away first.
+
+The endpoint is taken from a context variable set by the HTTP middleware
+(or by the job workers), like the request timer.
+"""
+
+import json
+import os
+import threading
+import time
+from collections import deque
+from contextvars import ContextVar
+from typing import Any, Deque, Dict, Optional, Tuple
+
+import numpy as np
+
+from observability.metrics import metrics
+
+# USD per million (prompt, response) tokens
+DEFAULT_PRICES: Dict[str, Tuple[float, float]] = {
+    "gemini-1.5-flash": (0.075, 0.30),
+    "gemini-1.5-pro": (1.25, 5.00),
+}
+LLM_PRICES = {**DEFAULT_PRICES, **{
+    model: tuple(rates) for model, rates in json.loads(os.getenv("LLM_PRICES") or "{}").items()
+}}
+LLM_USAGE_MAX_KEYS = int(os.getenv("LLM_USAGE_MAX_KEYS", "1000"))           # Clients / queries tracked
+LLM_COST_ADMISSION = os.getenv("LLM_COST_ADMISSION", "false").lower() in ("1", "true", "yes")
+LLM_CLIENT_HOURLY_BUDGET = float(os.getenv("LLM_CLIENT_HOURLY_BUDGET", "0.50"))  # USD per client per hour
+LLM_ADMISSION_PERCENTILE = float(os.getenv("LLM_ADMISSION_PERCENTILE", "90"))   # Shed above this under load
+RECENT_COSTS = 500                                                             # Calls the percentile covers
+
+DIMENSIONS = ("endpoint", "client", "depth", "model", "query")
+BOUNDED_DIMENSIONS = ("client", "query")
+
+metrics.describe("llm_tokens_total", "Gemini tokens by model, kind (prompt/response), endpoint and depth")
+metrics.describe("llm_cost_usd_total", "Estimated Gemini spend in USD by model, endpoint and depth")
+metrics.describe("llm_call_duration_seconds", "Gemini model latency by model")
+metrics.describe("llm_admission_rejections_total", "Gemini calls turned away by cost-based admission by reason")
+
+_current_endpoint: ContextVar[str] = ContextVar("llm_usage_endpoint", default="background")
+
+
+def set_usage_endpoint(endpoint: str):
+    """Attribute the LLM calls of the current request (or job) to an endpoint"""
+    _current_endpoint.set(endpoint)
+
+
+def current_endpoint() -> str:
+    return _current_endpoint.get()
+
+
+def price(model: Optional[str], prompt_tokens: float, response_tokens: float) -> float:
+    """Cost of a call in USD (0 for models without a known price)"""
+    prompt_rate, response_rate = LLM_PRICES.get(model or "", (0.0, 0.0))
+    return (prompt_tokens * prompt_rate + response_tokens * response_rate) / 1_000_000
+
+
+def _empty() -> Dict[str, float]:
+    return {"calls": 0, "prompt_tokens": 0, "response_tokens": 0, "cost_usd": 0.0, "latency_seconds": 0.0}
+
+
+class LLMUsageTracker:
+    """In-process token, latency and cost accounting for Gemini calls"""
+
+    def __init__(self, max_keys: int = LLM_USAGE_MAX_KEYS, admission: bool = LLM_COST_ADMISSION,
+                 client_hourly_budget: float = LLM_CLIENT_HOURLY_BUDGET,
+                 admission_percentile: float = LLM_ADMISSION_PERCENTILE):
+        self.max_keys = max_keys
+        self.admission = admission
+        self.client_hourly_budget = client_hourly_budget
+        self.admission_percentile = admission_percentile
+        self._lock = threading.Lock()
+        self._totals = _empty()
+        self._by: Dict[str, Dict[str, Dict[str, float]]] = {dimension: {} for dimension in DIMENSIONS}
+        # Client -> (hour, USD spent in it), for the hourly budget
+        self._hourly: Dict[str, Tuple[int, float]] = {}
+        self._recent_costs: Deque[float] = deque(maxlen=RECENT_COSTS)
+        self._threshold: Optional[float] = None
+        self.rejections = {"client_budget": 0, "expensive_under_load": 0}
+        self.started = time.time()
+
+    def record(self, model: Optional[str], client: str, depth: Optional[str], query: Optional[str],
+               prompt_tokens: int, response_tokens: int, latency: float) -> float:
+        """Account one Gemini call; returns its cost in USD"""
+        cost = price(model, prompt_tokens, response_tokens)
+        endpoint = current_endpoint()
+        keys = {"endpoint": endpoint, "client": client, "depth": depth or "unknown",
+                "model": model or "unknown", "query": (query or "").strip().lower()[:120] or "unknown"}
+        hour = int(time.time() // 3600)
+        with self._lock:
+            entries = [self._totals]
+            for dimension, key in keys.items():
+                table = self._by[dimension]
+                entry = table.get(key)
+                if entry is None:
+                    if dimension in BOUNDED_DIMENSIONS and len(table) >= self.max_keys:
+                        # Keep the big spenders: drop the cheapest entry
+                        del table[min(table, key=lambda name: table[name]["cost_usd"])]
+                    entry = table[key] = _empty()
+                entries.append(entry)
+            for stats in entries:
+                stats["calls"] += 1
+                stats["prompt_tokens"] += prompt_tokens
+                stats["response_tokens"] += response_tokens
+                stats["cost_usd"] += cost
+                stats["latency_seconds"] += latency
+            spent_hour, spent = self._hourly.get(client, (hour, 0.0))
+            self._hourly[client] = (hour, (spent if spent_hour == hour else 0.0) + cost)
+            if len(self._hourly) > self.max_keys:
+                self._hourly = {name: value for name, value in self._hourly.items() if value[0] == hour}
+            self._recent_costs.append(cost)
+            self._threshold = None
+
+        labels = {"model": keys["model"], "endpoint": endpoint, "depth": keys["depth"]}
+        metrics.increment("llm_tokens_total", {**labels, "kind": "prompt"}, prompt_tokens)
+        metrics.increment("llm_tokens_total", {**labels, "kind": "response"}, response_tokens)
+        metrics.increment("llm_cost_usd_total", labels, cost)
+        metrics.observe("llm_call_duration_seconds", latency, {"model": keys["model"]})
+        return cost
+
+    def hourly_spend(self, client: str) -> float:
+        spent_hour, spent = self._hourly.get(client, (0, 0.0))
+        return spent if spent_hour == int(time.time() // 3600) else 0.0
+
+    def _expensive_threshold(self) -> Optional[float]:
+        """Cost above which a call counts as expensive (None until enough calls were seen)"""
+        if self._threshold is None and len(self._recent_costs) >= 20:
+            self._threshold = float(np.percentile(np.fromiter(self._recent_costs, float), self.admission_percentile))
+        return self._threshold
+
+    def admit(self, client: str, estimated_cost: float, congested: bool) -> Optional[str]:
+        """
+        Cost-based admission for a call about to wait for an LLM slot.
+
+        Returns:
+            None to admit the call, or the reason it was turned away
+        """
+        if not self.admission:
+            return None
+        reason = None
+        if self.hourly_spend(client) + estimated_cost > self.client_hourly_budget:
+            reason = "client_budget"
+        elif congested:
+            threshold = self._expensive_threshold()
+            if threshold is not None and estimated_cost > threshold:
+                reason = "expensive_under_load"
+        if reason is not None:
+            self.rejections[reason] += 1
+            metrics.increment("llm_admission_rejections_total", {"reason": reason})
+        return reason
+
+    @staticmethod
+    def _summary(stats: Dict[str, float]) -> Dict[str, Any]:
+        calls = stats["calls"]
+        return {
+            "calls": calls,
+            "prompt_tokens": stats["prompt_tokens"],
+            "response_tokens": stats["response_tokens"],
+            "cost_usd": round(stats["cost_usd"], 6),
+            "mean_latency_ms": round(stats["latency_seconds"] / calls * 1000, 1) if calls else None,
+            "mean_cost_usd": round(stats["cost_usd"] / calls, 6) if calls else None,
+        }
+
+    def summary(self, top: int = 10) -> Dict[str, Any]:
+        """Totals plus usage by endpoint, depth and model, and the top clients and queries by cost"""
+        with self._lock:
+            result: Dict[str, Any] = {
+                "since": self.started,
+                "totals": self._summary(self._totals),
+                "prices_usd_per_million_tokens": {
+                    model: {"prompt": rates[0], "response": rates[1]} for model, rates in LLM_PRICES.items()
+                },
+            }
+            for dimension in DIMENSIONS:
+                rows = sorted(self._by[dimension].items(), key=lambda item: item[1]["cost_usd"], reverse=True)
+                if dimension in BOUNDED_DIMENSIONS:
+                    rows = rows[:top]
+                result[f"by_{dimension}"] = {key: self._summary(stats) for key, stats in rows}
+        result["admission"] = {
+            "enabled": self.admission,
+            "client_hourly_budget_usd": self.client_hourly_budget,
+            "percentile": self.admission_percentile,
+            "expensive_threshold_usd": self._expensive_threshold(),
+            "rejections": dict(self.rejections),
+        }
+        return result
+
+
+# Global LLM usage tracker instance
+llm_usage = LLMUsageTracker()
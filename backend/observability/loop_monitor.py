@@ -0,0 +1,175 @@
+"""
+Event loop monitor - Scheduling lag and the callbacks that block the loop
+
+Each worker serves every request on one event loop, so any synchronous
+work in a coroutine (file I/O, print(), big json.dumps calls, CPU-heavy
+parsing) delays every other request in the worker. This monitor measures
+that continuously:
+
+- A task sleeps LOOP_LAG_INTERVAL_MS at a time and records how late it
+  wakes up as the loop's scheduling lag (event_loop_lag_seconds histogram).
+- A watchdog thread checks that task's deadline. When it is more than
+  LOOP_BLOCK_THRESHOLD_MS overdue, the loop is stuck in one callback (or
+  saturated), and the watchdog captures the loop thread's stack right then,
+  tagged with the route and pipeline stage the profiler would give it.
+  The last LOOP_BLOCK_EVENTS of these are kept with their stacks and how
+  long the loop stayed blocked, and counted in event_loop_blocks_total.
+
+GET /api/admin/loop returns them; /api/status has the lag summary.
+"""
+
+import asyncio
+import os
+import sys
+import threading
+import time
+import traceback
+from collections import Counter, deque
+from datetime import datetime
+from typing import Any, Deque, Dict, List, Optional
+
+import numpy as np
+
+from observability.metrics import metrics
+from observability.profiler import code_label, route_of, walk_stack
+
+LOOP_MONITOR_ENABLED = os.getenv("LOOP_MONITOR_ENABLED", "true").lower() in ("1", "true", "yes")
+LOOP_LAG_INTERVAL_MS = float(os.getenv("LOOP_LAG_INTERVAL_MS", "50"))        # Lag measured this often
+LOOP_BLOCK_THRESHOLD_MS = float(os.getenv("LOOP_BLOCK_THRESHOLD_MS", "100"))  # Lag that counts as blocked
+LOOP_BLOCK_EVENTS = int(os.getenv("LOOP_BLOCK_EVENTS", "50"))                # Blocking events kept
+LAG_WINDOW = 1200                                                             # Recent lags in the summary
+STACK_FRAMES = 25                                                             # Innermost frames kept per event
+
+LAG_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0)
+
+metrics.describe("event_loop_lag_seconds", "Event loop scheduling lag")
+metrics.describe("event_loop_blocks_total", "Times the event loop was blocked past the threshold, by stage")
+metrics.describe("event_loop_block_seconds", "How long the event loop stayed blocked, by stage")
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+class LoopMonitor:
+    """Loop lag measurement plus a watchdog that captures the stacks of blocking callbacks"""
+
+    def __init__(self, interval_ms: float = LOOP_LAG_INTERVAL_MS, threshold_ms: float = LOOP_BLOCK_THRESHOLD_MS,
+                 max_events: int = LOOP_BLOCK_EVENTS):
+        self.interval = interval_ms / 1000
+        self.threshold = threshold_ms / 1000
+        self._lock = threading.Lock()
+        self._task: Optional[asyncio.Task] = None
+        self._watchdog: Optional[threading.Thread] = None
+        self._stopping = threading.Event()
+        self._loop_thread: Optional[int] = None
+        # time.monotonic() by which the lag task should have woken up (None while it runs)
+        self._expected: Optional[float] = None
+        # Blocking event detected during the current sleep, completed when the task wakes up
+        self._open: Optional[Dict[str, Any]] = None
+        self._lags: Deque[float] = deque(maxlen=LAG_WINDOW)
+        self.events: Deque[Dict[str, Any]] = deque(maxlen=max_events)
+        self.sites: Counter = Counter()
+        self.stats = {"ticks": 0, "blocks": 0, "max_lag_ms": 0.0}
+
+    async def _measure(self):
+        while True:
+            with self._lock:
+                self._expected = time.monotonic() + self.interval
+            await asyncio.sleep(self.interval)
+            lag = max(0.0, time.monotonic() - self._expected)
+            with self._lock:
+                self._expected = None
+                block, self._open = self._open, None
+            self._lags.append(lag)
+            self.stats["ticks"] += 1
+            self.stats["max_lag_ms"] = max(self.stats["max_lag_ms"], round(lag * 1000, 1))
+            metrics.observe("event_loop_lag_seconds", lag, buckets=LAG_BUCKETS)
+            if block is not None:
+                block["blocked_ms"] = round(lag * 1000, 1)
+                metrics.observe("event_loop_block_seconds", lag, {"stage": block["stage"]}, buckets=LAG_BUCKETS)
+
+    def _capture(self, overdue: float) -> Optional[Dict[str, Any]]:
+        """What the loop thread is running right now"""
+        frame = sys._current_frames().get(self._loop_thread)
+        if frame is None:
+            return None
+        try:
+            codes, stage, scope = walk_stack(frame)
+            stack = traceback.format_stack(frame)[-STACK_FRAMES:]
+        finally:
+            del frame
+        # Where in our own code it happened (the innermost backend frame), else the innermost frame
+        site = next((code for code in codes if code.co_filename.startswith(BACKEND_DIR)), codes[0] if codes else None)
+        return {
+            "detected_at": datetime.now().isoformat(),
+            "overdue_ms": round(overdue * 1000, 1),
+            "route": route_of(scope),
+            "stage": stage,
+            "site": code_label(site) if site is not None else "-",
+            "stack": [line.rstrip() for line in stack],
+        }
+
+    def _watch(self):
+        while not self._stopping.wait(self.threshold / 2):
+            with self._lock:
+                expected, detected = self._expected, self._open is not None
+            if expected is None or detected:
+                continue
+            overdue = time.monotonic() - expected
+            if overdue < self.threshold:
+                continue
+            try:
+                event = self._capture(overdue)
+            except Exception as e:
+                print(f"⚠️ Could not capture blocked event loop stack: {e}")
+                continue
+            if event is None:
+                continue
+            with self._lock:
+                # Still the same sleep: let the lag task fill in how long the loop stayed blocked
+                if self._expected == expected:
+                    self._open = event
+            self.events.append(event)
+            self.sites[event["site"]] += 1
+            self.stats["blocks"] += 1
+            metrics.increment("event_loop_blocks_total", {"stage": event["stage"]})
+
+    def start(self):
+        """Start measuring the running loop (call from the event loop thread)"""
+        if LOOP_MONITOR_ENABLED and self._task is None:
+            self._loop_thread = threading.get_ident()
+            self._stopping.clear()
+            self._task = asyncio.create_task(self._measure())
+            self._watchdog = threading.Thread(target=self._watch, name="loop-watchdog", daemon=True)
+            self._watchdog.start()
+            print(f"⏱️ Watching event loop lag (blocked when over {self.threshold * 1000:.0f}ms)")
+
+    async def stop(self):
+        self._stopping.set()
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+        self._watchdog = None
+
+    def snapshot(self) -> Dict[str, Any]:
+        lags = np.fromiter(self._lags, float) * 1000 if self._lags else None
+        return {
+            "enabled": self._task is not None,
+            "interval_ms": self.interval * 1000,
+            "threshold_ms": self.threshold * 1000,
+            "lag_p50_ms": round(float(np.percentile(lags, 50)), 2) if lags is not None else None,
+            "lag_p99_ms": round(float(np.percentile(lags, 99)), 2) if lags is not None else None,
+            **self.stats,
+            "top_sites": dict(self.sites.most_common(5)),
+        }
+
+    def blocking_events(self, limit: int = LOOP_BLOCK_EVENTS) -> List[Dict[str, Any]]:
+        """Most recent blocking events first, with their stacks"""
+        return list(self.events)[::-1][:limit]
+
+
+# Global event loop monitor instance
+loop_monitor = LoopMonitor()
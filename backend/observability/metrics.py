@@ -0,0 +1,123 @@
+"""
+Metrics - In-process counters and histograms with a Prometheus text endpoint
+
+A small registry (no client library needed) for operational counters such as
+upstream attempts and retries. Values are per worker process; GET /metrics
+renders them in the Prometheus text exposition format and snapshot() returns
+them as JSON for /api/status.
+"""
+
+import bisect
+import threading
+from typing import Dict, List, Optional, Sequence, Tuple
+
+LabelKey = Tuple[Tuple[str, str], ...]
+
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+
+def _label_key(labels: Optional[Dict[str, str]]) -> LabelKey:
+    return tuple(sorted((key, str(value)) for key, value in (labels or {}).items()))
+
+
+def _format_labels(key: LabelKey, extra: Optional[Tuple[str, str]] = None) -> str:
+    pairs = list(key) + ([extra] if extra else [])
+    if not pairs:
+        return ""
+    return "{" + ",".join(f'{name}="{value}"' for name, value in pairs) + "}"
+
+
+class _Histogram:
+    def __init__(self, buckets: Sequence[float]):
+        self.buckets = tuple(buckets)
+        self.counts = [0] * (len(self.buckets) + 1)
+        self.total = 0.0
+        self.count = 0
+
+    def observe(self, value: float):
+        self.counts[bisect.bisect_left(self.buckets, value)] += 1
+        self.total += value
+        self.count += 1
+
+
+class MetricsRegistry:
+    """Thread-safe counters and histograms keyed by name and labels"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._counters: Dict[str, Dict[LabelKey, float]] = {}
+        self._histograms: Dict[str, Dict[LabelKey, _Histogram]] = {}
+        self._help: Dict[str, str] = {}
+
+    def describe(self, name: str, help_text: str):
+        self._help[name] = help_text
+
+    def increment(self, name: str, labels: Optional[Dict[str, str]] = None, value: float = 1.0):
+        key = _label_key(labels)
+        with self._lock:
+            series = self._counters.setdefault(name, {})
+            series[key] = series.get(key, 0.0) + value
+
+    def observe(self, name: str, value: float, labels: Optional[Dict[str, str]] = None,
+                buckets: Sequence[float] = DEFAULT_BUCKETS):
+        key = _label_key(labels)
+        with self._lock:
+            series = self._histograms.setdefault(name, {})
+            histogram = series.get(key)
+            if histogram is None:
+                histogram = series[key] = _Histogram(buckets)
+            histogram.observe(value)
+
+    def counter_value(self, name: str, labels: Optional[Dict[str, str]] = None) -> float:
+        return self._counters.get(name, {}).get(_label_key(labels), 0.0)
+
+    def snapshot(self) -> Dict[str, Dict[str, object]]:
+        """Counters and histogram summaries as JSON-friendly dicts"""
+        with self._lock:
+            result: Dict[str, Dict[str, object]] = {}
+            for name, series in self._counters.items():
+                result[name] = {_format_labels(key) or "total": value for key, value in series.items()}
+            for name, series in self._histograms.items():
+                result[name] = {
+                    _format_labels(key) or "all": {
+                        "count": histogram.count,
+                        "sum": round(histogram.total, 6),
+                        "buckets": dict(zip([str(bound) for bound in histogram.buckets] + ["+Inf"],
+                                            _cumulative(histogram.counts)))
+                    }
+                    for key, histogram in series.items()
+                }
+            return result
+
+    def render_prometheus(self) -> str:
+        lines: List[str] = []
+        with self._lock:
+            for name, series in self._counters.items():
+                if name in self._help:
+                    lines.append(f"# HELP {name} {self._help[name]}")
+                lines.append(f"# TYPE {name} counter")
+                for key, value in series.items():
+                    lines.append(f"{name}{_format_labels(key)} {value:g}")
+            for name, series in self._histograms.items():
+                if name in self._help:
+                    lines.append(f"# HELP {name} {self._help[name]}")
+                lines.append(f"# TYPE {name} histogram")
+                for key, histogram in series.items():
+                    for bound, count in zip([f"{b:g}" for b in histogram.buckets] + ["+Inf"],
+                                            _cumulative(histogram.counts)):
+                        lines.append(f"{name}_bucket{_format_labels(key, ('le', bound))} {count}")
+                    lines.append(f"{name}_sum{_format_labels(key)} {histogram.total:g}")
+                    lines.append(f"{name}_count{_format_labels(key)} {histogram.count}")
+        return "\n".join(lines) + "\n"
+
+
+def _cumulative(counts: List[int]) -> List[int]:
+    total, result = 0, []
+    for count in counts:
+        total += count
+        result.append(total)
+    return result
+
+
+# Global metrics registry
+metrics = MetricsRegistry()
@@ -0,0 +1,268 @@
+"""
+Sampling profiler - Collapsed stacks by route and pipeline stage
+
+A background thread samples Python stacks every PROFILE_INTERVAL_MS with
+sys._current_frames(), which costs nothing on the request path itself. It
+runs in two modes:
+
+- Per request: PROFILE_SAMPLE_RATE of /api/* requests are marked in their
+  ASGI scope, and while any marked request is in flight the event loop's
+  stack is sampled and kept when it belongs to a marked request.
+- Whole process: GET /api/admin/profile?seconds=N samples every thread for
+  N seconds (including Gemini calls running in worker threads and idle
+  time in the event loop).
+
+Each sample is tagged with the route it ran for (found through the ASGI
+scope in the await chain) and the pipeline stage of its innermost
+recognized frame (rate limiter, Qloo, Gemini, serialization, ...), and
+stacks are aggregated in the collapsed format that flamegraph.pl and
+speedscope read:
+
+    route:/api/trends/analyze;stage:qloo;main (main.py:1);...;get_trend_data (qloo_service.py:120) 42
+
+Profiles stay in memory per worker, bounded to PROFILE_MAX_STACKS distinct
+stacks.
+"""
+
+import os
+import random
+import sys
+import threading
+import time
+from collections import Counter
+from types import CodeType, FrameType
+from typing import Any, Dict, List, Optional, Tuple
+
+PROFILE_SAMPLE_RATE = float(os.getenv("PROFILE_SAMPLE_RATE", "0"))        # Fraction of /api/* requests profiled
+PROFILE_INTERVAL_MS = float(os.getenv("PROFILE_INTERVAL_MS", "10"))       # Milliseconds between samples
+PROFILE_MAX_STACKS = int(os.getenv("PROFILE_MAX_STACKS", "20000"))        # Distinct stacks kept per profile
+PROFILE_MAX_SECONDS = 120.0                                               # Longest whole-process profile
+MAX_DEPTH = 128
+
+SCOPE_FLAG = "profile_sample"
+
+# Pipeline stages by file path fragment, checked from the innermost frame outwards
+STAGES: Tuple[Tuple[str, Tuple[str, ...]], ...] = (
+    ("rate_limiter", ("middleware/rate_limiter.py",)),
+    ("idempotency", ("services/idempotency.py",)),
+    ("qloo", ("services/qloo_service.py", "services/qloo_models.py", "services/http_client.py")),
+    ("gemini", ("services/llm_service.py", "services/llm_scheduler.py", "google/generativeai/",
+                "google/api_core/", "google/ai/generativelanguage")),
+    ("prompt", ("services/prompt_builder.py",)),
+    ("rules", ("services/insight_engine.py", "services/region_comparison.py")),
+    ("history", ("services/analysis_store.py", "services/similarity_cache.py", "services/strength_history.py")),
+)
+# Frames of these libraries (with no pipeline stage further in) are serialization work
+SERIALIZATION = ("/json/", "fastapi/encoders.py", "pydantic/", "pydantic_core/", "fastapi/routing.py",
+                 "starlette/responses.py")
+# Innermost frames of a thread waiting for work (uvloop waits below asyncio/runners.py)
+IDLE = ("selectors.py", "threading.py", "concurrent/futures/thread.py", "asyncio/runners.py",
+        "asyncio/base_events.py")
+
+
+# Per code object: (stage, serialization library, idle wait, has a "scope" variable), worked out once
+_code_info: Dict[CodeType, Tuple[Optional[str], bool, bool, bool]] = {}
+
+StackKey = Tuple[str, str, Tuple[CodeType, ...]]  # Route, stage, code objects innermost first
+
+
+def _info(code: CodeType) -> Tuple[Optional[str], bool, bool, bool]:
+    info = _code_info.get(code)
+    if info is None:
+        filename = code.co_filename
+        stage = next((name for name, fragments in STAGES if any(part in filename for part in fragments)), None)
+        info = _code_info[code] = (stage, any(part in filename for part in SERIALIZATION),
+                                   filename.endswith(IDLE), "scope" in code.co_varnames)
+    return info
+
+
+def code_label(code: CodeType) -> str:
+    return f"{code.co_name} ({os.path.basename(code.co_filename)}:{code.co_firstlineno})".replace(";", ":")
+
+
+def _scope(frame: FrameType) -> Optional[Dict[str, Any]]:
+    """ASGI scope of the request a frame runs for"""
+    scope = frame.f_locals.get("scope")
+    return scope if isinstance(scope, dict) and scope.get("type") == "http" else None
+
+
+def route_of(scope: Optional[Dict[str, Any]]) -> str:
+    if scope is None:
+        return "-"
+    return getattr(scope.get("route"), "path", None) or scope.get("path", "-")
+
+
+def walk_stack(frame: Optional[FrameType]) -> Tuple[Tuple[CodeType, ...], str, Optional[Dict[str, Any]]]:
+    """Code objects (innermost first), pipeline stage and request scope of a thread's stack"""
+    codes: List[CodeType] = []
+    stage = None
+    serialization = False
+    scope = None
+    while frame is not None and len(codes) < MAX_DEPTH:
+        code = frame.f_code
+        code_stage, library, idle, has_scope = _info(code)
+        if not codes and idle:
+            stage = "idle"
+        elif stage is None and code_stage is not None:
+            # The innermost recognized pipeline frame decides
+            stage = code_stage
+        serialization = serialization or (library and len(codes) < 8)
+        if scope is None and has_scope:
+            scope = _scope(frame)
+        codes.append(code)
+        frame = frame.f_back
+    return tuple(codes), stage or ("serialization" if serialization else "other"), scope
+
+
+class SamplingProfiler:
+    """Statistical profiler thread producing collapsed stacks tagged by route and stage"""
+
+    def __init__(self, sample_rate: float = PROFILE_SAMPLE_RATE, interval_ms: float = PROFILE_INTERVAL_MS,
+                 max_stacks: int = PROFILE_MAX_STACKS):
+        self.sample_rate = sample_rate
+        self.interval = interval_ms / 1000
+        self.max_stacks = max_stacks
+        self._lock = threading.Lock()
+        self._wake = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+        self._loop_thread: Optional[int] = None
+        self._active_requests = 0
+        self._sampled_requests = 0
+        # Profile of sampled requests (since start or the last reset), and of the running timed profile
+        self._requests: Counter = Counter()
+        self._timed: Optional[Counter] = None
+        self.stats = {"samples": 0, "request_samples": 0, "dropped_stacks": 0, "profiles": 0}
+
+    # ------------------------------------------------------------------
+    # Per-request sampling (called from the HTTP middleware)
+    # ------------------------------------------------------------------
+
+    def begin_request(self, scope: Dict[str, Any]) -> bool:
+        """Mark PROFILE_SAMPLE_RATE of requests for profiling; returns whether this one was"""
+        if self.sample_rate <= 0 or self._thread is None or random.random() >= self.sample_rate:
+            return False
+        scope[SCOPE_FLAG] = True
+        with self._lock:
+            self._active_requests += 1
+            self._sampled_requests += 1
+        self._wake.set()
+        return True
+
+    def end_request(self):
+        with self._lock:
+            self._active_requests -= 1
+
+    # ------------------------------------------------------------------
+    # Whole-process profiles (admin endpoint)
+    # ------------------------------------------------------------------
+
+    def begin_profile(self) -> bool:
+        """Start a whole-process profile; False if one is already running"""
+        with self._lock:
+            if self._timed is not None:
+                return False
+            self._timed = Counter()
+        self._wake.set()
+        return True
+
+    def end_profile(self) -> Counter:
+        with self._lock:
+            profile, self._timed = self._timed or Counter(), None
+            self.stats["profiles"] += 1
+        return profile
+
+    def request_profile(self, reset: bool = False) -> Counter:
+        """Collapsed stacks of the sampled requests so far"""
+        with self._lock:
+            profile = Counter(self._requests)
+            if reset:
+                self._requests.clear()
+        return profile
+
+    # ------------------------------------------------------------------
+    # Sampler thread
+    # ------------------------------------------------------------------
+
+    def _add(self, profile: Counter, stack: StackKey):
+        if stack in profile or len(profile) < self.max_stacks:
+            profile[stack] += 1
+        else:
+            self.stats["dropped_stacks"] += 1
+
+    def _sample(self):
+        frames = sys._current_frames()
+        me = threading.get_ident()
+        with self._lock:
+            timed = self._timed
+            requests = self._active_requests > 0
+        for thread_id, frame in frames.items():
+            if thread_id == me:
+                continue
+            on_loop = thread_id == self._loop_thread
+            if timed is None and not on_loop:
+                continue
+            codes, stage, scope = walk_stack(frame)
+            stack = (route_of(scope), stage, codes)
+            with self._lock:
+                if timed is not None:
+                    self._add(timed, stack)
+                if requests and on_loop and scope is not None and scope.get(SCOPE_FLAG):
+                    self._add(self._requests, stack)
+                    self.stats["request_samples"] += 1
+        self.stats["samples"] += 1
+
+    def _run(self):
+        while True:
+            with self._lock:
+                busy = self._timed is not None or self._active_requests > 0
+            if not busy:
+                self._wake.wait()
+                self._wake.clear()
+                continue
+            started = time.perf_counter()
+            try:
+                self._sample()
+            except Exception as e:
+                print(f"⚠️ Profiler sample failed: {e}")
+            time.sleep(max(0.0, self.interval - (time.perf_counter() - started)))
+
+    def start(self):
+        """Start the sampler thread (from the event loop thread, whose stack per-request profiles sample)"""
+        if self._thread is None:
+            self._loop_thread = threading.get_ident()
+            self._thread = threading.Thread(target=self._run, name="sampling-profiler", daemon=True)
+            self._thread.start()
+            if self.sample_rate > 0:
+                print(f"🔬 Profiling {self.sample_rate:.1%} of API requests every {self.interval * 1000:.0f}ms")
+
+    def snapshot(self) -> Dict[str, Any]:
+        return {
+            "sample_rate": self.sample_rate,
+            "interval_ms": self.interval * 1000,
+            "sampled_requests": self._sampled_requests,
+            "request_stacks": len(self._requests),
+            "profiling": self._timed is not None,
+            **self.stats
+        }
+
+
+def collapsed(profile: Counter) -> str:
+    """Collapsed-stack text (one "frames count" line per stack, outermost frame first), heaviest first"""
+    return "".join(
+        f"route:{route};stage:{stage};{';'.join(code_label(code) for code in reversed(codes))} {count}\n"
+        for (route, stage, codes), count in profile.most_common()
+    )
+
+
+def breakdown(profile: Counter) -> Dict[str, Dict[str, int]]:
+    """Sample counts per route and per stage"""
+    routes: Counter = Counter()
+    stages: Counter = Counter()
+    for (route, stage, _), count in profile.items():
+        routes[route] += count
+        stages[stage] += count
+    return {"routes": dict(routes.most_common()), "stages": dict(stages.most_common())}
+
+
+# Global profiler instance
+profiler = SamplingProfiler()
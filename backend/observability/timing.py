@@ -0,0 +1,94 @@
+"""
+Per-request timing spans - Latency breakdown emitted as a Server-Timing header
+
+The HTTP middleware starts a RequestTimer for each API request and stores it
+in a context variable, so any code running on behalf of the request (router,
+QlooService, GeminiService, threads started with asyncio.to_thread) can
+record spans with timing_span() without the timer being passed around.
+"""
+
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Any, Dict, Iterator, List, Optional
+
+_current_timer: ContextVar[Optional["RequestTimer"]] = ContextVar("request_timer", default=None)
+
+
+class RequestTimer:
+    """Collects named durations for a single request"""
+
+    def __init__(self, debug: bool = False):
+        self.started = time.perf_counter()
+        self.debug = debug
+        # name -> [total seconds, count, description]; dicts keep first-seen order
+        self.spans: Dict[str, List[Any]] = {}
+
+    def record(self, name: str, duration: float, description: Optional[str] = None):
+        """Add a duration; repeated names are summed and counted"""
+        span = self.spans.get(name)
+        if span is None:
+            self.spans[name] = [duration, 1, description]
+        else:
+            span[0] += duration
+            span[1] += 1
+            if description:
+                span[2] = description
+
+    def elapsed(self) -> float:
+        return time.perf_counter() - self.started
+
+    def server_timing_header(self) -> str:
+        """Format spans per the Server-Timing spec (durations in milliseconds)"""
+        entries = []
+        for name, (duration, count, description) in self.spans.items():
+            entry = f"{name};dur={duration * 1000:.1f}"
+            if count > 1:
+                description = f"{description + ' ' if description else ''}x{count}"
+            if description:
+                entry += f';desc="{description}"'
+            entries.append(entry)
+        entries.append(f"total;dur={self.elapsed() * 1000:.1f}")
+        return ", ".join(entries)
+
+    def as_dict(self) -> Dict[str, Any]:
+        return {
+            "total_ms": round(self.elapsed() * 1000, 2),
+            "spans": {
+                name: {"duration_ms": round(duration * 1000, 2), "count": count, "description": description}
+                for name, (duration, count, description) in self.spans.items()
+            }
+        }
+
+
+def start_request_timer(debug: bool = False) -> RequestTimer:
+    """Create the timer for the current request context"""
+    timer = RequestTimer(debug=debug)
+    _current_timer.set(timer)
+    return timer
+
+
+def current_timer() -> Optional[RequestTimer]:
+    return _current_timer.get()
+
+
+@contextmanager
+def timing_span(name: str, description: Optional[str] = None) -> Iterator[None]:
+    """Time the enclosed block into the current request's timer (no-op outside requests)"""
+    timer = _current_timer.get()
+    if timer is None:
+        yield
+        return
+    started = time.perf_counter()
+    try:
+        yield
+    finally:
+        timer.record(name, time.perf_counter() - started, description)
+
+
+def timing_debug_block() -> Optional[Dict[str, Any]]:
+    """Timings to embed in the response body when the client asked for them"""
+    timer = _current_timer.get()
+    if timer is None or not timer.debug:
+        return None
+    return {"timings": timer.as_dict()}
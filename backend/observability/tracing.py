@@ -0,0 +1,156 @@
+"""
+Distributed tracing - OpenTelemetry spans with an offline-friendly exporter
+
+Spans cover the analysis handlers, each Qloo endpoint attempt, the Gemini call
+and the JSON parse. Tracing is off unless TRACING_ENABLED is set; when off,
+trace_span() hands back a shared no-op context manager so instrumented code
+pays a single boolean check.
+
+Configuration (environment):
+    TRACING_ENABLED       "true" to record spans
+    TRACING_SAMPLE_RATE   Fraction of new traces to sample (default 0.1)
+    TRACING_EXPORTER      "file" (default), "otlp" or "console"
+    TRACING_FILE          JSON-lines output for the file exporter
+    OTEL_EXPORTER_OTLP_ENDPOINT  Collector URL for the otlp exporter
+"""
+
+import json
+import os
+import threading
+from contextlib import nullcontext
+from pathlib import Path
+from typing import Any, ContextManager, Dict, Optional, Sequence
+
+try:
+    from opentelemetry import trace
+    from opentelemetry.sdk.resources import Resource
+    from opentelemetry.sdk.trace import ReadableSpan, TracerProvider
+    from opentelemetry.sdk.trace.export import (
+        BatchSpanProcessor,
+        ConsoleSpanExporter,
+        SpanExporter,
+        SpanExportResult
+    )
+    from opentelemetry.sdk.trace.sampling import ParentBased, TraceIdRatioBased
+    from opentelemetry.trace import Status, StatusCode
+    OTEL_AVAILABLE = True
+except ImportError:
+    OTEL_AVAILABLE = False
+    SpanExporter = object  # type: ignore
+
+TRACING_ENABLED = os.getenv("TRACING_ENABLED", "false").lower() in ("1", "true", "yes")
+TRACING_SAMPLE_RATE = float(os.getenv("TRACING_SAMPLE_RATE", "0.1"))
+TRACING_EXPORTER = os.getenv("TRACING_EXPORTER", "file").lower()
+TRACING_FILE = os.getenv("TRACING_FILE", str(Path(__file__).parent.parent / "traces.jsonl"))
+
+_NOOP = nullcontext()
+_tracer = None
+
+
+class JsonLinesSpanExporter(SpanExporter):  # type: ignore[misc]
+    """Append finished spans to a file as OTLP-shaped JSON, one span per line"""
+
+    def __init__(self, path: str):
+        self.path = Path(path)
+        self._lock = threading.Lock()
+
+    def export(self, spans: Sequence["ReadableSpan"]) -> "SpanExportResult":
+        lines = [json.dumps(self._to_otlp(span), default=str) for span in spans]
+        try:
+            with self._lock, open(self.path, "a") as f:
+                f.write("\n".join(lines) + "\n")
+        except OSError as e:
+            print(f"⚠️ Could not write traces: {e}")
+            return SpanExportResult.FAILURE
+        return SpanExportResult.SUCCESS
+
+    def shutdown(self):
+        pass
+
+    def force_flush(self, timeout_millis: int = 30000) -> bool:
+        return True
+
+    @staticmethod
+    def _to_otlp(span: "ReadableSpan") -> dict:
+        context = span.get_span_context()
+        return {
+            "traceId": format(context.trace_id, "032x"),
+            "spanId": format(context.span_id, "016x"),
+            "parentSpanId": format(span.parent.span_id, "016x") if span.parent else "",
+            "name": span.name,
+            "kind": span.kind.name,
+            "startTimeUnixNano": span.start_time,
+            "endTimeUnixNano": span.end_time,
+            "durationMs": round((span.end_time - span.start_time) / 1e6, 3) if span.end_time else None,
+            "attributes": dict(span.attributes or {}),
+            "events": [
+                {"name": event.name, "timeUnixNano": event.timestamp, "attributes": dict(event.attributes or {})}
+                for event in span.events
+            ],
+            "status": {"code": span.status.status_code.name, "message": span.status.description or ""},
+            "resource": dict(span.resource.attributes),
+        }
+
+
+def _build_exporter() -> "SpanExporter":
+    if TRACING_EXPORTER == "console":
+        return ConsoleSpanExporter()
+    if TRACING_EXPORTER == "otlp":
+        try:
+            from opentelemetry.exporter.otlp.proto.http.trace_exporter import OTLPSpanExporter
+            return OTLPSpanExporter()
+        except ImportError:
+            print("⚠️ OTLP exporter not installed, writing traces to file instead")
+    return JsonLinesSpanExporter(TRACING_FILE)
+
+
+def setup_tracing(service_name: str = "trend-compass-api") -> bool:
+    """Install the tracer provider; returns whether tracing is active"""
+    global _tracer, TRACING_ENABLED
+    if not TRACING_ENABLED:
+        return False
+    if not OTEL_AVAILABLE:
+        print("⚠️ OpenTelemetry SDK not available, tracing disabled")
+        TRACING_ENABLED = False
+        return False
+
+    provider = TracerProvider(
+        resource=Resource.create({"service.name": service_name}),
+        sampler=ParentBased(TraceIdRatioBased(TRACING_SAMPLE_RATE))
+    )
+    provider.add_span_processor(BatchSpanProcessor(_build_exporter()))
+    trace.set_tracer_provider(provider)
+    _tracer = trace.get_tracer("trend_compass")
+    print(f"🔭 Tracing enabled ({TRACING_EXPORTER} exporter, sample rate {TRACING_SAMPLE_RATE})")
+    return True
+
+
+def trace_span(name: str, attributes: Optional[Dict[str, Any]] = None) -> ContextManager:
+    """Start a span as the current span (a shared no-op when tracing is off)"""
+    if _tracer is None:
+        return _NOOP
+    return _tracer.start_as_current_span(
+        name, attributes={key: value for key, value in (attributes or {}).items() if value is not None}
+    )
+
+
+def set_span_attributes(attributes: Dict[str, Any]):
+    """Attach attributes to the current span, e.g. status or fallback reason"""
+    if _tracer is None:
+        return
+    span = trace.get_current_span()
+    if span.is_recording():
+        for key, value in attributes.items():
+            if value is not None:
+                span.set_attribute(key, value)
+
+
+def mark_span_error(error: Optional[BaseException] = None, message: Optional[str] = None):
+    """Flag the current span as failed"""
+    if _tracer is None:
+        return
+    span = trace.get_current_span()
+    if span.is_recording():
+        if error is not None:
+            span.record_exception(error)
+        span.set_status(Status(StatusCode.ERROR, message or (str(error) if error else None)))
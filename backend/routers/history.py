@@ -0,0 +1,101 @@
+"""
+History routes - Search and fetch past analyses from the analysis store
+"""
+
+import time
+from fastapi import APIRouter, Depends, HTTPException, Query
+from typing import Optional
+
+from services.analysis_store import analysis_store, build_request_key
+from services.strength_history import SECONDS_PER_DAY, strength_history
+from routers.profiling import require_admin
+
+# Create router (past queries and full responses of every client are listed, so admins only)
+router = APIRouter(
+    prefix="/api/history",
+    tags=["history"],
+    dependencies=[Depends(require_admin)],
+    responses={401: {"description": "Missing or invalid X-Admin-Token"}, 404: {"description": "Not found"}},
+)
+
+@router.get(
+    "/search",
+    summary="🔎 Search Past Analyses",
+    description="""
+    **Full-text search over previously generated trend and audience analyses**
+
+    Matches the query and summary text (prefix matching per word), newest and most relevant first.
+    Leave `q` empty to list the most recent analyses.
+    """,
+    responses={
+        200: {"description": "✅ Matching analyses"}
+    }
+)
+async def search_history(
+    q: Optional[str] = Query(None, description="Words to search for, e.g. 'sustainable fashion'"),
+    kind: Optional[str] = Query(None, pattern="^(trend|audience|comparison)$", description="Restrict to trend, audience or region comparison analyses"),
+    industry: Optional[str] = Query(None, description="Restrict to one industry"),
+    since: Optional[str] = Query(None, pattern=r"^\d{4}-\d{2}-\d{2}$", description="Only analyses on or after this date (YYYY-MM-DD)"),
+    limit: int = Query(20, ge=1, le=100)
+):
+    """Search stored analyses."""
+    results = analysis_store.search(text=q, kind=kind, industry=industry, since=since, limit=limit)
+    return {
+        "query": q,
+        "count": len(results),
+        "results": results
+    }
+
+@router.get(
+    "/strengths",
+    summary="📈 Trend Strength History",
+    description="""
+    **Recorded Qloo strengths of a trend over time, with their trajectory**
+
+    Every live trend analysis records the overall trend strength and each affinity domain's strength.
+    Returns the points of each series within the last `days` days and the moving averages, weekly growth
+    and forecast over `timeframe` that trend analyses report.
+    """,
+    responses={
+        200: {"description": "✅ Strength series and trajectory"},
+        404: {"description": "❌ No strengths recorded for this trend"}
+    }
+)
+async def get_strength_history(
+    query: str = Query(..., min_length=3, description="The trend, as sent to /api/trends/analyze"),
+    industry: Optional[str] = Query(None, description="The industry it was analyzed in"),
+    days: float = Query(30.0, gt=0, le=365, description="How far back to look"),
+    timeframe: Optional[str] = Query(None, description="Forecast horizon, e.g. '3 months'")
+):
+    """Strength time series of one trend."""
+    key = build_request_key(query, industry)
+    series = strength_history.domains(key) if strength_history.available else []
+    if not series:
+        raise HTTPException(status_code=404, detail="No strength history for this trend")
+    since = time.time() - days * SECONDS_PER_DAY
+    result = {}
+    points = strength_history.points_many([series_id for _, series_id in series], since)
+    for (domain, _), (timestamps, values) in zip(series, points):
+        result[domain or "overall"] = {"timestamps": timestamps.tolist(), "strengths": values.astype(float).round(3).tolist()}
+    return {
+        "query": query,
+        "industry": industry,
+        "series": result,
+        "trajectory": strength_history.trajectory(key, timeframe, window_days=days)
+    }
+
+@router.get(
+    "/{analysis_id}",
+    summary="📄 Get a Past Analysis",
+    description="Return the full stored response for one analysis from the search results",
+    responses={
+        200: {"description": "✅ Stored analysis"},
+        404: {"description": "❌ No analysis with that id"}
+    }
+)
+async def get_history_entry(analysis_id: int):
+    """Fetch one stored analysis."""
+    entry = analysis_store.get(analysis_id)
+    if entry is None:
+        raise HTTPException(status_code=404, detail="Analysis not found")
+    return entry
@@ -0,0 +1,140 @@
+"""
+Job routes - Submit analyses as background jobs and poll for their results
+"""
+
+from fastapi import APIRouter, Depends, HTTPException, Query, Request
+
+from middleware.rate_limiter import rate_limiter
+from models.schemas import AudienceInsightRequest, TrendAnalysisRequest
+from routers.trends import get_qloo_service
+from services.llm_service import GeminiService
+from services.qloo_service import QlooService
+from services.analysis_pipeline import (
+    audience_request_key,
+    run_audience_analysis,
+    run_trend_analysis,
+    trend_request_key
+)
+from services.job_queue import JobQueueFull, job_queue
+from services.precompute import popularity_tracker
+
+# Create router
+router = APIRouter(
+    prefix="/api/jobs",
+    tags=["jobs"],
+    responses={404: {"description": "Not found"}},
+)
+
+# Longest a GET may hold the connection waiting for a job to finish
+MAX_WAIT_SECONDS = 30.0
+
+
+def get_job_llm_service(request: Request):
+    """Dependency for the LLM service of a job: background work, scheduled as batch like precompute."""
+    return GeminiService(client_id=rate_limiter.get_client_ip(request), priority="batch")
+
+
+def _accepted(job: dict, request: Request) -> dict:
+    """202 body: the job plus where to poll for it"""
+    return {**job, "poll_url": str(request.url_for("get_job", job_id=job["job_id"]))}
+
+
+def _queue_full(e: JobQueueFull) -> HTTPException:
+    print(f"⚠️ Analysis job rejected: {e}")
+    return HTTPException(status_code=503, detail="Too many analyses are queued. Please try again shortly.")
+
+
+@router.post(
+    "/trends/analyze",
+    status_code=202,
+    summary="⏳ Submit a Trend Analysis Job",
+    description="""
+    **Start a trend analysis in the background and get a job ID right away**
+
+    Takes the same body as `/api/trends/analyze`. Poll `GET /api/jobs/{job_id}` (add `?wait=20` to
+    long-poll) until `status` is `succeeded` or `failed`; the analysis is in `result`.
+    Submitting an analysis that is already running or recently finished returns that job.
+    """,
+    responses={
+        202: {"description": "✅ Job queued (or an identical job reused)"},
+        503: {"description": "⚠️ Too many jobs queued - Try again shortly"}
+    }
+)
+async def submit_trend_job(
+    body: TrendAnalysisRequest,
+    request: Request,
+    llm_service: GeminiService = Depends(get_job_llm_service),
+    qloo_service: QlooService = Depends(get_qloo_service)
+):
+    """Queue a trend analysis."""
+    request_key = trend_request_key(body)
+    popularity_tracker.record("trend", request_key, body)
+
+    async def run():
+        response = await run_trend_analysis(body, llm_service, qloo_service, depth_deadline=False)
+        return response.model_dump(mode="json", exclude_none=True)
+
+    try:
+        return _accepted(job_queue.submit("trend", request_key, run), request)
+    except JobQueueFull as e:
+        raise _queue_full(e)
+
+
+@router.post(
+    "/audience/analyze",
+    status_code=202,
+    summary="⏳ Submit an Audience Analysis Job",
+    description="""
+    **Start an audience analysis in the background and get a job ID right away**
+
+    Takes the same body as `/api/audience/analyze` and is polled like trend analysis jobs.
+    """,
+    responses={
+        202: {"description": "✅ Job queued (or an identical job reused)"},
+        503: {"description": "⚠️ Too many jobs queued - Try again shortly"}
+    }
+)
+async def submit_audience_job(
+    body: AudienceInsightRequest,
+    request: Request,
+    llm_service: GeminiService = Depends(get_job_llm_service),
+    qloo_service: QlooService = Depends(get_qloo_service)
+):
+    """Queue an audience analysis."""
+    request_key = audience_request_key(body)
+    popularity_tracker.record("audience", request_key, body)
+
+    async def run():
+        response = await run_audience_analysis(body, llm_service, qloo_service)
+        return response.model_dump(mode="json", exclude_none=True)
+
+    try:
+        return _accepted(job_queue.submit("audience", request_key, run), request)
+    except JobQueueFull as e:
+        raise _queue_full(e)
+
+
+@router.get(
+    "/{job_id}",
+    name="get_job",
+    summary="📬 Get a Job's Status and Result",
+    description="""
+    **Status of a background analysis job**
+
+    `status` is `queued`, `running`, `succeeded` or `failed`. Pass `wait` (seconds) to hold the request
+    until the job finishes or the wait runs out. Finished jobs are kept for a limited time.
+    """,
+    responses={
+        200: {"description": "✅ Job status, with the analysis once it has succeeded"},
+        404: {"description": "❌ Unknown or expired job"}
+    }
+)
+async def get_job(
+    job_id: str,
+    wait: float = Query(0.0, ge=0.0, le=MAX_WAIT_SECONDS, description="Seconds to long-poll for completion")
+):
+    """Poll a job."""
+    job = await job_queue.wait(job_id, wait)
+    if job is None:
+        raise HTTPException(status_code=404, detail="Job not found or expired")
+    return job
@@ -0,0 +1,103 @@
+"""
+Profiling routes - Admin-only sampling profiles and event loop health of this worker
+"""
+
+import asyncio
+import hmac
+import os
+from typing import Optional
+from fastapi import APIRouter, Depends, Header, HTTPException, Query
+from fastapi.responses import PlainTextResponse
+
+from observability.loop_monitor import LOOP_BLOCK_EVENTS, loop_monitor
+from observability.profiler import PROFILE_MAX_SECONDS, breakdown, collapsed, profiler
+
+ADMIN_TOKEN = os.getenv("ADMIN_TOKEN", "")
+
+def require_admin(x_admin_token: Optional[str] = Header(None)):
+    """Dependency that lets only requests carrying ADMIN_TOKEN in X-Admin-Token through."""
+    if not ADMIN_TOKEN:
+        raise HTTPException(status_code=403, detail="Admin endpoints are disabled (set ADMIN_TOKEN)")
+    if not x_admin_token or not hmac.compare_digest(x_admin_token, ADMIN_TOKEN):
+        raise HTTPException(status_code=401, detail="Missing or invalid X-Admin-Token")
+
+# Create router
+router = APIRouter(
+    prefix="/api/admin",
+    tags=["admin"],
+    dependencies=[Depends(require_admin)],
+    responses={401: {"description": "Missing or invalid X-Admin-Token"}},
+)
+
+def _render(profile, output: str):
+    if output == "json":
+        return {"samples": sum(profile.values()), "stacks": len(profile), **breakdown(profile),
+                "profiler": profiler.snapshot()}
+    return PlainTextResponse(collapsed(profile))
+
+@router.get(
+    "/profile",
+    summary="🔬 Profile This Worker",
+    description="""
+    **Sample every thread of the worker that answers for `seconds` seconds**
+
+    Returns collapsed stacks (`format=collapsed`, for flamegraph.pl or speedscope) with each stack
+    rooted at `route:<path>;stage:<stage>`, or sample counts per route and stage (`format=json`).
+    Requires the `X-Admin-Token` header.
+    """,
+    responses={
+        200: {"description": "✅ Collapsed stacks or a per-route/stage breakdown"},
+        409: {"description": "⏳ A profile is already running in this worker"}
+    }
+)
+async def profile_process(
+    seconds: float = Query(10.0, gt=0, le=PROFILE_MAX_SECONDS),
+    output: str = Query("collapsed", alias="format", pattern="^(collapsed|json)$")
+):
+    """Timed whole-process profile."""
+    profiler.start()
+    if not profiler.begin_profile():
+        raise HTTPException(status_code=409, detail="A profile is already running in this worker")
+    try:
+        await asyncio.sleep(seconds)
+    finally:
+        profile = profiler.end_profile()
+    return _render(profile, output)
+
+@router.get(
+    "/profile/requests",
+    summary="🔬 Sampled Request Profiles",
+    description="""
+    **Stacks of the `PROFILE_SAMPLE_RATE` fraction of API requests profiled by this worker**
+
+    Same formats as `/api/admin/profile`; `reset=true` starts a new aggregate.
+    Requires the `X-Admin-Token` header.
+    """,
+    responses={
+        200: {"description": "✅ Collapsed stacks or a per-route/stage breakdown"}
+    }
+)
+async def profile_requests(
+    reset: bool = False,
+    output: str = Query("collapsed", alias="format", pattern="^(collapsed|json)$")
+):
+    """Aggregated profile of the sampled requests."""
+    return _render(profiler.request_profile(reset=reset), output)
+
+@router.get(
+    "/loop",
+    summary="⏱️ Event Loop Lag and Blocking Calls",
+    description="""
+    **How late this worker's event loop runs, and what blocked it**
+
+    Lag percentiles plus the most recent times the loop was blocked for more than `LOOP_BLOCK_THRESHOLD_MS`,
+    each with the route, pipeline stage, code site and stack that was running when it was caught.
+    Requires the `X-Admin-Token` header.
+    """,
+    responses={
+        200: {"description": "✅ Loop lag summary and blocking events"}
+    }
+)
+async def event_loop_health(limit: int = Query(20, ge=1, le=LOOP_BLOCK_EVENTS)):
+    """Event loop lag and recent blocking callbacks."""
+    return {"lag": loop_monitor.snapshot(), "blocking_events": loop_monitor.blocking_events(limit)}
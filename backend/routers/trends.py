@@ -2,21 +2,42 @@
 API routes - Defines the trend and audience analysis endpoints
 """
 
-import json
 import os
-from fastapi import APIRouter, HTTPException, Depends
+import time
+from fastapi import APIRouter, HTTPException, Depends, Request
 from datetime import datetime
-from typing import Dict, Any
 
 from models.schemas import (
     TrendAnalysisRequest,
     TrendAnalysisResponse,
     AudienceInsightRequest,
     AudienceInsightResponse,
-    InsightPoint
+    AudienceComparisonRequest,
+    AudienceComparisonResponse
 )
+from middleware.rate_limiter import rate_limiter
 from services.llm_service import GeminiService
+from services.llm_scheduler import llm_scheduler
+from services.quota_manager import quota_manager
 from services.qloo_service import QlooService
+from services.deadline import parse_timeout_header, start_deadline
+from services.depth_profiles import get_profile, profiles_snapshot, record_latency
+from services.analysis_pipeline import (
+    audience_request_key,
+    run_audience_analysis,
+    run_audience_comparison,
+    run_trend_analysis,
+    trend_request_key
+)
+from services.precompute import popularity_tracker, precomputer
+from services.health_prober import health_prober
+from services.idempotency import idempotency_store
+from services.job_queue import job_queue
+from services.similarity_cache import similarity_cache
+from services.strength_history import strength_history
+from observability.metrics import metrics
+from observability.loop_monitor import loop_monitor
+from observability.profiler import profiler
 
 # Create router
 router = APIRouter(
@@ -26,25 +47,39 @@ router = APIRouter(
 )
 
 # Dependency injection for services
-def get_llm_service():
-    """Dependency for LLM service."""
-    return GeminiService()
+def get_llm_service(request: Request):
+    """Dependency for LLM service, scheduled fairly per client."""
+    # Clients can mark their own traffic as batch (lower share of LLM capacity), never higher
+    priority = "batch" if request.headers.get("x-request-priority") == "batch" else "interactive"
+    return GeminiService(client_id=rate_limiter.get_client_ip(request), priority=priority)
 
 def get_qloo_service():
     """Dependency for Qloo service."""
     return QlooService()
 
+async def request_deadline(request: Request) -> float:
+    """Dependency that starts the request deadline read by the Qloo and Gemini services."""
+    # Async so the deadline is set in the endpoint's own context (sync dependencies run in a thread)
+    return start_deadline(parse_timeout_header(request.headers.get("x-request-timeout")))
+
 @router.get(
     "/test-qloo",
     summary="🧪 Test Qloo API Connection",
-    description="Test connection to Qloo API and discover available endpoints",
+    description="Latest background health check of the Qloo API (add ?discover=true to probe the available endpoints now)",
     responses={
         200: {"description": "✅ Qloo API test results"},
         500: {"description": "⚠️ Server Error"}
     }
 )
-async def test_qloo_connection(qloo_service: QlooService = Depends(get_qloo_service)):
-    """Test Qloo API connection and discover endpoints."""
+async def test_qloo_connection(discover: bool = False,
+                               qloo_service: QlooService = Depends(get_qloo_service)):
+    """Latest background Qloo health check; ?discover=true probes the candidate endpoints now."""
+    if not discover:
+        return {
+            "status": "test_completed",
+            "timestamp": datetime.now().isoformat(),
+            "qloo_connection": health_prober.result("qloo")
+        }
     try:
         connection_test = await qloo_service.test_connection()
         return {
@@ -68,42 +103,69 @@ async def test_qloo_connection(qloo_service: QlooService = Depends(get_qloo_serv
         500: {"description": "⚠️ Server Error"}
     }
 )
-async def get_api_status(
-    llm_service: GeminiService = Depends(get_llm_service),
-    qloo_service: QlooService = Depends(get_qloo_service)
-):
-    """Get comprehensive API and service status."""
+async def get_api_status():
+    """Get comprehensive API and service status (upstream health comes from the background prober)."""
     try:
-        # Check Gemini API status
-        gemini_status = "available" if llm_service.use_real_api else "demo_mode"
-        
-        # Check Qloo API status (simplified check)
-        qloo_api_key = os.getenv("QLOO_API_KEY")
-        qloo_api_url = os.getenv("QLOO_API_URL", "https://hackathon.api.qloo.com")
-        qloo_status = "configured" if qloo_api_key and qloo_api_key != "demo_key_for_hackathon" else "demo_mode"
+        gemini = health_prober.result("gemini")
+        qloo = health_prober.result("qloo")
+        database = health_prober.result("database")
+        qloo_api_url = qloo.get("url", os.getenv("QLOO_API_URL", "https://hackathon.api.qloo.com"))
         
         return {
-            "status": "healthy",
+            "status": "degraded" if "unavailable" in (gemini["status"], qloo["status"], database["status"]) else "healthy",
             "timestamp": datetime.now().isoformat(),
             "services": {
                 "gemini_llm": {
-                    "status": gemini_status,
-                    "description": "Google Gemini AI for trend analysis" if gemini_status == "available" else "Using demo responses (add GEMINI_API_KEY)"
+                    **gemini,
+                    "description": {
+                        "demo_mode": "Using demo responses (add GEMINI_API_KEY)",
+                        "available": "Google Gemini AI for trend analysis",
+                        "unavailable": "Google Gemini AI is not responding, using fallbacks"
+                    }.get(gemini["status"], "Google Gemini AI configured, not checked yet")
                 },
                 "qloo_api": {
-                    "status": qloo_status, 
+                    **qloo,
                     "url": qloo_api_url,
-                    "description": f"Qloo cultural data API at {qloo_api_url}" if qloo_status == "configured" else "Using simulated data (add QLOO_API_KEY)"
+                    "description": {
+                        "demo_mode": "Using simulated data (add QLOO_API_KEY)",
+                        "available": f"Qloo cultural data API at {qloo_api_url}",
+                        "unavailable": f"Qloo cultural data API at {qloo_api_url} is not responding, using simulated data"
+                    }.get(qloo["status"], f"Qloo cultural data API at {qloo_api_url}, not checked yet")
                 },
                 "database": {
-                    "status": "not_implemented",
-                    "description": "No database required for current version"
-                }
+                    **database,
+                    "description": "Analysis history disabled (ANALYSIS_STORE_ENABLED)" if database["status"] == "disabled" else f"SQLite analysis history ({database.get('analyses', 'unknown number of')} analyses stored)"
+                },
+                "health_checks": {
+                    name: value for name, value in health_prober.snapshot().items() if name != "checks"
+                },
+                "similarity_cache": {
+                    "status": "available" if similarity_cache.enabled else "disabled",
+                    "entries": similarity_cache.size(),
+                    "threshold": similarity_cache.threshold
+                },
+                "llm_scheduler": llm_scheduler.snapshot(),
+                "upstream_quotas": quota_manager.snapshot(),
+                "upstream_retries": {
+                    name: values for name, values in metrics.snapshot().items() if name.startswith("upstream_")
+                },
+                "precompute": precomputer.snapshot(),
+                "depth_profiles": profiles_snapshot(),
+                "jobs": job_queue.snapshot(),
+                "idempotency": idempotency_store.snapshot(),
+                "profiler": profiler.snapshot(),
+                "event_loop": loop_monitor.snapshot(),
+                "strength_history": strength_history.snapshot()
             },
             "api_endpoints": {
                 "trends_analyze": "/api/trends/analyze",
                 "audience_analyze": "/api/audience/analyze",
+                "audience_compare": "/api/audience/compare",
                 "status_check": "/api/status",
+                "history_search": "/api/history/search",
+                "jobs_submit": "/api/jobs/trends/analyze",
+                "job_status": "/api/jobs/{job_id}",
+                "llm_usage": "/api/usage/llm",
                 "docs": "/docs",
                 "redoc": "/redoc"
             }
@@ -137,8 +199,8 @@ async def test_qloo_integration(
             "message": "Qloo API integration test completed",
             "timestamp": datetime.now().isoformat(),
             "api_url": qloo_service.base_url,
-            "has_real_data": "trend_strength" in test_result and "cultural_affinities" in test_result,
-            "sample_data": test_result,
+            "has_real_data": not test_result.simulated,
+            "sample_data": test_result.as_dict(),
             "explanation": {
                 "hackathon_url": "https://hackathon.api.qloo.com",
                 "how_it_works": [
@@ -161,6 +223,7 @@ async def test_qloo_integration(
 @router.post(
     "/trends/analyze", 
     response_model=TrendAnalysisResponse,
+    response_model_exclude_none=True,
     summary="📊 Analyze Market Trends",
     description="""
     **Analyze any trend to get strategic insights and forecasts**
@@ -178,37 +241,21 @@ async def test_qloo_integration(
 )
 async def analyze_trend(
     request: TrendAnalysisRequest,
+    deadline: float = Depends(request_deadline),
     llm_service: GeminiService = Depends(get_llm_service),
     qloo_service: QlooService = Depends(get_qloo_service)
 ):
     """
     Analyze trends with AI-powered insights and cultural context.
     """
+    started = time.perf_counter()
     try:
-        # Step 1: Get cultural affinity data from Qloo
-        qloo_data = await qloo_service.get_trend_data(
-            query=request.query,
-            industry=request.industry
-        )
-        
-        # Step 2: Process with LLM for insights
-        llm_result = await llm_service.analyze_trend(
-            query=request.query,
-            qloo_data=qloo_data,
-            industry=request.industry,
-            timeframe=request.timeframe
-        )
-        
-        # Step 3: Return the combined result
-        return TrendAnalysisResponse(
-            query=request.query,
-            summary=llm_result.get("summary", "Analysis not available"),
-            timestamp=datetime.now().isoformat(),
-            insights=llm_result.get("insights", []),
-            recommendations=llm_result.get("recommendations", []),
-            data_sources={"qloo": qloo_data}
-        )
-        
+        popularity_tracker.record("trend", trend_request_key(request), request)
+        response = await run_trend_analysis(request, llm_service, qloo_service)
+        # Count the analysis against its depth tier's latency SLO
+        record_latency(get_profile(request.depth), time.perf_counter() - started)
+        return response
+
     except ValueError as e:
         # Handle validation errors
         print(f"Validation error in trend analysis: {str(e)}")
@@ -234,6 +281,7 @@ async def analyze_trend(
 @router.post(
     "/audience/analyze", 
     response_model=AudienceInsightResponse,
+    response_model_exclude_none=True,
     summary="👥 Deep Audience Insights",
     description="""
     **Understand your target audience with cultural intelligence**
@@ -251,6 +299,7 @@ async def analyze_trend(
 )
 async def analyze_audience(
     request: AudienceInsightRequest,
+    deadline: float = Depends(request_deadline),
     llm_service: GeminiService = Depends(get_llm_service),
     qloo_service: QlooService = Depends(get_qloo_service)
 ):
@@ -258,31 +307,9 @@ async def analyze_audience(
     Analyze audiences with cultural affinity data and behavioral insights.
     """
     try:
-        # Step 1: Get cultural affinity data from Qloo
-        qloo_data = await qloo_service.get_audience_data(
-            audience=request.target_audience,
-            product_category=request.product_category,
-            region=request.region
-        )
-        
-        # Step 2: Process with LLM for insights
-        llm_result = await llm_service.generate_audience_insights(
-            target_audience=request.target_audience,
-            qloo_data=qloo_data,
-            product_category=request.product_category,
-            region=request.region
-        )
-        
-        # Step 3: Return the combined result
-        return AudienceInsightResponse(
-            target_audience=request.target_audience,
-            summary=llm_result.get("summary", "Analysis not available"),
-            timestamp=datetime.now().isoformat(),
-            cultural_affinities=llm_result.get("cultural_affinities", []),
-            recommendations=llm_result.get("recommendations", []),
-            data_sources={"qloo": qloo_data}
-        )
-        
+        popularity_tracker.record("audience", audience_request_key(request), request)
+        return await run_audience_analysis(request, llm_service, qloo_service)
+
     except ValueError as e:
         # Handle validation errors
         print(f"Validation error in audience analysis: {str(e)}")
@@ -304,3 +331,48 @@ async def analyze_audience(
             status_code=500,
             detail="An unexpected error occurred during audience analysis. Our team has been notified."
         )
+
+@router.post(
+    "/audience/compare",
+    response_model=AudienceComparisonResponse,
+    response_model_exclude_none=True,
+    summary="🌍 Compare an Audience Across Regions",
+    description="""
+    **See how one audience differs between regions in a single request**
+
+    🎯 **Input**: An audience and 2-6 regions (default North America, Europe and Asia)  
+    🧭 **Output**: What each region over- and under-indexes on, what all regions share, and localized recommendations
+
+    Qloo data for all regions is fetched concurrently and compared in one pass, followed by a single
+    consolidated AI analysis, so it takes about as long as one `/api/audience/analyze` request.
+    """,
+    responses={
+        200: {"description": "✅ Success - Per-region comparison"},
+        400: {"description": "❌ Bad Request - Provide an audience and 2-6 regions"},
+        500: {"description": "⚠️ Server Error - Try again later"}
+    }
+)
+async def compare_audience(
+    request: AudienceComparisonRequest,
+    deadline: float = Depends(request_deadline),
+    llm_service: GeminiService = Depends(get_llm_service),
+    qloo_service: QlooService = Depends(get_qloo_service)
+):
+    """
+    Compare an audience across regions with one Qloo fan-out and one AI call.
+    """
+    try:
+        return await run_audience_comparison(request, llm_service, qloo_service)
+
+    except ValueError as e:
+        print(f"Validation error in audience comparison: {str(e)}")
+        raise HTTPException(
+            status_code=400,
+            detail=f"Invalid input: {str(e)}"
+        )
+    except Exception as e:
+        print(f"Unexpected error in audience comparison: {str(e)}")
+        raise HTTPException(
+            status_code=500,
+            detail="An unexpected error occurred during audience comparison. Our team has been notified."
+        )
@@ -0,0 +1,36 @@
+"""
+Usage routes - Gemini token, latency and cost accounting
+"""
+
+import os
+from fastapi import APIRouter, Depends, Query
+
+from observability.llm_usage import llm_usage
+from routers.profiling import require_admin
+
+# Create router (client IPs and query texts are listed, so admins only)
+router = APIRouter(
+    prefix="/api/usage",
+    tags=["usage"],
+    dependencies=[Depends(require_admin)],
+    responses={401: {"description": "Missing or invalid X-Admin-Token"}},
+)
+
+@router.get(
+    "/llm",
+    summary="💸 Gemini Usage and Cost",
+    description="""
+    **Which endpoints, clients, depths and queries drive Gemini spend and latency**
+
+    Prompt and response tokens (from Gemini's usage metadata), mean model latency and estimated cost
+    per endpoint, depth and model, plus the top clients and queries by cost. Counted per worker
+    process since it started; `/metrics` has the same totals as `llm_tokens_total` and `llm_cost_usd_total`.
+    Requires the `X-Admin-Token` header.
+    """,
+    responses={
+        200: {"description": "✅ Gemini usage summary"}
+    }
+)
+async def llm_usage_summary(top: int = Query(10, ge=1, le=100, description="Clients and queries to list")):
+    """Gemini usage summary for this worker."""
+    return {"worker_pid": os.getpid(), **llm_usage.summary(top=top)}
@@ -0,0 +1,449 @@
+"""
+Analysis pipeline - Qloo data + Gemini insights assembled into API responses
+
+Shared by the API routes and background jobs (precomputation) so both go
+through the same history lookup, upstream calls and recording.
+
+Responses degrade field by field rather than all at once: whatever real data
+arrived in time is kept and only the missing parts are filled from history,
+rule-based insights or demo content. data_sources["provenance"] records where
+each field came from.
+
+Qloo data stays one typed payload (services.qloo_models) from the Qloo
+response to the serialized data_sources.
+"""
+
+import asyncio
+from dataclasses import replace
+from datetime import datetime
+from typing import Any, Callable, Dict, Optional, Tuple, Type
+
+from models.schemas import (
+    TrendAnalysisRequest,
+    TrendAnalysisResponse,
+    AudienceInsightRequest,
+    AudienceInsightResponse,
+    AudienceComparisonRequest,
+    AudienceComparisonResponse
+)
+from services.llm_service import GeminiService
+from services.qloo_models import AudiencePayload, QlooPayload, TrendPayload
+from services.qloo_service import QlooService
+from services.analysis_store import ANALYSIS_STALE_TTL, analysis_store, build_request_key
+from services.deadline import LLM_MIN_BUDGET, QLOO_MIN_BUDGET, has_budget, tighten_deadline
+from services.depth_profiles import get_profile
+from services.insight_engine import audience_insights, trend_insights
+from services.quota_manager import quota_manager
+from services.region_comparison import compare_regions, comparison_insights
+from services.simulated_data import is_simulated
+from services.similarity_cache import similarity_cache
+from services.strength_history import strength_history
+from observability.timing import timing_debug_block, timing_span
+from observability.tracing import set_span_attributes, trace_span
+
+
+def trend_request_key(request: TrendAnalysisRequest) -> str:
+    return build_request_key(request.query, request.industry, request.timeframe, request.depth)
+
+
+def trend_series_key(request: TrendAnalysisRequest) -> str:
+    """Strength history series of a trend: the query in its industry, whatever the depth or timeframe"""
+    return build_request_key(request.query, request.industry)
+
+
+def audience_request_key(request: AudienceInsightRequest) -> str:
+    return build_request_key(request.target_audience, request.product_category, request.region)
+
+
+def comparison_request_key(request: AudienceComparisonRequest) -> str:
+    return build_request_key(request.target_audience, request.product_category, ",".join(request.regions))
+
+
+# Response fields whose provenance is reported, besides "qloo"
+TREND_FIELDS = ("summary", "insights", "recommendations")
+AUDIENCE_FIELDS = ("summary", "cultural_affinities", "recommendations")
+COMPARISON_FIELDS = ("summary", "insights", "recommendations")
+
+
+def _store_marker(stored: Dict[str, Any]) -> Dict[str, Any]:
+    return {"cached": True, "stored_at": datetime.fromtimestamp(stored["stored_at"]).isoformat()}
+
+
+def _stored_response(stored: Dict[str, Any], fields: Tuple[str, ...],
+                     stale_reason: Optional[str] = None) -> Dict[str, Any]:
+    """Response fields from a stored analysis, marked as served from history"""
+    response = dict(stored["response"])
+    response["data_sources"] = {
+        **response.get("data_sources", {}),
+        "analysis_store": _store_marker(stored),
+        "provenance": {field: "history" for field in ("qloo",) + fields}
+    }
+    if stale_reason:
+        response["data_sources"]["analysis_store"].update({"stale": True, "reason": stale_reason})
+    return response
+
+
+def _history(kind: str, request_key: str) -> Optional[Dict[str, Any]]:
+    """Newest live analysis of the same request that is still usable as a fallback"""
+    with timing_span("store_lookup"):
+        return analysis_store.find_recent(kind, request_key, max_age=ANALYSIS_STALE_TTL)
+
+
+def _resolve_qloo(qloo_data: QlooPayload, stored: Optional[Dict[str, Any]],
+                  model: Type[QlooPayload]) -> Tuple[QlooPayload, str]:
+    """Prefer live Qloo data, then real Qloo data kept in history, then simulated data"""
+    if not is_simulated(qloo_data):
+        return qloo_data, "qloo"
+    data_sources = stored["response"].get("data_sources", {}) if stored is not None else {}
+    if data_sources.get("provenance", {}).get("qloo") == "qloo" and data_sources.get("qloo"):
+        return model.coerce(data_sources["qloo"]), "history"
+    return qloo_data, "simulated"
+
+
+def _assemble(llm_result: Dict[str, Any], fields: Tuple[str, ...], qloo_source: str,
+              stored: Optional[Dict[str, Any]], derive: Callable[[], Dict[str, Any]],
+              rules_only: bool = False) -> Tuple[Dict[str, Any], str]:
+    """
+    Pick the source of the analysis fields.
+
+    Gemini output when it answered; otherwise rules over live Qloo data, then an
+    older Gemini analysis from history, and the demo analysis as a last resort.
+    rules_only (depth="basic") always uses the rules.
+    """
+    if llm_result.get("generated_by") == "gemini":
+        return llm_result, "gemini"
+    if rules_only or qloo_source == "qloo":
+        with timing_span("rules"):
+            return derive(), "rules"
+    if stored is not None:
+        return {field: stored["response"].get(field) for field in fields}, "history"
+    return llm_result, "demo"
+
+
+async def _with_related_trends(qloo_data: TrendPayload, qloo_service: QlooService,
+                               industry: Optional[str], count: int) -> TrendPayload:
+    """Add Qloo trend data for the top related concepts (deep analyses), looked up concurrently"""
+    concepts = list(qloo_data.related_concepts[:count])
+    if not concepts or not has_budget(QLOO_MIN_BUDGET):
+        return qloo_data
+    with timing_span("qloo_subqueries", f"{len(concepts)} concepts"):
+        results = await asyncio.gather(
+            *(qloo_service.get_trend_data(query=concept, industry=industry) for concept in concepts)
+        )
+    related = []
+    for concept, result in zip(concepts, results):
+        if is_simulated(result):
+            continue  # Only real data is worth adding to the prompt
+        affinities = sorted(result.cultural_affinities, key=lambda affinity: affinity.strength or 0.0, reverse=True)
+        related.append({
+            "concept": concept,
+            "trend_strength": result.trend_strength,
+            "top_domains": [affinity.domain for affinity in affinities[:2]]
+        })
+    set_span_attributes({"qloo.subqueries": len(concepts), "qloo.subqueries_live": len(related)})
+    return replace(qloo_data, related_trends=tuple(related)) if related else qloo_data
+
+
+def _data_sources(qloo_data: QlooPayload, qloo_source: str, source: str, fields: Tuple[str, ...],
+                  stored: Optional[Dict[str, Any]]) -> Dict[str, Any]:
+    data_sources = {
+        "qloo": qloo_data.as_dict(),
+        "provenance": {"qloo": qloo_source, **{field: source for field in fields}}
+    }
+    if stored is not None and "history" in (qloo_source, source):
+        data_sources["analysis_store"] = {**_store_marker(stored), "partial": True}
+    return data_sources
+
+
+def _stale_fallback(kind: str, request_key: str) -> Optional[Dict[str, Any]]:
+    """
+    When Gemini can't answer in time (quota empty, or too little of the request
+    deadline left), an older live analysis beats a demo answer
+    """
+    if quota_manager.exhausted("gemini"):
+        reason = "upstream_quota"
+    elif not has_budget(LLM_MIN_BUDGET):
+        reason = "deadline"
+    else:
+        return None
+    stored = analysis_store.find_recent(kind, request_key, max_age=ANALYSIS_STALE_TTL)
+    set_span_attributes({"cache.stale_hit": stored is not None})
+    fields = TREND_FIELDS if kind == "trend" else AUDIENCE_FIELDS
+    return _stored_response(stored, fields, stale_reason=reason) if stored is not None else None
+
+
+async def run_trend_analysis(request: TrendAnalysisRequest, llm_service: GeminiService,
+                             qloo_service: QlooService, use_store: bool = True,
+                             depth_deadline: bool = True) -> TrendAnalysisResponse:
+    """
+    Run the trend analysis pipeline.
+
+    Args:
+        request: The validated trend request
+        llm_service: Gemini service
+        qloo_service: Qloo service
+        use_store: Serve a recent identical analysis from history if one exists
+                   (False forces a fresh analysis, e.g. for precomputation)
+        depth_deadline: Cap the deadline at the depth's time budget
+                        (False for background jobs, which have JOB_TIMEOUT instead)
+    """
+    # The depth picks the model, prompt size, extra Qloo lookups and time budget
+    profile = get_profile(request.depth)
+    if depth_deadline:
+        tighten_deadline(profile.deadline)
+    with trace_span("analyze_trend", {
+        "trend.query": request.query,
+        "trend.industry": request.industry,
+        "trend.timeframe": request.timeframe,
+        "trend.depth": profile.name
+    }):
+        # Step 0: Serve a recent identical analysis from history
+        request_key = trend_request_key(request)
+        if use_store:
+            with timing_span("store_lookup"):
+                stored = analysis_store.find_recent("trend", request_key)
+            set_span_attributes({"cache.hit": stored is not None})
+            if stored is not None:
+                return TrendAnalysisResponse(**_stored_response(stored, TREND_FIELDS), debug=timing_debug_block())
+
+            # Step 0b: ...or a recent analysis of a near-duplicate query in the same context
+            with timing_span("similarity_lookup"):
+                match = similarity_cache.find(request.query, request.industry, request.timeframe, request.depth)
+                stored = analysis_store.find_recent("trend", match[0]) if match else None
+            set_span_attributes({"cache.similar_hit": stored is not None})
+            if stored is not None:
+                _, matched_query, similarity = match
+                response = _stored_response(stored, TREND_FIELDS)
+                response["query"] = request.query
+                response["data_sources"]["near_duplicate"] = {
+                    "matched_query": matched_query,
+                    "similarity": round(similarity, 3)
+                }
+                return TrendAnalysisResponse(**response, debug=timing_debug_block())
+
+            stale = _stale_fallback("trend", request_key)
+            if stale is not None:
+                return TrendAnalysisResponse(**stale, debug=timing_debug_block())
+
+        # Step 1: Get cultural affinity data from Qloo
+        with timing_span("qloo"):
+            qloo_data = await qloo_service.get_trend_data(
+                query=request.query,
+                industry=request.industry
+            )
+
+        # Step 1b: If Qloo failed, real Qloo data kept in history beats simulated data
+        stored = _history("trend", request_key) if use_store and is_simulated(qloo_data) else None
+        qloo_data, qloo_source = _resolve_qloo(qloo_data, stored, TrendPayload)
+
+        # Step 1c: Deep analyses also look at the top related concepts
+        if profile.qloo_subqueries and qloo_source == "qloo":
+            qloo_data = await _with_related_trends(qloo_data, qloo_service, request.industry, profile.qloo_subqueries)
+
+        # Step 1d: Record live strengths and add the recorded trajectory over the request's timeframe
+        with timing_span("strength_history"):
+            series_key = trend_series_key(request)
+            if qloo_source == "qloo":
+                strength_history.record(series_key, qloo_data)
+            trajectory = strength_history.trajectory(series_key, request.timeframe)
+        if trajectory is not None:
+            qloo_data = replace(qloo_data, strength_history=trajectory)
+
+        # Step 2: Process with LLM for insights (depth="basic" is answered by the rule engine alone)
+        rules_only = not profile.use_llm
+        llm_result: Dict[str, Any] = {}
+        if not rules_only:
+            with timing_span("llm"):
+                llm_result = await llm_service.analyze_trend(
+                    query=request.query,
+                    qloo_data=qloo_data,
+                    industry=request.industry,
+                    timeframe=request.timeframe,
+                    profile=profile
+                )
+
+        # Step 3: Build the combined result from the best source available for each part
+        with timing_span("build"):
+            result, source = _assemble(
+                llm_result, TREND_FIELDS, qloo_source, stored,
+                lambda: trend_insights(request.query, qloo_data, request.industry, request.timeframe),
+                rules_only=rules_only
+            )
+            response = TrendAnalysisResponse(
+                query=request.query,
+                summary=result.get("summary") or "Analysis not available",
+                timestamp=datetime.now().isoformat(),
+                insights=result.get("insights") or [],
+                recommendations=result.get("recommendations") or [],
+                data_sources=_data_sources(qloo_data, qloo_source, source, TREND_FIELDS, stored)
+            )
+        set_span_attributes({"response.qloo_source": qloo_source, "response.insight_source": source})
+
+        # Step 4: Record it in history (written in the background); only live results are re-served
+        # (for depth="basic", rules over live Qloo data are the live result)
+        live = source == "gemini" or (rules_only and qloo_source == "qloo")
+        analysis_store.record(
+            "trend", request_key, request.query, response.model_dump(exclude_none=True), live=live,
+            industry=request.industry, timeframe=request.timeframe, depth=request.depth
+        )
+        if live:
+            similarity_cache.add(request.query, request_key, request.industry, request.timeframe, request.depth)
+        response.debug = timing_debug_block()
+        return response
+
+
+async def run_audience_analysis(request: AudienceInsightRequest, llm_service: GeminiService,
+                                qloo_service: QlooService, use_store: bool = True) -> AudienceInsightResponse:
+    """
+    Run the audience analysis pipeline.
+
+    Args:
+        request: The validated audience request
+        llm_service: Gemini service
+        qloo_service: Qloo service
+        use_store: Serve a recent identical analysis from history if one exists
+    """
+    with trace_span("analyze_audience", {
+        "audience.target": request.target_audience,
+        "audience.product_category": request.product_category,
+        "audience.region": request.region
+    }):
+        # Step 0: Serve a recent identical analysis from history
+        request_key = audience_request_key(request)
+        if use_store:
+            with timing_span("store_lookup"):
+                stored = analysis_store.find_recent("audience", request_key)
+            set_span_attributes({"cache.hit": stored is not None})
+            if stored is not None:
+                return AudienceInsightResponse(**_stored_response(stored, AUDIENCE_FIELDS), debug=timing_debug_block())
+
+            stale = _stale_fallback("audience", request_key)
+            if stale is not None:
+                return AudienceInsightResponse(**stale, debug=timing_debug_block())
+
+        # Step 1: Get cultural affinity data from Qloo
+        with timing_span("qloo"):
+            qloo_data = await qloo_service.get_audience_data(
+                audience=request.target_audience,
+                product_category=request.product_category,
+                region=request.region
+            )
+
+        # Step 1b: If Qloo failed, real Qloo data kept in history beats simulated data
+        stored = _history("audience", request_key) if use_store and is_simulated(qloo_data) else None
+        qloo_data, qloo_source = _resolve_qloo(qloo_data, stored, AudiencePayload)
+
+        # Step 2: Process with LLM for insights
+        with timing_span("llm"):
+            llm_result = await llm_service.generate_audience_insights(
+                target_audience=request.target_audience,
+                qloo_data=qloo_data,
+                product_category=request.product_category,
+                region=request.region
+            )
+
+        # Step 3: Build the combined result from the best source available for each part
+        with timing_span("build"):
+            result, source = _assemble(
+                llm_result, AUDIENCE_FIELDS, qloo_source, stored,
+                lambda: audience_insights(request.target_audience, qloo_data, request.product_category,
+                                          request.region)
+            )
+            response = AudienceInsightResponse(
+                target_audience=request.target_audience,
+                summary=result.get("summary") or "Analysis not available",
+                timestamp=datetime.now().isoformat(),
+                cultural_affinities=result.get("cultural_affinities") or [],
+                recommendations=result.get("recommendations") or [],
+                data_sources=_data_sources(qloo_data, qloo_source, source, AUDIENCE_FIELDS, stored)
+            )
+        set_span_attributes({"response.qloo_source": qloo_source, "response.insight_source": source})
+
+        # Step 4: Record it in history (written in the background); only live results are re-served
+        analysis_store.record(
+            "audience", request_key, request.target_audience, response.model_dump(exclude_none=True),
+            live=llm_result.get("generated_by") == "gemini",
+            product_category=request.product_category, region=request.region
+        )
+        response.debug = timing_debug_block()
+        return response
+
+
+async def run_audience_comparison(request: AudienceComparisonRequest, llm_service: GeminiService,
+                                  qloo_service: QlooService, use_store: bool = True) -> AudienceComparisonResponse:
+    """
+    Compare one audience across regions: Qloo data for every region fetched
+    concurrently, one vectorized diff, and a single Gemini call over the diff.
+
+    Args:
+        request: The validated comparison request
+        llm_service: Gemini service
+        qloo_service: Qloo service
+        use_store: Serve a recent identical comparison from history if one exists
+    """
+    with trace_span("compare_audience_regions", {
+        "audience.target": request.target_audience,
+        "audience.product_category": request.product_category,
+        "audience.regions": ",".join(request.regions)
+    }):
+        # Step 0: Serve a recent identical comparison from history
+        request_key = comparison_request_key(request)
+        if use_store:
+            with timing_span("store_lookup"):
+                stored = analysis_store.find_recent("comparison", request_key)
+            set_span_attributes({"cache.hit": stored is not None})
+            if stored is not None:
+                return AudienceComparisonResponse(**_stored_response(stored, COMPARISON_FIELDS),
+                                                  debug=timing_debug_block())
+
+        # Step 1: Qloo data for all regions at once, so this costs about one region's latency
+        with timing_span("qloo", f"{len(request.regions)} regions"):
+            payloads = await qloo_service.get_audience_data_by_region(
+                audience=request.target_audience,
+                regions=request.regions,
+                product_category=request.product_category
+            )
+        qloo_sources = {region: "simulated" if is_simulated(payload) else "qloo"
+                        for region, payload in zip(request.regions, payloads)}
+
+        # Step 2: Per-region deltas in one pass
+        with timing_span("compare"):
+            diff = compare_regions(request.regions, payloads)
+
+        # Step 3: One consolidated Gemini call over the compact diff, rules when it can't answer
+        with timing_span("llm"):
+            llm_result = await llm_service.compare_audience_regions(
+                target_audience=request.target_audience,
+                diff=diff,
+                product_category=request.product_category
+            )
+        source = "gemini" if llm_result is not None else "rules"
+        if llm_result is None:
+            with timing_span("rules"):
+                llm_result = comparison_insights(request.target_audience, diff, request.product_category)
+
+        with timing_span("build"):
+            response = AudienceComparisonResponse(
+                target_audience=request.target_audience,
+                summary=llm_result.get("summary") or "Comparison not available",
+                timestamp=datetime.now().isoformat(),
+                regions=diff["regions"],
+                shared_affinities=diff["shared"],
+                insights=llm_result.get("insights") or [],
+                recommendations=llm_result.get("recommendations") or [],
+                data_sources={
+                    "qloo": {region: payload.as_dict() for region, payload in zip(request.regions, payloads)},
+                    "provenance": {"qloo": qloo_sources, **{field: source for field in COMPARISON_FIELDS}}
+                }
+            )
+        set_span_attributes({"response.insight_source": source,
+                             "response.qloo_live_regions": sum(value == "qloo" for value in qloo_sources.values())})
+
+        # Step 4: Record it in history; only comparisons of live data written by Gemini are re-served
+        analysis_store.record(
+            "comparison", request_key, request.target_audience, response.model_dump(exclude_none=True),
+            live=source == "gemini" and all(value == "qloo" for value in qloo_sources.values()),
+            product_category=request.product_category, region=", ".join(request.regions)
+        )
+        response.debug = timing_debug_block()
+        return response
@@ -0,0 +1,390 @@
+"""
+Analysis store - Persistent SQLite history of completed analyses
+
+Every trend and audience analysis is recorded with its normalized query,
+industry, timeframe/region and date, so recent identical analyses can be
+served without re-running Qloo and Gemini, and past results can be searched
+with SQLite FTS5.
+
+Writes never block the request: record() queues the row and a background
+thread inserts queued rows in batched transactions. Rows still waiting in the
+queue are visible to find_recent() through a small in-memory map. The same
+thread prunes analyses older than ANALYSIS_RETENTION_DAYS and the oldest beyond
+ANALYSIS_MAX_ROWS (the FTS delete trigger keeps the search index in step).
+"""
+
+import json
+import os
+import queue
+import re
+import sqlite3
+import threading
+import time
+from datetime import datetime, timezone
+from pathlib import Path
+from typing import Any, Dict, List, Optional, Tuple
+
+ANALYSIS_STORE_ENABLED = os.getenv("ANALYSIS_STORE_ENABLED", "true").lower() in ("1", "true", "yes")
+ANALYSIS_DB_PATH = os.getenv("ANALYSIS_DB_PATH") or str(Path(__file__).parent.parent / "data" / "analyses.db")
+ANALYSIS_CACHE_TTL = float(os.getenv("ANALYSIS_CACHE_TTL", "3600"))  # Seconds a stored analysis is served
+ANALYSIS_STALE_TTL = float(os.getenv("ANALYSIS_STALE_TTL", "86400"))  # Oldest analysis served when upstreams are unavailable
+ANALYSIS_RETENTION_DAYS = float(os.getenv("ANALYSIS_RETENTION_DAYS", "30"))  # Older analyses are deleted
+ANALYSIS_MAX_ROWS = int(os.getenv("ANALYSIS_MAX_ROWS", "100000"))           # Oldest analyses dropped beyond this
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS analyses (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    kind TEXT NOT NULL,
+    request_key TEXT NOT NULL,
+    query TEXT NOT NULL,
+    normalized_query TEXT NOT NULL,
+    industry TEXT,
+    timeframe TEXT,
+    product_category TEXT,
+    region TEXT,
+    depth TEXT,
+    live INTEGER NOT NULL DEFAULT 1,
+    created_at REAL NOT NULL,
+    created_date TEXT NOT NULL,
+    summary TEXT NOT NULL,
+    response_json TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS idx_analyses_request ON analyses (kind, request_key, created_at DESC);
+CREATE INDEX IF NOT EXISTS idx_analyses_query ON analyses (normalized_query, created_at DESC);
+CREATE INDEX IF NOT EXISTS idx_analyses_industry ON analyses (industry, created_date);
+CREATE INDEX IF NOT EXISTS idx_analyses_date ON analyses (created_date);
+CREATE VIRTUAL TABLE IF NOT EXISTS analyses_fts USING fts5(
+    query, summary, industry, content='analyses', content_rowid='id'
+);
+CREATE TRIGGER IF NOT EXISTS analyses_fts_insert AFTER INSERT ON analyses BEGIN
+    INSERT INTO analyses_fts (rowid, query, summary, industry)
+    VALUES (new.id, new.query, new.summary, coalesce(new.industry, ''));
+END;
+CREATE TRIGGER IF NOT EXISTS analyses_fts_delete AFTER DELETE ON analyses BEGIN
+    INSERT INTO analyses_fts (analyses_fts, rowid, query, summary, industry)
+    VALUES ('delete', old.id, old.query, old.summary, coalesce(old.industry, ''));
+END;
+"""
+
+_NON_WORD = re.compile(r"[^\w\s]+")
+_SPACES = re.compile(r"\s+")
+
+
+def normalize_query(text: Optional[str]) -> str:
+    """Lowercase, strip punctuation and collapse whitespace"""
+    if not text:
+        return ""
+    return _SPACES.sub(" ", _NON_WORD.sub(" ", text.lower())).strip()
+
+
+def build_request_key(*parts: Optional[str]) -> str:
+    """Identity of an analysis request: its normalized fields joined together"""
+    return "|".join(normalize_query(part) for part in parts)
+
+
+class AnalysisStore:
+    """SQLite + FTS5 store of completed analyses with batched background writes"""
+
+    def __init__(self, db_path: str = ANALYSIS_DB_PATH, cache_ttl: float = ANALYSIS_CACHE_TTL,
+                 batch_size: int = 50, flush_interval: float = 0.5, enabled: bool = True,
+                 retention_days: float = ANALYSIS_RETENTION_DAYS, max_rows: int = ANALYSIS_MAX_ROWS):
+        self.db_path = db_path
+        self.cache_ttl = cache_ttl
+        self.retention = retention_days * 86400
+        self.max_rows = max_rows
+        self._next_prune = 0.0
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self._queue: "queue.Queue[Optional[Dict[str, Any]]]" = queue.Queue()
+        self._pending: Dict[Tuple[str, str], Dict[str, Any]] = {}
+        self._pending_lock = threading.Lock()
+        self._local = threading.local()
+        self._writer: Optional[threading.Thread] = None
+        self._writer_lock = threading.Lock()
+        self.available = enabled and self._initialize()
+
+    def _initialize(self) -> bool:
+        try:
+            Path(self.db_path).parent.mkdir(parents=True, exist_ok=True)
+            connection = self._connection()
+            connection.executescript(_SCHEMA)
+            return True
+        except (sqlite3.Error, OSError) as e:
+            print(f"⚠️ Analysis store unavailable ({e}), history disabled")
+            return False
+
+    def _connection(self) -> sqlite3.Connection:
+        """One connection per thread (reads on the event loop, writes on the writer thread)"""
+        connection = getattr(self._local, "connection", None)
+        if connection is None:
+            connection = sqlite3.connect(self.db_path, timeout=5.0, isolation_level=None)
+            connection.row_factory = sqlite3.Row
+            connection.execute("PRAGMA journal_mode=WAL")
+            connection.execute("PRAGMA synchronous=NORMAL")
+            self._local.connection = connection
+        return connection
+
+    # ------------------------------------------------------------------
+    # Write path
+    # ------------------------------------------------------------------
+
+    def record(self, kind: str, request_key: str, query: str, response: Dict[str, Any],
+               live: bool = True, **fields: Optional[str]):
+        """Queue a completed analysis for insertion (never blocks on SQLite)"""
+        if not self.available:
+            return
+        now = time.time()
+        row = {
+            "kind": kind,
+            "request_key": request_key,
+            "query": query,
+            "normalized_query": normalize_query(query),
+            "industry": fields.get("industry"),
+            "timeframe": fields.get("timeframe"),
+            "product_category": fields.get("product_category"),
+            "region": fields.get("region"),
+            "depth": fields.get("depth"),
+            "live": 1 if live else 0,
+            "created_at": now,
+            "created_date": datetime.fromtimestamp(now, timezone.utc).strftime("%Y-%m-%d"),
+            "summary": response.get("summary", ""),
+            "response": response,
+        }
+        if live:
+            with self._pending_lock:
+                self._pending[(kind, request_key)] = row
+        self._ensure_writer()
+        self._queue.put(row)
+
+    def _ensure_writer(self):
+        if self._writer is not None and self._writer.is_alive():
+            return
+        with self._writer_lock:
+            if self._writer is None or not self._writer.is_alive():
+                self._writer = threading.Thread(target=self._write_loop, name="analysis-store-writer", daemon=True)
+                self._writer.start()
+
+    def _write_loop(self):
+        while True:
+            batch: List[Dict[str, Any]] = []
+            row = self._queue.get()
+            if row is None:
+                return
+            batch.append(row)
+            deadline = time.monotonic() + self.flush_interval
+            stop = False
+            while len(batch) < self.batch_size:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    break
+                try:
+                    row = self._queue.get(timeout=remaining)
+                except queue.Empty:
+                    break
+                if row is None:
+                    stop = True
+                    break
+                batch.append(row)
+            self._flush(batch)
+            self._prune(time.time())
+            if stop:
+                return
+
+    def _flush(self, batch: List[Dict[str, Any]]):
+        try:
+            connection = self._connection()
+            connection.execute("BEGIN")
+            connection.executemany(
+                """
+                INSERT INTO analyses (kind, request_key, query, normalized_query, industry, timeframe,
+                                      product_category, region, depth, live, created_at, created_date,
+                                      summary, response_json)
+                VALUES (:kind, :request_key, :query, :normalized_query, :industry, :timeframe,
+                        :product_category, :region, :depth, :live, :created_at, :created_date,
+                        :summary, :response_json)
+                """,
+                [dict(row, response_json=json.dumps(row["response"], default=str)) for row in batch]
+            )
+            connection.execute("COMMIT")
+        except sqlite3.Error as e:
+            print(f"⚠️ Could not write {len(batch)} analyses: {e}")
+            try:
+                connection.execute("ROLLBACK")
+            except sqlite3.Error:
+                pass
+        finally:
+            with self._pending_lock:
+                for row in batch:
+                    key = (row["kind"], row["request_key"])
+                    if self._pending.get(key) is row:
+                        del self._pending[key]
+
+    def _prune(self, now: float):
+        """Delete analyses past retention and the oldest beyond max_rows, at most once a minute"""
+        if now < self._next_prune:
+            return
+        self._next_prune = now + 60
+        try:
+            connection = self._connection()
+            connection.execute("DELETE FROM analyses WHERE created_at < ?", (now - self.retention,))
+            connection.execute(
+                "DELETE FROM analyses WHERE id IN "
+                "(SELECT id FROM analyses ORDER BY created_at DESC LIMIT -1 OFFSET ?)",
+                (self.max_rows,)
+            )
+        except sqlite3.Error as e:
+            print(f"⚠️ Could not prune analyses: {e}")
+
+    def close(self, timeout: float = 5.0):
+        """Flush queued writes and stop the writer thread"""
+        if self._writer is not None and self._writer.is_alive():
+            self._queue.put(None)
+            self._writer.join(timeout)
+
+    # ------------------------------------------------------------------
+    # Read path
+    # ------------------------------------------------------------------
+
+    def find_recent(self, kind: str, request_key: str, max_age: Optional[float] = None) -> Optional[Dict[str, Any]]:
+        """
+        Return the newest live analysis for an identical request, if fresh enough.
+
+        Returns:
+            {"response": ..., "stored_at": epoch seconds} or None
+        """
+        if not self.available:
+            return None
+        cutoff = time.time() - (self.cache_ttl if max_age is None else max_age)
+
+        with self._pending_lock:
+            pending = self._pending.get((kind, request_key))
+        if pending is not None and pending["created_at"] >= cutoff:
+            return {"response": pending["response"], "stored_at": pending["created_at"]}
+
+        try:
+            row = self._connection().execute(
+                """
+                SELECT response_json, created_at FROM analyses
+                WHERE kind = ? AND request_key = ? AND live = 1 AND created_at >= ?
+                ORDER BY created_at DESC LIMIT 1
+                """,
+                (kind, request_key, cutoff)
+            ).fetchone()
+        except sqlite3.Error as e:
+            print(f"⚠️ Analysis store lookup failed: {e}")
+            return None
+        if row is None:
+            return None
+        return {"response": json.loads(row["response_json"]), "stored_at": row["created_at"]}
+
+    def search(self, text: Optional[str] = None, kind: Optional[str] = None, industry: Optional[str] = None,
+               since: Optional[str] = None, limit: int = 20) -> List[Dict[str, Any]]:
+        """
+        Search past analyses by full text (query, summary, industry) and filters.
+
+        Args:
+            text: Words to match; each word also matches as a prefix
+            kind: "trend", "audience" or "comparison"
+            industry: Exact industry filter (case-insensitive)
+            since: ISO date (YYYY-MM-DD); only analyses on or after it
+            limit: Maximum rows
+        """
+        if not self.available:
+            return []
+
+        clauses: List[str] = []
+        params: List[Any] = []
+        terms = normalize_query(text).split()
+        if terms:
+            source = "analyses_fts JOIN analyses ON analyses.id = analyses_fts.rowid"
+            clauses.append("analyses_fts MATCH ?")
+            params.append(" ".join(f'"{term}"*' for term in terms))
+            order = "bm25(analyses_fts), analyses.created_at DESC"
+            snippet = "snippet(analyses_fts, 1, '[', ']', '…', 12)"
+        else:
+            source = "analyses"
+            order = "analyses.created_at DESC"
+            snippet = "substr(analyses.summary, 1, 160)"
+        if kind:
+            clauses.append("analyses.kind = ?")
+            params.append(kind)
+        if industry:
+            clauses.append("analyses.industry = ? COLLATE NOCASE")
+            params.append(industry)
+        if since:
+            clauses.append("analyses.created_date >= ?")
+            params.append(since)
+
+        where = f"WHERE {' AND '.join(clauses)}" if clauses else ""
+        try:
+            rows = self._connection().execute(
+                f"""
+                SELECT analyses.id, analyses.kind, analyses.query, analyses.industry, analyses.timeframe,
+                       analyses.product_category, analyses.region, analyses.depth, analyses.live,
+                       analyses.created_at, {snippet} AS snippet
+                FROM {source} {where}
+                ORDER BY {order}
+                LIMIT ?
+                """,
+                params + [max(1, min(limit, 100))]
+            ).fetchall()
+        except sqlite3.Error as e:
+            print(f"⚠️ Analysis search failed: {e}")
+            return []
+
+        return [
+            {
+                "id": row["id"],
+                "kind": row["kind"],
+                "query": row["query"],
+                "industry": row["industry"],
+                "timeframe": row["timeframe"],
+                "product_category": row["product_category"],
+                "region": row["region"],
+                "depth": row["depth"],
+                "live": bool(row["live"]),
+                "created_at": datetime.fromtimestamp(row["created_at"], timezone.utc).isoformat(),
+                "snippet": row["snippet"],
+            }
+            for row in rows
+        ]
+
+    def get(self, analysis_id: int) -> Optional[Dict[str, Any]]:
+        """Full stored response for one analysis"""
+        if not self.available:
+            return None
+        row = self._connection().execute(
+            "SELECT kind, created_at, response_json FROM analyses WHERE id = ?", (analysis_id,)
+        ).fetchone()
+        if row is None:
+            return None
+        return {
+            "id": analysis_id,
+            "kind": row["kind"],
+            "created_at": datetime.fromtimestamp(row["created_at"], timezone.utc).isoformat(),
+            "response": json.loads(row["response_json"]),
+        }
+
+    def recent_live(self, kind: str, max_age: Optional[float] = None) -> List[Dict[str, Any]]:
+        """Request fields of live analyses still within the TTL, oldest first (for warming indexes)"""
+        if not self.available:
+            return []
+        cutoff = time.time() - (self.cache_ttl if max_age is None else max_age)
+        rows = self._connection().execute(
+            """
+            SELECT request_key, query, industry, timeframe, product_category, region, depth, created_at
+            FROM analyses WHERE kind = ? AND live = 1 AND created_at >= ?
+            ORDER BY created_at
+            """,
+            (kind, cutoff)
+        ).fetchall()
+        return [dict(row) for row in rows]
+
+    def count(self) -> int:
+        if not self.available:
+            return 0
+        return self._connection().execute("SELECT COUNT(*) FROM analyses").fetchone()[0]
+
+
+# Global analysis store instance
+analysis_store = AnalysisStore(enabled=ANALYSIS_STORE_ENABLED)
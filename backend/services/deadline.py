@@ -0,0 +1,75 @@
+"""
+Request deadlines - How long the current request may still take
+
+The analysis routes start a deadline for each request, REQUEST_DEADLINE
+seconds by default or shorter when the client sends X-Request-Timeout (the
+frontend gives up after 30s, so waiting longer helps nobody). It lives in a
+context variable like the request timer, so QlooService, GeminiService, the
+retry policies and the LLM scheduler read the time left without it being
+passed around, and size every outbound timeout to fit.
+
+Outside a request (precomputation, scripts) there is no deadline and the
+services use their own per-call timeouts.
+"""
+
+import os
+import time
+from contextvars import ContextVar
+from typing import Optional
+
+REQUEST_DEADLINE = float(os.getenv("REQUEST_DEADLINE", "25"))
+REQUEST_DEADLINE_MIN = 1.0
+
+# Below these budgets the call is skipped and the pipeline degrades instead
+QLOO_MIN_BUDGET = float(os.getenv("QLOO_MIN_BUDGET", "0.5"))
+LLM_MIN_BUDGET = float(os.getenv("LLM_MIN_BUDGET", "3"))
+
+_current_deadline: ContextVar[Optional[float]] = ContextVar("request_deadline", default=None)
+
+
+def parse_timeout_header(value: Optional[str]) -> float:
+    """Seconds allowed for a request: the client's X-Request-Timeout, clamped to REQUEST_DEADLINE"""
+    try:
+        requested = float(value) if value else REQUEST_DEADLINE
+    except ValueError:
+        requested = REQUEST_DEADLINE
+    return min(REQUEST_DEADLINE, max(REQUEST_DEADLINE_MIN, requested))
+
+
+def start_deadline(seconds: float = REQUEST_DEADLINE) -> float:
+    """Set the deadline (a time.monotonic() value) for the current request context"""
+    deadline = time.monotonic() + seconds
+    _current_deadline.set(deadline)
+    return deadline
+
+
+def current_deadline() -> Optional[float]:
+    return _current_deadline.get()
+
+
+def time_remaining() -> Optional[float]:
+    """Seconds left before the deadline (never negative), or None without a deadline"""
+    deadline = _current_deadline.get()
+    return None if deadline is None else max(0.0, deadline - time.monotonic())
+
+
+def call_timeout(default: float) -> float:
+    """Timeout for one outbound call: the service's own limit, capped by the time left"""
+    remaining = time_remaining()
+    return default if remaining is None else min(default, remaining)
+
+
+def has_budget(minimum: float) -> bool:
+    """Whether at least `minimum` seconds are left (always true without a deadline)"""
+    remaining = time_remaining()
+    return remaining is None or remaining >= minimum
+
+
+def tighten_deadline(seconds: float) -> Optional[float]:
+    """Bring an existing request deadline forward to at most `seconds` from now (no-op without one)"""
+    deadline = _current_deadline.get()
+    if deadline is None:
+        return None
+    deadline = min(deadline, time.monotonic() + seconds)
+    _current_deadline.set(deadline)
+    return deadline
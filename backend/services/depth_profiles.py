@@ -0,0 +1,91 @@
+"""
+Depth profiles - What a 'basic', 'standard' or 'deep' trend analysis costs
+
+TrendAnalysisRequest.depth selects one of these execution profiles. Each
+profile fixes the Gemini model, the token budget for Qloo data in the
+prompt, how many insights and recommendations are asked for, how many extra
+Qloo lookups (related concepts) feed the analysis, the time budget and the
+latency objective, so cheap requests finish fast and only 'deep' requests
+pay for the heavier model and the additional upstream calls.
+
+Latency against each tier's SLO is counted in observability.metrics
+(analysis_latency_seconds, analysis_slo_total) and reported in /api/status;
+benchmarks/bench_depth_tiers.py load-tests every tier against its SLO.
+"""
+
+import os
+from dataclasses import asdict, dataclass
+from typing import Any, Dict, Optional
+
+from observability.metrics import metrics
+from services.prompt_builder import PROMPT_TOKEN_BUDGET
+
+metrics.describe("analysis_latency_seconds", "Trend analysis latency by depth tier")
+metrics.describe("analysis_slo_total", "Trend analyses by depth tier and whether they met the tier's latency SLO")
+
+
+@dataclass(frozen=True)
+class DepthProfile:
+    """Execution profile for one analysis depth"""
+    name: str
+    use_llm: bool
+    model: Optional[str]          # Gemini model; None for rules only
+    prompt_token_budget: int      # Tokens for the Qloo data section of the prompt
+    insight_count: int
+    recommendation_count: int
+    qloo_subqueries: int          # Related concepts also looked up in Qloo
+    deadline: float               # Seconds the request may take (caps REQUEST_DEADLINE)
+    llm_timeout: float            # Seconds per Gemini attempt
+    slo_seconds: float            # Latency objective (p95)
+
+
+DEPTH_PROFILES: Dict[str, DepthProfile] = {
+    "basic": DepthProfile(
+        name="basic", use_llm=False, model=None, prompt_token_budget=0,
+        insight_count=4, recommendation_count=4, qloo_subqueries=0,
+        deadline=float(os.getenv("DEPTH_BASIC_DEADLINE", "3")), llm_timeout=0.0,
+        slo_seconds=float(os.getenv("DEPTH_BASIC_SLO", "1")),
+    ),
+    "standard": DepthProfile(
+        name="standard", use_llm=True, model=os.getenv("GEMINI_MODEL_STANDARD", "gemini-1.5-flash"),
+        prompt_token_budget=PROMPT_TOKEN_BUDGET,
+        insight_count=4, recommendation_count=4, qloo_subqueries=0,
+        deadline=float(os.getenv("DEPTH_STANDARD_DEADLINE", "15")), llm_timeout=10.0,
+        slo_seconds=float(os.getenv("DEPTH_STANDARD_SLO", "5")),
+    ),
+    "deep": DepthProfile(
+        name="deep", use_llm=True, model=os.getenv("GEMINI_MODEL_DEEP", "gemini-1.5-pro"),
+        prompt_token_budget=int(os.getenv("DEEP_PROMPT_TOKEN_BUDGET", "1600")),
+        insight_count=6, recommendation_count=6, qloo_subqueries=2,
+        deadline=float(os.getenv("DEPTH_DEEP_DEADLINE", "25")), llm_timeout=20.0,
+        slo_seconds=float(os.getenv("DEPTH_DEEP_SLO", "15")),
+    ),
+}
+
+DEFAULT_DEPTH = "standard"
+
+
+def get_profile(depth: Optional[str]) -> DepthProfile:
+    """Profile for a requested depth; unknown or missing depths run as 'standard'"""
+    return DEPTH_PROFILES.get((depth or DEFAULT_DEPTH).lower(), DEPTH_PROFILES[DEFAULT_DEPTH])
+
+
+def record_latency(profile: DepthProfile, seconds: float):
+    """Count an analysis against its tier's SLO"""
+    metrics.observe("analysis_latency_seconds", seconds, {"depth": profile.name})
+    met = "true" if seconds <= profile.slo_seconds else "false"
+    metrics.increment("analysis_slo_total", {"depth": profile.name, "met": met})
+
+
+def profiles_snapshot() -> Dict[str, Any]:
+    """Profiles with their SLO attainment so far (this worker)"""
+    result = {}
+    for name, profile in DEPTH_PROFILES.items():
+        met = metrics.counter_value("analysis_slo_total", {"depth": name, "met": "true"})
+        missed = metrics.counter_value("analysis_slo_total", {"depth": name, "met": "false"})
+        result[name] = {
+            **asdict(profile),
+            "analyses": int(met + missed),
+            "slo_attainment": round(met / (met + missed), 4) if met + missed else None
+        }
+    return result
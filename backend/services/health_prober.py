@@ -0,0 +1,184 @@
+"""
+Health prober - Background health checks behind /api/status
+
+/api/status used to build a GeminiService and a QlooService and count the
+history table on every call, so monitoring that polls it put load on the
+workers (and /api/test-qloo probed Qloo endpoint by endpoint). Instead a
+background task started in the app lifespan checks each dependency every
+HEALTH_PROBE_INTERVAL seconds, with jitter so workers don't probe in
+lockstep, and keeps the latest result, its latency and the error rate over
+the last HEALTH_PROBE_WINDOW checks. /api/status only reads that snapshot.
+
+Checks are cheap on purpose: one GET on the Qloo API (any answer below 500
+means reachable), a Gemini model metadata lookup (no generation quota used)
+and a row count of the history store. Services in demo mode are reported as
+such without being probed; until a service's first check (or when probing
+is disabled) its demo mode is read from the configuration.
+
+With several workers each runs its own prober.
+"""
+
+import asyncio
+import os
+import random
+import time
+from collections import deque
+from datetime import datetime
+from typing import Any, Awaitable, Callable, Deque, Dict, Optional
+
+from observability.metrics import metrics
+from services.analysis_store import analysis_store
+from services.llm_service import GEMINI_AVAILABLE, GeminiService
+from services.qloo_service import QLOO_API_KEY, QlooService
+
+HEALTH_PROBE_ENABLED = os.getenv("HEALTH_PROBE_ENABLED", "true").lower() in ("1", "true", "yes")
+HEALTH_PROBE_INTERVAL = float(os.getenv("HEALTH_PROBE_INTERVAL", "30"))   # Seconds between checks
+HEALTH_PROBE_JITTER = float(os.getenv("HEALTH_PROBE_JITTER", "0.2"))      # +/- fraction of the interval
+HEALTH_PROBE_TIMEOUT = float(os.getenv("HEALTH_PROBE_TIMEOUT", "5"))      # Per check
+HEALTH_PROBE_WINDOW = int(os.getenv("HEALTH_PROBE_WINDOW", "20"))         # Checks the error rate covers
+QLOO_HEALTH_PATH = os.getenv("QLOO_HEALTH_PATH", "/")
+
+metrics.describe("health_probes_total", "Background health checks by target and outcome")
+metrics.describe("health_probe_duration_seconds", "Background health check latency by target")
+
+
+class HealthProber:
+    """Periodic health checks of the upstreams and the history store, read from memory"""
+
+    def __init__(self, interval: float = HEALTH_PROBE_INTERVAL, jitter: float = HEALTH_PROBE_JITTER,
+                 timeout: float = HEALTH_PROBE_TIMEOUT, window: int = HEALTH_PROBE_WINDOW):
+        self.interval = interval
+        self.jitter = jitter
+        self.timeout = timeout
+        self._checks: Dict[str, Callable[[], Awaitable[Dict[str, Any]]]] = {
+            "qloo": self._check_qloo,
+            "gemini": self._check_gemini,
+            "database": self._check_database,
+        }
+        self._outcomes: Dict[str, Deque[bool]] = {name: deque(maxlen=window) for name in self._checks}
+        self._results: Dict[str, Dict[str, Any]] = {name: {"status": "unknown"} for name in self._checks}
+        self._gemini: Optional[GeminiService] = None
+        self._qloo: Optional[QlooService] = None
+        self._task: Optional[asyncio.Task] = None
+        self.rounds = 0
+
+    # ------------------------------------------------------------------
+    # Checks (return details, or a dict with a "status" when there is nothing to probe)
+    # ------------------------------------------------------------------
+
+    async def _check_qloo(self) -> Dict[str, Any]:
+        if not QLOO_API_KEY or QLOO_API_KEY == "demo_key_for_hackathon":
+            return {"status": "demo_mode"}
+        if self._qloo is None:
+            self._qloo = QlooService()
+        return {"url": self._qloo.base_url, **await self._qloo.health_check(QLOO_HEALTH_PATH, self.timeout)}
+
+    async def _check_gemini(self) -> Dict[str, Any]:
+        if self._gemini is None:
+            self._gemini = GeminiService(client_id="health_prober", priority="batch")
+        if not self._gemini.use_real_api:
+            return {"status": "demo_mode"}
+        return await self._gemini.health_check(self.timeout)
+
+    async def _check_database(self) -> Dict[str, Any]:
+        if not analysis_store.available:
+            return {"status": "disabled"}
+        return {"analyses": await asyncio.to_thread(analysis_store.count)}
+
+    # ------------------------------------------------------------------
+
+    async def probe(self, name: str) -> Dict[str, Any]:
+        """Run one check now and record its result"""
+        started = time.perf_counter()
+        outcomes = self._outcomes[name]
+        result: Dict[str, Any] = {"checked_at": datetime.now().isoformat()}
+        try:
+            detail = await asyncio.wait_for(self._checks[name](), timeout=self.timeout)
+        except Exception as e:
+            outcomes.append(False)
+            result.update(status="unavailable", error=str(e) or type(e).__name__)
+            if self._results[name].get("status") != "unavailable":
+                print(f"🩺 Health check for {name} failed: {result['error']}")
+        else:
+            if "status" in detail:
+                # Nothing to probe (demo mode, disabled)
+                result.update(detail)
+                self._results[name] = result
+                return result
+            outcomes.append(True)
+            result.update(status="available", **detail)
+        elapsed = time.perf_counter() - started
+        result["latency_ms"] = round(elapsed * 1000, 1)
+        result["error_rate"] = round(outcomes.count(False) / len(outcomes), 3)
+        result["checks"] = len(outcomes)
+        metrics.increment("health_probes_total", {"target": name, "outcome": result["status"]})
+        metrics.observe("health_probe_duration_seconds", elapsed, {"target": name})
+        self._results[name] = result
+        return result
+
+    async def probe_all(self):
+        await asyncio.gather(*(self.probe(name) for name in self._checks))
+        self.rounds += 1
+
+    def _next_delay(self) -> float:
+        return self.interval * (1 + random.uniform(-self.jitter, self.jitter))
+
+    async def _run(self):
+        # First round soon after startup, spread out across workers
+        await asyncio.sleep(random.uniform(0, min(1.0, self.interval)))
+        while True:
+            try:
+                await self.probe_all()
+            except Exception as e:
+                print(f"⚠️ Health probe round failed: {e}")
+            await asyncio.sleep(self._next_delay())
+
+    def start(self):
+        if HEALTH_PROBE_ENABLED and self._task is None:
+            # Set the clients up now; building them inside a check would count towards its latency
+            self._gemini = GeminiService(client_id="health_prober", priority="batch")
+            self._qloo = QlooService()
+            self._task = asyncio.create_task(self._run())
+            print(f"🩺 Probing upstream health every {self.interval:.0f}s (±{self.jitter:.0%})")
+
+    async def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+    @staticmethod
+    def _configured_status(name: str) -> Optional[str]:
+        """What the configuration alone says about a service (demo mode, disabled), at no cost"""
+        if name == "qloo" and (not QLOO_API_KEY or QLOO_API_KEY == "demo_key_for_hackathon"):
+            return "demo_mode"
+        if name == "gemini":
+            api_key = os.getenv("GEMINI_API_KEY")
+            if not api_key or api_key == "demo_key_for_hackathon" or not GEMINI_AVAILABLE:
+                return "demo_mode"
+        if name == "database" and not analysis_store.available:
+            return "disabled"
+        return None
+
+    def result(self, name: str) -> Dict[str, Any]:
+        result = self._results[name]
+        if result["status"] == "unknown":
+            configured = self._configured_status(name)
+            if configured is not None:
+                return {"status": configured}
+        return result
+
+    def snapshot(self) -> Dict[str, Any]:
+        return {
+            "enabled": self._task is not None,
+            "interval_seconds": self.interval,
+            "rounds": self.rounds,
+            "checks": dict(self._results)
+        }
+
+
+# Global health prober instance
+health_prober = HealthProber()
@@ -0,0 +1,45 @@
+"""
+HTTP client pool - One shared httpx.AsyncClient for upstream REST calls
+
+Opening an httpx.AsyncClient per call builds a new connection pool (and
+TLS session) every time, which costs more CPU than the call itself at load.
+QlooService instead borrows this process-wide client, so connections to Qloo
+are kept alive and reused, and concurrent fan-out requests (related
+concepts, per-region audiences) share one bounded pool. Timeouts stay per
+call. The client is created on first use in the running event loop and
+closed in the app lifespan.
+"""
+
+import asyncio
+import os
+from typing import Optional
+
+import httpx
+
+UPSTREAM_MAX_CONNECTIONS = int(os.getenv("UPSTREAM_MAX_CONNECTIONS", "50"))
+UPSTREAM_KEEPALIVE_CONNECTIONS = int(os.getenv("UPSTREAM_KEEPALIVE_CONNECTIONS", "20"))
+
+_client: Optional[httpx.AsyncClient] = None
+_client_loop: Optional[asyncio.AbstractEventLoop] = None
+
+
+def shared_client() -> httpx.AsyncClient:
+    """The pooled client for this process (recreated if used from a different event loop)"""
+    global _client, _client_loop
+    loop = asyncio.get_running_loop()
+    if _client is None or _client.is_closed or _client_loop is not loop:
+        _client = httpx.AsyncClient(
+            limits=httpx.Limits(max_connections=UPSTREAM_MAX_CONNECTIONS,
+                                max_keepalive_connections=UPSTREAM_KEEPALIVE_CONNECTIONS),
+            timeout=30.0
+        )
+        _client_loop = loop
+    return _client
+
+
+async def close_shared_client():
+    global _client, _client_loop
+    if _client is not None and not _client.is_closed:
+        await _client.aclose()
+    _client = None
+    _client_loop = None
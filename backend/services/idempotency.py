@@ -0,0 +1,247 @@
+"""
+Idempotency keys - Retried analysis POSTs return the first response
+
+The frontend and API integrations retry /api/trends/analyze and friends on
+network errors, and every retry used to be a new analysis: another paid
+Gemini call and another slot of the daily rate limit. A client that sends
+an Idempotency-Key header now gets, for every request with the same key:
+
+- the stored response of the first request once it has finished, or
+- attached to the first request while it is still running (the retry
+  waits for it, up to its own request deadline), or
+- 422 when the key is reused for a different request body.
+
+Keys are scoped per client and live in a small SQLite database like the
+job store, so a retry answered by another gunicorn worker sees them. They
+are kept IDEMPOTENCY_TTL seconds, and the store is bounded to
+IDEMPOTENCY_MAX_KEYS. Server errors (5xx) and 429s are not stored, so a
+retry after one runs the analysis again. A claim whose worker died is
+taken over after IDEMPOTENCY_LOCK_TIMEOUT seconds. Store transactions run
+in a worker thread, so waiting for another worker's lock never blocks the
+event loop.
+"""
+
+import asyncio
+import hashlib
+import json
+import os
+import sqlite3
+import threading
+import time
+from pathlib import Path
+from typing import Any, Dict, Optional, Tuple
+
+from observability.metrics import metrics
+
+IDEMPOTENCY_ENABLED = os.getenv("IDEMPOTENCY_ENABLED", "true").lower() in ("1", "true", "yes")
+IDEMPOTENCY_DB_PATH = os.getenv("IDEMPOTENCY_DB_PATH") or str(Path(__file__).parent.parent / "data" / "idempotency.db")
+IDEMPOTENCY_TTL = float(os.getenv("IDEMPOTENCY_TTL", "86400"))                # Seconds responses are kept
+IDEMPOTENCY_MAX_KEYS = int(os.getenv("IDEMPOTENCY_MAX_KEYS", "10000"))        # Oldest keys dropped beyond this
+IDEMPOTENCY_LOCK_TIMEOUT = float(os.getenv("IDEMPOTENCY_LOCK_TIMEOUT", "120"))  # Seconds before a claim is stale
+IDEMPOTENCY_MAX_BODY = 1 << 20                                               # Larger responses are not stored
+IDEMPOTENCY_POLL_INTERVAL = 0.25                                             # Store polling for other workers' claims
+MAX_KEY_LENGTH = 255
+
+# Paid analyses that clients retry
+IDEMPOTENT_PATHS = ("/api/trends/analyze", "/api/audience/analyze", "/api/audience/compare")
+
+metrics.describe("idempotency_requests_total", "Requests with an Idempotency-Key by outcome")
+
+
+class IdempotencyStore:
+    """Cross-worker, TTL'd and bounded store of responses by idempotency key"""
+
+    def __init__(self, db_path: str = IDEMPOTENCY_DB_PATH, ttl: float = IDEMPOTENCY_TTL,
+                 max_keys: int = IDEMPOTENCY_MAX_KEYS, lock_timeout: float = IDEMPOTENCY_LOCK_TIMEOUT,
+                 enabled: bool = IDEMPOTENCY_ENABLED):
+        self.db_path = db_path
+        self.ttl = ttl
+        self.max_keys = max_keys
+        self.lock_timeout = lock_timeout
+        self._local = threading.local()
+        # Keys claimed by this process: key -> event set when the response is stored or released
+        self._done: Dict[str, asyncio.Event] = {}
+        self._next_purge = 0.0
+        self.stats = {"stored": 0, "replayed": 0, "attached": 0, "mismatched": 0, "conflicts": 0}
+        self.available = enabled and self._initialize()
+
+    def _initialize(self) -> bool:
+        try:
+            Path(self.db_path).parent.mkdir(parents=True, exist_ok=True)
+            connection = self._connection()
+            connection.execute(
+                """CREATE TABLE IF NOT EXISTS idempotency_keys (
+                    key TEXT PRIMARY KEY,
+                    fingerprint TEXT NOT NULL,
+                    created_at REAL NOT NULL,
+                    locked_until REAL,
+                    expires_at REAL,
+                    status INTEGER,
+                    headers TEXT,
+                    body BLOB
+                )"""
+            )
+            connection.execute("CREATE INDEX IF NOT EXISTS idempotency_by_age ON idempotency_keys (created_at)")
+            return True
+        except sqlite3.Error as e:
+            print(f"⚠️ Idempotency store unavailable ({e}), Idempotency-Key headers ignored")
+            return False
+
+    def _connection(self) -> sqlite3.Connection:
+        connection = getattr(self._local, "connection", None)
+        if connection is None:
+            connection = sqlite3.connect(self.db_path, timeout=1.0, isolation_level=None)
+            connection.execute("PRAGMA journal_mode=WAL")
+            connection.execute("PRAGMA synchronous=OFF")
+            self._local.connection = connection
+        return connection
+
+    @staticmethod
+    def fingerprint(method: str, path: str, body: bytes) -> str:
+        """What a reused key must match: the same endpoint and the same request body"""
+        return hashlib.sha256(b"%s %s\n%s" % (method.encode(), path.encode(), body)).hexdigest()
+
+    def claim(self, key: str, fingerprint: str) -> Tuple[str, Optional[Dict[str, Any]]]:
+        """
+        Claim a key for a new request, or report what the key already holds.
+
+        Returns:
+            ("claimed", None), ("completed", response), ("in_flight", None) or ("mismatch", None)
+        """
+        now = time.time()
+        self._purge(now)
+        connection = self._connection()
+        connection.execute("BEGIN IMMEDIATE")
+        try:
+            row = connection.execute(
+                "SELECT fingerprint, locked_until, expires_at, status, headers, body FROM idempotency_keys WHERE key = ?",
+                (key,)
+            ).fetchone()
+            if row is not None:
+                stored_fingerprint, locked_until, expires_at, status, headers, body = row
+                if status is not None and expires_at > now:
+                    connection.execute("COMMIT")
+                    if stored_fingerprint != fingerprint:
+                        return "mismatch", None
+                    return "completed", {"status": status, "headers": json.loads(headers), "body": body}
+                if status is None and locked_until > now:
+                    connection.execute("COMMIT")
+                    return ("in_flight" if stored_fingerprint == fingerprint else "mismatch"), None
+                # Expired response or a claim whose worker went away: start over
+            connection.execute(
+                "INSERT OR REPLACE INTO idempotency_keys (key, fingerprint, created_at, locked_until) VALUES (?, ?, ?, ?)",
+                (key, fingerprint, now, now + self.lock_timeout)
+            )
+            connection.execute("COMMIT")
+        except sqlite3.Error:
+            connection.execute("ROLLBACK")
+            raise
+        return "claimed", None
+
+    def _store(self, key: str, status: int, headers: Dict[str, str], body: bytes):
+        try:
+            self._connection().execute(
+                "UPDATE idempotency_keys SET status = ?, headers = ?, body = ?, expires_at = ?, locked_until = NULL WHERE key = ?",
+                (status, json.dumps(headers), body, time.time() + self.ttl, key)
+            )
+            self.stats["stored"] += 1
+        except sqlite3.Error as e:
+            print(f"⚠️ Could not store response for idempotency key: {e}")
+
+    def _delete_claim(self, key: str):
+        try:
+            self._connection().execute("DELETE FROM idempotency_keys WHERE key = ? AND status IS NULL", (key,))
+        except sqlite3.Error as e:
+            print(f"⚠️ Could not release idempotency key: {e}")
+
+    async def complete(self, key: str, status: int, headers: Dict[str, str], body: bytes):
+        """Store the response of a claimed key (or release it when the response should not be replayed)"""
+        if status >= 500 or status in (409, 429) or len(body) > IDEMPOTENCY_MAX_BODY:
+            await self.release(key)
+            return
+        await asyncio.to_thread(self._store, key, status, headers, body)
+        self._finish(key)
+
+    async def release(self, key: str):
+        """Give up a claim so the next request with the key runs again"""
+        await asyncio.to_thread(self._delete_claim, key)
+        self._finish(key)
+
+    def _finish(self, key: str):
+        done = self._done.pop(key, None)
+        if done is not None:
+            done.set()
+
+    async def acquire(self, key: str, fingerprint: str, timeout: float) -> Tuple[str, Optional[Dict[str, Any]]]:
+        """
+        Claim a key, waiting up to `timeout` seconds for a request already running with it.
+
+        Returns:
+            As claim(); "in_flight" only when the first request is still running after `timeout`,
+            "unavailable" when the store could not be used
+        """
+        give_up = time.monotonic() + timeout
+        waited = False
+        while True:
+            try:
+                outcome, response = await asyncio.to_thread(self.claim, key, fingerprint)
+            except sqlite3.Error as e:
+                # Run the request without replay protection rather than fail it
+                print(f"⚠️ Idempotency store busy ({e}), running request without it")
+                return "unavailable", None
+            if outcome == "claimed":
+                self._done[key] = asyncio.Event()
+            if outcome != "in_flight" or time.monotonic() >= give_up:
+                break
+            waited = True
+            done = self._done.get(key)
+            if done is not None:
+                # Claimed by this worker: wake up as soon as it finishes
+                try:
+                    await asyncio.wait_for(done.wait(), max(0.0, give_up - time.monotonic()))
+                except asyncio.TimeoutError:
+                    pass
+            else:
+                # Claimed by another worker: watch the shared store
+                await asyncio.sleep(min(IDEMPOTENCY_POLL_INTERVAL, max(0.0, give_up - time.monotonic())))
+
+        if outcome == "completed":
+            counter = "attached" if waited else "replayed"
+        else:
+            counter = {"mismatch": "mismatched", "in_flight": "conflicts"}.get(outcome)
+        if counter is not None:
+            self.stats[counter] += 1
+        metrics.increment("idempotency_requests_total", {"outcome": counter or outcome})
+        return outcome, response
+
+    def _purge(self, now: float):
+        """Delete expired keys and the oldest beyond max_keys, at most once a minute"""
+        if now < self._next_purge:
+            return
+        self._next_purge = now + 60
+        try:
+            connection = self._connection()
+            connection.execute(
+                "DELETE FROM idempotency_keys WHERE expires_at <= ? OR locked_until <= ?",
+                (now, now - self.lock_timeout)
+            )
+            connection.execute(
+                "DELETE FROM idempotency_keys WHERE key IN "
+                "(SELECT key FROM idempotency_keys ORDER BY created_at DESC LIMIT -1 OFFSET ?)",
+                (self.max_keys,)
+            )
+        except sqlite3.Error as e:
+            print(f"⚠️ Could not purge idempotency keys: {e}")
+
+    def snapshot(self) -> Dict[str, Any]:
+        return {
+            "enabled": self.available,
+            "max_keys": self.max_keys,
+            "ttl_seconds": self.ttl,
+            "shared_store": self.db_path if self.available else None,
+            **self.stats
+        }
+
+
+# Global idempotency store instance
+idempotency_store = IdempotencyStore()
@@ -0,0 +1,316 @@
+"""
+Insight engine - Rule-based insights derived directly from Qloo payloads
+
+The affinity and regional strengths in a Qloo payload already say which
+domains and regions carry a trend, so templated insights with confidences
+computed from those strengths can stand in for a multi-second Gemini call.
+Used for depth="basic" requests (rules only) and whenever Gemini can't
+answer (timeout, unparseable output, quota) but real Qloo data arrived.
+
+Trend payloads are scored in batches with NumPy: strengths are padded into
+(payloads x domains) and (payloads x regions) arrays so ranking, regional
+deltas and confidences are computed for every payload at once; only the
+final text templating is per payload. A single analysis is a batch of one.
+
+Payloads are the typed models of services.qloo_models (plain dicts are
+converted first), so scoring reads validated floats and tuples directly.
+When a trend payload carries strength_history (trajectory stats from
+services.strength_history), a 'Future Trajectory' insight reports them.
+
+Results have the same shape as GeminiService results, with
+"generated_by": "rules".
+"""
+
+import math
+from datetime import datetime
+from typing import Any, Dict, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+from services.qloo_models import AudiencePayload, TrendPayload
+
+# Rule-based confidences are capped below typical LLM confidences
+MAX_RULE_CONFIDENCE = 0.9
+MIN_RULE_CONFIDENCE = 0.3
+
+# A region must lead (or trail) the regional mean by this much to be called out
+REGIONAL_DELTA_THRESHOLD = 0.03
+
+# Entities per domain at which an affinity counts as fully supported
+FULL_SUPPORT_ENTITIES = 3
+
+TREND_AFFINITY_INSIGHTS = 2
+
+
+def _strength(value: Any) -> float:
+    try:
+        return min(1.0, max(0.0, float(value)))
+    except (TypeError, ValueError):
+        return float("nan")
+
+
+def _momentum(strength: float) -> str:
+    if strength >= 0.8:
+        return "strong"
+    if strength >= 0.6:
+        return "moderate"
+    return "emerging"
+
+
+def _list(items: Any, limit: int = 3) -> str:
+    return ", ".join(str(item) for item in list(items or [])[:limit])
+
+
+def _padded(rows: Sequence[Sequence[float]]) -> np.ndarray:
+    """Ragged rows as a float array padded with NaN (at least one column)"""
+    width = max((len(row) for row in rows), default=0) or 1
+    array = np.full((len(rows), width), np.nan)
+    for index, row in enumerate(rows):
+        array[index, :len(row)] = row
+    return array
+
+
+def _descending(scores: np.ndarray) -> np.ndarray:
+    """Column order per row, highest score first and NaN padding last"""
+    return np.argsort(np.where(np.isnan(scores), np.inf, -scores), axis=1, kind="stable")
+
+
+def score_trends(payloads: Sequence[Any]) -> Dict[str, np.ndarray]:
+    """
+    Score a batch of Qloo trend payloads.
+
+    Returns:
+        Arrays with one row per payload: "momentum", "affinity_order" and
+        "affinity_confidence" (indexes into each payload's cultural_affinities),
+        "region_order", "region_delta" (strength minus the payload's regional mean)
+        and "region_confidence"
+    """
+    payloads = [TrendPayload.coerce(payload) for payload in payloads]
+    overall = np.array([_strength(payload.trend_strength) for payload in payloads], dtype=float)
+    affinity_strength = _padded([[_strength(item.strength) for item in payload.cultural_affinities]
+                                 for payload in payloads])
+    entity_counts = _padded([[len(item.entities) for item in payload.cultural_affinities] for payload in payloads])
+    region_strength = _padded([[_strength(item.strength) for item in payload.regional_variations]
+                               for payload in payloads])
+
+    # Affinities backed by fewer entities are discounted by up to 15%
+    support = np.minimum(entity_counts, FULL_SUPPORT_ENTITIES) / FULL_SUPPORT_ENTITIES
+    affinity_score = affinity_strength * (0.85 + 0.15 * support)
+
+    # NaN-aware means without nanmean's warning for payloads that have no values at all
+    with np.errstate(invalid="ignore", divide="ignore"):
+        mean_affinity = np.nansum(affinity_strength, axis=1) / np.sum(~np.isnan(affinity_strength), axis=1)
+        region_mean = (np.nansum(region_strength, axis=1, keepdims=True)
+                       / np.sum(~np.isnan(region_strength), axis=1, keepdims=True))
+    # Momentum blends Qloo's overall trend strength with how strongly its domains respond
+    # (either alone when the other is missing, 0.5 when both are)
+    momentum = 0.6 * overall + 0.4 * mean_affinity
+    momentum = np.where(np.isnan(overall), mean_affinity, momentum)
+    momentum = np.where(np.isnan(mean_affinity), overall, momentum)
+    momentum = np.where(np.isnan(momentum), 0.5, momentum)
+    region_delta = region_strength - region_mean
+
+    return {
+        "momentum": momentum,
+        "affinity_order": _descending(affinity_score),
+        "affinity_confidence": np.clip(affinity_score, MIN_RULE_CONFIDENCE, MAX_RULE_CONFIDENCE),
+        "region_order": _descending(region_strength),
+        "region_delta": region_delta,
+        # Regional claims are surer when the region is strong and clearly apart from the rest
+        "region_confidence": np.clip(region_strength * (0.8 + 2.0 * np.abs(region_delta)),
+                                     MIN_RULE_CONFIDENCE, MAX_RULE_CONFIDENCE),
+    }
+
+
+def trajectory_insight(query: str, trajectory: Optional[Dict[str, Any]],
+                       timeframe: Optional[str] = None) -> Optional[Dict[str, Any]]:
+    """'Future Trajectory' insight from strength history stats (services.strength_history); None without them"""
+    if not trajectory or not trajectory.get("points"):
+        return None
+    growth = trajectory["growth_per_week"]
+    direction = "rising" if growth > 0.002 else "falling" if growth < -0.002 else "holding steady"
+    movers = [row for row in trajectory.get("domains") or [] if abs(row["growth_per_week"]) > 0.002]
+    mover = (f" {movers[0]['domain']} is moving fastest ({movers[0]['growth_per_week']:+.1%} per week)."
+             if movers else "")
+    return {
+        "title": "Future Trajectory",
+        "description": f"Qloo strength for {query} is {direction}: {trajectory['recent_average']:.0%} over the last week "
+                       f"against {trajectory['average']:.0%} across {trajectory['points']} readings"
+                       + (f" over {trajectory['span_days']:.0f} days ({growth:+.1%} per week)"
+                          if trajectory.get("span_days", 0) >= 1 else "")
+                       + f", projecting "
+                       f"{trajectory['forecast']:.0%} over {timeframe or 'the coming months'}.{mover}",
+        # More readings make the fitted trend more trustworthy
+        "confidence": round(min(MAX_RULE_CONFIDENCE, MIN_RULE_CONFIDENCE + 0.05 * trajectory["points"]), 2),
+        "source": "qloo"
+    }
+
+
+def _trend_result(query: str, payload: TrendPayload, industry: Optional[str], timeframe: Optional[str],
+                  scores: Dict[str, Any]) -> Dict[str, Any]:
+    """Template the insights for one scored payload (its row of scores, as Python lists)"""
+    affinities = payload.cultural_affinities
+    regions = payload.regional_variations
+    related = payload.related_concepts
+    market = industry or "the market"
+    momentum = scores["momentum"]
+    affinity_confidence = scores["affinity_confidence"]
+    region_delta = scores["region_delta"]
+    region_confidence = scores["region_confidence"]
+
+    ranked_affinities = [i for i in scores["affinity_order"][:len(affinities)] if not math.isnan(affinity_confidence[i])]
+    ranked_regions = [i for i in scores["region_order"][:len(regions)] if not math.isnan(region_delta[i])]
+
+    insights: List[Dict[str, Any]] = [{
+        "title": "Overall Momentum",
+        "description": f"{query} shows {_momentum(momentum)} momentum in {market} "
+                       f"({momentum:.0%} combined trend and affinity strength).",
+        "confidence": round(min(MAX_RULE_CONFIDENCE, max(MIN_RULE_CONFIDENCE, momentum)), 2),
+        "source": "qloo"
+    }]
+    for index in ranked_affinities[:TREND_AFFINITY_INSIGHTS]:
+        affinity = affinities[index]
+        insights.append({
+            "title": f"{affinity.domain or 'Cultural'} Affinity",
+            "description": f"{query} resonates with {_list(affinity.entities) or 'this domain'} "
+                           f"({_strength(affinity.strength):.0%} affinity).",
+            "confidence": round(affinity_confidence[index], 2),
+            "source": "qloo"
+        })
+    if ranked_regions:
+        top, bottom = ranked_regions[0], ranked_regions[-1]
+        delta = region_delta[top]
+        region = regions[top]
+        if delta >= REGIONAL_DELTA_THRESHOLD:
+            note = f" {region.notable_difference}." if region.notable_difference else ""
+            trailing = regions[bottom].region if bottom != top else None
+            insights.append({
+                "title": f"Regional Lead: {region.region or 'Top region'}",
+                "description": f"{region.region or 'The top region'} leads at "
+                               f"{_strength(region.strength):.0%}, {delta:+.0%} against the regional average"
+                               + (f" while {trailing} trails." if trailing else ".") + note,
+                "confidence": round(region_confidence[top], 2),
+                "source": "qloo"
+            })
+        else:
+            insights.append({
+                "title": "Balanced Regional Adoption",
+                "description": f"Adoption of {query} is even across {_list([regions[i].region for i in ranked_regions])}.",
+                "confidence": round(sum(region_confidence[i] for i in ranked_regions) / len(ranked_regions), 2),
+                "source": "qloo"
+            })
+
+    trajectory = trajectory_insight(query, payload.strength_history, timeframe)
+    if trajectory is not None:
+        insights.append(trajectory)
+
+    recommendations = []
+    if ranked_affinities:
+        top_affinity = affinities[ranked_affinities[0]]
+        recommendations.append(f"Prioritize {top_affinity.domain or 'top-affinity'} channels such as "
+                               f"{_list(top_affinity.entities, 2) or 'the highest-affinity outlets'} for {query}")
+    if ranked_regions:
+        recommendations.append(f"Launch or test {query} initiatives in "
+                               f"{regions[ranked_regions[0]].region or 'the leading region'} first")
+    if related:
+        recommendations.append(f"Connect {query} with adjacent concepts: {_list(related)}")
+    recommendations.append(f"Track {query} momentum over {timeframe or 'the next 6-12 months'} before scaling investment")
+
+    highlights = []
+    if ranked_affinities:
+        highlights.append(f"the strongest affinity is {affinities[ranked_affinities[0]].domain or 'cultural'}")
+    if ranked_regions:
+        highlights.append(f"{regions[ranked_regions[0]].region or 'one region'} leads regionally")
+    summary = (f"'{query}' shows {_momentum(momentum)} cultural momentum in {market} "
+               f"(strength {momentum:.0%})" + (f"; {' and '.join(highlights)}." if highlights else "."))
+
+    return {
+        "query": query,
+        "generated_by": "rules",
+        "summary": summary,
+        "timestamp": datetime.now().isoformat(),
+        "insights": insights,
+        "recommendations": recommendations
+    }
+
+
+_SCORE_FIELDS = ("momentum", "affinity_order", "affinity_confidence", "region_order", "region_delta",
+                 "region_confidence")
+
+
+def trend_insights_batch(requests: Sequence[Tuple[str, Any, Optional[str], Optional[str]]]
+                         ) -> List[Dict[str, Any]]:
+    """Insights for many (query, qloo_data, industry, timeframe) tuples, scored in one pass"""
+    if not requests:
+        return []
+    requests = [(query, TrendPayload.coerce(payload), industry, timeframe)
+                for query, payload, industry, timeframe in requests]
+    scores = score_trends([payload for _, payload, _, _ in requests])
+    # One bulk conversion instead of indexing NumPy scalars while templating
+    rows = zip(*(scores[name].tolist() for name in _SCORE_FIELDS))
+    return [
+        _trend_result(query, payload, industry, timeframe, dict(zip(_SCORE_FIELDS, row)))
+        for (query, payload, industry, timeframe), row in zip(requests, rows)
+    ]
+
+
+def trend_insights(query: str, qloo_data: Any, industry: Optional[str] = None,
+                   timeframe: Optional[str] = None) -> Dict[str, Any]:
+    """Summary, insights and recommendations computed from a Qloo trend payload"""
+    return trend_insights_batch([(query, qloo_data, industry, timeframe)])[0]
+
+
+def audience_insights(target_audience: str, qloo_data: Any, product_category: Optional[str] = None,
+                      region: Optional[str] = None) -> Dict[str, Any]:
+    """Summary, affinities and recommendations computed from a Qloo audience payload"""
+    payload = AudiencePayload.coerce(qloo_data)
+    affinities = {domain: entities for domain, entities in payload.cultural_affinities.items() if entities}
+    preferences = payload.content_preferences
+    drivers = payload.purchase_drivers
+    emerging = payload.emerging_interests
+
+    # Without strengths, confidence grows with how much of the payload is filled in
+    coverage = (len(affinities) / 4 + bool(preferences) + bool(drivers) + bool(emerging)) / 4
+    confidence = round(0.5 + 0.35 * min(1.0, coverage), 2)
+
+    cultural_affinities: List[Dict[str, Any]] = [
+        {
+            "title": f"{domain.title()} Affinities",
+            "description": f"{target_audience} over-index on {_list(entities)}.",
+            "confidence": confidence,
+            "source": "qloo"
+        }
+        for domain, entities in list(affinities.items())[:3]
+    ]
+    if drivers:
+        cultural_affinities.append({
+            "title": "Purchase Drivers",
+            "description": f"Buying decisions are driven by {_list(drivers)}.",
+            "confidence": confidence,
+            "source": "qloo"
+        })
+
+    recommendations = []
+    if preferences.get("format"):
+        recommendations.append(f"Favour {_list(preferences['format'], 2)} content"
+                               + (f" in a tone that is {_list(preferences.get('tone'), 2).lower()}" if preferences.get("tone") else ""))
+    if affinities.get("media"):
+        recommendations.append(f"Reach {target_audience} through {_list(affinities['media'], 2)}")
+    if preferences.get("values"):
+        recommendations.append(f"Lead messaging for {product_category or 'your products'} with {_list(preferences['values'], 2)}")
+    if emerging:
+        recommendations.append(f"Explore emerging interests: {_list(emerging)}")
+
+    summary = (f"Qloo data for {target_audience}"
+               + (f" in {region}" if region else "")
+               + (f" shows strongest affinities in {_list(affinities, 3)}" if affinities else " is limited")
+               + (f", with {drivers[0]} as the leading purchase driver." if drivers else "."))
+
+    return {
+        "target_audience": target_audience,
+        "generated_by": "rules",
+        "summary": summary,
+        "timestamp": datetime.now().isoformat(),
+        "cultural_affinities": cultural_affinities,
+        "recommendations": recommendations
+    }
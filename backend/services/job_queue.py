@@ -0,0 +1,327 @@
+"""
+Job queue - Runs long analyses in the background behind a job ID
+
+POST /api/jobs/... answers right away with a job ID; a small pool of asyncio
+workers started in the app lifespan runs the analysis pipeline, and clients
+poll (or long-poll with ?wait=) GET /api/jobs/{id} for the result. The HTTP
+request is over as soon as the job is queued, so slow 'deep' analyses no
+longer hold connections (or the gunicorn timeout) while fast traffic waits.
+
+Job state and results live in a small SQLite database like the upstream
+quotas, so a poll answered by any gunicorn worker sees the job, and results
+are kept for JOB_RESULT_TTL seconds. Submitting an analysis that is already
+queued, running or recently finished returns the existing job instead of
+running it again. The queue is bounded: when it is full submit() raises
+JobQueueFull and the route answers 503.
+
+The owning worker touches its pending jobs every JOB_HEARTBEAT seconds; a
+job whose worker process died is reported as failed once it goes quiet.
+"""
+
+import asyncio
+import json
+import os
+import sqlite3
+import threading
+import time
+import uuid
+from pathlib import Path
+from typing import Any, Awaitable, Callable, Dict, List, Optional
+
+from services.deadline import start_deadline
+from observability.llm_usage import set_usage_endpoint
+from observability.metrics import metrics
+
+JOB_DB_PATH = os.getenv("JOB_DB_PATH") or str(Path(__file__).parent.parent / "data" / "jobs.db")
+JOB_WORKERS = int(os.getenv("JOB_WORKERS", "4"))                  # Concurrent jobs per process
+JOB_QUEUE_SIZE = int(os.getenv("JOB_QUEUE_SIZE", "100"))          # Queued jobs per process before 503
+JOB_TIMEOUT = float(os.getenv("JOB_TIMEOUT", "120"))              # Seconds one job may run
+JOB_RESULT_TTL = float(os.getenv("JOB_RESULT_TTL", "600"))        # Seconds finished jobs are kept
+JOB_POLL_INTERVAL = 0.25                                          # Store polling for jobs owned by another worker
+JOB_HEARTBEAT = 10.0                                              # Seconds between touches of pending jobs
+
+FINISHED = ("succeeded", "failed")
+
+metrics.describe("jobs_total", "Background analysis jobs by kind and outcome")
+metrics.describe("job_duration_seconds", "Background analysis job run time by kind")
+
+JobRunner = Callable[[], Awaitable[Dict[str, Any]]]
+
+
+class JobQueueFull(Exception):
+    """Raised when a job cannot be queued because the worker pool is saturated"""
+    pass
+
+
+class JobQueue:
+    """Bounded background worker pool with a cross-worker, TTL'd job store"""
+
+    def __init__(self, db_path: str = JOB_DB_PATH, workers: int = JOB_WORKERS,
+                 queue_size: int = JOB_QUEUE_SIZE, timeout: float = JOB_TIMEOUT,
+                 result_ttl: float = JOB_RESULT_TTL):
+        self.db_path = db_path
+        self.workers = workers
+        self.queue_size = queue_size
+        self.timeout = timeout
+        self.result_ttl = result_ttl
+        self._local = threading.local()
+        self._queue: Optional[asyncio.Queue] = None
+        self._tasks: List[asyncio.Task] = []
+        # Jobs owned by this process: job id -> event set when it finishes (for long polls)
+        self._done: Dict[str, asyncio.Event] = {}
+        self._next_purge = 0.0
+        self.stats = {"submitted": 0, "deduplicated": 0, "rejected": 0, "succeeded": 0, "failed": 0}
+        self.available = self._initialize()
+
+    def _initialize(self) -> bool:
+        try:
+            Path(self.db_path).parent.mkdir(parents=True, exist_ok=True)
+            connection = self._connection()
+            connection.execute(
+                """CREATE TABLE IF NOT EXISTS jobs (
+                    id TEXT PRIMARY KEY,
+                    kind TEXT NOT NULL,
+                    request_key TEXT NOT NULL,
+                    status TEXT NOT NULL,
+                    created_at REAL NOT NULL,
+                    updated_at REAL NOT NULL,
+                    expires_at REAL,
+                    result TEXT,
+                    error TEXT
+                )"""
+            )
+            connection.execute("CREATE INDEX IF NOT EXISTS jobs_by_key ON jobs (kind, request_key, created_at)")
+            return True
+        except sqlite3.Error as e:
+            print(f"⚠️ Job store unavailable ({e}), async analysis jobs disabled")
+            return False
+
+    def _connection(self) -> sqlite3.Connection:
+        connection = getattr(self._local, "connection", None)
+        if connection is None:
+            connection = sqlite3.connect(self.db_path, timeout=1.0, isolation_level=None)
+            connection.execute("PRAGMA journal_mode=WAL")
+            connection.execute("PRAGMA synchronous=OFF")
+            self._local.connection = connection
+        return connection
+
+    @property
+    def running(self) -> bool:
+        return bool(self._tasks)
+
+    def _record(self, row: Optional[tuple], now: float) -> Optional[Dict[str, Any]]:
+        """Job row as an API dict; None once expired. Pending jobs without a heartbeat count as lost"""
+        if row is None:
+            return None
+        job_id, kind, request_key, status, created_at, updated_at, expires_at, result, error = row
+        if expires_at is not None and expires_at <= now:
+            return None
+        if status not in FINISHED and now - updated_at > 3 * JOB_HEARTBEAT:
+            status, error = "failed", "Job was lost (worker restarted)"
+        job = {
+            "job_id": job_id,
+            "kind": kind,
+            "request_key": request_key,
+            "status": status,
+            "created_at": created_at,
+            "updated_at": updated_at,
+        }
+        if status in FINISHED:
+            job["expires_at"] = expires_at
+        if result is not None:
+            job["result"] = json.loads(result)
+        if error:
+            job["error"] = error
+        return job
+
+    def _find_reusable(self, connection: sqlite3.Connection, kind: str, request_key: str,
+                       now: float) -> Optional[Dict[str, Any]]:
+        """Newest job for the same analysis that is still in flight or has a fresh result"""
+        rows = connection.execute(
+            "SELECT * FROM jobs WHERE kind = ? AND request_key = ? ORDER BY created_at DESC LIMIT 3",
+            (kind, request_key)
+        ).fetchall()
+        for row in rows:
+            job = self._record(row, now)
+            # Failed jobs are retried by submitting again
+            if job is not None and job["status"] != "failed":
+                return job
+        return None
+
+    def submit(self, kind: str, request_key: str, runner: JobRunner) -> Dict[str, Any]:
+        """
+        Queue an analysis, or return the job already covering the same request.
+
+        Returns:
+            The job dict with "deduplicated" set when an existing job was reused
+        Raises:
+            JobQueueFull: this worker already has queue_size jobs waiting
+        """
+        if not self.available or self._queue is None:
+            raise JobQueueFull("Background jobs are not running")
+        now = time.time()
+        self._purge(now)
+        connection = self._connection()
+        connection.execute("BEGIN IMMEDIATE")
+        try:
+            existing = self._find_reusable(connection, kind, request_key, now)
+            if existing is not None:
+                connection.execute("COMMIT")
+                self.stats["deduplicated"] += 1
+                metrics.increment("jobs_total", {"kind": kind, "outcome": "deduplicated"})
+                return {**existing, "deduplicated": True}
+            if self._queue.full():
+                connection.execute("ROLLBACK")
+                self.stats["rejected"] += 1
+                metrics.increment("jobs_total", {"kind": kind, "outcome": "rejected"})
+                raise JobQueueFull(f"{self._queue.qsize()} jobs already queued")
+            job_id = uuid.uuid4().hex
+            connection.execute(
+                "INSERT INTO jobs (id, kind, request_key, status, created_at, updated_at) VALUES (?, ?, ?, 'queued', ?, ?)",
+                (job_id, kind, request_key, now, now)
+            )
+            connection.execute("COMMIT")
+        except sqlite3.Error:
+            connection.execute("ROLLBACK")
+            raise
+
+        self._done[job_id] = asyncio.Event()
+        self._queue.put_nowait((job_id, kind, runner))
+        self.stats["submitted"] += 1
+        return {
+            "job_id": job_id, "kind": kind, "request_key": request_key, "status": "queued",
+            "created_at": now, "updated_at": now, "deduplicated": False
+        }
+
+    def get(self, job_id: str) -> Optional[Dict[str, Any]]:
+        """Current state of a job (from any worker); None if unknown or expired"""
+        if not self.available:
+            return None
+        row = self._connection().execute("SELECT * FROM jobs WHERE id = ?", (job_id,)).fetchone()
+        return self._record(row, time.time())
+
+    async def wait(self, job_id: str, timeout: float) -> Optional[Dict[str, Any]]:
+        """Long poll: return once the job has finished or after `timeout` seconds"""
+        job = self.get(job_id)
+        if job is None or job["status"] in FINISHED or timeout <= 0:
+            return job
+        done = self._done.get(job_id)
+        if done is not None:
+            # Our own job: wake up as soon as it finishes
+            try:
+                await asyncio.wait_for(done.wait(), timeout)
+            except asyncio.TimeoutError:
+                pass
+            return self.get(job_id)
+        # Running in another worker: watch the shared store
+        give_up = time.monotonic() + timeout
+        while time.monotonic() < give_up:
+            await asyncio.sleep(min(JOB_POLL_INTERVAL, max(0.0, give_up - time.monotonic())))
+            job = self.get(job_id)
+            if job is None or job["status"] in FINISHED:
+                return job
+        return job
+
+    def _update(self, job_id: str, status: str, result: Optional[Dict[str, Any]] = None,
+                error: Optional[str] = None):
+        now = time.time()
+        expires_at = now + self.result_ttl if status in FINISHED else None
+        try:
+            self._connection().execute(
+                "UPDATE jobs SET status = ?, updated_at = ?, expires_at = ?, result = ?, error = ? WHERE id = ?",
+                (status, now, expires_at, json.dumps(result) if result is not None else None, error, job_id)
+            )
+        except sqlite3.Error as e:
+            print(f"⚠️ Could not update job {job_id}: {e}")
+
+    def _purge(self, now: float):
+        """Delete expired and long-lost jobs, at most once a minute"""
+        if now < self._next_purge:
+            return
+        self._next_purge = now + 60
+        try:
+            self._connection().execute(
+                "DELETE FROM jobs WHERE expires_at <= ? OR (expires_at IS NULL AND updated_at < ?)",
+                (now, now - self.result_ttl)
+            )
+        except sqlite3.Error as e:
+            print(f"⚠️ Could not purge expired jobs: {e}")
+
+    async def _run_job(self, job_id: str, kind: str, runner: JobRunner):
+        self._update(job_id, "running")
+        started = time.perf_counter()
+        # Jobs get their own time budget instead of the (long gone) request's
+        start_deadline(self.timeout)
+        set_usage_endpoint(f"job:{kind}")
+        try:
+            result = await asyncio.wait_for(runner(), self.timeout)
+            self._update(job_id, "succeeded", result=result)
+            outcome = "succeeded"
+        except asyncio.TimeoutError:
+            self._update(job_id, "failed", error=f"Analysis did not finish within {self.timeout:.0f}s")
+            outcome = "failed"
+        except Exception as e:
+            print(f"⚠️ Job {job_id} ({kind}) failed: {e}")
+            self._update(job_id, "failed", error="The analysis failed. Please try again later.")
+            outcome = "failed"
+        self.stats[outcome] += 1
+        metrics.increment("jobs_total", {"kind": kind, "outcome": outcome})
+        metrics.observe("job_duration_seconds", time.perf_counter() - started, {"kind": kind})
+
+    async def _worker(self):
+        while True:
+            job_id, kind, runner = await self._queue.get()
+            try:
+                await self._run_job(job_id, kind, runner)
+            finally:
+                self._queue.task_done()
+                done = self._done.pop(job_id, None)
+                if done is not None:
+                    done.set()
+
+    async def _heartbeat(self):
+        while True:
+            await asyncio.sleep(JOB_HEARTBEAT)
+            pending = list(self._done)
+            if not pending:
+                continue
+            try:
+                self._connection().execute(
+                    f"UPDATE jobs SET updated_at = ? WHERE status IN ('queued', 'running') AND id IN ({','.join('?' * len(pending))})",
+                    (time.time(), *pending)
+                )
+            except sqlite3.Error as e:
+                print(f"⚠️ Could not refresh pending jobs: {e}")
+
+    def start(self):
+        if self.available and not self._tasks:
+            self._queue = asyncio.Queue(maxsize=self.queue_size)
+            self._tasks = [asyncio.create_task(self._worker()) for _ in range(self.workers)]
+            self._tasks.append(asyncio.create_task(self._heartbeat()))
+            print(f"🧵 Running analysis jobs on {self.workers} background workers (queue of {self.queue_size})")
+
+    async def stop(self):
+        for task in self._tasks:
+            task.cancel()
+        for task in self._tasks:
+            try:
+                await task
+            except asyncio.CancelledError:
+                pass
+        self._tasks = []
+        self._queue = None
+
+    def snapshot(self) -> Dict[str, Any]:
+        return {
+            "enabled": self.running,
+            "workers": self.workers if self.running else 0,
+            "queued": self._queue.qsize() if self._queue is not None else 0,
+            "queue_size": self.queue_size,
+            "result_ttl_seconds": self.result_ttl,
+            "shared_store": self.db_path if self.available else None,
+            **self.stats
+        }
+
+
+# Global job queue instance
+job_queue = JobQueue()
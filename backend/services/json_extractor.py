@@ -0,0 +1,284 @@
+"""
+JSON extractor - Tolerant, incremental extraction of JSON objects from LLM output
+
+Gemini sometimes wraps its JSON in markdown fences, adds prose around it, or
+emits small syntax defects (trailing commas, smart quotes, Python literals,
+a truncated tail). Rather than throwing away a paid completion, this module
+locates the JSON object, repairs common defects and validates the result
+against the InsightPoint schema.
+"""
+
+import json
+import re
+from typing import Any, Dict, List, Optional
+
+from pydantic import ValidationError
+
+from models.schemas import InsightPoint
+
+_SMART_QUOTES = str.maketrans({"“": '"', "”": '"', "‘": "'", "’": "'"})
+_TRAILING_COMMA = re.compile(r",(\s*[}\]])")
+_PYTHON_LITERALS = {"True": "true", "False": "false", "None": "null"}
+_VALID_SOURCES = {"qloo", "llm", "combined"}
+
+
+class IncrementalJSONExtractor:
+    """
+    Find the first complete top-level JSON object in a stream of text chunks.
+
+    Feed chunks as they arrive; feed() returns the parsed object as soon as
+    its closing brace is seen, so callers can stop waiting on the rest.
+    """
+
+    def __init__(self):
+        self.buffer = ""
+        self._start = -1
+        self._depth = 0
+        self._in_string = False
+        self._quote = ""
+        self._escaped = False
+        self._position = 0
+
+    def feed(self, chunk: str) -> Optional[Dict[str, Any]]:
+        """Add a chunk and return the first complete object, if one is now available"""
+        self.buffer += chunk
+        while self._position < len(self.buffer):
+            char = self.buffer[self._position]
+            self._position += 1
+
+            if self._start < 0:
+                if char == "{":
+                    self._start = self._position - 1
+                    self._depth = 1
+                continue
+
+            if self._in_string:
+                if self._escaped:
+                    self._escaped = False
+                elif char == "\\":
+                    self._escaped = True
+                elif char == self._quote:
+                    self._in_string = False
+                continue
+
+            if char in "\"“”" or (char == "'" and self._looks_like_quote()):
+                self._in_string = True
+                self._quote = '"' if char in "“”" else char
+                if char == "“":
+                    self._quote = "”"
+            elif char in "{[":
+                self._depth += 1
+            elif char in "}]":
+                self._depth -= 1
+                if self._depth == 0:
+                    candidate = self.buffer[self._start:self._position]
+                    parsed = parse_json_object(candidate)
+                    if parsed is not None:
+                        return parsed
+                    # Not a usable object (e.g. braces in prose) - keep scanning after it
+                    self._start = -1
+        return None
+
+    def finish(self) -> Optional[Dict[str, Any]]:
+        """Flush the stream, repairing an object that was cut off mid-way"""
+        if self._start < 0:
+            return None
+        return parse_json_object(self.buffer[self._start:], allow_truncated=True)
+
+    def _looks_like_quote(self) -> bool:
+        # A single quote opens a string only where a JSON value or key may start
+        previous = self.buffer[:self._position - 1].rstrip()
+        return bool(previous) and previous[-1] in "{[,:"
+
+
+def _convert_outside_strings(text: str) -> str:
+    """Rewrite single-quoted strings, comments and Python literals outside JSON strings"""
+    out: List[str] = []
+    i = 0
+    length = len(text)
+    while i < length:
+        char = text[i]
+        if char == '"':
+            end = i + 1
+            while end < length and text[end] != '"':
+                end += 2 if text[end] == "\\" else 1
+            out.append(text[i:end + 1])
+            i = end + 1
+        elif char == "'":
+            end = i + 1
+            while end < length and text[end] != "'":
+                end += 2 if text[end] == "\\" else 1
+            inner = text[i + 1:end].replace('\\"', '"').replace("\\'", "'")
+            out.append(json.dumps(inner))
+            i = end + 1
+        elif text.startswith("//", i):
+            newline = text.find("\n", i)
+            i = length if newline < 0 else newline
+        elif text.startswith("/*", i):
+            close = text.find("*/", i + 2)
+            i = length if close < 0 else close + 2
+        elif char.isalpha():
+            end = i
+            while end < length and (text[end].isalnum() or text[end] == "_"):
+                end += 1
+            word = text[i:end]
+            out.append(_PYTHON_LITERALS.get(word, word))
+            i = end
+        else:
+            out.append(char)
+            i += 1
+    return "".join(out)
+
+
+def _close_truncated(text: str) -> str:
+    """Close an unterminated string and any open brackets at the end of the text"""
+    stack: List[str] = []
+    in_string = False
+    escaped = False
+    for char in text:
+        if in_string:
+            if escaped:
+                escaped = False
+            elif char == "\\":
+                escaped = True
+            elif char == '"':
+                in_string = False
+        elif char == '"':
+            in_string = True
+        elif char in "{[":
+            stack.append("}" if char == "{" else "]")
+        elif char in "}]" and stack:
+            stack.pop()
+    if in_string:
+        text += '"'
+    text = text.rstrip().rstrip(",:")
+    return text + "".join(reversed(stack))
+
+
+def repair_json(text: str, allow_truncated: bool = False) -> str:
+    """Fix the defects LLMs commonly introduce into otherwise valid JSON"""
+    text = text.translate(_SMART_QUOTES)
+    text = _convert_outside_strings(text)
+    if allow_truncated:
+        text = _close_truncated(text)
+    return _TRAILING_COMMA.sub(r"\1", text)
+
+
+def parse_json_object(text: str, allow_truncated: bool = False) -> Optional[Dict[str, Any]]:
+    """Parse a JSON object, retrying once with repairs applied"""
+    try:
+        parsed = json.loads(text)
+    except json.JSONDecodeError:
+        try:
+            # strict=False also tolerates raw newlines inside strings
+            parsed = json.loads(repair_json(text, allow_truncated), strict=False)
+        except (json.JSONDecodeError, RecursionError):
+            return None
+    return parsed if isinstance(parsed, dict) else None
+
+
+def extract_json_object(text: str) -> Optional[Dict[str, Any]]:
+    """
+    Extract the first JSON object from a complete LLM response.
+
+    Args:
+        text: Raw model output, possibly fenced or surrounded by prose
+
+    Returns:
+        The parsed object, or None if no object could be recovered
+    """
+    stripped = text.strip()
+    if stripped.startswith("{"):
+        # Fast path for JSON mode responses
+        try:
+            parsed = json.loads(stripped)
+            if isinstance(parsed, dict):
+                return parsed
+        except json.JSONDecodeError:
+            pass
+
+    extractor = IncrementalJSONExtractor()
+    return extractor.feed(text) or extractor.finish()
+
+
+def _coerce_confidence(value: Any) -> Optional[float]:
+    if isinstance(value, str):
+        value = value.strip().rstrip("%")
+        try:
+            value = float(value)
+        except ValueError:
+            return None
+    if not isinstance(value, (int, float)) or isinstance(value, bool):
+        return None
+    value = float(value)
+    if value > 1.0:
+        value = value / 100.0  # Percentages such as 85 or "85%"
+    return min(max(value, 0.0), 1.0)
+
+
+def _coerce_insight(item: Any) -> Optional[Dict[str, Any]]:
+    if not isinstance(item, dict):
+        return None
+    source = str(item.get("source", "combined")).lower()
+    candidate = {
+        "title": item.get("title") or item.get("name"),
+        "description": item.get("description") or item.get("detail") or item.get("text"),
+        "confidence": _coerce_confidence(item.get("confidence", item.get("score", 0.75))),
+        "source": source if source in _VALID_SOURCES else "combined",
+    }
+    try:
+        return InsightPoint(**candidate).model_dump()
+    except ValidationError:
+        return None
+
+
+def _coerce_recommendation(item: Any) -> Optional[str]:
+    if isinstance(item, str):
+        return item.strip() or None
+    if isinstance(item, dict):
+        text = item.get("recommendation") or item.get("text") or item.get("description") or item.get("title")
+        return str(text).strip() if text else None
+    return None
+
+
+def validate_llm_result(data: Dict[str, Any], insights_key: str) -> Optional[Dict[str, Any]]:
+    """
+    Validate and normalize a parsed LLM result against the response schema.
+
+    Invalid insight points are dropped rather than failing the whole result;
+    the result is rejected only if it has no summary or no usable insights.
+
+    Args:
+        data: Parsed JSON object from the model
+        insights_key: "insights" for trends, "cultural_affinities" for audiences
+
+    Returns:
+        Normalized result dict, or None if it cannot be used
+    """
+    summary = data.get("summary")
+    raw_insights = data.get(insights_key)
+    if not isinstance(summary, str) or not summary.strip() or not isinstance(raw_insights, list):
+        return None
+
+    insights = [point for point in map(_coerce_insight, raw_insights) if point]
+    if not insights:
+        return None
+
+    raw_recommendations = data.get("recommendations") or []
+    if not isinstance(raw_recommendations, list):
+        raw_recommendations = [raw_recommendations]
+    recommendations = [text for text in map(_coerce_recommendation, raw_recommendations) if text]
+
+    return {
+        "summary": summary.strip(),
+        insights_key: insights,
+        "recommendations": recommendations,
+    }
+
+
+def parse_llm_response(text: str, insights_key: str) -> Optional[Dict[str, Any]]:
+    """Extract, repair and validate an LLM response in one step"""
+    parsed = extract_json_object(text)
+    if parsed is None:
+        return None
+    return validate_llm_result(parsed, insights_key)
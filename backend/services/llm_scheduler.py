@@ -0,0 +1,157 @@
+"""
+LLM scheduler - Weighted-fair sharing of Gemini capacity across clients
+
+At most LLM_MAX_CONCURRENCY Gemini calls run at once per worker. Callers that
+find every slot busy wait in a queue ordered by start-time fair queuing: each
+(priority class, client) flow gets a virtual start tag
+
+    start = max(virtual_time, previous finish of the flow)
+    finish = start + 1 / weight(priority class)
+
+and the smallest start tag is dispatched next. A client firing a burst only
+pushes its own tags further out, so other clients keep getting slots, and
+interactive traffic (weight 4) is served ahead of batch work such as
+precomputation (weight 1) without starving it.
+
+Every request carries a deadline. A request that can no longer finish in time
+(now + typical Gemini latency > deadline) is dropped, either when it would be
+dispatched or when its wait runs out, and the caller falls back instead of
+spending capacity on an answer nobody will wait for.
+
+Clients are identified like RateLimiter.get_client_ip.
+"""
+
+import asyncio
+import heapq
+import itertools
+import os
+import time
+from collections import Counter
+from dataclasses import dataclass, field
+from typing import Any, Dict, List, Optional, Tuple
+
+LLM_MAX_CONCURRENCY = int(os.getenv("LLM_MAX_CONCURRENCY", "4"))
+
+# Weight and default deadline (seconds from enqueue) per priority class
+PRIORITY_WEIGHTS = {"interactive": 4.0, "batch": 1.0}
+PRIORITY_DEADLINES = {
+    "interactive": float(os.getenv("LLM_INTERACTIVE_DEADLINE", "20")),
+    "batch": float(os.getenv("LLM_BATCH_DEADLINE", "120")),
+}
+
+
+class SchedulerDropped(Exception):
+    """The request could not be scheduled before its deadline"""
+
+
+@dataclass(order=True)
+class _Waiter:
+    start_tag: float
+    seq: int
+    flow: Tuple[str, str] = field(compare=False)
+    deadline: float = field(compare=False)
+    future: "asyncio.Future[None]" = field(compare=False)
+
+
+class LLMScheduler:
+    """Start-time fair queuing over a fixed number of concurrent LLM slots"""
+
+    def __init__(self, max_concurrency: int = LLM_MAX_CONCURRENCY):
+        self.max_concurrency = max_concurrency
+        self.in_flight = 0
+        self._heap: List[_Waiter] = []
+        self._finish_tags: Dict[Tuple[str, str], float] = {}
+        self._virtual_time = 0.0
+        self._seq = itertools.count()
+        self.service_time = 2.0  # EWMA of slot hold time, seconds
+        self.stats: Counter = Counter()
+
+    def _tag(self, flow: Tuple[str, str]) -> float:
+        start = max(self._virtual_time, self._finish_tags.get(flow, 0.0))
+        self._finish_tags[flow] = start + 1.0 / PRIORITY_WEIGHTS.get(flow[0], 1.0)
+        if len(self._finish_tags) > 10000:
+            # Flows whose finish tag is behind virtual time behave exactly like new flows
+            self._finish_tags = {key: tag for key, tag in self._finish_tags.items() if tag > self._virtual_time}
+        return start
+
+    def _too_late(self, deadline: float) -> bool:
+        return time.monotonic() + self.service_time > deadline
+
+    async def acquire(self, client_id: str, priority: str = "interactive", deadline: Optional[float] = None):
+        """
+        Wait for an LLM slot; release() must be called once the call finishes.
+
+        Args:
+            client_id: Client identity (IP, as in RateLimiter.get_client_ip)
+            priority: "interactive" or "batch"
+            deadline: time.monotonic() by which the LLM answer is needed
+
+        Raises:
+            SchedulerDropped: The call could not start early enough to meet its deadline
+        """
+        if priority not in PRIORITY_WEIGHTS:
+            priority = "interactive"
+        flow = (priority, client_id or "unknown")
+        if deadline is None:
+            deadline = time.monotonic() + PRIORITY_DEADLINES[priority]
+        if self._too_late(deadline):
+            self.stats[f"dropped_{priority}"] += 1
+            raise SchedulerDropped("deadline too close to start an LLM call")
+
+        start_tag = self._tag(flow)
+        if self.in_flight < self.max_concurrency and not self._heap:
+            self._virtual_time = max(self._virtual_time, start_tag)
+            self.in_flight += 1
+            self.stats[f"dispatched_{priority}"] += 1
+            return
+
+        waiter = _Waiter(start_tag, next(self._seq), flow, deadline, asyncio.get_running_loop().create_future())
+        heapq.heappush(self._heap, waiter)
+        self.stats[f"queued_{priority}"] += 1
+        try:
+            await asyncio.wait_for(waiter.future, timeout=max(0.0, deadline - time.monotonic() - self.service_time))
+        except asyncio.TimeoutError:
+            self.stats[f"dropped_{priority}"] += 1
+            raise SchedulerDropped("deadline passed while waiting for an LLM slot")
+        except asyncio.CancelledError:
+            # Caller went away; give back a slot that was granted in the meantime
+            if waiter.future.done() and not waiter.future.cancelled() and waiter.future.exception() is None:
+                self.release()
+            raise
+
+    def release(self, held_for: Optional[float] = None):
+        """Free a slot and dispatch the next waiter"""
+        if held_for is not None:
+            self.service_time = 0.8 * self.service_time + 0.2 * held_for
+        self.in_flight -= 1
+        self._dispatch()
+
+    def _dispatch(self):
+        while self.in_flight < self.max_concurrency and self._heap:
+            waiter = heapq.heappop(self._heap)
+            if waiter.future.done():
+                continue  # Timed out or cancelled while queued
+            priority = waiter.flow[0]
+            if self._too_late(waiter.deadline):
+                self.stats[f"dropped_{priority}"] += 1
+                waiter.future.set_exception(SchedulerDropped("deadline passed before an LLM slot was free"))
+                continue
+            self._virtual_time = max(self._virtual_time, waiter.start_tag)
+            self.in_flight += 1
+            self.stats[f"dispatched_{priority}"] += 1
+            waiter.future.set_result(None)
+
+    def snapshot(self) -> Dict[str, Any]:
+        waiting = Counter(waiter.flow[0] for waiter in self._heap if not waiter.future.done())
+        return {
+            "max_concurrency": self.max_concurrency,
+            "in_flight": self.in_flight,
+            "waiting": dict(waiting),
+            "waiting_clients": len({waiter.flow for waiter in self._heap if not waiter.future.done()}),
+            "typical_call_seconds": round(self.service_time, 3),
+            **dict(self.stats)
+        }
+
+
+# Global LLM scheduler instance
+llm_scheduler = LLMScheduler()
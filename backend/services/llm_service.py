@@ -3,13 +3,31 @@ Enhanced Gemini AI service with real API integration and fallback responses
 """
 
 import os
-import json
 import asyncio
+import time
 from pathlib import Path
 from dotenv import load_dotenv
 from typing import Dict, Any, Optional
 from datetime import datetime
 
+from observability.llm_usage import llm_usage, price
+from observability.timing import timing_span
+from observability.tracing import set_span_attributes, trace_span
+from services.depth_profiles import DepthProfile, get_profile
+from services.insight_engine import trajectory_insight
+from services.deadline import LLM_MIN_BUDGET, call_timeout, current_deadline, has_budget
+from services.json_extractor import parse_llm_response
+from services.llm_scheduler import SchedulerDropped, llm_scheduler
+from services.prompt_builder import (
+    build_audience_comparison_prompt,
+    build_audience_prompt,
+    build_trend_prompt,
+    estimate_tokens
+)
+from services.qloo_models import AudiencePayload, TrendPayload
+from services.quota_manager import quota_manager
+from services.retry_policy import gemini_retry
+
 # Load environment variables from .env file in parent directory
 env_path = Path(__file__).parent.parent.parent / ".env"
 load_dotenv(dotenv_path=env_path)
@@ -22,20 +40,65 @@ except ImportError:
     genai = None  # type: ignore
     print("⚠️ Google Generative AI not available, using fallback responses")
 
+# Expected completion size, charged to the tokens-per-minute quota before the call
+RESPONSE_TOKEN_ESTIMATE = 500
+
+# Longest a single generate_content attempt may take (less when the request deadline is closer)
+GEMINI_TIMEOUT = 10.0
+
+
+# GenerativeModel objects by model name, shared by all service instances
+_models: Dict[str, Any] = {}
+
+
+def _generative_model(name: str):
+    """Model client in JSON response mode, so completions come back as a bare JSON object"""
+    model = _models.get(name)
+    if model is None:
+        model = _models[name] = genai.GenerativeModel(  # type: ignore
+            name,
+            generation_config={"response_mime_type": "application/json"}
+        )
+    return model
+
+
+def _is_throttled(error: Exception) -> bool:
+    """Whether Gemini rejected the call for quota (HTTP 429 / RESOURCE_EXHAUSTED)"""
+    return getattr(error, "code", None) == 429 or type(error).__name__ == "ResourceExhausted"
+
 class GeminiService:
     """Enhanced AI analysis with real Gemini integration and robust fallbacks"""
     
-    def __init__(self):
-        """Setup service with real API integration and fallback capability"""
+    def __init__(self, client_id: str = "unknown", priority: str = "interactive"):
+        """
+        Setup service with real API integration and fallback capability
+
+        Args:
+            client_id: Who the calls are made for (fair-share key in the LLM scheduler)
+            priority: "interactive" for API requests, "batch" for background work
+        """
+        self.client_id = client_id
+        self.priority = priority
         self.api_key = os.getenv("GEMINI_API_KEY")
         self.use_real_api = False
         self.model = None
+        self.model_name = None
         
         if self.api_key and self.api_key != "demo_key_for_hackathon" and GEMINI_AVAILABLE and genai is not None:
             try:
-                genai.configure(api_key=self.api_key)  # type: ignore
-                # Use the current model name for Gemini 1.5
-                self.model = genai.GenerativeModel('gemini-1.5-flash')  # type: ignore
+                # GEMINI_API_ENDPOINT points the client at a compatible REST server (e.g. a local stub)
+                api_endpoint = os.getenv("GEMINI_API_ENDPOINT")
+                if api_endpoint:
+                    genai.configure(  # type: ignore
+                        api_key=self.api_key,
+                        transport="rest",
+                        client_options={"api_endpoint": api_endpoint}
+                    )
+                else:
+                    genai.configure(api_key=self.api_key)  # type: ignore
+                # Default (standard depth) model; deeper analyses pick theirs per call
+                self.model_name = get_profile(None).model
+                self.model = _generative_model(self.model_name)
                 self.use_real_api = True
                 print("🤖 Gemini AI service initialized with real API")
             except Exception as e:
@@ -44,72 +107,151 @@ class GeminiService:
         else:
             print("🤖 Using demo responses (add real GEMINI_API_KEY for live AI)")
     
-    async def _call_real_gemini_api(self, prompt: str) -> Optional[str]:
-        """Call the real Gemini API with error handling and timeout"""
+    async def _call_real_gemini_api(self, prompt: str, model_name: Optional[str] = None,
+                                    timeout: float = GEMINI_TIMEOUT,
+                                    response_tokens: int = RESPONSE_TOKEN_ESTIMATE,
+                                    depth: Optional[str] = None, query: Optional[str] = None) -> Optional[str]:
+        """Call the real Gemini API with error handling and timeout (usage accounted per depth and query)"""
         if not self.use_real_api or self.model is None:
             return None
-            
+        model_name = model_name or self.model_name
+        model = _generative_model(model_name)
+        
+        # Don't queue for capacity when this worker already knows the Gemini quota is empty
+        if quota_manager.exhausted("gemini"):
+            set_span_attributes({"llm.fallback_reason": "quota"})
+            return None
+        
+        # Too little of the request's time left for a useful answer: fall back right away
+        if not has_budget(LLM_MIN_BUDGET):
+            print("⏱️ Request deadline too close for Gemini, using fallback")
+            set_span_attributes({"llm.fallback_reason": "deadline"})
+            return None
+        
+        # Turn away calls over the client's spend, or the most expensive ones while calls queue
+        prompt_tokens = estimate_tokens(prompt)
+        rejected = llm_usage.admit(self.client_id, price(model_name, prompt_tokens, response_tokens),
+                                   congested=llm_scheduler.in_flight >= llm_scheduler.max_concurrency)
+        if rejected is not None:
+            print(f"💸 Gemini call not admitted ({rejected}), using fallback")
+            set_span_attributes({"llm.fallback_reason": f"cost_admission: {rejected}"})
+            return None
+        
+        # Wait for a fair share of LLM capacity (dropped if it can't start before the deadline)
         try:
-            # Add timeout to prevent hanging
-            response = await asyncio.wait_for(
-                asyncio.to_thread(self.model.generate_content, prompt),
-                timeout=10.0  # 10 second timeout
+            with timing_span("llm_queue"):
+                await llm_scheduler.acquire(self.client_id, self.priority, current_deadline())
+        except SchedulerDropped as e:
+            print(f"⏳ Gemini call dropped by scheduler: {e}")
+            set_span_attributes({"llm.fallback_reason": "scheduler_dropped"})
+            return None
+        
+        started = time.monotonic()
+        called = False
+        try:
+            # Stay inside the shared Gemini quota; fall back at once instead of waiting for it
+            estimated_tokens = prompt_tokens + response_tokens
+            if not quota_manager.try_acquire("gemini", tokens=estimated_tokens):
+                print("⏳ Gemini quota exhausted, using fallback")
+                set_span_attributes({"llm.fallback_reason": "quota"})
+                return None
+            
+            # Add timeout to prevent hanging, within what is left of the request deadline
+            called = True
+            async def attempt():
+                # The client gives up too, so a call we stop waiting for doesn't keep its thread busy
+                limit = call_timeout(timeout)
+                with timing_span("gemini_api"), \
+                        trace_span("gemini.generate_content", {"gen_ai.request.model": model_name}):
+                    return await asyncio.wait_for(
+                        asyncio.to_thread(model.generate_content, prompt, request_options={"timeout": limit}),
+                        timeout=limit
+                    )
+            
+            # Transient failures (5xx, timeouts) get a budgeted, jittered retry
+            call_started = time.monotonic()
+            response = await gemini_retry.call(
+                attempt,
+                deadline=current_deadline(),
+                expected_duration=llm_scheduler.service_time,
+                permit=lambda: quota_manager.try_acquire("gemini", tokens=estimated_tokens)
             )
-            return response.text
+            latency = time.monotonic() - call_started
+            # Correct the token estimate with the real usage, and account it
+            usage = getattr(response, "usage_metadata", None)
+            if usage is not None and getattr(usage, "total_token_count", 0):
+                quota_manager.adjust("gemini", usage.total_token_count - estimated_tokens)
+            text = response.text
+            llm_usage.record(
+                model_name, self.client_id, depth, query,
+                getattr(usage, "prompt_token_count", 0) or prompt_tokens,
+                getattr(usage, "candidates_token_count", 0) or estimate_tokens(text or ""),
+                latency
+            )
+            return text
         except asyncio.TimeoutError:
-            print("Gemini API timeout after 10 seconds")
+            print("Gemini API timed out")
+            set_span_attributes({"llm.fallback_reason": "timeout"})
             return None
         except Exception as e:
             print(f"Gemini API error: {e}")
+            if _is_throttled(e):
+                quota_manager.penalize("gemini")
+            set_span_attributes({"llm.fallback_reason": f"error: {type(e).__name__}"})
             return None
+        finally:
+            llm_scheduler.release(time.monotonic() - started if called else None)
     
-    async def analyze_trend(self, query: str, qloo_data: Dict[str, Any], 
+    async def health_check(self, timeout: float = 5.0) -> Dict[str, Any]:
+        """Look up the default model's metadata (no generation quota used); raises if Gemini is unreachable"""
+        model = await asyncio.to_thread(genai.get_model, f"models/{self.model_name}",  # type: ignore
+                                        request_options={"timeout": timeout})
+        return {"model": self.model_name, "input_token_limit": getattr(model, "input_token_limit", None)}
+
+    async def analyze_trend(self, query: str, qloo_data: TrendPayload, 
                           industry: Optional[str] = None, 
-                          timeframe: Optional[str] = None) -> Dict[str, Any]:
+                          timeframe: Optional[str] = None,
+                          profile: Optional[DepthProfile] = None) -> Dict[str, Any]:
         """Get trend analysis with Qloo data integration and real AI"""
+        profile = profile or get_profile(None)
         
         if self.use_real_api:
-            # Create AI prompt for real analysis
-            prompt = f"""
-            Analyze the trend "{query}" using the following cultural data from Qloo:
-            {json.dumps(qloo_data, indent=2)}
+            # Create AI prompt for real analysis (compact Qloo data within the depth's token budget)
+            with timing_span("prompt"):
+                prompt = build_trend_prompt(query, qloo_data, industry, timeframe,
+                                            token_budget=profile.prompt_token_budget,
+                                            insight_count=profile.insight_count,
+                                            recommendation_count=profile.recommendation_count)
             
-            Industry context: {industry or 'General market'}
-            Timeframe: {timeframe or '6-12 months'}
-            
-            Provide a comprehensive analysis with:
-            1. A summary (2-3 sentences)
-            2. 4 key insights with titles, descriptions, and confidence scores (0.0-1.0)
-            3. 4 actionable recommendations
-            
-            Format as JSON with this structure:
-            {{
-                "summary": "...",
-                "insights": [
-                    {{"title": "...", "description": "...", "confidence": 0.85, "source": "combined"}}
-                ],
-                "recommendations": ["...", "...", "...", "..."]
-            }}
-            """
-            
-            ai_response = await self._call_real_gemini_api(prompt)
+            # Longer answers are charged to the token quota up front
+            ai_response = await self._call_real_gemini_api(
+                prompt, profile.model, profile.llm_timeout,
+                response_tokens=RESPONSE_TOKEN_ESTIMATE * profile.insight_count // 4,
+                depth=profile.name, query=query
+            )
             if ai_response:
-                try:
-                    # Try to parse AI response as JSON
-                    parsed_response = json.loads(ai_response)
+                # Extract, repair and validate the JSON even if it is fenced or wrapped in prose
+                with timing_span("llm_parse"), trace_span("llm.parse_response", {"llm.response_chars": len(ai_response)}):
+                    parsed_response = parse_llm_response(ai_response, "insights")
+                    set_span_attributes({"llm.parse_success": parsed_response is not None})
+                if parsed_response is not None:
                     parsed_response["query"] = query
                     parsed_response["timestamp"] = datetime.now().isoformat()
+                    parsed_response["generated_by"] = "gemini"
                     return parsed_response
-                except json.JSONDecodeError:
-                    print("⚠️ AI returned non-JSON response, using fallback")
+                print("⚠️ AI returned unusable JSON response, using fallback")
+                set_span_attributes({"llm.fallback_reason": "unparseable_response"})
         
-        # Fallback to demo responses
-        return self._get_demo_trend_analysis(query, industry, timeframe)
+        # Fallback to demo responses (with the recorded strength trajectory when there is one)
+        return self._get_demo_trend_analysis(query, industry, timeframe,
+                                             TrendPayload.coerce(qloo_data).strength_history)
     
-    def _get_demo_trend_analysis(self, query: str, industry: Optional[str], timeframe: Optional[str]) -> Dict[str, Any]:
+    def _get_demo_trend_analysis(self, query: str, industry: Optional[str], timeframe: Optional[str],
+                                 trajectory: Optional[Dict[str, Any]] = None) -> Dict[str, Any]:
         """Generate comprehensive demo trend analysis"""
-        return {
+        analysis = {
             "query": query,
+            "generated_by": "demo",
             "summary": f"Analysis of '{query}' reveals significant growth momentum in the {industry or 'market'} sector. Qloo's cultural data shows strong resonance with key demographics, indicating sustained interest and adoption over {timeframe or 'the coming months'}.",
             "timestamp": datetime.now().isoformat(),
             "insights": [
@@ -145,54 +287,66 @@ class GeminiService:
                 f"Plan product roadmaps to capitalize on the {timeframe or '6-12 month'} growth window for {query}"
             ]
         }
+        recorded = trajectory_insight(query, trajectory, timeframe)
+        if recorded is not None:
+            analysis["insights"][2] = recorded
+        return analysis
     
-    async def generate_audience_insights(self, target_audience: str, qloo_data: Dict[str, Any],
+    async def generate_audience_insights(self, target_audience: str, qloo_data: AudiencePayload,
                                        product_category: Optional[str] = None,
                                        region: Optional[str] = None) -> Dict[str, Any]:
         """Get audience insights with Qloo data integration and real AI"""
         
         if self.use_real_api:
-            # Create AI prompt for real analysis
-            prompt = f"""
-            Analyze the audience "{target_audience}" using the following cultural data from Qloo:
-            {json.dumps(qloo_data, indent=2)}
-            
-            Product category: {product_category or 'General products'}
-            Region: {region or 'Global'}
-            
-            Provide comprehensive audience insights with:
-            1. A summary (2-3 sentences)
-            2. 4 cultural affinities with titles, descriptions, and confidence scores (0.0-1.0)
-            3. 4 actionable recommendations
+            # Create AI prompt for real analysis (compact, token-budgeted Qloo data)
+            with timing_span("prompt"):
+                prompt = build_audience_prompt(target_audience, qloo_data, product_category, region)
             
-            Format as JSON with this structure:
-            {{
-                "summary": "...",
-                "cultural_affinities": [
-                    {{"title": "...", "description": "...", "confidence": 0.85, "source": "combined"}}
-                ],
-                "recommendations": ["...", "...", "...", "..."]
-            }}
-            """
-            
-            ai_response = await self._call_real_gemini_api(prompt)
+            ai_response = await self._call_real_gemini_api(prompt, depth=get_profile(None).name, query=target_audience)
             if ai_response:
-                try:
-                    # Try to parse AI response as JSON
-                    parsed_response = json.loads(ai_response)
+                # Extract, repair and validate the JSON even if it is fenced or wrapped in prose
+                with timing_span("llm_parse"), trace_span("llm.parse_response", {"llm.response_chars": len(ai_response)}):
+                    parsed_response = parse_llm_response(ai_response, "cultural_affinities")
+                    set_span_attributes({"llm.parse_success": parsed_response is not None})
+                if parsed_response is not None:
                     parsed_response["target_audience"] = target_audience
                     parsed_response["timestamp"] = datetime.now().isoformat()
+                    parsed_response["generated_by"] = "gemini"
                     return parsed_response
-                except json.JSONDecodeError:
-                    print("⚠️ AI returned non-JSON response, using fallback")
+                print("⚠️ AI returned unusable JSON response, using fallback")
+                set_span_attributes({"llm.fallback_reason": "unparseable_response"})
         
         # Fallback to demo responses
         return self._get_demo_audience_analysis(target_audience, product_category, region)
     
+    async def compare_audience_regions(self, target_audience: str, diff: Dict[str, Any],
+                                       product_category: Optional[str] = None) -> Optional[Dict[str, Any]]:
+        """One Gemini call comparing an audience across regions; None when Gemini can't answer"""
+        if not self.use_real_api:
+            return None
+        with timing_span("prompt"):
+            prompt = build_audience_comparison_prompt(target_audience, diff, product_category)
+        
+        ai_response = await self._call_real_gemini_api(prompt, depth=get_profile(None).name, query=target_audience)
+        if not ai_response:
+            return None
+        with timing_span("llm_parse"), trace_span("llm.parse_response", {"llm.response_chars": len(ai_response)}):
+            parsed_response = parse_llm_response(ai_response, "insights")
+            set_span_attributes({"llm.parse_success": parsed_response is not None})
+        if parsed_response is None:
+            print("⚠️ AI returned unusable JSON response, using rule-based comparison")
+            set_span_attributes({"llm.fallback_reason": "unparseable_response"})
+            return None
+        parsed_response["target_audience"] = target_audience
+        parsed_response["timestamp"] = datetime.now().isoformat()
+        parsed_response["generated_by"] = "gemini"
+        return parsed_response
+    
     def _get_demo_audience_analysis(self, target_audience: str, product_category: Optional[str], region: Optional[str]) -> Dict[str, Any]:
         """Generate comprehensive demo audience analysis"""
         return {
             "target_audience": target_audience,
+            "generated_by": "demo",
             "summary": f"Analysis of {target_audience} reveals distinct cultural preferences and digital behaviors. Qloo's data shows this demographic has strong engagement with {product_category or 'innovative products'} and demonstrates clear patterns in {region or 'their region'}.",
             "timestamp": datetime.now().isoformat(),
             "cultural_affinities": [
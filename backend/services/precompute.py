@@ -0,0 +1,174 @@
+"""
+Precompute - Keeps popular analyses warm in the analysis store
+
+Every analysis request bumps a popularity score for its request key (decayed
+with a half-life, so yesterday's hits fade). A background task started in the
+app lifespan periodically takes the top-N keys and re-runs the pipeline for
+any whose stored result is missing or about to expire, so hot queries are
+always answered from history. Refreshes are capped by an hourly upstream
+budget and run one at a time to stay out of the way of live traffic.
+
+With several workers each runs its own scheduler; refreshes already written by
+another worker are seen through the shared store and skipped.
+"""
+
+import asyncio
+import heapq
+import os
+import time
+from collections import deque
+from typing import Any, Deque, Dict, List, Optional, Tuple
+
+from services.analysis_pipeline import run_audience_analysis, run_trend_analysis
+from services.analysis_store import analysis_store
+from services.llm_service import GeminiService
+from services.qloo_service import QlooService
+
+PRECOMPUTE_ENABLED = os.getenv("PRECOMPUTE_ENABLED", "true").lower() in ("1", "true", "yes")
+PRECOMPUTE_TOP_N = int(os.getenv("PRECOMPUTE_TOP_N", "10"))
+PRECOMPUTE_INTERVAL = float(os.getenv("PRECOMPUTE_INTERVAL", "60"))              # Seconds between passes
+PRECOMPUTE_REFRESH_MARGIN = float(os.getenv("PRECOMPUTE_REFRESH_MARGIN", "300"))  # Refresh this long before expiry
+PRECOMPUTE_MAX_CALLS_PER_HOUR = int(os.getenv("PRECOMPUTE_MAX_CALLS_PER_HOUR", "60"))
+POPULARITY_HALF_LIFE = float(os.getenv("POPULARITY_HALF_LIFE", "3600"))
+
+
+class PopularityTracker:
+    """Exponentially decayed request counts per analysis request key"""
+
+    def __init__(self, half_life: float = POPULARITY_HALF_LIFE, max_entries: int = 5000):
+        self.half_life = half_life
+        self.max_entries = max_entries
+        # request key -> [score at last hit, last hit time, kind, request]
+        self._entries: Dict[str, List[Any]] = {}
+
+    def _decayed(self, entry: List[Any], now: float) -> float:
+        return entry[0] * 2 ** (-(now - entry[1]) / self.half_life)
+
+    def record(self, kind: str, request_key: str, request: Any):
+        now = time.time()
+        key = f"{kind}:{request_key}"
+        entry = self._entries.get(key)
+        if entry is None:
+            if len(self._entries) >= self.max_entries:
+                self._prune(now)
+            self._entries[key] = [1.0, now, kind, request]
+        else:
+            entry[0] = self._decayed(entry, now) + 1.0
+            entry[1] = now
+            entry[3] = request
+
+    def _prune(self, now: float):
+        """Drop the least popular half of the entries"""
+        keep = heapq.nlargest(self.max_entries // 2, self._entries.items(),
+                              key=lambda item: self._decayed(item[1], now))
+        self._entries = dict(keep)
+
+    def top(self, n: int) -> List[Tuple[str, str, Any, float]]:
+        """The n most popular requests as (kind, request_key, request, score)"""
+        now = time.time()
+        ranked = heapq.nlargest(n, self._entries.items(), key=lambda item: self._decayed(item[1], now))
+        return [(entry[2], key.split(":", 1)[1], entry[3], round(self._decayed(entry, now), 3))
+                for key, entry in ranked]
+
+
+class Precomputer:
+    """Background refresher for the most popular analyses"""
+
+    def __init__(self, tracker: PopularityTracker, top_n: int = PRECOMPUTE_TOP_N,
+                 interval: float = PRECOMPUTE_INTERVAL, refresh_margin: float = PRECOMPUTE_REFRESH_MARGIN,
+                 max_calls_per_hour: int = PRECOMPUTE_MAX_CALLS_PER_HOUR):
+        self.tracker = tracker
+        self.top_n = top_n
+        self.interval = interval
+        self.refresh_margin = refresh_margin
+        self.max_calls_per_hour = max_calls_per_hour
+        self._calls: Deque[float] = deque()
+        self._task: Optional[asyncio.Task] = None
+        self.stats = {"passes": 0, "refreshed": 0, "already_warm": 0, "budget_exhausted": 0, "errors": 0}
+
+    def budget_remaining(self) -> int:
+        cutoff = time.time() - 3600
+        while self._calls and self._calls[0] < cutoff:
+            self._calls.popleft()
+        return max(0, self.max_calls_per_hour - len(self._calls))
+
+    def _needs_refresh(self, kind: str, request_key: str) -> bool:
+        stored = analysis_store.find_recent(kind, request_key)
+        if stored is None:
+            return True
+        return time.time() - stored["stored_at"] >= analysis_store.cache_ttl - self.refresh_margin
+
+    async def refresh_once(self) -> int:
+        """Refresh popular analyses that are missing or close to expiry; returns how many ran"""
+        self.stats["passes"] += 1
+        candidates = self.tracker.top(self.top_n)
+        if not candidates:
+            return 0
+
+        llm_service = GeminiService(client_id="precompute", priority="batch")
+        if not llm_service.use_real_api:
+            # Demo results are never re-served from the store, so warming them is pointless
+            return 0
+        qloo_service = QlooService()
+
+        refreshed = 0
+        for kind, request_key, request, _ in candidates:
+            if not self._needs_refresh(kind, request_key):
+                self.stats["already_warm"] += 1
+                continue
+            if self.budget_remaining() == 0:
+                self.stats["budget_exhausted"] += 1
+                break
+            self._calls.append(time.time())
+            try:
+                if kind == "trend":
+                    await run_trend_analysis(request, llm_service, qloo_service, use_store=False)
+                else:
+                    await run_audience_analysis(request, llm_service, qloo_service, use_store=False)
+                refreshed += 1
+                self.stats["refreshed"] += 1
+            except Exception as e:
+                self.stats["errors"] += 1
+                print(f"⚠️ Precompute failed for {kind} '{request_key}': {e}")
+        if refreshed:
+            print(f"🔥 Precomputed {refreshed} popular analyses ({self.budget_remaining()} refreshes left this hour)")
+        return refreshed
+
+    async def _run(self):
+        while True:
+            await asyncio.sleep(self.interval)
+            try:
+                await self.refresh_once()
+            except Exception as e:
+                print(f"⚠️ Precompute pass failed: {e}")
+
+    def start(self):
+        if PRECOMPUTE_ENABLED and analysis_store.available and self._task is None:
+            self._task = asyncio.create_task(self._run())
+            print(f"🔥 Precomputing top {self.top_n} analyses every {self.interval:.0f}s")
+
+    async def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+    def snapshot(self) -> Dict[str, Any]:
+        return {
+            "enabled": self._task is not None,
+            "budget_remaining_this_hour": self.budget_remaining(),
+            "top_queries": [
+                {"kind": kind, "request_key": request_key, "score": score}
+                for kind, request_key, _, score in self.tracker.top(self.top_n)
+            ],
+            **self.stats
+        }
+
+
+# Global popularity tracker and precompute scheduler
+popularity_tracker = PopularityTracker()
+precomputer = Precomputer(popularity_tracker)
+
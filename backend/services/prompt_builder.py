@@ -0,0 +1,224 @@
+"""
+Prompt builder - Compact, token-budgeted encoding of Qloo data for Gemini
+
+Pretty-printed JSON repeats every key for every entity and spends tokens on
+indentation. This module renders Qloo payloads as compact tables instead:
+affinities are sorted by strength, low-signal rows and entities are trimmed,
+and the whole data section is shrunk until it fits a token budget. The
+encoding of a typed Qloo payload (services.qloo_models) is cached on it per
+budget, so shared payloads such as the simulated datasets are encoded once.
+"""
+
+import json
+import os
+import re
+from typing import Any, Dict, List, Optional, Tuple
+
+from services.qloo_models import AudiencePayload, TrendPayload
+
+# Token budget for the Qloo data section of a prompt (not the whole prompt)
+PROMPT_TOKEN_BUDGET = int(os.getenv("PROMPT_TOKEN_BUDGET", "800"))
+
+# Keys treated as the ranking signal of a row, in order of preference
+STRENGTH_KEYS = ("strength", "affinity", "score", "weight", "popularity")
+
+# Progressively tighter limits tried until the encoding fits the budget:
+# (max rows per table, max entities per cell, max items per list, min strength)
+_TRUNCATION_LEVELS: Tuple[Tuple[int, int, int, float], ...] = (
+    (12, 6, 8, 0.0),
+    (8, 4, 6, 0.3),
+    (6, 3, 4, 0.5),
+    (4, 2, 3, 0.6),
+    (3, 1, 2, 0.7),
+)
+
+_TOKEN_PATTERN = re.compile(r"\w+|[^\w\s]")
+
+
+def estimate_tokens(text: str) -> int:
+    """
+    Estimate the Gemini token count of a text without calling the tokenizer.
+
+    Words count as one token per ~4 characters and punctuation as one token
+    each, which tracks SentencePiece counts closely for English prompts.
+    """
+    tokens = 0
+    for match in _TOKEN_PATTERN.finditer(text):
+        length = match.end() - match.start()
+        tokens += 1 if length <= 4 else (length + 3) // 4
+    return tokens
+
+
+def _format_scalar(value: Any) -> str:
+    if isinstance(value, float):
+        return f"{value:.2f}"
+    if value is None:
+        return "-"
+    return str(value).replace("\n", " ").replace("|", "/")
+
+
+def _strength_of(row: Dict[str, Any]) -> Optional[float]:
+    for key in STRENGTH_KEYS:
+        value = row.get(key)
+        if isinstance(value, (int, float)) and not isinstance(value, bool):
+            return float(value)
+    return None
+
+
+def _join_items(items: List[Any], limit: int) -> str:
+    shown = [_format_scalar(item) for item in items[:limit] if not isinstance(item, (dict, list, tuple))]
+    if len(items) > limit:
+        shown.append(f"+{len(items) - limit} more")
+    return "; ".join(shown)
+
+
+def _encode_table(key: str, rows: List[Dict[str, Any]], max_rows: int,
+                  max_entities: int, min_strength: float) -> List[str]:
+    """Render a list of dicts once-per-column: a header and pipe-separated rows"""
+    columns: List[str] = []
+    for row in rows:
+        for column in row:
+            if column not in columns:
+                columns.append(column)
+
+    # Put the identifying column first and the strength column second
+    strength_column = next((c for c in STRENGTH_KEYS if c in columns), None)
+    if strength_column:
+        columns.remove(strength_column)
+        columns.insert(1 if columns else 0, strength_column)
+
+    ranked = [row for row in rows
+              if _strength_of(row) is None or _strength_of(row) >= min_strength]
+    ranked.sort(key=lambda row: _strength_of(row) or 0.0, reverse=True)
+
+    lines = [f"{key} ({'|'.join(columns)}):"]
+    for row in ranked[:max_rows]:
+        cells = []
+        for column in columns:
+            value = row.get(column)
+            if isinstance(value, (list, tuple)):
+                cells.append(_join_items(list(value), max_entities))
+            elif isinstance(value, dict):
+                cells.append(json.dumps(value, separators=(",", ":")))
+            else:
+                cells.append(_format_scalar(value))
+        lines.append("|".join(cells))
+    if len(ranked) > max_rows:
+        lines.append(f"(+{len(ranked) - max_rows} weaker rows omitted)")
+    return lines
+
+
+def _encode_value(key: str, value: Any, level: Tuple[int, int, int, float], indent: str = "") -> List[str]:
+    max_rows, max_entities, max_items, min_strength = level
+
+    if isinstance(value, (list, tuple)):
+        if value and all(isinstance(item, dict) for item in value):
+            return [indent + line for line in _encode_table(key, list(value), max_rows, max_entities, min_strength)]
+        return [f"{indent}{key}: {_join_items(list(value), max_items)}"]
+
+    if isinstance(value, dict):
+        if not value:
+            return []
+        lines = [f"{indent}{key}:"]
+        for sub_key, sub_value in value.items():
+            lines.extend(_encode_value(sub_key, sub_value, level, indent + " "))
+        return lines
+
+    return [f"{indent}{key}: {_format_scalar(value)}"]
+
+
+def encode_qloo_data(qloo_data: Any, token_budget: Optional[int] = None) -> str:
+    """
+    Encode a Qloo payload as compact text that fits within the token budget.
+
+    Args:
+        qloo_data: Trend or audience payload from Qloo (or the simulated data)
+        token_budget: Maximum estimated tokens for the encoding
+
+    Returns:
+        Compact, line-oriented representation of the payload
+    """
+    budget = token_budget or PROMPT_TOKEN_BUDGET
+    if isinstance(qloo_data, (TrendPayload, AudiencePayload)):
+        return qloo_data.cached(("prompt", budget), lambda: _encode(qloo_data.as_dict(), budget))
+    return _encode(qloo_data, budget)
+
+
+def _encode(qloo_data: Dict[str, Any], budget: int) -> str:
+    text = ""
+    for level in _TRUNCATION_LEVELS:
+        lines: List[str] = []
+        for key, value in qloo_data.items():
+            lines.extend(_encode_value(key, value, level))
+        text = "\n".join(lines)
+        if estimate_tokens(text) <= budget:
+            return text
+
+    # Still too large at the tightest level: keep whole lines until the budget runs out
+    kept: List[str] = []
+    used = 0
+    for line in text.split("\n"):
+        cost = estimate_tokens(line)
+        if used + cost > budget:
+            kept.append("(truncated)")
+            break
+        kept.append(line)
+        used += cost
+    return "\n".join(kept)
+
+
+def build_trend_prompt(query: str, qloo_data: Any, industry: Optional[str] = None,
+                       timeframe: Optional[str] = None, token_budget: Optional[int] = None,
+                       insight_count: int = 4, recommendation_count: int = 4) -> str:
+    """Build the Gemini prompt for trend analysis"""
+    return f"""Analyze the trend "{query}" using this Qloo cultural data (tables: header lists columns, rows sorted by strength):
+{encode_qloo_data(qloo_data, token_budget)}
+
+Industry context: {industry or 'General market'}
+Timeframe: {timeframe or '6-12 months'}
+
+Provide a comprehensive analysis with:
+1. A summary (2-3 sentences)
+2. {insight_count} key insights with titles, descriptions, and confidence scores (0.0-1.0)
+3. {recommendation_count} actionable recommendations
+
+Format as JSON with this structure:
+{{"summary": "...", "insights": [{{"title": "...", "description": "...", "confidence": 0.85, "source": "combined"}}], "recommendations": ["...", "...", "...", "..."]}}"""
+
+
+def build_audience_prompt(target_audience: str, qloo_data: Any,
+                          product_category: Optional[str] = None, region: Optional[str] = None,
+                          token_budget: Optional[int] = None) -> str:
+    """Build the Gemini prompt for audience insights"""
+    return f"""Analyze the audience "{target_audience}" using this Qloo cultural data (tables: header lists columns, rows sorted by strength):
+{encode_qloo_data(qloo_data, token_budget)}
+
+Product category: {product_category or 'General products'}
+Region: {region or 'Global'}
+
+Provide comprehensive audience insights with:
+1. A summary (2-3 sentences)
+2. 4 cultural affinities with titles, descriptions, and confidence scores (0.0-1.0)
+3. 4 actionable recommendations
+
+Format as JSON with this structure:
+{{"summary": "...", "cultural_affinities": [{{"title": "...", "description": "...", "confidence": 0.85, "source": "combined"}}], "recommendations": ["...", "...", "...", "..."]}}"""
+
+
+def build_audience_comparison_prompt(target_audience: str, diff: Dict[str, Any],
+                                     product_category: Optional[str] = None,
+                                     token_budget: Optional[int] = None) -> str:
+    """Build one Gemini prompt comparing an audience across regions from the compact region diff"""
+    insight_count = len(diff.get("regions") or []) + 1
+    return f"""Compare the audience "{target_audience}" across regions using this diff of Qloo cultural data (shared: affinities every region has; per region: similarity to the other regions, affinities it over-indexes on and ones that are less prominent there):
+{encode_qloo_data(diff, token_budget)}
+
+Product category: {product_category or 'General products'}
+
+Provide a cross-regional comparison with:
+1. A summary (2-3 sentences) of how the regions differ
+2. {insight_count} key insights with titles starting with the region they concern (or "Shared" for all regions), descriptions, and confidence scores (0.0-1.0)
+3. 4 actionable recommendations for localizing campaigns
+
+Format as JSON with this structure:
+{{"summary": "...", "insights": [{{"title": "Europe: ...", "description": "...", "confidence": 0.85, "source": "combined"}}], "recommendations": ["...", "...", "...", "..."]}}"""
@@ -0,0 +1,278 @@
+"""
+Qloo payload models - Typed trend and audience data, decoded once
+
+Qloo responses used to travel through the pipeline as plain dicts and were
+re-walked at every step: by the prompt encoder, by the rule engine (a get()
+and an isinstance() check per field), by pydantic for data_sources and again
+for the history store. They are now decoded once, straight from the
+response bytes, into frozen slotted dataclasses: strengths are validated as
+floats, lists become tuples of strings and keys the models don't know are
+kept in `extra`, so nothing Qloo sends is lost.
+
+The same object then feeds the prompt (prompt_builder caches its encoding
+per token budget on the object), rule scoring (typed attributes) and
+serialization (as_dict() and to_json() are computed once per object).
+Simulated datasets are converted once at import time and flagged simulated.
+Pipeline additions (related trends, strength history) are new fields set
+with dataclasses.replace(), which also starts a fresh cache.
+"""
+
+import json
+from dataclasses import dataclass, field
+from typing import Any, Callable, Dict, FrozenSet, Optional, Tuple, Type, TypeVar, Union
+
+from services.simulated_data import FrozenPayload
+
+Scalar = Union[str, int, float]
+Model = TypeVar("Model", "TrendPayload", "AudiencePayload")
+
+
+# Exact type checks: JSON only produces these types, and bool (an int subclass) must not pass as a number
+def _float(value: Any) -> Optional[float]:
+    kind = type(value)
+    if kind is float:
+        return value
+    return float(value) if kind is int else None
+
+
+def _text(value: Any) -> Optional[str]:
+    kind = type(value)
+    if kind is str:
+        return value
+    return str(value) if kind is int or kind is float else None
+
+
+def _texts(values: Any) -> Tuple[str, ...]:
+    """Scalars of a list as strings (a lone scalar counts as a list of one)"""
+    if isinstance(values, (list, tuple)):
+        items = tuple(values)
+        # Usually a list of strings already
+        if all(type(item) is str for item in items):
+            return items
+        return tuple(text for text in map(_text, items) if text is not None)
+    text = _text(values)
+    return () if text is None else (text,)
+
+
+def _extra(data: Dict[str, Any], known: FrozenSet[str]) -> Optional[Dict[str, Any]]:
+    if data.keys() <= known:
+        return None
+    return {key: value for key, value in data.items() if key not in known}
+
+
+def _plain(value: Any) -> Any:
+    """JSON-ready copy of a value (tuples and frozen dicts of simulated data thawed)"""
+    if isinstance(value, dict):
+        return {key: _plain(item) for key, item in value.items()}
+    if isinstance(value, (list, tuple)):
+        return [_plain(item) for item in value]
+    return value
+
+
+class _Cached:
+    """as_dict()/to_json() and other derived values, computed once per object"""
+
+    __slots__ = ()
+
+    def cached(self, key: Any, compute: Callable[[], Any]) -> Any:
+        cache = self._cache  # type: ignore[attr-defined]
+        value = cache.get(key)
+        if value is None:
+            value = cache[key] = compute()
+        return value
+
+    def as_dict(self) -> Dict[str, Any]:
+        """Plain dict for data_sources and the history store (shared: don't modify it)"""
+        return self.cached("dict", self._build_dict)  # type: ignore[attr-defined]
+
+    def to_json(self) -> str:
+        return self.cached("json", lambda: json.dumps(self.as_dict(), separators=(",", ":")))
+
+
+@dataclass(frozen=True, slots=True)
+class TrendAffinity:
+    domain: Optional[str]
+    entities: Tuple[str, ...]
+    strength: Optional[float]
+    extra: Optional[Dict[str, Any]] = None
+
+    _KEYS = frozenset(("domain", "entities", "strength"))
+
+    @classmethod
+    def from_dict(cls, data: Dict[str, Any]) -> "TrendAffinity":
+        return cls(_text(data.get("domain")), _texts(data.get("entities")), _float(data.get("strength")),
+                   _extra(data, cls._KEYS))
+
+    def as_dict(self) -> Dict[str, Any]:
+        data: Dict[str, Any] = {"domain": self.domain, "entities": list(self.entities), "strength": self.strength}
+        data = {key: value for key, value in data.items() if value is not None}
+        return {**data, **_plain(self.extra)} if self.extra else data
+
+
+@dataclass(frozen=True, slots=True)
+class RegionalVariation:
+    region: Optional[str]
+    strength: Optional[float]
+    notable_difference: Optional[str]
+    extra: Optional[Dict[str, Any]] = None
+
+    _KEYS = frozenset(("region", "strength", "notable_difference"))
+
+    @classmethod
+    def from_dict(cls, data: Dict[str, Any]) -> "RegionalVariation":
+        return cls(_text(data.get("region")), _float(data.get("strength")), _text(data.get("notable_difference")),
+                   _extra(data, cls._KEYS))
+
+    def as_dict(self) -> Dict[str, Any]:
+        data = {"region": self.region, "strength": self.strength, "notable_difference": self.notable_difference}
+        data = {key: value for key, value in data.items() if value is not None}
+        return {**data, **_plain(self.extra)} if self.extra else data
+
+
+@dataclass(frozen=True, slots=True)
+class TrendPayload(_Cached):
+    """Qloo trend data (POST /trends/analyze)"""
+    query: Optional[str] = None
+    trend_strength: Optional[float] = None
+    cultural_affinities: Tuple[TrendAffinity, ...] = ()
+    regional_variations: Tuple[RegionalVariation, ...] = ()
+    related_concepts: Tuple[str, ...] = ()
+    extra: Optional[Dict[str, Any]] = None
+    simulated: bool = False
+    # Added by the pipeline
+    related_trends: Tuple[Dict[str, Any], ...] = ()    # Top related concepts (deep analyses)
+    strength_history: Optional[Dict[str, Any]] = None  # Trajectory stats (services.strength_history)
+    _cache: Dict[Any, Any] = field(default_factory=dict, init=False, repr=False, compare=False)
+
+    _KEYS = frozenset(("query", "trend_strength", "cultural_affinities", "regional_variations",
+                       "related_concepts", "related_trends", "strength_history"))
+
+    @classmethod
+    def from_dict(cls, data: Dict[str, Any], simulated: bool = False) -> "TrendPayload":
+        affinities = data.get("cultural_affinities")
+        regions = data.get("regional_variations")
+        related_trends = data.get("related_trends")
+        strength_history = data.get("strength_history")
+        return cls(
+            query=_text(data.get("query")),
+            trend_strength=_float(data.get("trend_strength")),
+            cultural_affinities=tuple(TrendAffinity.from_dict(item) for item in affinities
+                                      if isinstance(item, dict)) if isinstance(affinities, (list, tuple)) else (),
+            regional_variations=tuple(RegionalVariation.from_dict(item) for item in regions
+                                      if isinstance(item, dict)) if isinstance(regions, (list, tuple)) else (),
+            related_concepts=_texts(data.get("related_concepts")),
+            extra=_extra(data, cls._KEYS),
+            simulated=simulated,
+            related_trends=tuple(_plain(item) for item in related_trends
+                                 if isinstance(item, dict)) if isinstance(related_trends, (list, tuple)) else (),
+            strength_history=_plain(strength_history) if isinstance(strength_history, dict) else None
+        )
+
+    @classmethod
+    def decode(cls, content: Union[bytes, str]) -> "TrendPayload":
+        """Decode a Qloo response body (the only JSON parse a live payload gets)"""
+        data = json.loads(content)
+        if not isinstance(data, dict):
+            raise ValueError("Qloo trend response is not a JSON object")
+        return cls.from_dict(data)
+
+    @classmethod
+    def coerce(cls, data: Any) -> "TrendPayload":
+        """The payload itself, or a model of a dict (simulated dataset, history, benchmarks)"""
+        if isinstance(data, cls):
+            return data
+        return cls.from_dict(data if isinstance(data, dict) else {}, simulated=isinstance(data, FrozenPayload))
+
+    def _build_dict(self) -> Dict[str, Any]:
+        data: Dict[str, Any] = {}
+        if self.query is not None:
+            data["query"] = self.query
+        if self.trend_strength is not None:
+            data["trend_strength"] = self.trend_strength
+        data["cultural_affinities"] = [item.as_dict() for item in self.cultural_affinities]
+        data["regional_variations"] = [item.as_dict() for item in self.regional_variations]
+        data["related_concepts"] = list(self.related_concepts)
+        if self.extra:
+            data.update(_plain(self.extra))
+        if self.related_trends:
+            data["related_trends"] = list(self.related_trends)
+        if self.strength_history is not None:
+            data["strength_history"] = self.strength_history
+        return data
+
+
+@dataclass(frozen=True, slots=True)
+class AudiencePayload(_Cached):
+    """Qloo audience data (POST /audiences/analyze)"""
+    audience: Optional[str] = None
+    audience_size_estimate: Optional[Scalar] = None
+    cultural_affinities: Dict[str, Tuple[str, ...]] = field(default_factory=dict)  # Domain -> entities
+    content_preferences: Dict[str, Tuple[str, ...]] = field(default_factory=dict)  # e.g. format, tone, values
+    purchase_drivers: Tuple[str, ...] = ()
+    emerging_interests: Tuple[str, ...] = ()
+    extra: Optional[Dict[str, Any]] = None
+    simulated: bool = False
+    _cache: Dict[Any, Any] = field(default_factory=dict, init=False, repr=False, compare=False)
+
+    _KEYS = frozenset(("audience", "audience_size_estimate", "cultural_affinities", "content_preferences",
+                       "purchase_drivers", "emerging_interests"))
+
+    @classmethod
+    def from_dict(cls, data: Dict[str, Any], simulated: bool = False) -> "AudiencePayload":
+        affinities = data.get("cultural_affinities")
+        preferences = data.get("content_preferences")
+        size = data.get("audience_size_estimate")
+        return cls(
+            audience=_text(data.get("audience")),
+            audience_size_estimate=size if _text(size) is not None else None,
+            cultural_affinities={str(domain): _texts(entities) for domain, entities in affinities.items()}
+            if isinstance(affinities, dict) else {},
+            content_preferences={str(key): _texts(values) for key, values in preferences.items()}
+            if isinstance(preferences, dict) else {},
+            purchase_drivers=_texts(data.get("purchase_drivers")),
+            emerging_interests=_texts(data.get("emerging_interests")),
+            extra=_extra(data, cls._KEYS),
+            simulated=simulated
+        )
+
+    @classmethod
+    def decode(cls, content: Union[bytes, str]) -> "AudiencePayload":
+        """Decode a Qloo response body (the only JSON parse a live payload gets)"""
+        data = json.loads(content)
+        if not isinstance(data, dict):
+            raise ValueError("Qloo audience response is not a JSON object")
+        return cls.from_dict(data)
+
+    @classmethod
+    def coerce(cls, data: Any) -> "AudiencePayload":
+        """The payload itself, or a model of a dict (simulated dataset, history, benchmarks)"""
+        if isinstance(data, cls):
+            return data
+        return cls.from_dict(data if isinstance(data, dict) else {}, simulated=isinstance(data, FrozenPayload))
+
+    def _build_dict(self) -> Dict[str, Any]:
+        data: Dict[str, Any] = {}
+        if self.audience is not None:
+            data["audience"] = self.audience
+        if self.audience_size_estimate is not None:
+            data["audience_size_estimate"] = self.audience_size_estimate
+        data["cultural_affinities"] = {domain: list(entities) for domain, entities in self.cultural_affinities.items()}
+        data["content_preferences"] = {key: list(values) for key, values in self.content_preferences.items()}
+        data["purchase_drivers"] = list(self.purchase_drivers)
+        data["emerging_interests"] = list(self.emerging_interests)
+        if self.extra:
+            data.update(_plain(self.extra))
+        return data
+
+
+QlooPayload = Union[TrendPayload, AudiencePayload]
+
+# Simulated datasets as models, converted on first use and shared like the datasets themselves
+_simulated: Dict[int, Any] = {}
+
+
+def simulated_payload(model: Type[Model], dataset: FrozenPayload) -> Model:
+    payload = _simulated.get(id(dataset))
+    if payload is None:
+        payload = _simulated[id(dataset)] = model.from_dict(dataset, simulated=True)
+    return payload
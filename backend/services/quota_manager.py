@@ -0,0 +1,193 @@
+"""
+Quota manager - Token buckets for outbound Qloo and Gemini traffic
+
+Keeps us under the upstream quotas instead of discovering them through 429
+responses. Each upstream has a requests-per-minute bucket; Gemini also has a
+tokens-per-minute bucket charged with the estimated prompt + response size and
+corrected with the real usage once the response arrives.
+
+Buckets live in a small SQLite database so every gunicorn worker draws from
+the same budget; a take is one short IMMEDIATE transaction with a
+QUOTA_LOCK_TIMEOUT_MS busy timeout, so a contended store fails open instead
+of stalling the event loop. When a bucket is empty the call is not queued:
+try_acquire() returns False and the caller serves simulated or previously
+stored data right away. A worker that sees an empty bucket remembers when it
+refills and skips the database until then.
+
+An upstream 429 drains the bucket for everyone (penalize()), so all workers
+back off together.
+"""
+
+import os
+import sqlite3
+import threading
+import time
+from contextlib import closing
+from pathlib import Path
+from typing import Any, Dict, Optional, Tuple
+
+QUOTA_DB_PATH = os.getenv("QUOTA_DB_PATH") or str(Path(__file__).parent.parent / "data" / "quotas.db")
+
+# Share of a per-minute limit that may be spent in one burst. Capacity C plus refill
+# L-C per minute means no rolling minute ever exceeds L, matching upstream windows
+QUOTA_BURST = float(os.getenv("QUOTA_BURST", "0.1"))
+# Requests a request bucket holds at least, so one full retry sequence (up to 3 attempts) fits
+QUOTA_MIN_BURST = 3.0
+# How long a take waits for another worker's transaction before the call is allowed anyway
+QUOTA_LOCK_TIMEOUT = float(os.getenv("QUOTA_LOCK_TIMEOUT_MS", "50")) / 1000
+
+
+def _bucket(name: str, limit: float) -> Tuple[float, float]:
+    """(capacity, refill per second) for a per-minute limit"""
+    capacity = max(1.0, limit * QUOTA_BURST)
+    if name.endswith(":requests") and limit > QUOTA_MIN_BURST:
+        capacity = max(capacity, QUOTA_MIN_BURST)
+    if capacity >= limit:
+        # A bucket holds at least one request, so limits of one a minute or less are spaced out instead
+        return capacity, limit / 60.0
+    return capacity, (limit - capacity) / 60.0
+
+
+# bucket name -> (capacity, refill per second); 0 disables a bucket
+QUOTA_BUCKETS: Dict[str, Tuple[float, float]] = {
+    name: _bucket(name, float(limit))
+    for name, limit in {
+        "qloo:requests": os.getenv("QLOO_RPM", "60"),
+        "gemini:requests": os.getenv("GEMINI_RPM", "15"),
+        "gemini:tokens": os.getenv("GEMINI_TPM", "1000000"),
+    }.items()
+}
+
+
+class QuotaManager:
+    """Cross-worker token buckets for upstream APIs"""
+
+    def __init__(self, db_path: str = QUOTA_DB_PATH, buckets: Optional[Dict[str, Tuple[float, float]]] = None):
+        self.db_path = db_path
+        self.buckets = {name: spec for name, spec in (buckets or QUOTA_BUCKETS).items() if spec[1] > 0}
+        self._local = threading.local()
+        self._empty_until: Dict[str, float] = {}
+        self.stats: Dict[str, int] = {}
+        self.available = self._initialize()
+
+    def _initialize(self) -> bool:
+        try:
+            Path(self.db_path).parent.mkdir(parents=True, exist_ok=True)
+            # Workers start together: setting up the schema may wait longer than a take
+            with closing(sqlite3.connect(self.db_path, timeout=5.0, isolation_level=None)) as connection:
+                connection.execute("PRAGMA journal_mode=WAL")
+                connection.execute(
+                    "CREATE TABLE IF NOT EXISTS buckets (name TEXT PRIMARY KEY, tokens REAL NOT NULL, updated REAL NOT NULL)"
+                )
+            return True
+        except sqlite3.Error as e:
+            print(f"⚠️ Quota store unavailable ({e}), outbound quotas not enforced")
+            return False
+
+    def _connection(self) -> sqlite3.Connection:
+        connection = getattr(self._local, "connection", None)
+        if connection is None:
+            connection = sqlite3.connect(self.db_path, timeout=QUOTA_LOCK_TIMEOUT, isolation_level=None)
+            connection.execute("PRAGMA journal_mode=WAL")
+            connection.execute("PRAGMA synchronous=OFF")
+            self._local.connection = connection
+        return connection
+
+    def _count(self, key: str):
+        self.stats[key] = self.stats.get(key, 0) + 1
+
+    def _take(self, costs: Dict[str, float], force: bool = False) -> bool:
+        """Atomically refill and charge several buckets; all or nothing unless force"""
+        connection = self._connection()
+        now = time.time()
+        connection.execute("BEGIN IMMEDIATE")
+        try:
+            levels = {}
+            for name, cost in costs.items():
+                capacity, rate = self.buckets[name]
+                row = connection.execute("SELECT tokens, updated FROM buckets WHERE name = ?", (name,)).fetchone()
+                tokens = capacity if row is None else min(capacity, row[0] + (now - row[1]) * rate)
+                levels[name] = tokens
+                if tokens < cost and not force:
+                    # Remember locally when enough will have refilled
+                    self._empty_until[name] = now + (cost - tokens) / rate
+                    connection.execute("ROLLBACK")
+                    return False
+            connection.executemany(
+                "INSERT OR REPLACE INTO buckets (name, tokens, updated) VALUES (?, ?, ?)",
+                [(name, levels[name] - cost, now) for name, cost in costs.items()]
+            )
+            connection.execute("COMMIT")
+            return True
+        except sqlite3.Error:
+            connection.execute("ROLLBACK")
+            raise
+
+    def try_acquire(self, service: str, tokens: float = 0.0) -> bool:
+        """
+        Take one request (and optionally tokens) from a service's buckets.
+
+        Returns:
+            False when the quota is exhausted; the caller should not call upstream
+        """
+        costs = {f"{service}:requests": 1.0}
+        if tokens:
+            costs[f"{service}:tokens"] = tokens
+        costs = {name: cost for name, cost in costs.items() if name in self.buckets}
+        if not self.available or not costs:
+            return True
+
+        now = time.time()
+        if any(self._empty_until.get(name, 0.0) > now for name in costs):
+            self._count(f"{service}_denied")
+            return False
+        try:
+            granted = self._take(costs)
+        except sqlite3.Error as e:
+            # Never block traffic on the quota store itself
+            print(f"⚠️ Quota check failed, allowing call: {e}")
+            return True
+        self._count(f"{service}_{'granted' if granted else 'denied'}")
+        return granted
+
+    def exhausted(self, service: str) -> bool:
+        """Cheap local check: did this worker recently find the service's quota empty?"""
+        now = time.time()
+        return any(until > now for name, until in self._empty_until.items() if name.startswith(f"{service}:"))
+
+    def adjust(self, service: str, tokens: float):
+        """Charge (or refund, if negative) the difference between estimated and real token usage"""
+        name = f"{service}:tokens"
+        if not self.available or name not in self.buckets or not tokens:
+            return
+        try:
+            self._take({name: tokens}, force=True)
+        except sqlite3.Error as e:
+            print(f"⚠️ Could not record token usage: {e}")
+
+    def penalize(self, service: str, seconds: float = 10.0):
+        """Upstream said 429: empty the service's request bucket for all workers"""
+        name = f"{service}:requests"
+        if not self.available or name not in self.buckets:
+            return
+        capacity, rate = self.buckets[name]
+        self._count(f"{service}_throttled")
+        self._empty_until[name] = time.time() + seconds
+        try:
+            self._connection().execute(
+                "INSERT OR REPLACE INTO buckets (name, tokens, updated) VALUES (?, ?, ?)",
+                (name, -seconds * rate, time.time())
+            )
+        except sqlite3.Error as e:
+            print(f"⚠️ Could not record upstream throttling: {e}")
+
+    def snapshot(self) -> Dict[str, Any]:
+        return {
+            "limits_per_minute": {name: round(capacity + rate * 60) for name, (capacity, rate) in self.buckets.items()},
+            "shared_store": self.db_path if self.available else None,
+            **self.stats
+        }
+
+
+# Global quota manager instance
+quota_manager = QuotaManager()
@@ -0,0 +1,150 @@
+"""
+Region comparison - How one audience differs between regions
+
+Takes one Qloo audience payload per region and works out, in a single NumPy
+pass over a (regions x items) matrix, what each region over- and
+under-indexes on compared with the others, what all regions share and how
+much each region's affinities overlap with the rest. Items are the entities
+of every affinity domain plus purchase drivers and emerging interests,
+weighted by rank (Qloo lists the strongest first).
+
+The result is a compact diff that is small enough to send to Gemini in one
+consolidated prompt instead of one full analysis per region; when Gemini
+can't answer, comparison_insights() templates insights from the same diff.
+"""
+
+from datetime import datetime
+from typing import Any, Dict, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+from services.insight_engine import MAX_RULE_CONFIDENCE, MIN_RULE_CONFIDENCE
+from services.qloo_models import AudiencePayload
+
+
+# Rank weight a region must lead (or trail) the other regions' mean by to call an item out
+DISTINCTIVE_DELTA = 0.4
+DIFF_ITEMS_PER_REGION = 4
+SHARED_ITEMS = 6
+
+def _items(payload: AudiencePayload) -> List[Tuple[str, str, float]]:
+    """(category, item, rank weight) for one payload; the first item of a list weighs 1.0"""
+    lists = list(payload.cultural_affinities.items())
+    lists.append(("purchase_drivers", payload.purchase_drivers))
+    lists.append(("emerging_interests", payload.emerging_interests))
+
+    items = []
+    for category, entries in lists:
+        for position, entry in enumerate(entries):
+            items.append((category, entry, 1.0 - 0.5 * position / len(entries)))
+    return items
+
+
+def compare_regions(regions: Sequence[str], payloads: Sequence[Any]) -> Dict[str, Any]:
+    """
+    Compact per-region diff of audience payloads.
+
+    Returns:
+        {"shared": [...], "regions": [{"region", "audience_size", "similarity",
+        "distinctive", "less_prominent"}, ...]} where similarity is the mean
+        Jaccard overlap with the other regions
+    """
+    vocabulary: Dict[Tuple[str, str], int] = {}
+    labels: List[str] = []
+    cells: List[Tuple[int, int, float]] = []
+    payloads = [AudiencePayload.coerce(payload) for payload in payloads]
+    for row, payload in enumerate(payloads):
+        for category, item, weight in _items(payload):
+            key = (category, item.lower())
+            column = vocabulary.get(key)
+            if column is None:
+                column = vocabulary[key] = len(labels)
+                labels.append(item)
+            cells.append((row, column, weight))
+
+    weights = np.zeros((len(payloads), max(1, len(labels))))
+    if cells:
+        rows, columns, values = zip(*cells)
+        np.maximum.at(weights, (np.array(rows), np.array(columns)), np.array(values))
+    present = weights > 0
+
+    count = len(payloads)
+    others = max(1, count - 1)
+    # Each region against the mean of the other regions
+    delta = weights - (weights.sum(axis=0, keepdims=True) - weights) / others
+    # Pairwise Jaccard overlap of the item sets
+    overlap = present.astype(float) @ present.T.astype(float)
+    sizes = present.sum(axis=1)
+    with np.errstate(invalid="ignore", divide="ignore"):
+        jaccard = overlap / (sizes[:, None] + sizes[None, :] - overlap)
+    jaccard = np.nan_to_num(jaccard)
+    similarity = (jaccard.sum(axis=1) - np.diag(jaccard)) / others
+
+    distinctive_order = np.argsort(-delta, axis=1, kind="stable")[:, :DIFF_ITEMS_PER_REGION]
+    lacking_order = np.argsort(delta, axis=1, kind="stable")[:, :DIFF_ITEMS_PER_REGION]
+    shared_order = np.argsort(-weights.mean(axis=0), kind="stable")
+    shared_mask = present.all(axis=0) if count else np.zeros(len(labels), dtype=bool)
+
+    distinctive_order, lacking_order = distinctive_order.tolist(), lacking_order.tolist()
+    delta_rows, similarity = delta.tolist(), similarity.tolist()
+    return {
+        "shared": [labels[column] for column in shared_order.tolist()
+                   if column < len(labels) and shared_mask[column]][:SHARED_ITEMS],
+        "regions": [
+            {
+                "region": region,
+                "audience_size": payload.audience_size_estimate,
+                "similarity": round(similarity[row], 2),
+                "distinctive": [labels[column] for column in distinctive_order[row]
+                                if column < len(labels) and delta_rows[row][column] >= DISTINCTIVE_DELTA],
+                "less_prominent": [labels[column] for column in lacking_order[row]
+                                   if column < len(labels) and delta_rows[row][column] <= -DISTINCTIVE_DELTA],
+            }
+            for row, (region, payload) in enumerate(zip(regions, payloads))
+        ]
+    }
+
+
+def comparison_insights(target_audience: str, diff: Dict[str, Any],
+                        product_category: Optional[str] = None) -> Dict[str, Any]:
+    """Summary, per-region insights and recommendations templated from a region diff"""
+    regions = diff["regions"]
+    insights: List[Dict[str, Any]] = []
+    recommendations: List[str] = []
+    for entry in regions:
+        # The less a region overlaps with the others, the more its differences matter
+        confidence = round(min(MAX_RULE_CONFIDENCE, max(MIN_RULE_CONFIDENCE, 0.9 - 0.4 * entry["similarity"])), 2)
+        if entry["distinctive"]:
+            insights.append({
+                "title": f"{entry['region']}: Distinct Affinities",
+                "description": (f"{target_audience} in {entry['region']} stand out for {', '.join(entry['distinctive'][:3])}"
+                                + (f", and care less about {', '.join(entry['less_prominent'][:2])}" if entry["less_prominent"] else "")
+                                + "."),
+                "confidence": confidence,
+                "source": "qloo"
+            })
+            recommendations.append(f"Localize {product_category or 'campaigns'} in {entry['region']} around "
+                                   f"{', '.join(entry['distinctive'][:2])}")
+    if diff["shared"]:
+        insights.append({
+            "title": "Shared Across Regions",
+            "description": f"All regions share affinities for {', '.join(diff['shared'][:3])}.",
+            "confidence": MAX_RULE_CONFIDENCE,
+            "source": "qloo"
+        })
+        recommendations.append(f"Build a global core message on {', '.join(diff['shared'][:2])}")
+
+    most_different = min(regions, key=lambda entry: entry["similarity"]) if regions else None
+    if most_different is not None and most_different["similarity"] >= 1.0:
+        most_different = None  # Identical data everywhere
+    summary = (f"Qloo data for {target_audience} across {', '.join(entry['region'] for entry in regions)}"
+               + (f" overlaps on {', '.join(diff['shared'][:2])}" if diff["shared"] else " shows little overlap")
+               + (f"; {most_different['region']} differs most from the rest." if most_different is not None else "."))
+    return {
+        "target_audience": target_audience,
+        "generated_by": "rules",
+        "summary": summary,
+        "timestamp": datetime.now().isoformat(),
+        "insights": insights,
+        "recommendations": recommendations
+    }
@@ -0,0 +1,166 @@
+"""
+Retry policy - Jittered exponential backoff with retry budgets for upstream calls
+
+A transient Qloo or Gemini failure (timeout, connection reset, 5xx) is worth a
+second attempt; a 4xx or a 429 is not (quota is handled by the quota manager,
+and retrying a throttled upstream only adds load). Retries use "full jitter"
+backoff, uniform(0, min(max_delay, base_delay * 2**attempt)), and are skipped
+when the sleep plus another attempt would overrun the caller's deadline.
+
+Each upstream has a retry budget so retries cannot amplify an outage: every
+successful call deposits `ratio` tokens (default 0.1), every retry spends one,
+and a small reserve lets a quiet service retry at all. Retries are therefore
+capped at roughly 10% of successful traffic.
+
+Attempts, retries and budget refusals are counted in observability.metrics.
+"""
+
+import asyncio
+import os
+import random
+import threading
+import time
+from typing import Any, Awaitable, Callable, Optional
+
+import httpx
+
+from observability.metrics import metrics
+from observability.tracing import set_span_attributes
+
+metrics.describe("upstream_attempts_total", "Upstream call attempts by service and outcome")
+metrics.describe("upstream_retries_total", "Upstream retries by service and reason")
+metrics.describe("upstream_retries_skipped_total", "Retryable failures not retried, by service and why")
+
+RETRY_BUDGET_RATIO = float(os.getenv("RETRY_BUDGET_RATIO", "0.1"))
+
+RETRYABLE_STATUS = frozenset({500, 502, 503, 504})
+RETRYABLE_ERRORS = (
+    httpx.TimeoutException,
+    httpx.NetworkError,
+    httpx.RemoteProtocolError,
+    asyncio.TimeoutError,
+    ConnectionError,
+)
+# google.api_core exceptions, matched by name so the dependency stays optional
+RETRYABLE_ERROR_NAMES = frozenset({"ServiceUnavailable", "InternalServerError", "DeadlineExceeded", "GatewayTimeout"})
+
+
+def retry_reason(error: Optional[BaseException] = None, status_code: Optional[int] = None) -> Optional[str]:
+    """Why a failure is worth retrying, or None if it is not"""
+    if status_code is not None:
+        return f"http_{status_code}" if status_code in RETRYABLE_STATUS else None
+    if error is None:
+        return None
+    if isinstance(error, RETRYABLE_ERRORS) or type(error).__name__ in RETRYABLE_ERROR_NAMES:
+        return type(error).__name__
+    return None
+
+
+class RetryBudget:
+    """Token bucket that allows retries in proportion to successful calls"""
+
+    def __init__(self, ratio: float = RETRY_BUDGET_RATIO, reserve: float = 5.0, max_tokens: float = 50.0):
+        self.ratio = ratio
+        self.max_tokens = max_tokens
+        self.tokens = reserve
+        self._lock = threading.Lock()
+
+    def record_success(self):
+        with self._lock:
+            self.tokens = min(self.max_tokens, self.tokens + self.ratio)
+
+    def try_spend(self) -> bool:
+        with self._lock:
+            if self.tokens >= 1.0:
+                self.tokens -= 1.0
+                return True
+            return False
+
+    def refund(self):
+        """Return a token taken for a retry that was not made"""
+        with self._lock:
+            self.tokens = min(self.max_tokens, self.tokens + 1.0)
+
+
+class RetryPolicy:
+    """Retry an async upstream call with backoff, a deadline and a shared budget"""
+
+    def __init__(self, service: str, max_attempts: int = 3, base_delay: float = 0.1,
+                 max_delay: float = 2.0, budget: Optional[RetryBudget] = None):
+        self.service = service
+        self.max_attempts = max_attempts
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+        self.budget = budget or RetryBudget()
+
+    def backoff(self, retry_number: int) -> float:
+        return random.uniform(0.0, min(self.max_delay, self.base_delay * (2 ** retry_number)))
+
+    def _skip(self, why: str):
+        metrics.increment("upstream_retries_skipped_total", {"service": self.service, "why": why})
+
+    async def call(self, operation: Callable[[], Awaitable[Any]],
+                   status_of: Optional[Callable[[Any], Optional[int]]] = None,
+                   deadline: Optional[float] = None, expected_duration: float = 0.0,
+                   permit: Optional[Callable[[], bool]] = None) -> Any:
+        """
+        Run operation(), retrying transient failures.
+
+        Args:
+            operation: Makes one attempt
+            status_of: Extracts an HTTP status from a result (e.g. lambda r: r.status_code)
+                       so 5xx responses are retried too
+            deadline: time.monotonic() after which no new attempt is started
+            expected_duration: Typical attempt duration, used with the deadline
+            permit: Called before each retry the budget allows (e.g. to take upstream quota); False stops retrying
+
+        Returns:
+            The last result; a retryable status is returned as-is once retries run out
+
+        Raises:
+            The last exception once retries run out, or at once if it is not retryable
+        """
+        retry_number = 0
+        while True:
+            try:
+                result = await operation()
+                error, reason = None, retry_reason(status_code=status_of(result)) if status_of else None
+            except Exception as e:
+                result, error, reason = None, e, retry_reason(error=e)
+
+            if reason is None:
+                outcome = "success" if error is None else "error"
+                metrics.increment("upstream_attempts_total", {"service": self.service, "outcome": outcome})
+                if error is None:
+                    self.budget.record_success()
+                    return result
+                raise error
+
+            metrics.increment("upstream_attempts_total", {"service": self.service, "outcome": "retryable"})
+            delay = self.backoff(retry_number)
+            retry_number += 1
+            if retry_number >= self.max_attempts:
+                self._skip("attempts")
+            elif deadline is not None and time.monotonic() + delay + expected_duration > deadline:
+                self._skip("deadline")
+            elif not self.budget.try_spend():
+                self._skip("budget")
+            elif permit is not None and not permit():
+                # Checked last, since it may take upstream quota; the budget token goes back
+                self.budget.refund()
+                self._skip("quota")
+            else:
+                metrics.increment("upstream_retries_total", {"service": self.service, "reason": reason})
+                set_span_attributes({f"{self.service}.retries": retry_number})
+                print(f"🔁 Retrying {self.service} after {reason} (attempt {retry_number + 1}, in {delay:.2f}s)")
+                await asyncio.sleep(delay)
+                continue
+
+            if error is not None:
+                raise error
+            return result
+
+
+# Shared policies (one retry budget per upstream)
+qloo_retry = RetryPolicy("qloo", max_attempts=3, base_delay=0.1, max_delay=1.0)
+gemini_retry = RetryPolicy("gemini", max_attempts=2, base_delay=0.5, max_delay=2.0)
@@ -0,0 +1,278 @@
+"""
+Similarity cache - Serves near-duplicate trend queries from recent analyses
+
+"Sustainable fashion trends", "sustainable fashion" and "eco-friendly fashion
+trends" should not each pay for a full Qloo + Gemini run. Queries are reduced
+to sets of content terms (stopwords dropped, light stemming, a small synonym
+table) and compared with set cosine similarity:
+
+    similarity = |A ∩ B| / sqrt(|A| * |B|)
+
+Lookups stay sub-millisecond at hundreds of thousands of entries because only
+a few candidates are ever scored. A match at threshold t must share at least
+one of the query's rarest |A| - ceil(t² |A|) + 1 terms (prefix filtering) and
+have between t²|A| and |A|/t² terms (length filtering), so only the postings
+of those rare terms are read (at most the newest SIMILARITY_MAX_CANDIDATES
+rows of each). Candidates are then scored with vectorized binary searches into
+each query term's sorted postings. Exact term-set matches skip all of this.
+
+Entries live in separate indexes per context (industry, timeframe, depth), so
+a match never crosses contexts. Matches resolve to a request key in the
+analysis store, which still decides freshness and whether the result is live.
+"""
+
+import math
+import os
+import re
+import threading
+import time
+from typing import Dict, List, Optional, Tuple
+
+import numpy as np
+
+from services.analysis_store import analysis_store, normalize_query
+
+SIMILARITY_CACHE_ENABLED = os.getenv("SIMILARITY_CACHE_ENABLED", "true").lower() in ("1", "true", "yes")
+SIMILARITY_THRESHOLD = float(os.getenv("SIMILARITY_THRESHOLD", "0.85"))
+SIMILARITY_MAX_CANDIDATES = 4096  # Newest rows read per prefix term; bounds lookups on very common words
+SIMILARITY_MAX_ENTRIES = int(os.getenv("SIMILARITY_MAX_ENTRIES", "500000"))  # Per context, before expired rows are dropped
+
+_STOPWORDS = frozenset("""
+a an and are as at be by for from how in into is it of on or the to what with
+trend trends trending analysis analyze market markets industry future latest new
+""".split())
+
+# Phrases and words treated as the same concept (applied after normalize_query)
+_PHRASE_SYNONYMS = (
+    ("eco friendly", "sustainable"),
+    ("environmentally friendly", "sustainable"),
+    ("artificial intelligence", "ai"),
+    ("machine learning", "ai"),
+    ("gen z", "genz"),
+    ("generation z", "genz"),
+)
+_WORD_SYNONYMS = {
+    "green": "sustainable",
+    "sustainability": "sustainable",
+    "ethical": "sustainable",
+    "apparel": "fashion",
+    "clothing": "fashion",
+    "clothes": "fashion",
+    "millennial": "millennials",
+    "technology": "tech",
+}
+_PHRASES = [(re.compile(rf"\b{phrase}\b"), replacement) for phrase, replacement in _PHRASE_SYNONYMS]
+
+
+def _stem(word: str) -> str:
+    if len(word) > 4 and word.endswith("ies"):
+        return word[:-3] + "y"
+    if len(word) > 3 and word.endswith("s") and not word.endswith("ss"):
+        return word[:-1]
+    return word
+
+
+def query_terms(text: str) -> Tuple[str, ...]:
+    """Content terms of a query, deduplicated and sorted"""
+    normalized = normalize_query(text)
+    for pattern, replacement in _PHRASES:
+        normalized = pattern.sub(replacement, normalized)
+    terms = set()
+    for word in normalized.split():
+        if word in _STOPWORDS:
+            continue
+        word = _WORD_SYNONYMS.get(word, word)
+        terms.add(_WORD_SYNONYMS.get(_stem(word), _stem(word)))
+    return tuple(sorted(terms))
+
+
+class _Growable:
+    """Append-only NumPy array with amortized doubling"""
+
+    def __init__(self, dtype, capacity: int = 64):
+        self.data = np.empty(capacity, dtype=dtype)
+        self.size = 0
+
+    def extend(self, values):
+        needed = self.size + len(values)
+        if needed > len(self.data):
+            grown = np.empty(max(needed, len(self.data) * 2), dtype=self.data.dtype)
+            grown[:self.size] = self.data[:self.size]
+            self.data = grown
+        self.data[self.size:needed] = values
+        self.size = needed
+
+    def view(self) -> np.ndarray:
+        return self.data[:self.size]
+
+
+class SimilarityIndex:
+    """Term-set cosine index with prefix-filtered candidates and vectorized scoring"""
+
+    def __init__(self):
+        self._vocab: Dict[str, int] = {}
+        self._postings: List[_Growable] = []  # term id -> row ids
+        self._terms = _Growable(np.int32, 1024)  # flat term ids of all rows
+        self._offsets = _Growable(np.int64, 256)
+        self._sizes = _Growable(np.int32, 256)
+        self._created = _Growable(np.float64, 256)
+        self._request_keys: List[str] = []
+        self._queries: List[str] = []
+        self._row_of_key: Dict[str, int] = {}
+        self._row_of_terms: Dict[Tuple[str, ...], int] = {}  # Newest row per exact term set
+
+    def __len__(self) -> int:
+        return len(self._request_keys)
+
+    def _term_id(self, term: str) -> int:
+        term_id = self._vocab.get(term)
+        if term_id is None:
+            term_id = self._vocab[term] = len(self._postings)
+            self._postings.append(_Growable(np.int32, 4))
+        return term_id
+
+    def add(self, terms: Tuple[str, ...], request_key: str, query: str, created_at: float):
+        if not terms:
+            return
+        row = self._row_of_key.get(request_key)
+        if row is not None:
+            # Same request seen again: just refresh its timestamp
+            self._created.data[row] = created_at
+            self._queries[row] = query
+            self._row_of_terms[terms] = row
+            return
+        row = len(self._request_keys)
+        term_ids = [self._term_id(term) for term in terms]
+        self._offsets.extend([self._terms.size])
+        self._sizes.extend([len(term_ids)])
+        self._created.extend([created_at])
+        self._terms.extend(term_ids)
+        for term_id in term_ids:
+            self._postings[term_id].extend([row])
+        self._request_keys.append(request_key)
+        self._queries.append(query)
+        self._row_of_key[request_key] = row
+        self._row_of_terms[terms] = row
+
+    def search(self, terms: Tuple[str, ...], threshold: float,
+               min_created: float = 0.0) -> Optional[Tuple[str, str, float]]:
+        """Best match as (request_key, query, similarity), or None below threshold"""
+        # Paraphrases usually reduce to exactly the same terms
+        row = self._row_of_terms.get(terms)
+        if row is not None and self._created.data[row] >= min_created:
+            return self._request_keys[row], self._queries[row], 1.0
+
+        known = [self._vocab[term] for term in terms if term in self._vocab]
+        if not terms or not known:
+            return None
+        n_query = len(terms)
+        # Overlap needed for a match: t * sqrt(|A||B|) >= t^2 |A|, so one of the rarest
+        # |A| - ceil(t^2 |A|) + 1 terms must be shared. Unknown terms are the rarest of all
+        # (no postings), so they use up prefix slots without contributing candidates
+        prefix = n_query - math.ceil(threshold * threshold * n_query - 1e-9) + 1 - (n_query - len(known))
+        if prefix <= 0:
+            return None
+        by_rarity = sorted(known, key=lambda term_id: self._postings[term_id].size)
+        rarest = by_rarity[:prefix]
+        # Only the newest rows of each posting are read. A row in several prefix postings
+        # is scored more than once; the scores are identical
+        if len(rarest) == 1:
+            candidates = self._postings[rarest[0]].view()[-SIMILARITY_MAX_CANDIDATES:]
+        else:
+            candidates = np.concatenate([
+                self._postings[term_id].view()[-SIMILARITY_MAX_CANDIDATES:] for term_id in rarest
+            ])
+        # Length filter: |B| must lie in [t^2 |A|, |A| / t^2] to reach the threshold
+        sizes = self._sizes.data[candidates]
+        keep = (sizes >= threshold * threshold * n_query - 1e-9) & (sizes <= n_query / (threshold * threshold) + 1e-9)
+        if min_created:
+            keep &= self._created.data[candidates] >= min_created
+        candidates, sizes = candidates[keep], sizes[keep]
+        if len(candidates) == 0:
+            return None
+
+        # Count shared terms: postings are sorted by row, so membership is a binary search
+        overlap = np.zeros(len(candidates), dtype=np.int32)
+        for term_id in by_rarity:
+            postings = self._postings[term_id].view()
+            found = np.searchsorted(postings, candidates)
+            found[found == len(postings)] = 0
+            overlap += postings[found] == candidates
+        similarity = overlap / np.sqrt(n_query * sizes)
+
+        best = int(np.argmax(similarity))
+        if similarity[best] < threshold:
+            return None
+        row = int(candidates[best])
+        return self._request_keys[row], self._queries[row], float(similarity[best])
+
+    def compacted(self, min_created: float) -> "SimilarityIndex":
+        """A new index holding only the rows created at or after min_created"""
+        index = SimilarityIndex()
+        created = self._created.view()
+        id_to_term = {term_id: term for term, term_id in self._vocab.items()}
+        for row in np.flatnonzero(created >= min_created):
+            start = self._offsets.data[row]
+            terms = tuple(id_to_term[int(term_id)] for term_id in self._terms.data[start:start + self._sizes.data[row]])
+            index.add(terms, self._request_keys[row], self._queries[row], float(created[row]))
+        return index
+
+
+class SimilarityCache:
+    """Per-context similarity indexes over recent trend analyses"""
+
+    def __init__(self, threshold: float = SIMILARITY_THRESHOLD, max_entries: int = SIMILARITY_MAX_ENTRIES,
+                 enabled: bool = SIMILARITY_CACHE_ENABLED):
+        self.threshold = threshold
+        self.max_entries = max_entries
+        self.enabled = enabled and analysis_store.available
+        self._indexes: Dict[str, SimilarityIndex] = {}
+        self._lock = threading.Lock()
+        self._warmed = False
+
+    @staticmethod
+    def _context(industry: Optional[str], timeframe: Optional[str], depth: Optional[str]) -> str:
+        return "|".join(normalize_query(part) for part in (industry, timeframe, depth))
+
+    def warm(self):
+        """Load live analyses still within the store TTL (called once at startup)"""
+        if not self.enabled or self._warmed:
+            return
+        self._warmed = True
+        rows = analysis_store.recent_live("trend")
+        for row in rows:
+            self.add(row["query"], row["request_key"], row["industry"], row["timeframe"], row["depth"],
+                     created_at=row["created_at"])
+        if rows:
+            print(f"🧭 Similarity cache warmed with {len(rows)} recent analyses")
+
+    def add(self, query: str, request_key: str, industry: Optional[str] = None,
+            timeframe: Optional[str] = None, depth: Optional[str] = None, created_at: Optional[float] = None):
+        if not self.enabled:
+            return
+        context = self._context(industry, timeframe, depth)
+        with self._lock:
+            index = self._indexes.get(context)
+            if index is None:
+                index = self._indexes[context] = SimilarityIndex()
+            elif len(index) >= self.max_entries:
+                index = self._indexes[context] = index.compacted(time.time() - analysis_store.cache_ttl)
+            index.add(query_terms(query), request_key, query, created_at or time.time())
+
+    def find(self, query: str, industry: Optional[str] = None, timeframe: Optional[str] = None,
+             depth: Optional[str] = None) -> Optional[Tuple[str, str, float]]:
+        """Closest recent request in the same context as (request_key, query, similarity)"""
+        if not self.enabled:
+            return None
+        index = self._indexes.get(self._context(industry, timeframe, depth))
+        if index is None:
+            return None
+        with self._lock:
+            return index.search(query_terms(query), self.threshold, time.time() - analysis_store.cache_ttl)
+
+    def size(self) -> int:
+        return sum(len(index) for index in self._indexes.values())
+
+
+# Global similarity cache instance
+similarity_cache = SimilarityCache()
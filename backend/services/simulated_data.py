@@ -0,0 +1,271 @@
+"""
+Simulated Qloo datasets - Immutable fallback payloads shared across requests
+
+The demo/fallback path used to rebuild large nested dict literals on every call.
+These datasets are now frozen once at import time and handed out without copying,
+together with a cached JSON encoding for prompt building and serialization.
+"""
+
+import json
+from typing import Any, Dict, Optional, Tuple
+
+
+def _readonly(*args, **kwargs):
+    raise TypeError("FrozenPayload is read-only; call thaw() for a mutable copy")
+
+
+class FrozenPayload(dict):
+    """Read-only dict with nested tuples/FrozenPayloads and cached JSON encodings"""
+
+    __slots__ = ("_json_cache",)
+
+    def __init__(self, data: Dict[str, Any]):
+        super().__init__((key, _freeze(value)) for key, value in data.items())
+        self._json_cache: Dict[Optional[int], str] = {}
+
+    __setitem__ = __delitem__ = _readonly
+    clear = pop = popitem = setdefault = update = _readonly
+    __ior__ = _readonly
+
+    def __hash__(self):
+        return hash(self.to_json())
+
+    def __copy__(self):
+        return self
+
+    def __deepcopy__(self, memo):
+        return self
+
+    def __reduce__(self):
+        return (FrozenPayload, (self.thaw(),))
+
+    def to_json(self, indent: Optional[int] = None) -> str:
+        """Return the JSON encoding, computed once per indent setting"""
+        encoded = self._json_cache.get(indent)
+        if encoded is None:
+            separators = (",", ":") if indent is None else None
+            encoded = json.dumps(self, indent=indent, separators=separators)
+            self._json_cache[indent] = encoded
+        return encoded
+
+    def thaw(self) -> Dict[str, Any]:
+        """Return a fully mutable deep copy"""
+        return {key: _thaw(value) for key, value in self.items()}
+
+
+def _freeze(value: Any) -> Any:
+    if isinstance(value, FrozenPayload):
+        return value
+    if isinstance(value, dict):
+        return FrozenPayload(value)
+    if isinstance(value, (list, tuple)):
+        return tuple(_freeze(item) for item in value)
+    return value
+
+
+def _thaw(value: Any) -> Any:
+    if isinstance(value, dict):
+        return {key: _thaw(item) for key, item in value.items()}
+    if isinstance(value, tuple):
+        return [_thaw(item) for item in value]
+    return value
+
+
+def is_simulated(data: Any) -> bool:
+    """Whether a Qloo payload is one of the simulated datasets (or a model of one, see services.qloo_models)"""
+    return isinstance(data, FrozenPayload) or getattr(data, "simulated", False) is True
+
+
+def dumps_payload(data: Any, indent: Optional[int] = None) -> str:
+    """json.dumps that reuses the cached encoding of frozen payloads"""
+    if isinstance(data, FrozenPayload):
+        return data.to_json(indent)
+    return json.dumps(data, indent=indent)
+
+
+# ---------------------------------------------------------------------------
+# Trend datasets (keyed by topic keywords)
+# ---------------------------------------------------------------------------
+
+TREND_FASHION = FrozenPayload({
+    "trend_strength": 0.85,
+    "cultural_affinities": [
+        {"domain": "Music", "entities": ["Alternative R&B", "Bedroom Pop", "Korean Hip Hop"], "strength": 0.78},
+        {"domain": "Media", "entities": ["TikTok", "Instagram Reels", "YouTube Shorts"], "strength": 0.92},
+        {"domain": "Values", "entities": ["Sustainability", "Individuality", "Global Citizenship"], "strength": 0.81},
+    ],
+    "regional_variations": [
+        {"region": "North America", "strength": 0.88, "notable_difference": "Higher focus on sustainability"},
+        {"region": "Europe", "strength": 0.79, "notable_difference": "Greater emphasis on timeless design"},
+        {"region": "Asia", "strength": 0.93, "notable_difference": "Faster adoption cycle, digital-first discovery"}
+    ],
+    "related_concepts": ["Upcycling", "Digital Fashion", "Gender-Neutral Design", "Micro-Seasons"]
+})
+
+TREND_TECH = FrozenPayload({
+    "trend_strength": 0.91,
+    "cultural_affinities": [
+        {"domain": "Media", "entities": ["Tech Podcasts", "YouTube Reviews", "Tech Forums"], "strength": 0.87},
+        {"domain": "Values", "entities": ["Innovation", "Efficiency", "Privacy"], "strength": 0.84},
+        {"domain": "Activities", "entities": ["Gaming", "Remote Work", "DIY Electronics"], "strength": 0.79},
+    ],
+    "regional_variations": [
+        {"region": "North America", "strength": 0.85, "notable_difference": "Early adoption focus"},
+        {"region": "Europe", "strength": 0.82, "notable_difference": "Greater regulatory awareness"},
+        {"region": "Asia", "strength": 0.94, "notable_difference": "Integration with daily lifestyle"}
+    ],
+    "related_concepts": ["AI Ethics", "Digital Wellness", "Tech Minimalism", "Sustainable Tech"]
+})
+
+TREND_FOOD = FrozenPayload({
+    "trend_strength": 0.83,
+    "cultural_affinities": [
+        {"domain": "Media", "entities": ["Food Blogs", "Instagram", "TikTok Recipes"], "strength": 0.89},
+        {"domain": "Values", "entities": ["Authenticity", "Sustainability", "Wellness"], "strength": 0.85},
+        {"domain": "Activities", "entities": ["Home Cooking", "Farmers Markets", "Food Tourism"], "strength": 0.91},
+    ],
+    "regional_variations": [
+        {"region": "North America", "strength": 0.82, "notable_difference": "Fusion experimentation"},
+        {"region": "Europe", "strength": 0.87, "notable_difference": "Heritage preservation focus"},
+        {"region": "Asia", "strength": 0.90, "notable_difference": "Digital food community engagement"}
+    ],
+    "related_concepts": ["Plant-Based Innovation", "Hyper-Local Sourcing", "Food Waste Reduction", "Ghost Kitchens"]
+})
+
+TREND_GENERIC = FrozenPayload({
+    "trend_strength": 0.75,
+    "cultural_affinities": [
+        {"domain": "Media", "entities": ["Social Media", "Streaming Content", "Podcasts"], "strength": 0.82},
+        {"domain": "Values", "entities": ["Authenticity", "Community", "Sustainability"], "strength": 0.79},
+        {"domain": "Activities", "entities": ["Content Creation", "Online Communities", "Skill Development"], "strength": 0.76},
+    ],
+    "regional_variations": [
+        {"region": "North America", "strength": 0.77, "notable_difference": "Early mainstream adoption"},
+        {"region": "Europe", "strength": 0.74, "notable_difference": "Traditional-modern integration"},
+        {"region": "Asia", "strength": 0.81, "notable_difference": "Digital-first engagement"}
+    ],
+    "related_concepts": ["Community Building", "Digital Transformation", "Personalization", "Micro-Trends"]
+})
+
+# Checked in order; the first matching keyword group wins
+TREND_DATASETS: Tuple[Tuple[Tuple[str, ...], FrozenPayload], ...] = (
+    (("fashion", "clothing", "apparel"), TREND_FASHION),
+    (("tech", "technology", "digital"), TREND_TECH),
+    (("food", "culinary", "cuisine"), TREND_FOOD),
+)
+
+# ---------------------------------------------------------------------------
+# Audience datasets (keyed by audience keywords)
+# ---------------------------------------------------------------------------
+
+AUDIENCE_GEN_Z = FrozenPayload({
+    "audience_size_estimate": "Large",
+    "cultural_affinities": {
+        "music": ["Hip Hop", "Hyperpop", "Indie Pop", "K-Pop"],
+        "media": ["TikTok", "YouTube", "Twitch", "Discord"],
+        "brands": ["Nike", "Glossier", "The Ordinary", "Crocs"],
+        "activities": ["Social Media Content Creation", "Gaming", "Thrifting", "Social Activism"]
+    },
+    "content_preferences": {
+        "format": ["Short-form video", "Memes", "Interactive", "Audio"],
+        "tone": ["Authentic", "Humorous", "Direct", "Educational"],
+        "values": ["Inclusivity", "Sustainability", "Transparency", "Social Justice"]
+    },
+    "purchase_drivers": ["Peer Recommendation", "Brand Values", "Social Media Presence", "Uniqueness"],
+    "emerging_interests": ["Virtual Fashion", "Creator Economy", "Plant-Based Products", "Mental Health Advocacy"]
+})
+
+AUDIENCE_MILLENNIAL = FrozenPayload({
+    "audience_size_estimate": "Very Large",
+    "cultural_affinities": {
+        "music": ["Indie Rock", "90s Nostalgia", "Electronic", "Folk Pop"],
+        "media": ["Instagram", "Podcasts", "Netflix", "Newsletter Subscriptions"],
+        "brands": ["Patagonia", "Apple", "Trader Joe's", "Allbirds"],
+        "activities": ["Home Improvement", "Fitness Classes", "Cooking", "Travel"]
+    },
+    "content_preferences": {
+        "format": ["Long-form articles", "Podcasts", "Curated newsletters", "Documentary-style"],
+        "tone": ["Informative", "Nostalgic", "Witty", "Practical"],
+        "values": ["Work-Life Balance", "Wellness", "Sustainability", "Financial Security"]
+    },
+    "purchase_drivers": ["Quality", "Convenience", "Ethical Production", "Status Signaling"],
+    "emerging_interests": ["Home Ownership Alternatives", "Career Pivots", "Plant Parenthood", "Wellness Tech"]
+})
+
+AUDIENCE_SENIOR = FrozenPayload({
+    "audience_size_estimate": "Medium-Large",
+    "cultural_affinities": {
+        "music": ["Classic Rock", "Jazz", "Classical", "Folk"],
+        "media": ["Facebook", "Cable News", "YouTube", "Print Media"],
+        "brands": ["Land's End", "Costco", "Subaru", "Apple"],
+        "activities": ["Gardening", "Travel", "Family Activities", "Reading"]
+    },
+    "content_preferences": {
+        "format": ["Detailed articles", "How-to guides", "Videos with captions", "Email newsletters"],
+        "tone": ["Respectful", "Clear", "Non-patronizing", "Expert"],
+        "values": ["Reliability", "Value", "Tradition", "Practicality"]
+    },
+    "purchase_drivers": ["Reliability", "Customer Service", "Familiarity", "Value for Money"],
+    "emerging_interests": ["Health Tech", "Multi-generational Travel", "Encore Careers", "Digital Connectivity"]
+})
+
+AUDIENCE_GENERIC = FrozenPayload({
+    "audience_size_estimate": "Medium",
+    "cultural_affinities": {
+        "music": ["Pop", "Rock", "R&B", "Indie"],
+        "media": ["Social Media", "Streaming Services", "News Sites", "Blogs"],
+        "brands": ["Amazon", "Target", "Nike", "Apple"],
+        "activities": ["Social Media", "Entertainment", "Shopping", "Dining"]
+    },
+    "content_preferences": {
+        "format": ["Video", "Images with text", "Articles", "Interactive"],
+        "tone": ["Conversational", "Authentic", "Clear", "Engaging"],
+        "values": ["Convenience", "Quality", "Affordability", "Innovation"]
+    },
+    "purchase_drivers": ["Price", "Convenience", "Recommendations", "Brand Reputation"],
+    "emerging_interests": ["Digital Wellness", "Sustainable Products", "Personalization", "Community Connection"]
+})
+
+AUDIENCE_DATASETS: Tuple[Tuple[Tuple[str, ...], FrozenPayload], ...] = (
+    (("gen z", "young", "teen"), AUDIENCE_GEN_Z),
+    (("millennial", "30", "young professional"), AUDIENCE_MILLENNIAL),
+    (("senior", "boomer", "older"), AUDIENCE_SENIOR),
+)
+
+# ---------------------------------------------------------------------------
+# Minimal fallbacks when no data is available at all
+# ---------------------------------------------------------------------------
+
+TREND_FALLBACK = FrozenPayload({
+    "trend_strength": 0.5,
+    "cultural_affinities": [],
+    "regional_variations": [],
+    "related_concepts": [],
+    "note": "Limited data available. This is fallback data due to API unavailability."
+})
+
+AUDIENCE_FALLBACK = FrozenPayload({
+    "audience_size_estimate": "Unknown",
+    "cultural_affinities": {},
+    "content_preferences": {},
+    "purchase_drivers": [],
+    "emerging_interests": [],
+    "note": "Limited data available. This is fallback data due to API unavailability."
+})
+
+
+def match_dataset(text: str, datasets: Tuple[Tuple[Tuple[str, ...], FrozenPayload], ...],
+                  default: FrozenPayload) -> FrozenPayload:
+    """Pick the shared dataset whose keywords appear in the text"""
+    text_lower = text.lower()
+    for keywords, payload in datasets:
+        if any(keyword in text_lower for keyword in keywords):
+            return payload
+    return default
+
+
+# Warm the compact encodings so the first request doesn't pay for them
+for _payload in (TREND_FASHION, TREND_TECH, TREND_FOOD, TREND_GENERIC,
+                 AUDIENCE_GEN_Z, AUDIENCE_MILLENNIAL, AUDIENCE_SENIOR, AUDIENCE_GENERIC,
+                 TREND_FALLBACK, AUDIENCE_FALLBACK):
+    _payload.to_json()
@@ -0,0 +1,411 @@
+"""
+Strength history - Append-only time series of Qloo trend strengths
+
+Every live Qloo trend payload is appended as strength snapshots: one point
+for the overall trend_strength and one per affinity domain, keyed by series
+(query + industry, domain). Stats computed over these series in one
+vectorized batch (averages, growth per week, a linear forecast over the
+request's timeframe) are added to the trend data as "strength_history", so
+the trajectory insight is backed by numbers instead of boilerplate.
+
+Storage is columnar NumPy memmaps under STRENGTH_HISTORY_DIR, three files per
+segment (series id int32, timestamp float64, value float32):
+
+- each process appends to its own fixed-size "active" segment, so gunicorn
+  workers never write to the same file; a range query scans the (small)
+  active segments with a mask
+- a full active segment is "sealed": sorted by (series, timestamp) and
+  rewritten, so range queries on sealed segments are two binary searches
+  no matter how many millions of points they hold
+- series ids are assigned in a small SQLite table shared by all workers
+
+Active segments left behind by a dead process are sealed by the next
+process that opens the store.
+"""
+
+import os
+import re
+import sqlite3
+import threading
+import time
+from pathlib import Path
+from typing import Any, Dict, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+from services.qloo_models import TrendPayload
+
+STRENGTH_HISTORY_ENABLED = os.getenv("STRENGTH_HISTORY_ENABLED", "true").lower() in ("1", "true", "yes")
+STRENGTH_HISTORY_DIR = os.getenv("STRENGTH_HISTORY_DIR") or str(Path(__file__).parent.parent / "data" / "strengths")
+STRENGTH_SEGMENT_ROWS = int(os.getenv("STRENGTH_SEGMENT_ROWS", str(1 << 18)))   # Points per active segment (4 MB)
+TRAJECTORY_WINDOW_DAYS = float(os.getenv("TRAJECTORY_WINDOW_DAYS", "30"))      # History the stats look back on
+RECENT_WINDOW_DAYS = 7.0
+MIN_TRAJECTORY_POINTS = 3
+MIN_TRAJECTORY_SPAN_DAYS = 1.0                                                  # History needed before growth is reported
+DEFAULT_HORIZON_DAYS = 180.0
+SEGMENT_REFRESH_INTERVAL = 1.0                                                  # Seconds between directory rescans
+
+# Column name -> dtype; the timestamp column is written last, so a nonzero timestamp marks a complete row
+COLUMNS: Tuple[Tuple[str, Any], ...] = (("series", np.int32), ("value", np.float32), ("ts", np.float64))
+OVERALL = ""  # Domain name of the overall trend_strength series
+
+SECONDS_PER_DAY = 86400.0
+_TIMEFRAME_PATTERN = re.compile(r"(\d+(?:\.\d+)?)\s*(day|week|month|year)", re.IGNORECASE)
+_UNIT_DAYS = {"day": 1.0, "week": 7.0, "month": 30.0, "year": 365.0}
+
+
+def timeframe_days(timeframe: Optional[str]) -> float:
+    """Forecast horizon for a request timeframe such as '3 months' or '6-12 months' (the first number counts)"""
+    match = _TIMEFRAME_PATTERN.search(re.sub(r"(\d+)\s*-\s*\d+", r"\1", timeframe or ""))
+    if match is None:
+        return DEFAULT_HORIZON_DAYS
+    return float(match.group(1)) * _UNIT_DAYS[match.group(2).lower()]
+
+
+def _pid_alive(pid: int) -> bool:
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        return True
+    return True
+
+
+class _Segment:
+    """One segment's columns; sealed segments are sorted by (series, ts)"""
+
+    def __init__(self, directory: Path, stem: str, sealed: bool, rows: Optional[int] = None, writable: bool = False):
+        self.stem = stem
+        self.sealed = sealed
+        self.columns: Dict[str, np.ndarray] = {}
+        for name, dtype in COLUMNS:
+            path = directory / f"{stem}.{name}"
+            if writable:
+                mapped = np.memmap(path, dtype=dtype, mode="w+", shape=(rows,))
+            else:
+                mapped = np.memmap(path, dtype=dtype, mode="r")
+            # Plain ndarray views of the mapping: same memory, without memmap's per-slice overhead
+            self.columns[name] = mapped.view(np.ndarray)
+        self.capacity = len(self.columns["ts"])
+        self.count = 0 if writable else (self.capacity if sealed else None)
+
+    def filled(self) -> int:
+        """Complete rows (another process may still be appending to an active segment)"""
+        if self.count is not None:
+            return self.count
+        ts = self.columns["ts"]
+        low, high = 0, self.capacity
+        while low < high:
+            middle = (low + high) // 2
+            if ts[middle] > 0:
+                low = middle + 1
+            else:
+                high = middle
+        return low
+
+    def points(self, series_ids: Sequence[int], since: float) -> List[Tuple[np.ndarray, np.ndarray]]:
+        """(timestamps, values) since a time for each series"""
+        ts, values, series = self.columns["ts"], self.columns["value"], self.columns["series"]
+        result = []
+        if self.sealed:
+            for series_id in series_ids:
+                # Search with the column's own dtype, or NumPy converts the whole column first
+                key = np.int32(series_id)
+                low = int(np.searchsorted(series, key, "left"))
+                high = int(np.searchsorted(series, key, "right"))
+                start = low + int(np.searchsorted(ts[low:high], since, "left"))
+                result.append((ts[start:high], values[start:high]))
+            return result
+        # Active segments are in arrival order: one scan picks out the rows of every requested series
+        count = self.filled()
+        rows = np.flatnonzero(np.isin(series[:count], np.asarray(series_ids, dtype=np.int32))
+                              & (ts[:count] >= since))
+        matched = series[rows]
+        for series_id in series_ids:
+            selected = rows[matched == series_id]
+            result.append((ts[selected], values[selected]))
+        return result
+
+
+class StrengthHistory:
+    """Columnar, memory-mapped store of strength snapshots with vectorized trajectory stats"""
+
+    def __init__(self, directory: str = STRENGTH_HISTORY_DIR, segment_rows: int = STRENGTH_SEGMENT_ROWS,
+                 enabled: bool = STRENGTH_HISTORY_ENABLED):
+        self.directory = Path(directory)
+        self.segment_rows = segment_rows
+        self._local = threading.local()
+        self._lock = threading.Lock()
+        self._series: Dict[Tuple[str, str], int] = {}
+        self._active: Optional[_Segment] = None
+        self._segments: Dict[str, _Segment] = {}
+        self._refreshed = 0.0
+        self.stats = {"points_written": 0, "segments_sealed": 0}
+        self.available = enabled and self._initialize()
+
+    def _initialize(self) -> bool:
+        try:
+            self.directory.mkdir(parents=True, exist_ok=True)
+            self._connection().execute(
+                "CREATE TABLE IF NOT EXISTS series (id INTEGER PRIMARY KEY, key TEXT NOT NULL, domain TEXT NOT NULL, "
+                "UNIQUE (key, domain))"
+            )
+            self._seal_orphans()
+            return True
+        except (sqlite3.Error, OSError, ValueError) as e:
+            print(f"⚠️ Strength history unavailable ({e}), trajectories disabled")
+            return False
+
+    def _connection(self) -> sqlite3.Connection:
+        connection = getattr(self._local, "connection", None)
+        if connection is None:
+            connection = sqlite3.connect(str(self.directory / "series.db"), timeout=1.0, isolation_level=None)
+            connection.execute("PRAGMA journal_mode=WAL")
+            self._local.connection = connection
+        return connection
+
+    # ------------------------------------------------------------------
+    # Series ids
+    # ------------------------------------------------------------------
+
+    def series_id(self, key: str, domain: str = OVERALL, create: bool = False) -> Optional[int]:
+        cached = self._series.get((key, domain))
+        if cached is not None:
+            return cached
+        connection = self._connection()
+        if create:
+            connection.execute("INSERT OR IGNORE INTO series (key, domain) VALUES (?, ?)", (key, domain))
+        row = connection.execute("SELECT id FROM series WHERE key = ? AND domain = ?", (key, domain)).fetchone()
+        if row is None:
+            return None
+        self._series[(key, domain)] = row[0]
+        return row[0]
+
+    def domains(self, key: str) -> List[Tuple[str, int]]:
+        """(domain, series id) of every series recorded for a key, overall first"""
+        rows = self._connection().execute(
+            "SELECT domain, id FROM series WHERE key = ? ORDER BY domain", (key,)
+        ).fetchall()
+        return [(domain, series_id) for domain, series_id in rows]
+
+    # ------------------------------------------------------------------
+    # Write path
+    # ------------------------------------------------------------------
+
+    def _new_active(self) -> _Segment:
+        stem = f"active-{os.getpid()}-{time.time_ns()}"
+        return _Segment(self.directory, stem, sealed=False, rows=self.segment_rows, writable=True)
+
+    def _seal(self, stem: str, columns: Dict[str, np.ndarray], count: int):
+        """Rewrite an active segment sorted by (series, ts) and remove it"""
+        if count == 0:
+            self._remove(stem)
+            return
+        order = np.lexsort((columns["ts"][:count], columns["series"][:count]))
+        sealed_stem = stem.replace("active-", "sealed-", 1)
+        # Timestamps last: readers only pick up a sealed segment once its .ts file exists
+        for name, _ in COLUMNS:
+            temporary = self.directory / f"{sealed_stem}.{name}.tmp"
+            np.asarray(columns[name][:count])[order].tofile(temporary)
+            os.replace(temporary, self.directory / f"{sealed_stem}.{name}")
+        self._remove(stem)
+        self.stats["segments_sealed"] += 1
+
+    def _remove(self, stem: str):
+        for name, _ in COLUMNS:
+            try:
+                os.remove(self.directory / f"{stem}.{name}")
+            except FileNotFoundError:
+                pass
+
+    def _seal_orphans(self):
+        """Seal active segments of processes that are gone"""
+        for path in self.directory.glob("active-*.ts"):
+            pid = int(path.stem.split("-")[1])
+            if pid == os.getpid() or _pid_alive(pid):
+                continue
+            segment = _Segment(self.directory, path.stem, sealed=False)
+            count = segment.filled()
+            print(f"🧹 Sealing {count} strength points left by process {pid}")
+            self._seal(path.stem, segment.columns, count)
+
+    def append(self, series_ids: Sequence[int], values: Sequence[float], timestamp: Optional[float] = None):
+        """Append one point per series (all at the same timestamp)"""
+        if not self.available or not series_ids:
+            return
+        timestamp = timestamp or time.time()
+        with self._lock:
+            if self._active is None:
+                self._active = self._new_active()
+            active = self._active
+            if active.count + len(series_ids) > active.capacity:
+                self._seal(active.stem, active.columns, active.count)
+                self._active = active = self._new_active()
+            start, end = active.count, active.count + len(series_ids)
+            active.columns["series"][start:end] = series_ids
+            active.columns["value"][start:end] = values
+            active.columns["ts"][start:end] = timestamp
+            active.count = end
+            self.stats["points_written"] += len(series_ids)
+
+    def record(self, key: str, qloo_data: Any, timestamp: Optional[float] = None):
+        """Append the overall and per-domain strengths of a live Qloo trend payload"""
+        if not self.available:
+            return
+        payload = TrendPayload.coerce(qloo_data)
+        points: List[Tuple[str, float]] = []
+        if payload.trend_strength is not None:
+            points.append((OVERALL, payload.trend_strength))
+        for affinity in payload.cultural_affinities:
+            if affinity.strength is not None and affinity.domain:
+                points.append((affinity.domain, affinity.strength))
+        if not points:
+            return
+        try:
+            ids = [self.series_id(key, domain, create=True) for domain, _ in points]
+            self.append(ids, [value for _, value in points], timestamp)
+        except (sqlite3.Error, OSError) as e:
+            print(f"⚠️ Could not record strength history: {e}")
+
+    # ------------------------------------------------------------------
+    # Read path
+    # ------------------------------------------------------------------
+
+    def _refresh_segments(self):
+        """Map segments written since the last look (at most once per SEGMENT_REFRESH_INTERVAL)"""
+        now = time.monotonic()
+        if now - self._refreshed < SEGMENT_REFRESH_INTERVAL:
+            return
+        self._refreshed = now
+        stems = {path.stem for path in self.directory.glob("*.ts")}
+        own = self._active.stem if self._active is not None else None
+        current: Dict[str, _Segment] = {}
+        for stem in stems:
+            if stem == own:
+                continue
+            if stem.startswith("active-") and stem.replace("active-", "sealed-", 1) in stems:
+                continue  # Being sealed; the sealed copy has the same points
+            segment = self._segments.get(stem)
+            if segment is None:
+                try:
+                    segment = _Segment(self.directory, stem, sealed=stem.startswith("sealed-"))
+                except (OSError, ValueError):
+                    continue  # Removed (or not yet complete) while we looked
+            current[stem] = segment
+        self._segments = current
+
+    def points_many(self, series_ids: Sequence[int], since: float = 0.0) -> List[Tuple[np.ndarray, np.ndarray]]:
+        """(timestamps, values) of each series since a time, oldest first"""
+        if not self.available:
+            return [(np.empty(0), np.empty(0, dtype=np.float32)) for _ in series_ids]
+        with self._lock:
+            self._refresh_segments()
+            segments = list(self._segments.values())
+            if self._active is not None:
+                segments.append(self._active)
+            parts = [segment.points(series_ids, since) for segment in segments]
+        result = []
+        for index in range(len(series_ids)):
+            ts = np.concatenate([part[index][0] for part in parts]) if parts else np.empty(0)
+            values = np.concatenate([part[index][1] for part in parts]) if parts else np.empty(0, dtype=np.float32)
+            order = np.argsort(ts, kind="stable")
+            result.append((ts[order], values[order]))
+        return result
+
+    def points(self, series_id: int, since: float = 0.0) -> Tuple[np.ndarray, np.ndarray]:
+        """(timestamps, values) of one series since a time, oldest first"""
+        return self.points_many([series_id], since)[0]
+
+    def trajectory(self, key: str, timeframe: Optional[str] = None,
+                   window_days: float = TRAJECTORY_WINDOW_DAYS) -> Optional[Dict[str, Any]]:
+        """Trajectory stats of the overall and per-domain series of a key; None without enough history"""
+        if not self.available:
+            return None
+        now = time.time()
+        since = now - window_days * SECONDS_PER_DAY
+        try:
+            series = self.domains(key)
+        except sqlite3.Error:
+            return None
+        if not series:
+            return None
+        data = self.points_many([series_id for _, series_id in series], since)
+        horizon = timeframe_days(timeframe)
+        stats = trajectory_stats(data, now, horizon)
+        rows = [dict(zip(stats, row)) for row in zip(*(column.tolist() for column in stats.values()))]
+        by_domain = {domain: row for (domain, _), row in zip(series, rows)
+                     if row["points"] >= MIN_TRAJECTORY_POINTS}
+        overall = by_domain.pop(OVERALL, None)
+        if overall is None:
+            return None
+        trajectory = {**overall, "horizon_days": horizon, "window_days": window_days}
+        if by_domain:
+            trajectory["domains"] = sorted(
+                ({"domain": domain, **{name: row[name] for name in ("average", "growth_per_week", "forecast")}}
+                 for domain, row in by_domain.items()),
+                key=lambda row: row["growth_per_week"], reverse=True
+            )
+        return trajectory
+
+    def snapshot(self) -> Dict[str, Any]:
+        if not self.available:
+            return {"enabled": False}
+        with self._lock:
+            self._refresh_segments()
+            stored = sum(segment.filled() for segment in self._segments.values())
+            stored += self._active.count if self._active is not None else 0
+            return {"enabled": True, "points": stored, "segments": len(self._segments) + (self._active is not None),
+                    "directory": str(self.directory), **self.stats}
+
+
+def trajectory_stats(series: Sequence[Tuple[np.ndarray, np.ndarray]], now: float,
+                     horizon_days: float) -> Dict[str, np.ndarray]:
+    """
+    Stats for a batch of series in one pass.
+
+    Series are padded with NaN into (series x points) arrays of age in days and
+    value; each row gets its point count, the days its points span, latest
+    value, average, recent (RECENT_WINDOW_DAYS) average, least-squares growth
+    per week (0 until the points span MIN_TRAJECTORY_SPAN_DAYS) and the fitted
+    line's value horizon_days ahead (no further ahead than the history reaches
+    back, clipped to 0..1), all rounded.
+    """
+    width = max((len(ts) for ts, _ in series), default=0) or 1
+    days = np.full((len(series), width), np.nan)
+    values = np.full((len(series), width), np.nan)
+    for row, (ts, value) in enumerate(series):
+        days[row, :len(ts)] = (ts - now) / SECONDS_PER_DAY
+        values[row, :len(value)] = value
+
+    present = ~np.isnan(values)
+    count = present.sum(axis=1)
+    recent = present & (days >= -RECENT_WINDOW_DAYS)
+    with np.errstate(invalid="ignore", divide="ignore"):
+        mean_day = np.nansum(days, axis=1) / count
+        average = np.nansum(values, axis=1) / count
+        recent_average = np.where(recent, values, 0.0).sum(axis=1) / recent.sum(axis=1)
+        centered_days = days - mean_day[:, None]
+        slope = (np.nansum(centered_days * (values - average[:, None]), axis=1)
+                 / np.nansum(centered_days ** 2, axis=1))
+    latest = values[np.arange(len(series)), np.maximum(count - 1, 0)]
+    span = np.nan_to_num(np.max(np.where(present, days, -np.inf), axis=1)
+                         - np.min(np.where(present, days, np.inf), axis=1), posinf=0.0, neginf=0.0)
+    # Readings minutes apart say nothing about weekly growth
+    slope = np.where(np.isfinite(slope) & (span >= MIN_TRAJECTORY_SPAN_DAYS), slope, 0.0)
+    # A line fitted over N days of history is extended at most N days ahead
+    forecast = np.clip(average + slope * (np.minimum(horizon_days, span) - mean_day), 0.0, 1.0)
+
+    return {
+        "points": count,
+        "span_days": np.round(span, 1),
+        "latest": np.round(latest, 3),
+        "average": np.round(average, 3),
+        "recent_average": np.round(np.where(np.isnan(recent_average), average, recent_average), 3),
+        "growth_per_week": np.round(slope * 7.0, 4),
+        "forecast": np.round(forecast, 3),
+    }
+
+
+# Global strength history instance
+strength_history = StrengthHistory()
@@ -0,0 +1,23 @@
+"""
+Shared test setup - the backend modules use flat imports (services.*, observability.*)
+"""
+
+import os
+import subprocess
+import sys
+from pathlib import Path
+
+BACKEND_DIR = Path(__file__).resolve().parent.parent
+if str(BACKEND_DIR) not in sys.path:
+    sys.path.insert(0, str(BACKEND_DIR))
+
+
+def setting_with_blank_env(module: str, setting: str) -> Path:
+    """
+    A module-level setting as read with the variable set to "" (a blank line copied
+    from .env.example), imported in a fresh interpreter
+    """
+    code = f"import {module} as module; print(module.{setting})"
+    result = subprocess.run([sys.executable, "-c", code], cwd=BACKEND_DIR, env={**os.environ, setting: ""},
+                            capture_output=True, text=True, check=True)
+    return Path(result.stdout.strip().splitlines()[-1])
@@ -0,0 +1,154 @@
+"""
+Tests for per-field degradation, provenance and history fallbacks in the analysis pipeline
+"""
+
+import asyncio
+import time
+
+import pytest
+
+import services.analysis_pipeline as analysis_pipeline
+from models.schemas import TrendAnalysisRequest
+from services.analysis_store import AnalysisStore
+from services.deadline import start_deadline, time_remaining
+from services.depth_profiles import get_profile
+from services.qloo_models import TrendPayload
+from services.qloo_service import QlooService
+from services.quota_manager import QuotaManager
+from services.similarity_cache import SimilarityCache
+from services.strength_history import StrengthHistory
+
+LIVE_QLOO = TrendPayload.from_dict({
+    "query": "ai art",
+    "trend_strength": 0.7,
+    "cultural_affinities": [{"domain": "music", "entities": ["synthwave"], "strength": 0.8}],
+    "related_concepts": ["robotics"]
+})
+
+GEMINI_ANSWER = {
+    "summary": "AI is growing",
+    "insights": [{"title": "Momentum", "description": "Strong interest", "confidence": 0.9}],
+    "recommendations": ["Invest early"],
+    "generated_by": "gemini"
+}
+
+DEMO_ANSWER = {
+    "summary": "Demo analysis",
+    "insights": [{"title": "Demo", "description": "Demo insight", "confidence": 0.5}],
+    "recommendations": ["Add an API key"]
+}
+
+
+class FakeQloo:
+    def __init__(self, payload: TrendPayload):
+        self.payload = payload
+        self.calls = 0
+
+    async def get_trend_data(self, query, industry=None):
+        self.calls += 1
+        return self.payload
+
+
+class FakeLLM:
+    def __init__(self, answer):
+        self.answer = answer
+        self.calls = 0
+
+    async def analyze_trend(self, **kwargs):
+        self.calls += 1
+        return dict(self.answer)
+
+
+@pytest.fixture
+def store(tmp_path, monkeypatch):
+    """Fresh history, quota, strength and similarity state for the pipeline"""
+    store = AnalysisStore(str(tmp_path / "analyses.db"), cache_ttl=0.0)
+    monkeypatch.setattr(analysis_pipeline, "analysis_store", store)
+    monkeypatch.setattr(analysis_pipeline, "quota_manager", QuotaManager(str(tmp_path / "quotas.db")))
+    monkeypatch.setattr(analysis_pipeline, "strength_history", StrengthHistory(str(tmp_path / "strengths")))
+    monkeypatch.setattr(analysis_pipeline, "similarity_cache", SimilarityCache(enabled=False))
+    yield store
+    store.close()
+
+
+def analyze(llm, qloo, **fields):
+    request = TrendAnalysisRequest(query="ai art", industry="technology", **fields)
+    return asyncio.run(analysis_pipeline.run_trend_analysis(request, llm, qloo))
+
+
+def simulated_qloo() -> FakeQloo:
+    return FakeQloo(QlooService()._get_simulated_trend_data("ai art"))
+
+
+def test_gemini_over_live_qloo_is_recorded_as_live(store):
+    response = analyze(FakeLLM(GEMINI_ANSWER), FakeQloo(LIVE_QLOO))
+    assert response.summary == "AI is growing"
+    assert response.data_sources["provenance"] == {
+        "qloo": "qloo", "summary": "gemini", "insights": "gemini", "recommendations": "gemini"
+    }
+    store.close()
+    assert store.find_recent("trend", analysis_pipeline.trend_request_key(
+        TrendAnalysisRequest(query="ai art", industry="technology")), max_age=60) is not None
+
+
+def test_failed_gemini_over_live_qloo_uses_rules_and_is_not_live(store):
+    response = analyze(FakeLLM(DEMO_ANSWER), FakeQloo(LIVE_QLOO))
+    assert response.summary != "Demo analysis"
+    assert set(response.data_sources["provenance"].values()) == {"qloo", "rules"}
+    store.close()
+    assert store.search("ai art")[0]["live"] is False
+
+
+def test_missing_parts_are_filled_from_history(store):
+    analyze(FakeLLM(GEMINI_ANSWER), FakeQloo(LIVE_QLOO))
+    store.close()
+
+    response = analyze(FakeLLM(DEMO_ANSWER), simulated_qloo())
+    assert response.summary == "AI is growing"
+    assert response.data_sources["qloo"]["trend_strength"] == 0.7
+    assert set(response.data_sources["provenance"].values()) == {"history"}
+    assert response.data_sources["analysis_store"]["partial"] is True
+
+
+def test_nothing_real_falls_back_to_the_demo_analysis(store):
+    response = analyze(FakeLLM(DEMO_ANSWER), simulated_qloo())
+    assert response.summary == "Demo analysis"
+    assert response.data_sources["provenance"]["qloo"] == "simulated"
+    assert response.data_sources["provenance"]["summary"] == "demo"
+
+
+def test_empty_gemini_quota_serves_a_stale_analysis_without_upstream_calls(store):
+    analyze(FakeLLM(GEMINI_ANSWER), FakeQloo(LIVE_QLOO))
+    store.close()
+    analysis_pipeline.quota_manager._empty_until["gemini:requests"] = time.time() + 60
+
+    llm, qloo = FakeLLM(GEMINI_ANSWER), FakeQloo(LIVE_QLOO)
+    response = analyze(llm, qloo)
+    assert (llm.calls, qloo.calls) == (0, 0)
+    assert response.data_sources["analysis_store"]["stale"] is True
+    assert response.data_sources["analysis_store"]["reason"] == "upstream_quota"
+
+
+def test_basic_depth_answers_from_rules_without_gemini(store):
+    llm = FakeLLM(GEMINI_ANSWER)
+    response = analyze(llm, FakeQloo(LIVE_QLOO), depth="basic")
+    assert llm.calls == 0
+    assert response.insights
+    assert set(response.data_sources["provenance"].values()) == {"qloo", "rules"}
+    store.close()
+    # Rules over live Qloo data are the live answer at this depth
+    assert store.search("ai art")[0]["live"] is True
+
+
+@pytest.mark.parametrize("depth_deadline", [True, False])
+def test_depth_caps_the_request_deadline(store, depth_deadline):
+    async def run():
+        start_deadline(25.0)
+        request = TrendAnalysisRequest(query="ai art", depth="basic")
+        await analysis_pipeline.run_trend_analysis(request, FakeLLM(GEMINI_ANSWER), FakeQloo(LIVE_QLOO),
+                                                   depth_deadline=depth_deadline)
+        return time_remaining()
+
+    remaining = asyncio.run(run())
+    # Background jobs (depth_deadline=False) keep their own, longer deadline
+    assert (remaining <= get_profile("basic").deadline) is depth_deadline
@@ -0,0 +1,76 @@
+"""
+Tests for the analysis store's retention, fallbacks and the admin-only history routes
+"""
+
+import time
+
+import pytest
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+
+import routers.profiling as profiling
+from conftest import BACKEND_DIR, setting_with_blank_env
+from routers import history
+from services.analysis_store import AnalysisStore
+
+
+@pytest.fixture
+def store(tmp_path):
+    store = AnalysisStore(str(tmp_path / "analyses.db"), retention_days=1, max_rows=3)
+    yield store
+    store.close()
+
+
+def record(store: AnalysisStore, query: str):
+    store.record("trend", query, query, {"summary": f"{query} is growing"}, industry="fashion")
+
+
+def test_blank_path_uses_default_database():
+    assert setting_with_blank_env("services.analysis_store", "ANALYSIS_DB_PATH") == BACKEND_DIR / "data" / "analyses.db"
+
+
+def test_unwritable_path_disables_store(tmp_path):
+    blocker = tmp_path / "file"
+    blocker.write_text("not a directory")
+    store = AnalysisStore(str(blocker / "sub" / "analyses.db"))
+    assert not store.available
+    store.record("trend", "k", "q", {"summary": "s"})
+    assert store.search("q") == []
+
+
+def test_prune_drops_oldest_rows_beyond_cap_and_their_index_entries(store):
+    for i in range(5):
+        record(store, f"query{i}")
+    store.close()
+
+    assert store.count() == 3
+    assert [row["query"] for row in store.search("query0")] == []
+    assert {row["query"] for row in store.search("query")} == {"query2", "query3", "query4"}
+
+
+def test_prune_drops_rows_past_retention(store):
+    record(store, "old")
+    store.close()
+    store._next_prune = 0.0
+    store._prune(time.time() + 2 * 86400)
+    assert store.count() == 0
+    assert store.search("old") == []
+
+
+@pytest.fixture
+def client():
+    app = FastAPI()
+    app.include_router(history.router)
+    return TestClient(app)
+
+
+def test_history_requires_admin_token(client, monkeypatch):
+    monkeypatch.setattr(profiling, "ADMIN_TOKEN", "secret")
+    assert client.get("/api/history/search").status_code == 401
+    assert client.get("/api/history/1", headers={"X-Admin-Token": "wrong"}).status_code == 401
+    assert client.get("/api/history/search", headers={"X-Admin-Token": "secret"}).status_code == 200
+
+
+def test_history_disabled_without_admin_token(client, monkeypatch):
+    monkeypatch.setattr(profiling, "ADMIN_TOKEN", "")
+    assert client.get("/api/history/search").status_code == 403
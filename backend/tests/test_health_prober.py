@@ -0,0 +1,49 @@
+"""
+Tests for the background health prober behind /api/status
+"""
+
+import asyncio
+
+import pytest
+
+import services.health_prober as health_prober
+from services.health_prober import HealthProber
+
+
+@pytest.fixture
+def demo_config(monkeypatch):
+    monkeypatch.setattr(health_prober, "QLOO_API_KEY", None)
+    monkeypatch.delenv("GEMINI_API_KEY", raising=False)
+
+
+@pytest.fixture
+def live_config(monkeypatch):
+    monkeypatch.setattr(health_prober, "QLOO_API_KEY", "test-key")
+    monkeypatch.setattr(health_prober, "GEMINI_AVAILABLE", True)
+    monkeypatch.setenv("GEMINI_API_KEY", "test-key")
+
+
+def test_demo_mode_is_reported_before_the_first_probe(demo_config):
+    prober = HealthProber()
+    assert prober.result("qloo") == {"status": "demo_mode"}
+    assert prober.result("gemini") == {"status": "demo_mode"}
+
+
+def test_configured_services_are_unknown_until_probed(live_config):
+    prober = HealthProber()
+    assert prober.result("qloo") == {"status": "unknown"}
+    assert prober.result("gemini") == {"status": "unknown"}
+
+
+def test_probe_results_replace_the_configured_status(live_config):
+    prober = HealthProber(timeout=1.0)
+
+    async def unreachable():
+        raise ConnectionError("refused")
+
+    prober._checks["qloo"] = unreachable
+    asyncio.run(prober.probe("qloo"))
+    result = prober.result("qloo")
+    assert result["status"] == "unavailable"
+    assert result["error"] == "refused"
+    assert result["error_rate"] == 1.0
@@ -0,0 +1,124 @@
+"""
+Tests for Idempotency-Key claims, replays and mismatches
+"""
+
+import asyncio
+import time
+
+import pytest
+
+from conftest import BACKEND_DIR, setting_with_blank_env
+from services.idempotency import IdempotencyStore
+
+
+@pytest.fixture
+def store(tmp_path):
+    return IdempotencyStore(str(tmp_path / "idempotency.db"), ttl=60, lock_timeout=30, enabled=True)
+
+
+def fingerprint(body: bytes = b'{"query": "ai"}') -> str:
+    return IdempotencyStore.fingerprint("POST", "/api/trends/analyze", body)
+
+
+def test_first_request_claims_the_key(store):
+    assert store.claim("client|k1", fingerprint()) == ("claimed", None)
+
+
+def test_same_request_while_running_is_in_flight(store):
+    store.claim("client|k1", fingerprint())
+    assert store.claim("client|k1", fingerprint()) == ("in_flight", None)
+
+
+def test_different_body_is_a_mismatch(store):
+    store.claim("client|k1", fingerprint())
+    assert store.claim("client|k1", fingerprint(b'{"query": "other"}'))[0] == "mismatch"
+
+
+def test_completed_response_is_replayed(store):
+    async def run():
+        assert (await store.acquire("client|k1", fingerprint(), timeout=1.0))[0] == "claimed"
+        await store.complete("client|k1", 200, {"content-type": "application/json"}, b'{"ok": true}')
+        return await store.acquire("client|k1", fingerprint(), timeout=1.0)
+
+    outcome, response = asyncio.run(run())
+    assert outcome == "completed"
+    assert response == {"status": 200, "headers": {"content-type": "application/json"}, "body": b'{"ok": true}'}
+    assert store.stats["replayed"] == 1
+
+
+def test_completed_key_with_a_different_body_is_a_mismatch(store):
+    async def run():
+        await store.acquire("client|k1", fingerprint(), timeout=1.0)
+        await store.complete("client|k1", 200, {}, b"{}")
+        return await store.acquire("client|k1", fingerprint(b"{}"), timeout=1.0)
+
+    assert asyncio.run(run()) == ("mismatch", None)
+
+
+@pytest.mark.parametrize("status", [500, 503, 409, 429])
+def test_failed_responses_are_not_stored(store, status):
+    async def run():
+        await store.acquire("client|k1", fingerprint(), timeout=1.0)
+        await store.complete("client|k1", status, {}, b"{}")
+        return await store.acquire("client|k1", fingerprint(), timeout=1.0)
+
+    assert asyncio.run(run()) == ("claimed", None)
+
+
+def test_retry_waits_for_the_running_request(store):
+    async def run():
+        await store.acquire("client|k1", fingerprint(), timeout=1.0)
+        retry = asyncio.create_task(store.acquire("client|k1", fingerprint(), timeout=5.0))
+        await asyncio.sleep(0.05)
+        assert not retry.done()
+        await store.complete("client|k1", 200, {}, b'{"ok": true}')
+        return await retry
+
+    started = time.monotonic()
+    outcome, response = asyncio.run(run())
+    assert outcome == "completed" and response["body"] == b'{"ok": true}'
+    assert time.monotonic() - started < 1.0
+    assert store.stats["attached"] == 1
+
+
+def test_retry_gives_up_while_still_running(store):
+    async def run():
+        await store.acquire("client|k1", fingerprint(), timeout=1.0)
+        return await store.acquire("client|k1", fingerprint(), timeout=0.05)
+
+    assert asyncio.run(run()) == ("in_flight", None)
+
+
+def test_keys_are_shared_between_workers(tmp_path):
+    path = str(tmp_path / "idempotency.db")
+    first, second = IdempotencyStore(path, enabled=True), IdempotencyStore(path, enabled=True)
+
+    async def run():
+        await first.acquire("client|k1", fingerprint(), timeout=1.0)
+        await first.complete("client|k1", 200, {}, b"{}")
+        return await second.acquire("client|k1", fingerprint(), timeout=1.0)
+
+    assert asyncio.run(run())[0] == "completed"
+
+
+def test_expired_responses_run_again(tmp_path):
+    store = IdempotencyStore(str(tmp_path / "idempotency.db"), ttl=0.01, enabled=True)
+
+    async def run():
+        await store.acquire("client|k1", fingerprint(), timeout=1.0)
+        await store.complete("client|k1", 200, {}, b"{}")
+        await asyncio.sleep(0.05)
+        return await store.acquire("client|k1", fingerprint(), timeout=1.0)
+
+    assert asyncio.run(run()) == ("claimed", None)
+
+
+def test_stale_claims_are_taken_over(tmp_path):
+    store = IdempotencyStore(str(tmp_path / "idempotency.db"), lock_timeout=0.01, enabled=True)
+    store.claim("client|k1", fingerprint())
+    time.sleep(0.05)
+    assert store.claim("client|k1", fingerprint()) == ("claimed", None)
+
+
+def test_blank_path_uses_default_database():
+    assert setting_with_blank_env("services.idempotency", "IDEMPOTENCY_DB_PATH") == BACKEND_DIR / "data" / "idempotency.db"
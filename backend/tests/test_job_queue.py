@@ -0,0 +1,195 @@
+"""
+Tests for background analysis jobs: running, deduplication, expiry and the queue bound
+"""
+
+import asyncio
+from contextlib import asynccontextmanager
+
+import pytest
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+
+import routers.jobs as jobs
+from conftest import BACKEND_DIR, setting_with_blank_env
+from models.schemas import TrendAnalysisResponse
+from services.job_queue import JobQueue, JobQueueFull
+
+
+@pytest.fixture
+def db_path(tmp_path):
+    return str(tmp_path / "jobs.db")
+
+
+def result_of(value):
+    async def runner():
+        return {"value": value}
+    return runner
+
+
+def test_job_runs_and_its_result_can_be_polled(db_path):
+    queue = JobQueue(db_path, workers=1)
+
+    async def run():
+        queue.start()
+        try:
+            job = queue.submit("trend", "key-1", result_of(42))
+            assert job["status"] == "queued" and not job["deduplicated"]
+            return await queue.wait(job["job_id"], timeout=2.0)
+        finally:
+            await queue.stop()
+
+    job = asyncio.run(run())
+    assert job["status"] == "succeeded"
+    assert job["result"] == {"value": 42}
+    assert job["expires_at"] is not None
+
+
+def test_identical_submissions_share_one_job(db_path):
+    queue = JobQueue(db_path, workers=1)
+    runs = []
+
+    async def runner():
+        runs.append(1)
+        await asyncio.sleep(0.05)
+        return {}
+
+    async def run():
+        queue.start()
+        try:
+            first = queue.submit("trend", "key-1", runner)
+            second = queue.submit("trend", "key-1", runner)
+            await queue.wait(first["job_id"], timeout=2.0)
+            third = queue.submit("trend", "key-1", runner)  # Finished recently: reused too
+            other = queue.submit("audience", "key-1", runner)  # Another kind is another analysis
+            await queue.wait(other["job_id"], timeout=2.0)
+            return first, second, third, other
+        finally:
+            await queue.stop()
+
+    first, second, third, other = asyncio.run(run())
+    assert second["job_id"] == third["job_id"] == first["job_id"]
+    assert second["deduplicated"] and third["deduplicated"]
+    assert other["job_id"] != first["job_id"]
+    assert len(runs) == 2
+
+
+def test_failed_jobs_can_be_resubmitted(db_path):
+    queue = JobQueue(db_path, workers=1)
+
+    async def failing():
+        raise RuntimeError("upstream broke")
+
+    async def run():
+        queue.start()
+        try:
+            failed = queue.submit("trend", "key-1", failing)
+            failed = await queue.wait(failed["job_id"], timeout=2.0)
+            retried = queue.submit("trend", "key-1", result_of(1))
+            return failed, retried
+        finally:
+            await queue.stop()
+
+    failed, retried = asyncio.run(run())
+    assert failed["status"] == "failed" and "result" not in failed
+    assert retried["job_id"] != failed["job_id"] and not retried["deduplicated"]
+
+
+def test_jobs_time_out(db_path):
+    queue = JobQueue(db_path, workers=1, timeout=0.05)
+
+    async def slow():
+        await asyncio.sleep(1.0)
+        return {}
+
+    async def run():
+        queue.start()
+        try:
+            job = queue.submit("trend", "key-1", slow)
+            return await queue.wait(job["job_id"], timeout=2.0)
+        finally:
+            await queue.stop()
+
+    assert asyncio.run(run())["status"] == "failed"
+
+
+def test_finished_jobs_expire(db_path):
+    queue = JobQueue(db_path, workers=1, result_ttl=0.05)
+
+    async def run():
+        queue.start()
+        try:
+            job = queue.submit("trend", "key-1", result_of(1))
+            await queue.wait(job["job_id"], timeout=2.0)
+            await asyncio.sleep(0.1)
+            return job["job_id"]
+        finally:
+            await queue.stop()
+
+    job_id = asyncio.run(run())
+    assert queue.get(job_id) is None
+
+
+def test_full_queue_rejects_new_jobs(db_path):
+    queue = JobQueue(db_path, workers=0, queue_size=1)
+
+    async def run():
+        queue.start()
+        try:
+            queue.submit("trend", "key-1", result_of(1))
+            with pytest.raises(JobQueueFull):
+                queue.submit("trend", "key-2", result_of(2))
+            # An identical analysis still finds the queued job
+            assert queue.submit("trend", "key-1", result_of(1))["deduplicated"]
+        finally:
+            await queue.stop()
+
+    asyncio.run(run())
+    assert queue.stats["rejected"] == 1
+
+
+def test_jobs_are_visible_to_other_workers(db_path):
+    owner, other = JobQueue(db_path, workers=1), JobQueue(db_path, workers=1)
+
+    async def run():
+        owner.start()
+        try:
+            job = owner.submit("trend", "key-1", result_of(7))
+            return await other.wait(job["job_id"], timeout=2.0)
+        finally:
+            await owner.stop()
+
+    assert asyncio.run(run())["result"] == {"value": 7}
+
+
+def test_blank_path_uses_default_database():
+    assert setting_with_blank_env("services.job_queue", "JOB_DB_PATH") == BACKEND_DIR / "data" / "jobs.db"
+
+
+def test_trend_job_runs_as_batch_without_the_depth_deadline(db_path, monkeypatch):
+    queue = JobQueue(db_path, workers=1)
+    calls = []
+
+    async def fake_analysis(request, llm_service, qloo_service, **kwargs):
+        calls.append((llm_service.priority, kwargs))
+        return TrendAnalysisResponse(query=request.query, summary="done", timestamp="now",
+                                     insights=[], recommendations=[])
+
+    monkeypatch.setattr(jobs, "job_queue", queue)
+    monkeypatch.setattr(jobs, "run_trend_analysis", fake_analysis)
+
+    @asynccontextmanager
+    async def lifespan(app):
+        queue.start()
+        yield
+        await queue.stop()
+
+    app = FastAPI(lifespan=lifespan)
+    app.include_router(jobs.router)
+    with TestClient(app) as client:
+        accepted = client.post("/api/jobs/trends/analyze", json={"query": "ai art", "depth": "basic"})
+        assert accepted.status_code == 202
+        job = client.get(f"/api/jobs/{accepted.json()['job_id']}", params={"wait": 2}).json()
+
+    assert job["status"] == "succeeded"
+    assert job["result"]["summary"] == "done"
+    assert calls == [("batch", {"depth_deadline": False})]
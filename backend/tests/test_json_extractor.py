@@ -0,0 +1,78 @@
+"""
+Tests for tolerant JSON extraction and validation of Gemini responses
+"""
+
+from services.json_extractor import (
+    IncrementalJSONExtractor,
+    extract_json_object,
+    parse_llm_response,
+    repair_json
+)
+
+
+def test_plain_json():
+    assert extract_json_object('{"summary": "ok", "insights": []}') == {"summary": "ok", "insights": []}
+
+
+def test_fenced_json_with_prose():
+    text = 'Here is the analysis:\n```json\n{"summary": "ok", "n": 1}\n```\nHope this helps {not json}.'
+    assert extract_json_object(text) == {"summary": "ok", "n": 1}
+
+
+def test_common_defects_are_repaired():
+    text = "{“summary”: 'Rising fast', 'scores': [1, 2, 3,], 'live': True, 'extra': None, // note\n}"
+    assert extract_json_object(text) == {"summary": "Rising fast", "scores": [1, 2, 3], "live": True, "extra": None}
+
+
+def test_braces_inside_strings_do_not_end_the_object():
+    assert extract_json_object('{"summary": "a } b { c", "n": 2}') == {"summary": "a } b { c", "n": 2}
+
+
+def test_truncated_tail_is_closed():
+    text = '{"summary": "Cut off", "insights": [{"title": "A", "description": "partial tex'
+    assert extract_json_object(text) == {
+        "summary": "Cut off", "insights": [{"title": "A", "description": "partial tex"}]
+    }
+
+
+def test_repair_keeps_string_contents():
+    assert repair_json('{"text": "True, None, it\'s fine,"}') == '{"text": "True, None, it\'s fine,"}'
+
+
+def test_incremental_feed_returns_once_the_object_closes():
+    extractor = IncrementalJSONExtractor()
+    assert extractor.feed('Sure! {"summary": "o') is None
+    assert extractor.feed('k", "items": [1, ') is None
+    assert extractor.feed('2]} trailing prose') == {"summary": "ok", "items": [1, 2]}
+
+
+def test_no_object():
+    assert extract_json_object("I could not analyze this trend.") is None
+
+
+def test_llm_result_is_validated_and_normalized():
+    text = """```json
+    {
+      "summary": "  Strong momentum  ",
+      "insights": [
+        {"title": "Growth", "description": "Up 20%", "confidence": "85%", "source": "QLOO"},
+        {"name": "Reach", "detail": "Broad", "score": 0.6, "source": "elsewhere"},
+        {"title": "No description"},
+        "not an insight"
+      ],
+      "recommendations": ["Invest early", {"text": "Partner with creators"}, ""]
+    }
+    ```"""
+    assert parse_llm_response(text, "insights") == {
+        "summary": "Strong momentum",
+        "insights": [
+            {"title": "Growth", "description": "Up 20%", "confidence": 0.85, "source": "qloo"},
+            {"title": "Reach", "description": "Broad", "confidence": 0.6, "source": "combined"},
+        ],
+        "recommendations": ["Invest early", "Partner with creators"],
+    }
+
+
+def test_llm_result_without_usable_insights_is_rejected():
+    assert parse_llm_response('{"summary": "ok", "insights": [{"title": "x"}]}', "insights") is None
+    assert parse_llm_response('{"insights": [{"title": "x", "description": "y"}]}', "insights") is None
@@ -0,0 +1,71 @@
+"""
+Tests for fair, deadline-aware scheduling of Gemini calls
+"""
+
+import asyncio
+import time
+
+import pytest
+
+from services.llm_scheduler import LLMScheduler, SchedulerDropped
+
+
+def dispatch_order(scheduler: LLMScheduler, callers):
+    """Queue (client, priority) callers behind one held slot; return the order they get it in"""
+    order = []
+
+    async def call(client, priority):
+        await scheduler.acquire(client, priority)
+        order.append((client, priority))
+        await asyncio.sleep(0)
+        scheduler.release()
+
+    async def run():
+        await scheduler.acquire("holder")
+        tasks = []
+        for client, priority in callers:
+            tasks.append(asyncio.create_task(call(client, priority)))
+            await asyncio.sleep(0)  # Enqueue in this order
+        scheduler.release()
+        await asyncio.gather(*tasks)
+
+    asyncio.run(run())
+    return order
+
+
+def test_a_burst_does_not_starve_other_clients():
+    order = dispatch_order(LLMScheduler(max_concurrency=1), [("a", "interactive")] * 4 + [("b", "interactive")])
+    assert order.index(("b", "interactive")) <= 1
+
+
+def test_interactive_overtakes_queued_batch_work():
+    order = dispatch_order(LLMScheduler(max_concurrency=1), [("a", "batch")] * 4 + [("b", "interactive")])
+    # Queued last, served right after the batch call it ties with
+    assert order.index(("b", "interactive")) <= 1
+
+
+def test_batch_is_not_starved():
+    callers = [("batch", "batch")] + [(f"user{i}", "interactive") for i in range(8)]
+    order = dispatch_order(LLMScheduler(max_concurrency=1), callers)
+    assert order.index(("batch", "batch")) < len(order) - 1
+
+
+def test_calls_that_cannot_meet_their_deadline_are_dropped():
+    scheduler = LLMScheduler(max_concurrency=1)
+    with pytest.raises(SchedulerDropped):
+        asyncio.run(scheduler.acquire("a", deadline=time.monotonic() + 0.5))  # Typical call takes 2s
+    assert scheduler.in_flight == 0
+
+
+def test_queued_call_is_dropped_when_its_wait_runs_out():
+    scheduler = LLMScheduler(max_concurrency=1)
+    scheduler.service_time = 0.01
+
+    async def run():
+        await scheduler.acquire("holder")
+        with pytest.raises(SchedulerDropped):
+            await scheduler.acquire("late", deadline=time.monotonic() + 0.1)
+
+    asyncio.run(run())
+    assert scheduler.in_flight == 1
+    assert scheduler.stats["dropped_interactive"] == 1
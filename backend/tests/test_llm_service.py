@@ -0,0 +1,30 @@
+"""
+Tests for the Gemini call path of the LLM service
+"""
+
+import asyncio
+
+import services.llm_service as llm_service
+from services.quota_manager import QuotaManager
+
+
+class FakeModel:
+    def __init__(self):
+        self.calls = []
+
+    def generate_content(self, prompt, **kwargs):
+        self.calls.append(kwargs)
+        return type("Response", (), {"text": '{"insights": []}', "usage_metadata": None})()
+
+
+def test_gemini_call_passes_its_timeout_to_the_client(tmp_path, monkeypatch):
+    model = FakeModel()
+    monkeypatch.setattr(llm_service, "_generative_model", lambda name: model)
+    monkeypatch.setattr(llm_service, "quota_manager", QuotaManager(str(tmp_path / "quotas.db")))
+    service = llm_service.GeminiService()
+    service.use_real_api, service.model, service.model_name = True, model, "test-model"
+
+    text = asyncio.run(service._call_real_gemini_api("prompt", timeout=7.0))
+    assert text == '{"insights": []}'
+    assert len(model.calls) == 1
+    assert 0 < model.calls[0]["request_options"]["timeout"] <= 7.0
@@ -0,0 +1,32 @@
+"""
+Tests for the admin-only Gemini usage endpoint
+"""
+
+import pytest
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+
+import routers.profiling as profiling
+from routers import usage
+
+
+@pytest.fixture
+def client():
+    app = FastAPI()
+    app.include_router(usage.router)
+    return TestClient(app)
+
+
+def test_usage_requires_admin_token(client, monkeypatch):
+    monkeypatch.setattr(profiling, "ADMIN_TOKEN", "secret")
+    assert client.get("/api/usage/llm").status_code == 401
+    assert client.get("/api/usage/llm", headers={"X-Admin-Token": "wrong"}).status_code == 401
+
+    response = client.get("/api/usage/llm", headers={"X-Admin-Token": "secret"})
+    assert response.status_code == 200
+    assert "worker_pid" in response.json()
+
+
+def test_usage_disabled_without_admin_token(client, monkeypatch):
+    monkeypatch.setattr(profiling, "ADMIN_TOKEN", "")
+    assert client.get("/api/usage/llm").status_code == 403
@@ -0,0 +1,166 @@
+"""
+Tests for the shared upstream token buckets
+"""
+
+import asyncio
+import sqlite3
+import time
+
+import httpx
+import pytest
+
+import services.http_client as http_client
+import services.qloo_service as qloo_service
+from services.quota_manager import QUOTA_BUCKETS, QUOTA_MIN_BURST, QuotaManager, _bucket
+from services.retry_policy import RetryBudget
+
+
+@pytest.fixture
+def db_path(tmp_path):
+    return str(tmp_path / "quotas.db")
+
+
+@pytest.fixture
+def live_qloo(monkeypatch):
+    """QlooService with an API key (requests go to a mock transport)"""
+    monkeypatch.setattr(qloo_service, "QLOO_API_KEY", "test-key")
+
+
+def test_default_buckets_fit_a_retry_sequence():
+    for name, (capacity, rate) in QUOTA_BUCKETS.items():
+        if name.endswith(":requests"):
+            assert capacity >= QUOTA_MIN_BURST
+        assert rate > 0
+
+
+@pytest.mark.parametrize("name", ["qloo:requests", "gemini:tokens"])
+@pytest.mark.parametrize("limit", [2, 3, 4, 5, 10, 15, 30, 60, 1000])
+def test_no_rolling_minute_exceeds_the_limit(name, limit):
+    capacity, rate = _bucket(name, float(limit))
+    assert capacity >= 1.0 and rate > 0
+    assert capacity + 60 * rate <= limit + 1e-9
+
+
+def test_limit_of_one_a_minute_is_spaced_out():
+    assert _bucket("gemini:requests", 1.0) == (1.0, 1.0 / 60)
+
+
+def test_bucket_grants_up_to_capacity_then_denies(db_path):
+    quotas = QuotaManager(db_path, buckets={"qloo:requests": (3.0, 0.001)})
+    assert [quotas.try_acquire("qloo") for _ in range(4)] == [True, True, True, False]
+    assert quotas.exhausted("qloo")
+
+
+def test_bucket_refills_over_time(db_path):
+    quotas = QuotaManager(db_path, buckets={"qloo:requests": (1.0, 20.0)})
+    assert quotas.try_acquire("qloo")
+    assert not quotas.try_acquire("qloo")
+    time.sleep(0.1)
+    assert quotas.try_acquire("qloo")
+
+
+def test_buckets_are_shared_between_workers(db_path):
+    buckets = {"gemini:requests": (2.0, 0.001)}
+    first, second = QuotaManager(db_path, buckets=buckets), QuotaManager(db_path, buckets=buckets)
+    assert first.try_acquire("gemini")
+    assert second.try_acquire("gemini")
+    assert not first.try_acquire("gemini")
+
+
+def test_token_bucket_is_charged_and_corrected(db_path):
+    quotas = QuotaManager(db_path, buckets={"gemini:requests": (10.0, 0.001), "gemini:tokens": (1000.0, 0.001)})
+    assert quotas.try_acquire("gemini", tokens=800)
+    assert not quotas.try_acquire("gemini", tokens=800)
+    quotas._empty_until.clear()
+    quotas.adjust("gemini", -600)  # Used 200 tokens, not the estimated 800
+    assert quotas.try_acquire("gemini", tokens=800)
+
+
+def test_contended_store_fails_open_quickly(db_path):
+    quotas = QuotaManager(db_path, buckets={"qloo:requests": (1.0, 0.001)})
+    holder = sqlite3.connect(db_path, isolation_level=None)
+    holder.execute("BEGIN IMMEDIATE")
+    try:
+        started = time.perf_counter()
+        assert quotas.try_acquire("qloo")
+        assert time.perf_counter() - started < 0.5
+    finally:
+        holder.execute("ROLLBACK")
+        holder.close()
+
+
+def run_trend_requests(monkeypatch, upstream, queries):
+    """Run get_trend_data for each query, each through a fresh service as the routers do"""
+    async def run():
+        monkeypatch.setattr(http_client, "_client", httpx.AsyncClient(transport=httpx.MockTransport(upstream)))
+        monkeypatch.setattr(http_client, "_client_loop", asyncio.get_running_loop())
+        try:
+            for query in queries:
+                await qloo_service.QlooService().get_trend_data(query)
+        finally:
+            await http_client._client.aclose()
+
+    asyncio.run(run())
+
+
+@pytest.fixture
+def qloo_quota(db_path, monkeypatch):
+    quotas = QuotaManager(db_path, buckets={"qloo:requests": (6.0, 0.001)})
+    monkeypatch.setattr(qloo_service, "quota_manager", quotas)
+    monkeypatch.setattr(qloo_service.qloo_retry, "base_delay", 0.0)
+    monkeypatch.setattr(qloo_service.qloo_retry, "budget", RetryBudget(reserve=50.0))
+    monkeypatch.setattr(qloo_service.QlooService, "trend_endpoint", None)
+    return quotas
+
+
+def test_every_request_sent_takes_quota(qloo_quota, monkeypatch, live_qloo):
+    calls = []
+
+    def upstream(request: httpx.Request) -> httpx.Response:
+        calls.append(request.url.path)
+        return httpx.Response(503)
+
+    run_trend_requests(monkeypatch, upstream, ["sustainable fashion"] * 3)
+    # The first endpoint's three attempts use half the bucket; the next request gets the rest
+    assert len(calls) == 6
+    assert qloo_quota.stats == {"qloo_granted": 6, "qloo_denied": 1}
+
+
+def test_server_error_stops_the_endpoint_search(qloo_quota, monkeypatch, live_qloo):
+    calls = []
+
+    def upstream(request: httpx.Request) -> httpx.Response:
+        calls.append(request.url.path)
+        return httpx.Response(404 if len(calls) == 1 else 401)
+
+    run_trend_requests(monkeypatch, upstream, ["ai"])
+    assert len(calls) == 2
+    assert qloo_quota.stats == {"qloo_granted": 2}
+
+
+def test_demo_mode_sends_nothing_and_takes_no_quota(qloo_quota, monkeypatch):
+    monkeypatch.setattr(qloo_service, "QLOO_API_KEY", None)
+    calls = []
+
+    def upstream(request: httpx.Request) -> httpx.Response:
+        calls.append(request.url.path)
+        return httpx.Response(200)
+
+    run_trend_requests(monkeypatch, upstream, ["ai", "ai"])
+    assert calls == []
+    assert qloo_quota.stats == {}
+
+
+def test_working_trend_endpoint_is_remembered_across_services(qloo_quota, monkeypatch, live_qloo):
+    calls = []
+
+    def upstream(request: httpx.Request) -> httpx.Response:
+        calls.append(request.url.path)
+        if request.url.path == "/api/trends":
+            return httpx.Response(200, json={"trend_strength": 0.5, "cultural_affinities": []})
+        return httpx.Response(404)
+
+    run_trend_requests(monkeypatch, upstream, ["ai"])
+    calls.clear()
+    run_trend_requests(monkeypatch, upstream, ["ai"])
+    assert calls == ["/api/trends"]
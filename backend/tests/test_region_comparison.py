@@ -0,0 +1,61 @@
+"""
+Tests for the per-region audience diff and the insights templated from it
+"""
+
+from services.region_comparison import compare_regions, comparison_insights
+
+US = {
+    "audience_size_estimate": "12M",
+    "cultural_affinities": {"music": ["Taylor Swift", "Drake"]},
+    "purchase_drivers": ["price"],
+    "emerging_interests": ["esports"],
+}
+JAPAN = {
+    "audience_size_estimate": "8M",
+    "cultural_affinities": {"music": ["Taylor Swift", "YOASOBI"]},
+    "purchase_drivers": ["Price"],
+    "emerging_interests": ["anime"],
+}
+
+
+def test_diff_lists_shared_and_distinctive_items():
+    diff = compare_regions(["US", "Japan"], [US, JAPAN])
+    assert diff["shared"] == ["Taylor Swift", "price"]
+
+    us, japan = diff["regions"]
+    assert us["region"] == "US" and us["audience_size"] == "12M"
+    assert us["distinctive"] == ["esports", "Drake"]
+    assert us["less_prominent"] == ["anime", "YOASOBI"]
+    assert japan["distinctive"] == ["anime", "YOASOBI"]
+    # Two of the six distinct items are in both regions
+    assert us["similarity"] == japan["similarity"] == 0.33
+
+
+def test_identical_regions_have_no_differences():
+    diff = compare_regions(["US", "Canada"], [US, US])
+    assert [entry["similarity"] for entry in diff["regions"]] == [1.0, 1.0]
+    assert all(not entry["distinctive"] and not entry["less_prominent"] for entry in diff["regions"])
+
+    result = comparison_insights("gamers", diff)
+    assert "differs most" not in result["summary"]
+    assert [insight["title"] for insight in result["insights"]] == ["Shared Across Regions"]
+
+
+def test_region_without_data_does_not_break_the_diff():
+    diff = compare_regions(["US", "Brazil"], [US, {}])
+    assert diff["shared"] == []
+    assert diff["regions"][1]["distinctive"] == []
+    assert diff["regions"][1]["similarity"] == 0.0
+
+
+def test_insights_are_templated_from_the_diff():
+    diff = compare_regions(["US", "Japan"], [US, JAPAN])
+    result = comparison_insights("gamers", diff, product_category="headsets")
+
+    assert result["generated_by"] == "rules"
+    assert result["summary"].startswith("Qloo data for gamers across US, Japan overlaps on Taylor Swift, price")
+    titles = [insight["title"] for insight in result["insights"]]
+    assert titles == ["US: Distinct Affinities", "Japan: Distinct Affinities", "Shared Across Regions"]
+    assert "care less about anime, YOASOBI" in result["insights"][0]["description"]
+    assert all(0 < insight["confidence"] <= 1 for insight in result["insights"])
+    assert result["recommendations"][0] == "Localize headsets in US around esports, Drake"
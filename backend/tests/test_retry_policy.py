@@ -0,0 +1,111 @@
+"""
+Tests for jittered retries and retry budgets
+"""
+
+import asyncio
+import time
+
+import httpx
+import pytest
+
+from services.retry_policy import RetryBudget, RetryPolicy, retry_reason
+
+
+class Response:
+    def __init__(self, status_code: int):
+        self.status_code = status_code
+
+
+def upstream(*statuses):
+    """Operation answering with each status in turn; counts its calls"""
+    calls = []
+
+    async def operation():
+        calls.append(len(calls))
+        return Response(statuses[min(len(calls) - 1, len(statuses) - 1)])
+
+    return operation, calls
+
+
+def policy(**kwargs) -> RetryPolicy:
+    return RetryPolicy("test", max_attempts=3, base_delay=0.0, max_delay=0.0, **kwargs)
+
+
+def test_retry_reasons():
+    assert retry_reason(status_code=503) == "http_503"
+    assert retry_reason(status_code=404) is None
+    assert retry_reason(status_code=429) is None
+    assert retry_reason(error=httpx.ConnectTimeout("slow")) == "ConnectTimeout"
+    assert retry_reason(error=ValueError("bad")) is None
+
+
+def test_transient_failures_are_retried_until_success():
+    operation, calls = upstream(503, 502, 200)
+    result = asyncio.run(policy().call(operation, status_of=lambda r: r.status_code))
+    assert result.status_code == 200
+    assert len(calls) == 3
+
+
+def test_last_result_is_returned_when_attempts_run_out():
+    operation, calls = upstream(503)
+    result = asyncio.run(policy().call(operation, status_of=lambda r: r.status_code))
+    assert result.status_code == 503
+    assert len(calls) == 3
+
+
+def test_client_errors_are_not_retried():
+    operation, calls = upstream(404)
+    asyncio.run(policy().call(operation, status_of=lambda r: r.status_code))
+    assert len(calls) == 1
+
+
+def test_exceptions_are_retried_then_raised():
+    calls = []
+
+    async def operation():
+        calls.append(1)
+        raise httpx.ReadTimeout("slow")
+
+    with pytest.raises(httpx.ReadTimeout):
+        asyncio.run(policy().call(operation))
+    assert len(calls) == 3
+
+
+def test_empty_budget_stops_retries():
+    operation, calls = upstream(503, 200)
+    asyncio.run(policy(budget=RetryBudget(reserve=0.0)).call(operation, status_of=lambda r: r.status_code))
+    assert len(calls) == 1
+
+
+def test_successes_refill_the_budget():
+    budget = RetryBudget(ratio=0.5, reserve=0.0)
+    assert not budget.try_spend()
+    budget.record_success()
+    budget.record_success()
+    assert budget.try_spend()
+
+
+def test_refused_permit_does_not_spend_budget():
+    budget = RetryBudget(reserve=1.0)
+    operation, calls = upstream(503, 200)
+    asyncio.run(policy(budget=budget).call(operation, status_of=lambda r: r.status_code, permit=lambda: False))
+    assert len(calls) == 1
+    assert budget.tokens == 1.0
+
+
+def test_exhausted_budget_does_not_ask_for_a_permit():
+    permits = []
+    operation, calls = upstream(503, 200)
+    asyncio.run(policy(budget=RetryBudget(reserve=0.0)).call(
+        operation, status_of=lambda r: r.status_code, permit=lambda: permits.append(1) or True
+    ))
+    assert len(calls) == 1
+    assert permits == []
+
+
+def test_no_retry_past_the_deadline():
+    operation, calls = upstream(503, 200)
+    deadline = time.monotonic() + 0.5
+    asyncio.run(policy().call(operation, status_of=lambda r: r.status_code,
+                              deadline=deadline, expected_duration=1.0))
+    assert len(calls) == 1
@@ -0,0 +1,43 @@
+"""
+Tests for near-duplicate query matching
+"""
+
+import time
+
+from services.similarity_cache import SimilarityIndex, query_terms
+
+
+def index_of(*queries):
+    index = SimilarityIndex()
+    for number, query in enumerate(queries):
+        index.add(query_terms(query), f"key-{number}", query, time.time())
+    return index
+
+
+def test_paraphrases_reduce_to_the_same_terms():
+    assert query_terms("Sustainable fashion trends") == query_terms("eco-friendly clothing")
+    assert query_terms("What is the future of AI?") == query_terms("artificial intelligence trends")
+
+
+def test_exact_term_match():
+    index = index_of("sustainable fashion", "electric vehicles")
+    assert index.search(query_terms("eco friendly fashion trends"), 0.85) == ("key-0", "sustainable fashion", 1.0)
+
+
+def test_close_query_matches_above_the_threshold():
+    index = index_of("plant based protein snacks for gen z", "electric vehicles")
+    request_key, _, similarity = index.search(query_terms("plant based protein snacks"), 0.7)
+    assert request_key == "key-0"
+    assert 0.7 <= similarity < 1.0
+
+
+def test_unrelated_query_does_not_match():
+    index = index_of("sustainable fashion", "electric vehicles")
+    assert index.search(query_terms("sourdough baking"), 0.85) is None
+    assert index.search(query_terms("fashion week"), 0.85) is None
+
+
+def test_expired_entries_do_not_match():
+    index = SimilarityIndex()
+    index.add(query_terms("sustainable fashion"), "old", "sustainable fashion", time.time() - 3600)
+    assert index.search(query_terms("sustainable fashion"), 0.85, min_created=time.time() - 60) is None
@@ -0,0 +1,60 @@
+"""
+Tests for the memory-mapped strength history: appends, sealing and range reads
+"""
+
+import numpy as np
+import pytest
+
+from conftest import BACKEND_DIR, setting_with_blank_env
+from services.strength_history import StrengthHistory, timeframe_days
+
+
+@pytest.fixture
+def history(tmp_path):
+    return StrengthHistory(str(tmp_path), segment_rows=4, enabled=True)
+
+
+def test_full_active_segment_is_sealed_sorted(history, tmp_path):
+    a, b = history.series_id("ai", create=True), history.series_id("ai", "music", create=True)
+    for step in range(3):
+        history.append([b, a], [0.1 * step, 0.5 + 0.1 * step], timestamp=1000.0 + step)
+
+    sealed = sorted(tmp_path.glob("sealed-*.ts"))
+    assert len(sealed) == 1 and history.stats["segments_sealed"] == 1
+    stem = sealed[0].name[:-len(".ts")]
+    series = np.fromfile(tmp_path / f"{stem}.series", dtype=np.int32)
+    ts = np.fromfile(tmp_path / f"{stem}.ts", dtype=np.float64)
+    assert list(series) == sorted(series)
+    assert all(np.diff(ts[series == a]) > 0)
+
+
+def test_points_span_sealed_and_active_segments(history):
+    series_id = history.series_id("ai", create=True)
+    for step in range(10):
+        history.append([series_id], [float(step)], timestamp=1000.0 + step)
+
+    ts, values = history.points(series_id)
+    assert list(values) == [float(step) for step in range(10)]
+    assert list(ts) == sorted(ts)
+    ts, values = history.points(series_id, since=1007.0)
+    assert list(values) == [7.0, 8.0, 9.0]
+
+
+def test_series_are_kept_apart(history):
+    a, b = history.series_id("ai", create=True), history.series_id("vr", create=True)
+    for step in range(6):
+        history.append([a, b], [1.0, 2.0], timestamp=1000.0 + step)
+    (_, a_values), (_, b_values) = history.points_many([a, b])
+    assert set(a_values) == {1.0} and len(a_values) == 6
+    assert set(b_values) == {2.0} and len(b_values) == 6
+
+
+def test_timeframes():
+    assert timeframe_days("3 months") == 90.0
+    assert timeframe_days("6-12 months") == 180.0
+    assert timeframe_days("2 weeks") == 14.0
+    assert timeframe_days(None) == 180.0
+
+
+def test_blank_directory_uses_default():
+    assert setting_with_blank_env("services.strength_history", "STRENGTH_HISTORY_DIR") == BACKEND_DIR / "data" / "strengths"
@@ -0,0 +1,55 @@
+"""
+Per-depth latency benchmark against each tier's SLO
+
+Load-tests /api/trends/analyze once per depth ('basic', 'standard', 'deep')
+against the local Qloo and Gemini stubs (see load_test.py) with unique
+queries, so every request does the tier's full work, and checks the p95
+latency of each tier against the SLO in services/depth_profiles.py.
+
+Run from the repository root:
+    python benchmarks/bench_depth_tiers.py --rps 2 --duration 15
+"""
+
+import argparse
+import asyncio
+import sys
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).parent))
+sys.path.insert(0, str(Path(__file__).parent.parent / "backend"))
+
+from load_test import main_async, parse_args  # noqa: E402
+from services.depth_profiles import DEPTH_PROFILES  # noqa: E402
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Latency per depth tier vs. SLO")
+    parser.add_argument("--rps", type=float, default=2.0)
+    parser.add_argument("--duration", type=float, default=15.0)
+    parser.add_argument("--depths", nargs="+", default=list(DEPTH_PROFILES), choices=list(DEPTH_PROFILES))
+    args, load_test_args = parser.parse_known_args()
+
+    rows = []
+    for depth in args.depths:
+        load_args = parse_args([
+            "--rps", str(args.rps), "--duration", str(args.duration), "--trend-share", "1",
+            "--unique-queries", "--depth", depth,
+        ] + load_test_args)
+        result = asyncio.run(main_async(load_args))
+        latency = result["load"]["endpoints"]["trends"]["latency"]
+        status = result["load"]["endpoints"]["trends"]["status"]
+        gemini = result["upstream"].get("gemini", {}).get("calls", {})
+        qloo_calls = result["upstream"].get("qloo", {}).get("total", 0)
+        rows.append((depth, latency, status, qloo_calls, gemini))
+
+    print("\n📊 Trend analysis latency per depth tier")
+    print(f"{'depth':<10}{'p50 ms':>10}{'p95 ms':>10}{'SLO ms':>10}  {'met':<5}{'qloo':>6}  gemini calls")
+    for depth, latency, status, qloo_calls, gemini in rows:
+        slo_ms = DEPTH_PROFILES[depth].slo_seconds * 1000
+        p95 = latency["p95_ms"] or 0.0
+        print(f"{depth:<10}{latency['p50_ms'] or 0:>10.0f}{p95:>10.0f}{slo_ms:>10.0f}  "
+              f"{'✅' if p95 <= slo_ms else '❌':<5}{qloo_calls:>6}  {gemini}  {status}")
+
+
+if __name__ == "__main__":
+    main()
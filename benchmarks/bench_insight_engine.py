@@ -0,0 +1,85 @@
+"""
+Rule-based insight engine throughput
+
+Generates Qloo-shaped trend payloads (random domain, entity and region
+counts, like the stub server), decoded into TrendPayload models as
+QlooService does, and measures how many complete analyses per second the
+engine produces one at a time and in batches, plus the cost of the
+vectorized scoring alone.
+
+Run from the repository root:
+    python benchmarks/bench_insight_engine.py
+"""
+
+import argparse
+import random
+import sys
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).parent.parent / "backend"))
+
+from services.insight_engine import score_trends, trend_insights, trend_insights_batch  # noqa: E402
+from services.qloo_models import TrendPayload  # noqa: E402
+
+REGIONS = ["North America", "Europe", "Asia", "Latin America", "Africa", "Oceania"]
+
+
+def make_payload(rng: random.Random) -> dict:
+    return {
+        "trend_strength": round(rng.uniform(0.4, 0.95), 2),
+        "cultural_affinities": [
+            {"domain": f"Domain {d}",
+             "entities": [f"Entity {d}-{e}" for e in range(rng.randint(1, 5))],
+             "strength": round(rng.random(), 2)}
+            for d in range(rng.randint(1, 6))
+        ],
+        "regional_variations": [
+            {"region": region, "strength": round(rng.uniform(0.5, 0.95), 2),
+             "notable_difference": "Regional difference"}
+            for region in rng.sample(REGIONS, rng.randint(1, len(REGIONS)))
+        ],
+        "related_concepts": [f"Concept {c}" for c in range(rng.randint(0, 5))],
+    }
+
+
+def rate(count: int, seconds: float) -> str:
+    return f"{count / seconds:10,.0f}/s  ({seconds / count * 1e6:7.1f} µs each)"
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Rule-based insight engine throughput")
+    parser.add_argument("--payloads", type=int, default=20000)
+    parser.add_argument("--batch", type=int, default=1000)
+    parser.add_argument("--seed", type=int, default=7)
+    args = parser.parse_args()
+
+    rng = random.Random(args.seed)
+    requests = [(f"trend {i}", TrendPayload.from_dict(make_payload(rng)), "Retail", "6 months")
+                for i in range(args.payloads)]
+    trend_insights(*requests[0])  # warm up imports and NumPy
+
+    started = time.perf_counter()
+    for query, payload, industry, timeframe in requests:
+        trend_insights(query, payload, industry, timeframe)
+    single = time.perf_counter() - started
+
+    started = time.perf_counter()
+    for offset in range(0, len(requests), args.batch):
+        trend_insights_batch(requests[offset:offset + args.batch])
+    batched = time.perf_counter() - started
+
+    payloads = [payload for _, payload, _, _ in requests]
+    started = time.perf_counter()
+    for offset in range(0, len(payloads), args.batch):
+        score_trends(payloads[offset:offset + args.batch])
+    scoring = time.perf_counter() - started
+
+    print(f"Rule-based trend analyses over {args.payloads:,} payloads")
+    print(f"  one at a time        {rate(args.payloads, single)}")
+    print(f"  batches of {args.batch:<6}    {rate(args.payloads, batched)}")
+    print(f"  scoring only (batch) {rate(args.payloads, scoring)}")
+
+
+if __name__ == "__main__":
+    main()
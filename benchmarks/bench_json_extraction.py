@@ -0,0 +1,89 @@
+"""
+Parse success-rate and parse-time benchmark for LLM responses
+
+Builds a corpus of response shapes Gemini actually produces (clean JSON,
+markdown fences, surrounding prose, trailing commas, smart quotes, Python
+literals, percentage confidences, truncated output) and compares plain
+json.loads with the tolerant extractor in services.json_extractor.
+
+Run from the repository root:
+    python benchmarks/bench_json_extraction.py
+"""
+
+import json
+import sys
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).parent.parent / "backend"))
+
+from services.json_extractor import parse_llm_response  # noqa: E402
+
+REPEATS = 500
+
+CLEAN = json.dumps({
+    "summary": "Sustainable fashion keeps gaining momentum with younger buyers.",
+    "insights": [
+        {"title": "Resale Growth", "description": "Second-hand platforms grow fastest.",
+         "confidence": 0.86, "source": "combined"},
+        {"title": "Material Transparency", "description": "Buyers check fibre sourcing.",
+         "confidence": 0.78, "source": "qloo"},
+    ],
+    "recommendations": ["Launch a take-back programme", "Publish supply-chain data"],
+}, indent=2)
+
+
+def build_corpus():
+    """(label, response text) pairs covering the common failure shapes"""
+    return [
+        ("clean", CLEAN),
+        ("markdown fence", f"```json\n{CLEAN}\n```"),
+        ("prose around", f"Here's the analysis you asked for:\n\n{CLEAN}\n\nLet me know if you'd like more!"),
+        ("trailing commas", CLEAN.replace('"combined"\n', '"combined",\n').replace(']\n}', '],\n}')),
+        ("smart quotes", CLEAN.replace('"', "“", 1).replace('"', "”", 1)),
+        ("python literals", CLEAN.replace('"source": "qloo"', '"source": "qloo", "verified": True')),
+        ("single quotes", CLEAN.replace('"Launch a take-back programme"', "'Launch a take-back programme'")),
+        ("percent confidence", CLEAN.replace("0.86", '"86%"').replace("0.78", "78")),
+        ("line comments", CLEAN.replace('"insights": [', '"insights": [ // top insights')),
+        ("truncated tail", CLEAN[:-60]),
+        ("braces in prose", "Using {your} data: " + CLEAN),
+        ("no json", "I'm sorry, I can't help with that request."),
+    ]
+
+
+def legacy_parse(text):
+    """What GeminiService did before: json.loads or give up"""
+    try:
+        return json.loads(text)
+    except json.JSONDecodeError:
+        return None
+
+
+def main():
+    corpus = build_corpus()
+    print(f"\n📊 LLM response parsing benchmark ({len(corpus)} shapes × {REPEATS} runs)")
+    print("=" * 66)
+    print(f"{'shape':<22}{'json.loads':>12}{'extractor':>12}{'µs/parse':>12}")
+
+    legacy_ok = extractor_ok = 0
+    total_time = 0.0
+    for label, text in corpus:
+        legacy_result = legacy_parse(text) is not None
+        started = time.perf_counter()
+        for _ in range(REPEATS):
+            result = parse_llm_response(text, "insights")
+        elapsed = (time.perf_counter() - started) / REPEATS
+        total_time += elapsed
+        legacy_ok += legacy_result
+        extractor_ok += result is not None
+        print(f"{label:<22}{'✅' if legacy_result else '❌':>11}{'✅' if result else '❌':>11}"
+              f"{elapsed * 1e6:>13.1f}")
+
+    print("=" * 66)
+    print(f"🏁 Success rate: json.loads {legacy_ok}/{len(corpus)}, "
+          f"extractor {extractor_ok}/{len(corpus)}, "
+          f"mean parse {total_time / len(corpus) * 1e6:.1f} µs")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,92 @@
+"""
+LLM scheduler benchmark: one bursty client vs. regular clients
+
+Simulates Gemini calls as fixed-duration sleeps behind a small number of
+slots. One client fires a burst of requests at t=0 while several regular
+clients send one request at a steady rate. Compares the weighted-fair
+LLMScheduler with a plain FIFO semaphore (the behaviour before scheduling).
+
+Run from the repository root:
+    python benchmarks/bench_llm_scheduler.py
+"""
+
+import argparse
+import asyncio
+import statistics
+import sys
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).parent.parent / "backend"))
+
+from services.llm_scheduler import LLMScheduler, SchedulerDropped  # noqa: E402
+
+
+def percentile(values, p):
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(len(ordered) * p))] if ordered else float("nan")
+
+
+async def run(mode: str, args):
+    scheduler = LLMScheduler(max_concurrency=args.slots)
+    scheduler.service_time = args.call_ms / 1000
+    semaphore = asyncio.Semaphore(args.slots)
+    latencies = {"burst": [], "regular": [], "batch": []}
+    dropped = {"burst": 0, "regular": 0, "batch": 0}
+
+    async def call(kind: str, client: str, priority: str = "interactive"):
+        started = time.monotonic()
+        deadline = started + args.deadline
+        if mode == "fifo":
+            async with semaphore:
+                await asyncio.sleep(args.call_ms / 1000)
+        else:
+            try:
+                await scheduler.acquire(client, priority, deadline)
+            except SchedulerDropped:
+                dropped[kind] += 1
+                return
+            try:
+                await asyncio.sleep(args.call_ms / 1000)
+            finally:
+                scheduler.release(args.call_ms / 1000)
+        latencies[kind].append(time.monotonic() - started)
+
+    async def regular_client(index: int):
+        tasks = []
+        for _ in range(args.regular_requests):
+            tasks.append(asyncio.create_task(call("regular", f"10.0.0.{index}")))
+            await asyncio.sleep(args.regular_interval)
+        await asyncio.gather(*tasks)
+
+    burst = [asyncio.create_task(call("burst", "10.9.9.9")) for _ in range(args.burst)]
+    batch = [asyncio.create_task(call("batch", "precompute", "batch")) for _ in range(args.batch)]
+    await asyncio.gather(*(regular_client(i) for i in range(args.regular_clients)), *burst, *batch)
+    return latencies, dropped
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Fair LLM scheduling vs FIFO")
+    parser.add_argument("--slots", type=int, default=4)
+    parser.add_argument("--call-ms", type=float, default=200)
+    parser.add_argument("--burst", type=int, default=120)
+    parser.add_argument("--batch", type=int, default=20)
+    parser.add_argument("--regular-clients", type=int, default=5)
+    parser.add_argument("--regular-requests", type=int, default=10)
+    parser.add_argument("--regular-interval", type=float, default=0.5)
+    parser.add_argument("--deadline", type=float, default=4.0, help="Seconds each request may take")
+    args = parser.parse_args()
+
+    for mode in ("fifo", "fair"):
+        started = time.monotonic()
+        latencies, dropped = asyncio.run(run(mode, args))
+        print(f"\n{mode.upper()} ({time.monotonic() - started:.1f}s wall)")
+        for kind, values in latencies.items():
+            late = sum(1 for value in values if value > args.deadline)
+            print(f"  {kind:8s} served {len(values):4d}  dropped {dropped[kind]:4d}  past deadline {late:4d}  "
+                  f"p50 {percentile(values, 0.5) * 1000:7.0f} ms  p95 {percentile(values, 0.95) * 1000:7.0f} ms  "
+                  f"mean {statistics.mean(values) * 1000 if values else float('nan'):7.0f} ms")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,116 @@
+"""
+Prompt size and latency benchmark: pretty-printed JSON vs compact prompt builder
+
+Compares the legacy prompt (json.dumps(qloo_data, indent=2)) with the
+token-budgeted encoding from services.prompt_builder, for the simulated
+datasets and a large synthetic "real" Qloo payload. Latency is measured
+end to end through GeminiService against the local LLM stub.
+
+Run from the repository root:
+    python benchmarks/bench_prompt_builder.py
+"""
+
+import asyncio
+import json
+import random
+import sys
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).parent.parent / "backend"))
+sys.path.insert(0, str(Path(__file__).parent))
+
+from llm_stub import StubGeminiModel  # noqa: E402
+from services import llm_service as llm_module  # noqa: E402
+from services.llm_service import GeminiService  # noqa: E402
+from services.prompt_builder import build_trend_prompt, estimate_tokens  # noqa: E402
+from services.simulated_data import AUDIENCE_GEN_Z, TREND_FASHION  # noqa: E402
+
+RUNS = 5
+
+
+def legacy_trend_prompt(query, qloo_data, industry=None, timeframe=None):
+    """The prompt exactly as GeminiService built it before the prompt builder"""
+    return f"""
+            Analyze the trend "{query}" using the following cultural data from Qloo:
+            {json.dumps(qloo_data, indent=2)}
+            
+            Industry context: {industry or 'General market'}
+            Timeframe: {timeframe or '6-12 months'}
+            
+            Provide a comprehensive analysis with:
+            1. A summary (2-3 sentences)
+            2. 4 key insights with titles, descriptions, and confidence scores (0.0-1.0)
+            3. 4 actionable recommendations
+            
+            Format as JSON with this structure:
+            {{
+                "summary": "...",
+                "insights": [
+                    {{"title": "...", "description": "...", "confidence": 0.85, "source": "combined"}}
+                ],
+                "recommendations": ["...", "...", "...", "..."]
+            }}
+            """
+
+
+def large_payload(seed: int = 7):
+    """A realistically large Qloo trend payload (many domains, entities and regions)"""
+    rng = random.Random(seed)
+    return {
+        "trend_strength": 0.82,
+        "cultural_affinities": [
+            {"domain": f"Domain {d}",
+             "entities": [f"Entity {d}-{e}" for e in range(20)],
+             "strength": round(rng.random(), 2)}
+            for d in range(25)
+        ],
+        "regional_variations": [
+            {"region": f"Region {r}", "strength": round(rng.random(), 2),
+             "notable_difference": "Distinct adoption pattern driven by local media"}
+            for r in range(12)
+        ],
+        "related_concepts": [f"Concept {c}" for c in range(40)],
+    }
+
+
+async def time_service(service: GeminiService, qloo_data, use_builder: bool) -> float:
+    """Mean analyze_trend latency, optionally routed through the legacy prompt"""
+    llm_module.build_trend_prompt = build_trend_prompt if use_builder else legacy_trend_prompt
+    try:
+        started = time.perf_counter()
+        for _ in range(RUNS):
+            await service.analyze_trend("sustainable fashion", qloo_data)
+        return (time.perf_counter() - started) / RUNS
+    finally:
+        llm_module.build_trend_prompt = build_trend_prompt
+
+
+async def main():
+    service = GeminiService()
+    service.model = StubGeminiModel()
+    service.use_real_api = True
+
+    cases = {
+        "simulated trend": TREND_FASHION,
+        "simulated audience": AUDIENCE_GEN_Z,
+        "large real-shaped": large_payload(),
+    }
+
+    print(f"\n📊 Prompt builder benchmark ({RUNS} stub calls per case)")
+    print("=" * 86)
+    print(f"{'payload':<20}{'legacy chars':>13}{'compact chars':>14}"
+          f"{'legacy tok':>12}{'compact tok':>12}{'legacy ms':>11}{'compact ms':>12}")
+    for label, payload in cases.items():
+        legacy = legacy_trend_prompt("sustainable fashion", payload)
+        compact = build_trend_prompt("sustainable fashion", payload)
+        legacy_latency = await time_service(service, payload, use_builder=False)
+        compact_latency = await time_service(service, payload, use_builder=True)
+        print(f"{label:<20}{len(legacy):>13}{len(compact):>14}"
+              f"{estimate_tokens(legacy):>12}{estimate_tokens(compact):>12}"
+              f"{legacy_latency * 1000:>11.1f}{compact_latency * 1000:>12.1f}")
+    print("=" * 86)
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
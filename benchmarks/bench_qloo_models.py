@@ -0,0 +1,150 @@
+"""
+Qloo payloads as dicts vs. the typed models of services/qloo_models.py
+
+Generates Qloo-shaped response bodies (like the stub server) and compares,
+per payload, plain json.loads dicts with TrendPayload/AudiencePayload models
+decoded from the same bytes:
+
+- decode time, encode time (json.dumps vs. to_json()) and memory held
+- one trend request's worth of work on the payload: prompt encoding,
+  rule-based insights and serializing the response with the payload in
+  data_sources
+
+Run from the repository root:
+    python benchmarks/bench_qloo_models.py --payloads 5000
+"""
+
+import argparse
+import gc
+import json
+import random
+import sys
+import time
+import tracemalloc
+from datetime import datetime
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).parent.parent / "backend"))
+
+from models.schemas import TrendAnalysisResponse  # noqa: E402
+from services.insight_engine import audience_insights, trend_insights  # noqa: E402
+from services.prompt_builder import build_audience_prompt, build_trend_prompt  # noqa: E402
+from services.qloo_models import AudiencePayload, TrendPayload  # noqa: E402
+
+REGIONS = ["North America", "Europe", "Asia", "Latin America", "Africa", "Oceania"]
+
+
+def trend_body(rng: random.Random, index: int) -> bytes:
+    return json.dumps({
+        "query": f"trend {index}",
+        "trend_strength": round(rng.uniform(0.5, 0.95), 2),
+        "cultural_affinities": [
+            {"domain": f"Domain {d}", "entities": [f"Entity {d}-{e}" for e in range(rng.randint(2, 6))],
+             "strength": round(rng.random(), 2)}
+            for d in range(rng.randint(2, 6))
+        ],
+        "regional_variations": [
+            {"region": region, "strength": round(rng.uniform(0.5, 0.95), 2),
+             "notable_difference": "Stubbed regional difference"}
+            for region in rng.sample(REGIONS, rng.randint(2, len(REGIONS)))
+        ],
+        "related_concepts": [f"Concept {c}" for c in range(rng.randint(0, 5))],
+    }).encode()
+
+
+def audience_body(rng: random.Random, index: int) -> bytes:
+    return json.dumps({
+        "audience": f"audience {index}",
+        "audience_size_estimate": rng.choice(["Medium", "Large", "Very Large"]),
+        "cultural_affinities": {
+            domain: [f"{domain.title()} {e}" for e in range(rng.randint(2, 6))]
+            for domain in ("music", "media", "brands", "activities")[:rng.randint(1, 4)]
+        },
+        "content_preferences": {"format": ["Short-form video"], "tone": ["Authentic"]},
+        "purchase_drivers": ["Peer Recommendation", "Brand Values"],
+        "emerging_interests": ["Creator Economy"],
+    }).encode()
+
+
+def per_payload(count: int, seconds: float) -> str:
+    return f"{seconds / count * 1e6:8.1f} µs"
+
+
+def timed(function, make_items, repeat: int) -> float:
+    """Best of `repeat` passes, each over fresh items (so no pass reuses another's caches)"""
+    best = float("inf")
+    for _ in range(repeat):
+        items = make_items()
+        started = time.perf_counter()
+        for item in items:
+            function(item)
+        best = min(best, time.perf_counter() - started)
+    return best
+
+
+def held_bytes(decode, bodies) -> float:
+    """Memory held per decoded payload"""
+    gc.collect()
+    tracemalloc.start()
+    before = tracemalloc.get_traced_memory()[0]
+    decoded = [decode(body) for body in bodies]
+    after = tracemalloc.get_traced_memory()[0]
+    tracemalloc.stop()
+    del decoded
+    return (after - before) / len(bodies)
+
+
+def trend_request(payload) -> str:
+    """The work one trend analysis does with its Qloo payload"""
+    build_trend_prompt("trend", payload, "Retail", "6 months")
+    result = trend_insights("trend", payload, "Retail", "6 months")
+    qloo = payload.as_dict() if isinstance(payload, TrendPayload) else payload
+    return TrendAnalysisResponse(
+        query="trend", summary=result["summary"], timestamp=datetime.now().isoformat(),
+        insights=result["insights"], recommendations=result["recommendations"],
+        data_sources={"qloo": qloo, "provenance": {"qloo": "qloo"}}
+    ).model_dump_json(exclude_none=True)
+
+
+def audience_request(payload) -> str:
+    build_audience_prompt("audience", payload)
+    result = audience_insights("audience", payload)
+    qloo = payload.as_dict() if isinstance(payload, AudiencePayload) else payload
+    return json.dumps({**result, "data_sources": {"qloo": qloo}})
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Qloo payload dicts vs. typed models")
+    parser.add_argument("--payloads", type=int, default=5000)
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--seed", type=int, default=7)
+    args = parser.parse_args()
+
+    rng = random.Random(args.seed)
+    cases = [
+        ("trend", [trend_body(rng, i) for i in range(args.payloads)], TrendPayload, trend_request),
+        ("audience", [audience_body(rng, i) for i in range(args.payloads)], AudiencePayload, audience_request),
+    ]
+    trend_request(TrendPayload.decode(cases[0][1][0]))  # warm up imports and NumPy
+
+    print(f"Qloo payloads, per payload over {args.payloads:,} "
+          f"(mean body {sum(map(len, cases[0][1])) / args.payloads:.0f} B trend, "
+          f"{sum(map(len, cases[1][1])) / args.payloads:.0f} B audience)")
+    print(f"{'':<10}{'':<8}{'decode':>12}{'encode':>12}{'memory':>10}{'request':>12}")
+    for name, bodies, model, request in cases:
+        for label, decode, encode in (
+            ("dict", json.loads, json.dumps),
+            ("model", model.decode, lambda payload: payload.to_json()),
+        ):
+            decoded = lambda: [decode(body) for body in bodies]  # noqa: E731
+            decode_time = timed(decode, lambda: bodies, args.repeat)
+            encode_time = timed(encode, decoded, args.repeat)
+            request_time = timed(request, decoded, args.repeat)
+            memory = held_bytes(decode, bodies)
+            print(f"{name:<10}{label:<8}{per_payload(args.payloads, decode_time):>12}"
+                  f"{per_payload(args.payloads, encode_time):>12}{memory:>8.0f} B"
+                  f"{per_payload(args.payloads, request_time):>12}")
+
+
+if __name__ == "__main__":
+    main()
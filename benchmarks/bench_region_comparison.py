@@ -0,0 +1,94 @@
+"""
+Multi-region audience comparison vs. one analysis per region
+
+Starts the local Qloo and Gemini stubs and the backend (see load_test.py) and
+compares, for the same audiences, the latency and Gemini calls of one
+/api/audience/analyze request, one analyze request per region (what the
+frontend had to do before) and a single /api/audience/compare request.
+Every audience is unique so nothing is served from history.
+
+Run from the repository root:
+    python benchmarks/bench_region_comparison.py --rounds 10
+"""
+
+import argparse
+import asyncio
+import sys
+import time
+from pathlib import Path
+from typing import Dict, List
+
+import httpx
+
+sys.path.insert(0, str(Path(__file__).parent))
+
+from load_test import Stack, parse_args, summarize, upstream_stats  # noqa: E402
+
+REGIONS = ["North America", "Europe", "Asia"]
+
+
+async def timed_post(client: httpx.AsyncClient, url: str, body: dict) -> float:
+    started = time.perf_counter()
+    response = await client.post(url, json=body)
+    response.raise_for_status()
+    return time.perf_counter() - started
+
+
+async def gemini_calls(client: httpx.AsyncClient, stack: Stack) -> int:
+    stats = await upstream_stats(client, stack.gemini_url)
+    return sum(count for key, count in stats.get("calls", {}).items() if key.endswith(":200"))
+
+
+async def run(args) -> Dict[str, Dict[str, float]]:
+    stack = Stack(parse_args(["--qloo-latency-ms", str(args.qloo_latency_ms),
+                              "--gemini-latency-ms", str(args.gemini_latency_ms)]))
+    stack.start()
+    try:
+        await stack.wait_ready()
+        latencies: Dict[str, List[float]] = {"one region": [], "per-region requests": [], "compare": []}
+        calls: Dict[str, int] = {name: 0 for name in latencies}
+        async with httpx.AsyncClient(base_url=stack.base_url, timeout=60.0) as client:
+            for round_number in range(args.rounds):
+                audience = f"Gen Z gamers cohort {round_number}"
+                steps = {
+                    "one region": lambda: timed_post(client, "/api/audience/analyze", {
+                        "target_audience": f"{audience} single", "region": REGIONS[0]}),
+                    "per-region requests": lambda: _per_region(client, f"{audience} fanout"),
+                    "compare": lambda: timed_post(client, "/api/audience/compare", {
+                        "target_audience": f"{audience} compare", "regions": REGIONS}),
+                }
+                for name, step in steps.items():
+                    before = await gemini_calls(client, stack)
+                    latencies[name].append(await step())
+                    calls[name] += await gemini_calls(client, stack) - before
+        return {name: {**summarize(values), "gemini_calls_per_op": calls[name] / args.rounds}
+                for name, values in latencies.items()}
+    finally:
+        stack.stop()
+
+
+async def _per_region(client: httpx.AsyncClient, audience: str) -> float:
+    """The old way: one full analysis per region, fired concurrently"""
+    started = time.perf_counter()
+    await asyncio.gather(*(timed_post(client, "/api/audience/analyze", {
+        "target_audience": audience, "region": region}) for region in REGIONS))
+    return time.perf_counter() - started
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Multi-region audience comparison latency")
+    parser.add_argument("--rounds", type=int, default=10)
+    parser.add_argument("--qloo-latency-ms", type=float, default=150.0)
+    parser.add_argument("--gemini-latency-ms", type=float, default=800.0)
+    args = parser.parse_args()
+
+    results = asyncio.run(run(args))
+    print(f"\n🌍 Audience analysis across {len(REGIONS)} regions ({args.rounds} rounds)")
+    print(f"{'approach':<22}{'p50 ms':>10}{'p95 ms':>10}{'gemini calls':>14}")
+    for name, result in results.items():
+        print(f"{name:<22}{result['p50_ms'] or 0:>10.0f}{result['p95_ms'] or 0:>10.0f}"
+              f"{result['gemini_calls_per_op']:>14.1f}")
+
+
+if __name__ == "__main__":
+    main()
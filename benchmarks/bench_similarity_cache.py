@@ -0,0 +1,106 @@
+"""
+Similarity cache benchmark: lookup latency and hit rate at scale
+
+Fills one SimilarityIndex with synthetic trend queries: a few very common words
+("fashion", "sustainable", ... with postings of tens of thousands of rows) plus
+topic words drawn from a Zipf distribution over a large vocabulary, then
+measures lookup latency for paraphrased and unrelated queries, compared with a
+brute-force scan over every row.
+
+Run from the repository root:
+    python benchmarks/bench_similarity_cache.py --entries 300000
+"""
+
+import argparse
+import itertools
+import random
+import statistics
+import sys
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).parent.parent / "backend"))
+
+from services.similarity_cache import SimilarityIndex, query_terms  # noqa: E402
+
+COMMON = ["fashion", "tech", "food", "beauty", "travel", "gaming", "fitness", "music", "home", "finance"]
+MODIFIERS = ["sustainable", "vintage", "luxury", "budget", "smart", "plant based", "remote", "creator", "local", "retro"]
+
+
+def synthetic_query(rng: random.Random, vocabulary, weights):
+    words = [rng.choice(COMMON), rng.choice(MODIFIERS)]
+    words += rng.choices(vocabulary, cum_weights=weights, k=rng.randint(1, 3))
+    rng.shuffle(words)
+    return " ".join(words) + rng.choice(["", " trends", " market"])
+
+
+def percentile(values, p):
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(len(ordered) * p))]
+
+
+def brute_force(index: SimilarityIndex, terms, threshold):
+    """Score every row in Python-free NumPy, for comparison"""
+    import numpy as np
+    known = [index._vocab[t] for t in terms if t in index._vocab]
+    sizes = index._sizes.view()
+    all_terms = index._terms.view()
+    hits = np.isin(all_terms, np.asarray(known, dtype=np.int32)).astype(np.int32)
+    overlap = np.add.reduceat(hits, index._offsets.view())
+    similarity = overlap / np.sqrt(len(terms) * sizes)
+    best = int(np.argmax(similarity))
+    return similarity[best] >= threshold
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--entries", type=int, default=300000)
+    parser.add_argument("--lookups", type=int, default=2000)
+    parser.add_argument("--threshold", type=float, default=0.85)
+    args = parser.parse_args()
+
+    rng = random.Random(42)
+    vocabulary = [f"topic{i}" for i in range(20000)]
+    unseen = [f"other{i}" for i in range(20000)]
+    weights = list(itertools.accumulate(1.0 / rank for rank in range(1, len(vocabulary) + 1)))
+    index = SimilarityIndex()
+    queries = []
+
+    start = time.perf_counter()
+    for i in range(args.entries):
+        query = synthetic_query(rng, vocabulary, weights)
+        queries.append(query)
+        index.add(query_terms(query), f"key{i}", query, 0.0)
+    build_s = time.perf_counter() - start
+    print(f"Indexed {len(index):,} queries in {build_s:.1f}s ({args.entries / build_s:,.0f}/s)")
+
+    def paraphrase(query):
+        return rng.choice(["", "latest ", "future of "]) + query.replace("sustainable", "eco-friendly") + " trends"
+
+    workloads = {
+        "paraphrased (should hit)": [paraphrase(rng.choice(queries)) for _ in range(args.lookups)],
+        "one extra word (scored)": [rng.choice(queries) + f" {rng.choice(unseen)}" for _ in range(args.lookups)],
+        "unrelated (should miss)": [synthetic_query(rng, unseen, weights) for _ in range(args.lookups)],
+    }
+    for name, lookups in workloads.items():
+        latencies, hits = [], 0
+        for query in lookups:
+            t0 = time.perf_counter()
+            terms = query_terms(query)
+            match = index.search(terms, args.threshold)
+            latencies.append((time.perf_counter() - t0) * 1e6)
+            hits += match is not None
+        print(f"\n{name}: hit rate {hits / len(lookups):.1%}")
+        print(f"  lookup p50 {percentile(latencies, 0.5):7.1f} µs   p99 {percentile(latencies, 0.99):7.1f} µs   "
+              f"mean {statistics.mean(latencies):7.1f} µs")
+
+    brute = []
+    for query in workloads["paraphrased (should hit)"][:50]:
+        t0 = time.perf_counter()
+        brute_force(index, query_terms(query), args.threshold)
+        brute.append((time.perf_counter() - t0) * 1e6)
+    print(f"\nbrute-force scan of all rows: p50 {percentile(brute, 0.5):,.0f} µs")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,91 @@
+"""
+Allocation benchmark for the simulated (fallback) Qloo payloads
+
+Compares the old behaviour - rebuilding the nested dict literal and
+pretty-printing it into the prompt on every call - with the shared,
+frozen datasets and their cached JSON encodings.
+
+Run from the repository root:
+    python benchmarks/bench_simulated_payloads.py
+"""
+
+import json
+import sys
+import time
+import tracemalloc
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).parent.parent / "backend"))
+
+from services.simulated_data import (  # noqa: E402
+    AUDIENCE_DATASETS,
+    AUDIENCE_GENERIC,
+    TREND_DATASETS,
+    TREND_GENERIC,
+    dumps_payload,
+    match_dataset
+)
+
+ITERATIONS = 10_000
+QUERIES = ["sustainable fashion", "AI technology", "plant-based food", "urban gardening"]
+AUDIENCES = ["Gen Z music lovers", "Tech millennials", "Active seniors", "Pet owners"]
+
+
+def _trend(query: str):
+    return match_dataset(query, TREND_DATASETS, TREND_GENERIC)
+
+
+def _audience(audience: str):
+    return match_dataset(audience, AUDIENCE_DATASETS, AUDIENCE_GENERIC)
+
+
+def rebuild_per_call():
+    """Old path: fresh dict literal + fresh JSON encoding per request"""
+    for i in range(ITERATIONS):
+        trend = _trend(QUERIES[i % 4]).thaw()
+        audience = _audience(AUDIENCES[i % 4]).thaw()
+        json.dumps(trend, indent=2)
+        json.dumps(audience, indent=2)
+
+
+def shared_frozen():
+    """New path: shared frozen payload + cached encoding"""
+    for i in range(ITERATIONS):
+        trend = _trend(QUERIES[i % 4])
+        audience = _audience(AUDIENCES[i % 4])
+        dumps_payload(trend, indent=2)
+        dumps_payload(audience, indent=2)
+
+
+def measure(label: str, func):
+    tracemalloc.start()
+    tracemalloc.reset_peak()
+    before = tracemalloc.take_snapshot()
+    started = time.perf_counter()
+    func()
+    elapsed = time.perf_counter() - started
+    after = tracemalloc.take_snapshot()
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+
+    # Net memory still held after the run (excluding tracemalloc bookkeeping noise)
+    allocated = sum(
+        stat.size_diff for stat in after.compare_to(before, "filename") if stat.size_diff > 0
+    )
+    print(f"{label:<22} {elapsed * 1e6 / ITERATIONS:>9.2f} µs/call "
+          f"{peak / 1024:>10.1f} KiB peak {allocated / 1024:>10.1f} KiB retained")
+    return peak
+
+
+def main():
+    print(f"\n📊 Simulated payload benchmark ({ITERATIONS} trend+audience lookups)")
+    print("=" * 70)
+    old_peak = measure("rebuild per call", rebuild_per_call)
+    new_peak = measure("shared frozen", shared_frozen)
+    print("=" * 70)
+    if new_peak:
+        print(f"🏁 Peak allocation reduced {old_peak / new_peak:.1f}x")
+
+
+if __name__ == "__main__":
+    main()
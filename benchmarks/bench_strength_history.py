@@ -0,0 +1,98 @@
+"""
+Strength history store: append throughput, range queries and trajectory stats
+
+Fills a temporary store with millions of strength points (KEYS trends x
+DOMAINS series each, spread over 30 days, across several sealed segments and
+one active segment), then measures single-series range queries, the full
+per-trend trajectory used by trend analyses, and the batched stats alone.
+
+Run from the repository root:
+    python benchmarks/bench_strength_history.py --points 2000000
+"""
+
+import argparse
+import random
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+import numpy as np
+
+sys.path.insert(0, str(Path(__file__).parent.parent / "backend"))
+
+from services.strength_history import SECONDS_PER_DAY, StrengthHistory, trajectory_stats  # noqa: E402
+
+DOMAINS = ["", "Music", "Fashion", "Food", "Travel"]
+
+
+def percentiles(samples):
+    samples = np.array(samples) * 1000
+    return f"p50 {np.percentile(samples, 50):6.3f} ms  p99 {np.percentile(samples, 99):6.3f} ms"
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Strength history store benchmark")
+    parser.add_argument("--points", type=int, default=2_000_000)
+    parser.add_argument("--keys", type=int, default=2000)
+    parser.add_argument("--segment-rows", type=int, default=1 << 18)
+    parser.add_argument("--queries", type=int, default=2000)
+    parser.add_argument("--seed", type=int, default=7)
+    args = parser.parse_args()
+
+    rng = random.Random(args.seed)
+    store = StrengthHistory(tempfile.mkdtemp(prefix="strengths-"), segment_rows=args.segment_rows)
+    connection = store._connection()
+    connection.execute("BEGIN")
+    series = {key: [store.series_id(f"trend {key}|retail", domain, create=True) for domain in DOMAINS]
+              for key in range(args.keys)}
+    connection.execute("COMMIT")
+
+    # One snapshot (all domains of one trend) per append, oldest first, like live traffic
+    snapshots = args.points // len(DOMAINS)
+    now = time.time()
+    start = now - 30 * SECONDS_PER_DAY
+    started = time.perf_counter()
+    for index in range(snapshots):
+        key = rng.randrange(args.keys)
+        base = 0.5 + 0.3 * (key % 7) / 7
+        store.append(series[key], [min(1.0, base + rng.uniform(-0.05, 0.05)) for _ in DOMAINS],
+                     timestamp=start + (now - start) * index / snapshots)
+    written = time.perf_counter() - started
+    snapshot = store.snapshot()
+    print(f"Wrote {snapshot['points']:,} points ({snapshot['segments']} segments) "
+          f"at {snapshot['points'] / written:,.0f} points/s")
+
+    keys = [rng.randrange(args.keys) for _ in range(args.queries)]
+    store.points(series[0][0])  # map the segments
+    samples = []
+    for key in keys:
+        began = time.perf_counter()
+        store.points(series[key][0], now - 7 * SECONDS_PER_DAY)
+        samples.append(time.perf_counter() - began)
+    print(f"  range query, one series, 7 days      {percentiles(samples)}")
+
+    samples = []
+    for key in keys:
+        began = time.perf_counter()
+        store.points(series[key][0])
+        samples.append(time.perf_counter() - began)
+    print(f"  range query, one series, all         {percentiles(samples)}")
+
+    samples = []
+    for key in keys:
+        began = time.perf_counter()
+        store.trajectory(f"trend {key}|retail", "6 months")
+        samples.append(time.perf_counter() - began)
+    print(f"  trajectory, {len(DOMAINS)} series per trend        {percentiles(samples)}")
+
+    batch = [store.points(series_id) for key in keys[:200] for series_id in series[key]]
+    began = time.perf_counter()
+    trajectory_stats(batch, now, 180.0)
+    elapsed = time.perf_counter() - began
+    points = sum(len(ts) for ts, _ in batch)
+    print(f"  stats only, {len(batch)} series / {points:,} points in one batch: {elapsed * 1000:.2f} ms")
+
+
+if __name__ == "__main__":
+    main()
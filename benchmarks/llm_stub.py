@@ -0,0 +1,54 @@
+"""
+In-process stand-in for the Gemini GenerativeModel used by benchmarks
+
+Latency grows with prompt size the way a hosted model's prefill does, so
+prompt-size optimizations show up as end-to-end latency differences without
+calling (or paying for) the real API.
+"""
+
+import json
+import time
+from types import SimpleNamespace
+
+from services.prompt_builder import estimate_tokens
+
+STUB_RESPONSE = {
+    "summary": "Stub analysis generated locally for benchmarking.",
+    "insights": [
+        {"title": f"Insight {i}", "description": "Generated by the local LLM stub.",
+         "confidence": 0.8, "source": "llm"}
+        for i in range(1, 5)
+    ],
+    "cultural_affinities": [
+        {"title": f"Affinity {i}", "description": "Generated by the local LLM stub.",
+         "confidence": 0.8, "source": "llm"}
+        for i in range(1, 5)
+    ],
+    "recommendations": [f"Recommendation {i}" for i in range(1, 5)],
+}
+
+
+class StubGeminiModel:
+    """Mimics GenerativeModel.generate_content with token-proportional latency"""
+
+    def __init__(self, base_latency: float = 0.05, seconds_per_prompt_token: float = 0.0002,
+                 response_text: str = None):
+        self.base_latency = base_latency
+        self.seconds_per_prompt_token = seconds_per_prompt_token
+        self.response_text = response_text or json.dumps(STUB_RESPONSE)
+        self.calls = 0
+        self.prompt_tokens = 0
+
+    def generate_content(self, prompt, **kwargs):
+        prompt_tokens = estimate_tokens(prompt)
+        self.calls += 1
+        self.prompt_tokens += prompt_tokens
+        time.sleep(self.base_latency + prompt_tokens * self.seconds_per_prompt_token)
+        return SimpleNamespace(
+            text=self.response_text,
+            usage_metadata=SimpleNamespace(
+                prompt_token_count=prompt_tokens,
+                candidates_token_count=estimate_tokens(self.response_text),
+                total_token_count=prompt_tokens + estimate_tokens(self.response_text),
+            ),
+        )
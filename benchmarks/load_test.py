@@ -0,0 +1,342 @@
+"""
+End-to-end load-testing harness for the Trend Compass API
+
+Starts the Qloo and Gemini stubs plus the backend (unless --target points at
+an already running server), drives /api/trends/analyze and
+/api/audience/analyze with an open-loop async load generator at a target
+RPS, and reports throughput, p50/p95/p99 latency and upstream call counts.
+Results are written as JSON to benchmarks/results/ so runs can be compared
+between commits.
+
+Run from the repository root:
+    python benchmarks/load_test.py --rps 20 --duration 30
+    python benchmarks/load_test.py --rps 50 --gemini-latency-ms 1500 --qloo-error-rate 0.05
+"""
+
+import argparse
+import asyncio
+import json
+import os
+import random
+import subprocess
+import sys
+import tempfile
+import time
+from collections import Counter, defaultdict
+from datetime import datetime, timezone
+from pathlib import Path
+from typing import Any, Dict, List, Optional
+
+import httpx
+
+ROOT = Path(__file__).parent.parent
+RESULTS_DIR = Path(__file__).parent / "results"
+
+TREND_QUERIES = [
+    "sustainable fashion", "AI technology", "plant-based food", "urban gardening",
+    "vintage streetwear", "digital wellness", "fermented foods", "remote work tech",
+]
+AUDIENCES = [
+    "Gen Z music lovers", "Tech millennials", "Active seniors", "Young professionals",
+    "Outdoor enthusiasts", "Gen Z gamers", "Busy parents", "Boomer travellers",
+]
+
+
+def percentile(values: List[float], pct: float) -> Optional[float]:
+    """Nearest-rank percentile (values need not be sorted)"""
+    if not values:
+        return None
+    ordered = sorted(values)
+    index = max(0, min(len(ordered) - 1, int(round(pct / 100.0 * len(ordered) + 0.5)) - 1))
+    return ordered[index]
+
+
+def summarize(latencies: List[float]) -> Dict[str, Optional[float]]:
+    to_ms = lambda value: round(value * 1000, 2) if value is not None else None  # noqa: E731
+    return {
+        "count": len(latencies),
+        "mean_ms": to_ms(sum(latencies) / len(latencies)) if latencies else None,
+        "p50_ms": to_ms(percentile(latencies, 50)),
+        "p95_ms": to_ms(percentile(latencies, 95)),
+        "p99_ms": to_ms(percentile(latencies, 99)),
+        "max_ms": to_ms(max(latencies)) if latencies else None,
+    }
+
+
+def parse_server_timing(header: str) -> Dict[str, float]:
+    """Server-Timing header -> {stage: seconds}"""
+    stages = {}
+    for entry in header.split(","):
+        name, *params = [part.strip() for part in entry.split(";")]
+        for param in params:
+            if param.startswith("dur="):
+                stages[name] = float(param[4:]) / 1000.0
+    return stages
+
+
+def git_revision() -> str:
+    try:
+        return subprocess.check_output(
+            ["git", "rev-parse", "--short", "HEAD"], cwd=ROOT, text=True, stderr=subprocess.DEVNULL
+        ).strip()
+    except (OSError, subprocess.CalledProcessError):
+        return "unknown"
+
+
+class Stack:
+    """The stubs and backend running as local subprocesses"""
+
+    def __init__(self, args):
+        self.args = args
+        self.processes: List[subprocess.Popen] = []
+        self.rate_limit_file = Path(tempfile.mkdtemp()) / "rate_limits.json"
+        self.base_url = f"http://127.0.0.1:{args.app_port}"
+        self.qloo_url = f"http://127.0.0.1:{args.qloo_port}"
+        self.gemini_url = f"http://127.0.0.1:{args.gemini_port}"
+
+    def _spawn_stub(self, service: str, port: int, latency_ms: float, error_rate: float,
+                    throttle_rate: float, extra: List[str]):
+        cmd = [
+            sys.executable, str(Path(__file__).parent / "stub_servers.py"), service,
+            "--port", str(port),
+            "--latency-ms", str(latency_ms),
+            "--error-rate", str(error_rate),
+            "--throttle-rate", str(throttle_rate),
+            "--seed", str(self.args.seed),
+        ] + extra
+        self.processes.append(subprocess.Popen(cmd, cwd=ROOT))
+
+    def start(self):
+        args = self.args
+        self._spawn_stub("qloo", args.qloo_port, args.qloo_latency_ms, args.qloo_error_rate,
+                         args.qloo_throttle_rate,
+                         ["--payload-domains", str(args.qloo_payload_domains),
+                          "--payload-entities", str(args.qloo_payload_entities),
+                          "--quota-rpm", str(args.qloo_quota_rpm)])
+        self._spawn_stub("gemini", args.gemini_port, args.gemini_latency_ms, args.gemini_error_rate,
+                         args.gemini_throttle_rate, ["--ms-per-token", str(args.gemini_ms_per_token),
+                                                     "--quota-rpm", str(args.gemini_quota_rpm)])
+
+        env = dict(os.environ)
+        env.update({
+            "QLOO_API_URL": self.qloo_url,
+            "QLOO_API_KEY": "stub-qloo-key",
+            "GEMINI_API_KEY": "stub-gemini-key",
+            "GEMINI_API_ENDPOINT": self.gemini_url,
+            "RATE_LIMIT_PER_DAY": str(10 ** 9),
+            "RATE_LIMIT_FILE": str(self.rate_limit_file),
+            # Fresh history and quota state per run
+            "ANALYSIS_DB_PATH": str(self.rate_limit_file.parent / "analyses.db"),
+            "QUOTA_DB_PATH": str(self.rate_limit_file.parent / "quotas.db"),
+            "JOB_DB_PATH": str(self.rate_limit_file.parent / "jobs.db"),
+            "STRENGTH_HISTORY_DIR": str(self.rate_limit_file.parent / "strengths"),
+            # Tell the backend the stub quotas (0 = unlimited stub, so no outbound limit either)
+            "QLOO_RPM": str(args.qloo_quota_rpm if args.backend_quotas else 0),
+            "GEMINI_RPM": str(args.gemini_quota_rpm if args.backend_quotas else 0),
+            "GEMINI_TPM": "0",
+        })
+        cmd = [sys.executable, "-m", "uvicorn", "main:app", "--host", "127.0.0.1",
+               "--port", str(args.app_port), "--workers", str(args.workers), "--log-level", "warning"]
+        self.processes.append(subprocess.Popen(
+            cmd, cwd=ROOT / "backend", env=env,
+            stdout=None if args.verbose else subprocess.DEVNULL,
+        ))
+
+    async def wait_ready(self, timeout: float = 30.0):
+        deadline = time.monotonic() + timeout
+        async with httpx.AsyncClient() as client:
+            for url in (f"{self.qloo_url}/__stats", f"{self.gemini_url}/__stats", f"{self.base_url}/health"):
+                while True:
+                    try:
+                        # Any HTTP answer means the server is accepting requests
+                        await client.get(url, timeout=1.0)
+                        break
+                    except httpx.HTTPError:
+                        pass
+                    if time.monotonic() > deadline:
+                        raise RuntimeError(f"Timed out waiting for {url}")
+                    await asyncio.sleep(0.2)
+
+    def stop(self):
+        for process in reversed(self.processes):
+            process.terminate()
+        for process in self.processes:
+            try:
+                process.wait(timeout=10)
+            except subprocess.TimeoutExpired:
+                process.kill()
+
+
+async def upstream_stats(client: httpx.AsyncClient, url: str) -> Dict[str, Any]:
+    try:
+        response = await client.get(f"{url}/__stats", timeout=5.0)
+        return response.json()
+    except httpx.HTTPError as e:
+        return {"error": str(e)}
+
+
+async def run_load(args, base_url: str) -> Dict[str, Any]:
+    """Open-loop load: requests are issued on schedule regardless of completions"""
+    rng = random.Random(args.seed)
+    latencies: Dict[str, List[float]] = defaultdict(list)
+    statuses: Dict[str, Counter] = defaultdict(Counter)
+    stage_timings: Dict[str, List[float]] = defaultdict(list)
+    interval = 1.0 / args.rps
+    total = int(args.rps * args.duration)
+
+    limits = httpx.Limits(max_connections=args.max_connections, max_keepalive_connections=args.max_connections)
+    async with httpx.AsyncClient(base_url=base_url, limits=limits, timeout=args.request_timeout) as client:
+
+        async def fire(index: int):
+            if rng.random() < args.trend_share:
+                name, path = "trends", "/api/trends/analyze"
+                body = {"query": rng.choice(TREND_QUERIES), "industry": "Retail"}
+                if args.depth:
+                    body["depth"] = args.depth
+            else:
+                name, path = "audience", "/api/audience/analyze"
+                body = {"target_audience": rng.choice(AUDIENCES), "region": "Europe"}
+            if args.unique_queries:
+                # A distinct word per request defeats history and near-duplicate caching
+                key = "query" if "query" in body else "target_audience"
+                body[key] = f"{body[key]} variant{index}"
+            # Distinct client addresses so per-IP limits see many users
+            headers = {"X-Forwarded-For": f"10.{index // 65536 % 256}.{index // 256 % 256}.{index % 256}"}
+            if args.client_timeout:
+                headers["X-Request-Timeout"] = str(args.client_timeout)
+            started = time.perf_counter()
+            try:
+                response = await client.post(path, json=body, headers=headers)
+                status = str(response.status_code)
+                for stage, duration in parse_server_timing(response.headers.get("server-timing", "")).items():
+                    stage_timings[stage].append(duration)
+            except httpx.HTTPError as e:
+                status = type(e).__name__
+            elapsed = time.perf_counter() - started
+            latencies[name].append(elapsed)
+            statuses[name][status] += 1
+
+        tasks = []
+        started = time.perf_counter()
+        for index in range(total):
+            target = started + index * interval
+            delay = target - time.perf_counter()
+            if delay > 0:
+                await asyncio.sleep(delay)
+            tasks.append(asyncio.create_task(fire(index)))
+        await asyncio.gather(*tasks)
+        wall_time = time.perf_counter() - started
+
+    all_latencies = [value for values in latencies.values() for value in values]
+    ok = sum(counter.get("200", 0) for counter in statuses.values())
+    return {
+        "requests": total,
+        "wall_time_s": round(wall_time, 3),
+        "throughput_rps": round(total / wall_time, 2) if wall_time else None,
+        "success_rps": round(ok / wall_time, 2) if wall_time else None,
+        "latency": summarize(all_latencies),
+        "endpoints": {
+            name: {"latency": summarize(values), "status": dict(statuses[name])}
+            for name, values in latencies.items()
+        },
+        "stages": {name: summarize(values) for name, values in stage_timings.items()},
+    }
+
+
+def print_report(result: Dict[str, Any]):
+    load = result["load"]
+    print("\n📊 Load test results")
+    print("=" * 72)
+    print(f"Requests: {load['requests']} in {load['wall_time_s']}s "
+          f"→ {load['throughput_rps']} req/s ({load['success_rps']} successful/s)")
+    print(f"{'':<14}{'count':>8}{'p50 ms':>10}{'p95 ms':>10}{'p99 ms':>10}{'max ms':>10}  status")
+    rows = [("all", load["latency"], "")] + [
+        (name, data["latency"], json.dumps(data["status"])) for name, data in load["endpoints"].items()
+    ] + [(f"  {name}", stats, "(server stage)") for name, stats in load["stages"].items()]
+    for name, stats, status in rows:
+        print(f"{name:<14}{stats['count']:>8}{stats['p50_ms'] or 0:>10.1f}{stats['p95_ms'] or 0:>10.1f}"
+              f"{stats['p99_ms'] or 0:>10.1f}{stats['max_ms'] or 0:>10.1f}  {status}")
+    for service, stats in result.get("upstream", {}).items():
+        print(f"Upstream {service}: {stats.get('total', '?')} calls {json.dumps(stats.get('calls', {}))}")
+    print("=" * 72)
+
+
+async def main_async(args) -> Dict[str, Any]:
+    stack = None if args.target else Stack(args)
+    try:
+        if stack:
+            stack.start()
+            await stack.wait_ready()
+            print(f"🚀 Stack ready: app {stack.base_url}, qloo {stack.qloo_url}, gemini {stack.gemini_url}")
+        base_url = args.target or stack.base_url
+
+        load = await run_load(args, base_url)
+        upstream = {}
+        if stack:
+            async with httpx.AsyncClient() as client:
+                upstream = {
+                    "qloo": await upstream_stats(client, stack.qloo_url),
+                    "gemini": await upstream_stats(client, stack.gemini_url),
+                }
+        return {
+            "timestamp": datetime.now(timezone.utc).isoformat(),
+            "git_revision": git_revision(),
+            "config": {key: value for key, value in vars(args).items() if key != "output"},
+            "load": load,
+            "upstream": upstream,
+        }
+    finally:
+        if stack:
+            stack.stop()
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Load test the Trend Compass API against local stubs")
+    parser.add_argument("--rps", type=float, default=10.0, help="Target requests per second")
+    parser.add_argument("--duration", type=float, default=20.0, help="Seconds of load")
+    parser.add_argument("--trend-share", type=float, default=0.6, help="Fraction of trend (vs audience) requests")
+    parser.add_argument("--target", help="Existing server URL (skips starting stubs and backend)")
+    parser.add_argument("--workers", type=int, default=1, help="Backend worker processes")
+    parser.add_argument("--app-port", type=int, default=8765)
+    parser.add_argument("--qloo-port", type=int, default=9001)
+    parser.add_argument("--gemini-port", type=int, default=9002)
+    parser.add_argument("--qloo-latency-ms", type=float, default=150.0)
+    parser.add_argument("--qloo-error-rate", type=float, default=0.0)
+    parser.add_argument("--qloo-throttle-rate", type=float, default=0.0)
+    parser.add_argument("--qloo-payload-domains", type=int, default=3)
+    parser.add_argument("--qloo-payload-entities", type=int, default=3)
+    parser.add_argument("--gemini-latency-ms", type=float, default=800.0)
+    parser.add_argument("--gemini-ms-per-token", type=float, default=0.2)
+    parser.add_argument("--gemini-error-rate", type=float, default=0.0)
+    parser.add_argument("--gemini-throttle-rate", type=float, default=0.0)
+    parser.add_argument("--depth", choices=["basic", "standard", "deep"], help="Depth of trend requests")
+    parser.add_argument("--unique-queries", action="store_true", help="Make every request a cache miss")
+    parser.add_argument("--qloo-quota-rpm", type=int, default=0, help="Stub per-minute quota (0 = unlimited)")
+    parser.add_argument("--gemini-quota-rpm", type=int, default=0, help="Stub per-minute quota (0 = unlimited)")
+    parser.add_argument("--no-backend-quotas", dest="backend_quotas", action="store_false",
+                        help="Don't tell the backend the stub quotas (shows the 429s they prevent)")
+    parser.add_argument("--max-connections", type=int, default=500)
+    parser.add_argument("--request-timeout", type=float, default=60.0)
+    parser.add_argument("--client-timeout", type=float, default=0.0,
+                        help="Deadline sent as X-Request-Timeout (seconds, 0 = server default)")
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--output", help="Result file (default: benchmarks/results/<timestamp>-<rev>.json)")
+    parser.add_argument("--verbose", action="store_true", help="Show backend logs")
+    return parser.parse_args(argv)
+
+
+def main():
+    args = parse_args()
+    result = asyncio.run(main_async(args))
+    print_report(result)
+
+    output = Path(args.output) if args.output else RESULTS_DIR / (
+        f"{datetime.now(timezone.utc).strftime('%Y%m%dT%H%M%SZ')}-{result['git_revision']}.json"
+    )
+    output.parent.mkdir(parents=True, exist_ok=True)
+    output.write_text(json.dumps(result, indent=2))
+    print(f"💾 Results written to {output}")
+
+
+if __name__ == "__main__":
+    main()
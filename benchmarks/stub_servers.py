@@ -0,0 +1,259 @@
+"""
+Local stub servers for Qloo and Gemini
+
+Both stubs speak enough of the real wire format for the backend to use them
+unchanged (QLOO_API_URL / GEMINI_API_ENDPOINT), with configurable latency,
+error-rate and payload-size distributions. Every call is counted so the load
+harness can report upstream traffic; GET /__stats returns the counters.
+
+Run one stub per process:
+    python benchmarks/stub_servers.py qloo --port 9001 --latency-ms 150 --error-rate 0.02
+    python benchmarks/stub_servers.py gemini --port 9002 --latency-ms 900 --latency-sigma 0.4 --quota-rpm 300
+"""
+
+import argparse
+import asyncio
+import json
+import math
+import random
+import re
+import sys
+import time
+from collections import Counter, deque
+from dataclasses import dataclass
+from pathlib import Path
+
+from fastapi import FastAPI, Request
+from fastapi.responses import JSONResponse
+
+sys.path.insert(0, str(Path(__file__).parent.parent / "backend"))
+
+from services.prompt_builder import estimate_tokens  # noqa: E402
+
+
+@dataclass
+class StubConfig:
+    """Latency, error and payload-size distribution for a stub"""
+    latency_ms: float = 100.0        # Median latency
+    latency_sigma: float = 0.3       # Log-normal spread (0 = fixed latency)
+    ms_per_token: float = 0.0        # Extra latency per prompt token (Gemini prefill)
+    error_rate: float = 0.0          # Fraction of 5xx responses
+    throttle_rate: float = 0.0       # Fraction of 429 responses
+    payload_domains: int = 3         # Qloo: affinity domains per payload (mean)
+    payload_entities: int = 3        # Qloo: entities per domain (mean)
+    quota_rpm: int = 0               # Requests per rolling minute before 429s (0 = unlimited)
+    pro_latency_factor: float = 2.5  # Gemini: latency multiplier for "pro" models
+    seed: int = 0
+
+    def sample_latency(self, rng: random.Random, tokens: int = 0) -> float:
+        base = self.latency_ms * math.exp(rng.gauss(0.0, self.latency_sigma)) if self.latency_sigma else self.latency_ms
+        return (base + tokens * self.ms_per_token) / 1000.0
+
+    def sample_size(self, rng: random.Random, mean: int) -> int:
+        # Exponential spread around the mean, never empty
+        return max(1, int(rng.expovariate(1.0 / mean))) if mean > 1 else 1
+
+
+def _error(status_code: int, message: str, google: bool) -> JSONResponse:
+    if google:
+        # Google API error shape, so the Gemini SDK raises its typed exceptions
+        status = "RESOURCE_EXHAUSTED" if status_code == 429 else "INTERNAL"
+        return JSONResponse(status_code=status_code,
+                            content={"error": {"code": status_code, "message": message, "status": status}})
+    return JSONResponse(status_code=status_code, content={"error": message})
+
+
+def _failure(config: StubConfig, rng: random.Random, window: deque, google: bool = False):
+    if config.quota_rpm:
+        # Rolling one-minute quota, like the real upstreams
+        now = time.monotonic()
+        while window and window[0] < now - 60:
+            window.popleft()
+        if len(window) >= config.quota_rpm:
+            return _error(429, "per-minute quota exceeded (stub)", google)
+        window.append(now)
+    roll = rng.random()
+    if roll < config.throttle_rate:
+        return _error(429, "quota exceeded (stub)", google)
+    if roll < config.throttle_rate + config.error_rate:
+        return _error(500, "internal error (stub)", google)
+    return None
+
+
+def _stats_routes(app: FastAPI, calls: Counter):
+    @app.get("/__stats")
+    async def stats():
+        return {"calls": dict(calls), "total": sum(calls.values())}
+
+    @app.post("/__reset")
+    async def reset():
+        calls.clear()
+        return {"status": "reset"}
+
+
+def create_qloo_app(config: StubConfig) -> FastAPI:
+    """Qloo stub serving the trend and audience endpoints QlooService calls"""
+    app = FastAPI(title="Qloo stub")
+    rng = random.Random(config.seed)
+    calls: Counter = Counter()
+    window: deque = deque()
+    _stats_routes(app, calls)
+
+    def trend_payload(query: str):
+        domains = config.sample_size(rng, config.payload_domains)
+        return {
+            "query": query,
+            "trend_strength": round(rng.uniform(0.5, 0.95), 2),
+            "cultural_affinities": [
+                {"domain": f"Domain {d}",
+                 "entities": [f"Entity {d}-{e}" for e in range(config.sample_size(rng, config.payload_entities))],
+                 "strength": round(rng.random(), 2)}
+                for d in range(domains)
+            ],
+            "regional_variations": [
+                {"region": region, "strength": round(rng.uniform(0.5, 0.95), 2),
+                 "notable_difference": "Stubbed regional difference"}
+                for region in ("North America", "Europe", "Asia")
+            ],
+            "related_concepts": [f"Concept {c}" for c in range(4)],
+        }
+
+    def audience_payload(audience: str):
+        return {
+            "audience": audience,
+            "audience_size_estimate": rng.choice(["Medium", "Large", "Very Large"]),
+            "cultural_affinities": {
+                domain: [f"{domain.title()} {e}" for e in range(config.sample_size(rng, config.payload_entities))]
+                for domain in ("music", "media", "brands", "activities")[:config.sample_size(rng, config.payload_domains)]
+            },
+            "content_preferences": {"format": ["Short-form video"], "tone": ["Authentic"]},
+            "purchase_drivers": ["Peer Recommendation", "Brand Values"],
+            "emerging_interests": ["Creator Economy"],
+        }
+
+    @app.post("/trends/analyze")
+    async def trends(request: Request):
+        body = await request.json()
+        await asyncio.sleep(config.sample_latency(rng))
+        failure = _failure(config, rng, window)
+        calls[f"trends:{failure.status_code if failure else 200}"] += 1
+        return failure or trend_payload(body.get("query", ""))
+
+    @app.post("/audiences/analyze")
+    async def audiences(request: Request):
+        body = await request.json()
+        await asyncio.sleep(config.sample_latency(rng))
+        failure = _failure(config, rng, window)
+        calls[f"audiences:{failure.status_code if failure else 200}"] += 1
+        return failure or audience_payload(body.get("audience", ""))
+
+    return app
+
+
+def create_gemini_app(config: StubConfig) -> FastAPI:
+    """Gemini stub implementing the REST generateContent method"""
+    app = FastAPI(title="Gemini stub")
+    rng = random.Random(config.seed)
+    calls: Counter = Counter()
+    window: deque = deque()
+    _stats_routes(app, calls)
+
+    def requested(prompt: str, pattern: str) -> int:
+        match = re.search(pattern, prompt)
+        return int(match.group(1)) if match else 4
+
+    def completion(prompt: str) -> str:
+        insights_key = "cultural_affinities" if "Analyze the audience" in prompt else "insights"
+        return json.dumps({
+            "summary": "Stubbed Gemini analysis for load testing.",
+            insights_key: [
+                {"title": f"Insight {i}", "description": "Generated by the Gemini stub.",
+                 "confidence": round(rng.uniform(0.6, 0.95), 2), "source": "llm"}
+                for i in range(1, requested(prompt, r"(\d+) (?:key insights|cultural affinities)") + 1)
+            ],
+            "recommendations": [
+                f"Recommendation {i}" for i in range(1, requested(prompt, r"(\d+) actionable recommendations") + 1)
+            ],
+        })
+
+    @app.get("/v1beta/models/{model}")
+    async def get_model(model: str):
+        # Metadata lookups (health checks) are counted apart from generation calls
+        calls["models.get"] += 1
+        return {"name": f"models/{model}", "baseModelId": model, "version": "001", "displayName": model,
+                "inputTokenLimit": 1048576, "outputTokenLimit": 8192,
+                "supportedGenerationMethods": ["generateContent"]}
+
+    @app.post("/v1beta/models/{model_method}")
+    async def generate_content(model_method: str, request: Request):
+        body = await request.json()
+        prompt = "".join(
+            part.get("text", "")
+            for content in body.get("contents", [])
+            for part in content.get("parts", [])
+        )
+        prompt_tokens = estimate_tokens(prompt)
+        model = model_method.split(":")[0]
+        # Larger models answer more slowly
+        slowdown = config.pro_latency_factor if "pro" in model else 1.0
+        await asyncio.sleep(config.sample_latency(rng, prompt_tokens) * slowdown)
+        failure = _failure(config, rng, window, google=True)
+        calls[f"{model}:{failure.status_code if failure else 200}"] += 1
+        if failure:
+            return failure
+
+        text = completion(prompt)
+        response_tokens = estimate_tokens(text)
+        return {
+            "candidates": [{
+                "content": {"parts": [{"text": text}], "role": "model"},
+                "finishReason": "STOP",
+                "index": 0,
+            }],
+            "usageMetadata": {
+                "promptTokenCount": prompt_tokens,
+                "candidatesTokenCount": response_tokens,
+                "totalTokenCount": prompt_tokens + response_tokens,
+            },
+        }
+
+    return app
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Run a local Qloo or Gemini stub server")
+    parser.add_argument("service", choices=["qloo", "gemini"])
+    parser.add_argument("--port", type=int, default=9001)
+    parser.add_argument("--latency-ms", type=float, default=100.0)
+    parser.add_argument("--latency-sigma", type=float, default=0.3)
+    parser.add_argument("--ms-per-token", type=float, default=0.0)
+    parser.add_argument("--error-rate", type=float, default=0.0)
+    parser.add_argument("--throttle-rate", type=float, default=0.0)
+    parser.add_argument("--quota-rpm", type=int, default=0)
+    parser.add_argument("--pro-latency-factor", type=float, default=2.5)
+    parser.add_argument("--payload-domains", type=int, default=3)
+    parser.add_argument("--payload-entities", type=int, default=3)
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    config = StubConfig(
+        latency_ms=args.latency_ms,
+        latency_sigma=args.latency_sigma,
+        ms_per_token=args.ms_per_token,
+        error_rate=args.error_rate,
+        throttle_rate=args.throttle_rate,
+        payload_domains=args.payload_domains,
+        payload_entities=args.payload_entities,
+        quota_rpm=args.quota_rpm,
+        pro_latency_factor=args.pro_latency_factor,
+        seed=args.seed,
+    )
+    app = create_qloo_app(config) if args.service == "qloo" else create_gemini_app(config)
+
+    import uvicorn
+    print(f"🧪 {args.service} stub listening on port {args.port}")
+    uvicorn.run(app, host="127.0.0.1", port=args.port, log_level="warning")
+
+
+if __name__ == "__main__":
+    main()
@@ -26,6 +26,25 @@ const API_BASE_URL = (() => {
 // DOM Elements
 let elements: { [key: string]: HTMLElement | null } = {};
 
+// Idempotency keys of analyses that have not succeeded yet, by endpoint and request body
+const pendingIdempotencyKeys = new Map<string, string>();
+
+/**
+ * Idempotency-Key for an analysis request: retrying the same request reuses its key,
+ * so the backend returns the first response instead of running (and charging) it again
+ */
+function idempotencyKey(endpoint: string, body: string): string {
+    const request = `${endpoint} ${body}`;
+    let key = pendingIdempotencyKeys.get(request);
+    if (!key) {
+        key = typeof crypto !== 'undefined' && 'randomUUID' in crypto
+            ? crypto.randomUUID()
+            : `${Date.now().toString(36)}-${Math.random().toString(36).slice(2)}`;
+        pendingIdempotencyKeys.set(request, key);
+    }
+    return key;
+}
+
 /**
  * Initialize the application
  */
@@ -185,12 +204,17 @@ async function handleTrendSubmission(e: Event): Promise<void> {
             controller.abort();
         }, 30000);
         
+        const requestBody = JSON.stringify(formData);
         const response = await fetch(`${API_BASE_URL}/api/trends/analyze`, {
             method: 'POST',
             headers: {
                 'Content-Type': 'application/json',
+                // Tell the backend how long we wait so it can degrade instead of timing out
+                'X-Request-Timeout': '28',
+                // Retries of this request get the first response instead of a new analysis
+                'Idempotency-Key': idempotencyKey('/api/trends/analyze', requestBody),
             },
-            body: JSON.stringify(formData),
+            body: requestBody,
             signal: controller.signal
         });
         
@@ -211,6 +235,8 @@ async function handleTrendSubmission(e: Event): Promise<void> {
         const result = await response.json();
         
         console.log('🎯 API Response:', result); // Debug logging
+        pendingIdempotencyKeys.delete(`/api/trends/analyze ${requestBody}`);
+        logServerTiming('Trend analysis', response);
         
         // Update rate limit display from response headers
         const rateLimit = response.headers.get('X-RateLimit-Limit');
@@ -298,12 +324,17 @@ async function handleAudienceSubmission(e: Event): Promise<void> {
             controller.abort();
         }, 30000);
         
+        const requestBody = JSON.stringify(formData);
         const response = await fetch(`${API_BASE_URL}/api/audience/analyze`, {
             method: 'POST',
             headers: {
                 'Content-Type': 'application/json',
+                // Tell the backend how long we wait so it can degrade instead of timing out
+                'X-Request-Timeout': '28',
+                // Retries of this request get the first response instead of a new analysis
+                'Idempotency-Key': idempotencyKey('/api/audience/analyze', requestBody),
             },
-            body: JSON.stringify(formData),
+            body: requestBody,
             signal: controller.signal
         });
         
@@ -322,6 +353,8 @@ async function handleAudienceSubmission(e: Event): Promise<void> {
         }
         
         const result = await response.json();
+        pendingIdempotencyKeys.delete(`/api/audience/analyze ${requestBody}`);
+        logServerTiming('Audience analysis', response);
         
         // Update rate limit display from response headers
         const rateLimit = response.headers.get('X-RateLimit-Limit');
@@ -544,6 +577,34 @@ function displayAudienceResults(data: any): void {
     });
 }
 
+/**
+ * Parse the Server-Timing header into per-stage durations (ms)
+ */
+function parseServerTiming(header: string | null): { [stage: string]: number } {
+    const stages: { [stage: string]: number } = {};
+    if (!header) return stages;
+    
+    header.split(',').forEach(entry => {
+        const [name, ...params] = entry.trim().split(';');
+        const duration = params.find(param => param.trim().startsWith('dur='));
+        if (name && duration) {
+            stages[name] = parseFloat(duration.trim().slice(4));
+        }
+    });
+    return stages;
+}
+
+/**
+ * Log where the server spent its time (rate limit, Qloo, Gemini, response building)
+ */
+function logServerTiming(label: string, response: Response): void {
+    const stages = parseServerTiming(response.headers.get('Server-Timing'));
+    if (Object.keys(stages).length > 0) {
+        console.log(`⏱️ ${label} server timing (ms):`);
+        console.table(stages);
+    }
+}
+
 /**
  * Update rate limit display
  */